@@ -116,13 +116,15 @@ async function main() {
     summaryStack.addDependency(ragStack);
 
     // Stack 5: Sistema de Emails Personalizados con IA (Nova Pro + SES)
-    // Los recursos se importan automáticamente desde LegacyStack usando CloudFormation exports
+    // Los recursos se importan automáticamente desde LegacyStack y RAGStack usando CloudFormation exports
+    // DEPENDENCIA: Requiere que RAGStack se despliegue primero (layer compartido con db)
     const emailStack = new AIEmailStack(app, `${participantPrefix}-AIEmailStack`, {
       participantPrefix,
       env,
       verifiedEmailAddress: process.env.VERIFIED_EMAIL || 'noreply@example.com',
       description: 'Sistema de Emails Personalizados con IA',
     });
+    emailStack.addDependency(ragStack);
   }
 
   app.synth();
@@ -39,6 +39,13 @@ export class AIClassificationStack extends cdk.Stack {
     // Importar bucket S3 (para leer prompts)
     const bucket = s3.Bucket.fromBucketName(this, 'ImportedBucket', bucketName);
 
+    // Lambda Layer compartido (lambda/shared) exportado por AIRAGStack
+    const sharedLayer = lambda.LayerVersion.fromLayerVersionArn(
+      this,
+      'ImportedSharedLayer',
+      cdk.Fn.importValue(`${participantPrefix}-SimilaritySearchLayerArn`)
+    );
+
     // ========================================
     // Lambda: Clasificador de Riesgo con RAG
     // ========================================
@@ -47,12 +54,15 @@ export class AIClassificationStack extends cdk.Stack {
       runtime: lambda.Runtime.PYTHON_3_11,
       handler: 'index.handler',
       code: lambda.Code.fromAsset('../lambda/ai/classify_risk'),
-      timeout: cdk.Duration.seconds(30),
+      // El modo batch (informe_ids / filtro) puede superar los 29s de API Gateway:
+      // los lotes grandes se invocan directamente (CLI, EventBridge)
+      timeout: cdk.Duration.minutes(5),
       memorySize: 1024,
       vpc,
       vpcSubnets: {
         subnetType: ec2.SubnetType.PRIVATE_WITH_EGRESS,
       },
+      layers: [sharedLayer],
       environment: {
         DB_SECRET_ARN: dbSecretArn,
         DB_CLUSTER_ARN: dbClusterArn,
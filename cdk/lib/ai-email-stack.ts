@@ -41,6 +41,13 @@ export class AIEmailStack extends cdk.Stack {
     // Importar bucket S3
     const bucket = s3.Bucket.fromBucketName(this, 'ImportedBucket', bucketName);
 
+    // Lambda Layer compartido (lambda/shared) exportado por AIRAGStack
+    const sharedLayer = lambda.LayerVersion.fromLayerVersionArn(
+      this,
+      'ImportedSharedLayer',
+      cdk.Fn.importValue(`${participantPrefix}-SimilaritySearchLayerArn`)
+    );
+
     // Lambda: Enviador de Emails
     this.sendEmailLambda = new lambda.Function(this, 'SendEmailFunction', {
       functionName: `${participantPrefix}-send-email`,
@@ -51,6 +58,7 @@ export class AIEmailStack extends cdk.Stack {
       memorySize: 1024,
       vpc,
       vpcSubnets: { subnetType: ec2.SubnetType.PRIVATE_WITH_EGRESS },
+      layers: [sharedLayer],
       environment: {
         DB_SECRET_ARN: dbSecretArn,
         DB_CLUSTER_ARN: dbClusterArn,
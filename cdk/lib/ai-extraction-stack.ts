@@ -3,8 +3,13 @@ import * as lambda from 'aws-cdk-lib/aws-lambda';
 import * as s3 from 'aws-cdk-lib/aws-s3';
 import * as s3n from 'aws-cdk-lib/aws-s3-notifications';
 import * as iam from 'aws-cdk-lib/aws-iam';
+import * as sns from 'aws-cdk-lib/aws-sns';
+import * as subs from 'aws-cdk-lib/aws-sns-subscriptions';
+import * as sqs from 'aws-cdk-lib/aws-sqs';
+import { SqsEventSource } from 'aws-cdk-lib/aws-lambda-event-sources';
 import * as ec2 from 'aws-cdk-lib/aws-ec2';
 import { Construct } from 'constructs';
+import { sharedLayerCode } from './shared-layer';
 
 export interface AIExtractionStackProps extends cdk.StackProps {
   participantPrefix: string;
@@ -14,6 +19,7 @@ export interface AIExtractionStackProps extends cdk.StackProps {
 
 export class AIExtractionStack extends cdk.Stack {
   public readonly extractPdfLambda: lambda.Function;
+  public readonly extractPdfCompletionLambda: lambda.Function;
 
   constructor(scope: Construct, id: string, props: AIExtractionStackProps) {
     super(scope, id, props);
@@ -42,51 +48,142 @@ export class AIExtractionStack extends cdk.Stack {
     const bucket = s3.Bucket.fromBucketName(this, 'ImportedBucket', bucketName);
 
     // ========================================
-    // Lambda: Extractor de PDFs con IA
+    // Textract asíncrono: tópico SNS de finalización y rol para publicar
+    // ========================================
+    const textractTopic = new sns.Topic(this, 'TextractCompletionTopic', {
+      topicName: `${participantPrefix}-textract-completion`,
+    });
+
+    const textractRole = new iam.Role(this, 'TextractServiceRole', {
+      assumedBy: new iam.ServicePrincipal('textract.amazonaws.com'),
+      description: 'Rol que Textract asume para publicar la finalización de jobs',
+    });
+    textractTopic.grantPublish(textractRole);
+
+    // ========================================
+    // Colas SQS delante de cada Lambda: lotes de hasta 10 mensajes procesados
+    // en paralelo, con respuesta parcial (solo los fallidos se reintentan)
+    // ========================================
+    const ingestDlq = new sqs.Queue(this, 'ExtractPdfIngestDLQ', {
+      queueName: `${participantPrefix}-extract-pdf-ingest-dlq`,
+      retentionPeriod: cdk.Duration.days(14),
+    });
+
+    const ingestQueue = new sqs.Queue(this, 'ExtractPdfIngestQueue', {
+      queueName: `${participantPrefix}-extract-pdf-ingest`,
+      visibilityTimeout: cdk.Duration.minutes(6), // 6x el timeout de la Lambda de ingesta
+      deadLetterQueue: { queue: ingestDlq, maxReceiveCount: 3 },
+    });
+
+    const completionDlq = new sqs.Queue(this, 'ExtractPdfCompletionDLQ', {
+      queueName: `${participantPrefix}-extract-pdf-complete-dlq`,
+      retentionPeriod: cdk.Duration.days(14),
+    });
+
+    const completionQueue = new sqs.Queue(this, 'ExtractPdfCompletionQueue', {
+      queueName: `${participantPrefix}-extract-pdf-complete`,
+      visibilityTimeout: cdk.Duration.minutes(30), // 6x el timeout de la Lambda de finalización
+      deadLetterQueue: { queue: completionDlq, maxReceiveCount: 3 },
+    });
+
+    const environment = {
+      DB_SECRET_ARN: dbSecretArn,
+      DB_CLUSTER_ARN: dbClusterArn,
+      DATABASE_NAME: databaseName,
+      BUCKET_NAME: bucket.bucketName,
+      TEXTRACT_SNS_TOPIC_ARN: textractTopic.topicArn,
+      TEXTRACT_ROLE_ARN: textractRole.roleArn,
+      EXTRACT_MAX_CONCURRENCY: '4',
+    };
+
+    // Lambda Layer compartido (lambda/shared): upserts de trabajador, contratista e informe
+    const sharedLayer = new lambda.LayerVersion(this, 'ExtractionSharedLayer', {
+      layerVersionName: `${participantPrefix}-extraction-shared`,
+      code: sharedLayerCode(),
+      compatibleRuntimes: [lambda.Runtime.PYTHON_3_11],
+      description: 'Acceso compartido a Aurora para extract_pdf',
+    });
+
+    // ========================================
+    // Lambda: Ingesta de PDFs (inicia jobs de Textract y retorna)
     // ========================================
     this.extractPdfLambda = new lambda.Function(this, 'ExtractPdfFunction', {
       functionName: `${participantPrefix}-extract-pdf`,
       runtime: lambda.Runtime.PYTHON_3_11,
       handler: 'index.handler',
       code: lambda.Code.fromAsset('../lambda/ai/extract_pdf'),
-      timeout: cdk.Duration.minutes(5), // Textract puede tardar
-      memorySize: 1024,
+      timeout: cdk.Duration.minutes(1), // Solo inicia jobs (con reintentos ante throttling)
+      memorySize: 256,
       vpc,
       vpcSubnets: {
         subnetType: ec2.SubnetType.PRIVATE_WITH_EGRESS,
       },
-      environment: {
-        DB_SECRET_ARN: dbSecretArn,
-        DB_CLUSTER_ARN: dbClusterArn,
-        DATABASE_NAME: databaseName,
-        BUCKET_NAME: bucket.bucketName,
+      layers: [sharedLayer],
+      environment,
+    });
+
+    // ========================================
+    // Lambda: Finalización (resultado de Textract -> Bedrock -> Aurora)
+    // ========================================
+    this.extractPdfCompletionLambda = new lambda.Function(this, 'ExtractPdfCompletionFunction', {
+      functionName: `${participantPrefix}-extract-pdf-complete`,
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: 'index.completion_handler',
+      code: lambda.Code.fromAsset('../lambda/ai/extract_pdf'),
+      timeout: cdk.Duration.minutes(5), // Paginar resultados + Bedrock
+      memorySize: 1024,
+      vpc,
+      vpcSubnets: {
+        subnetType: ec2.SubnetType.PRIVATE_WITH_EGRESS,
       },
+      layers: [sharedLayer],
+      environment,
     });
 
+    // Textract -> SNS -> SQS -> Lambda de finalización
+    textractTopic.addSubscription(new subs.SqsSubscription(completionQueue, { rawMessageDelivery: true }));
+
+    this.extractPdfLambda.addEventSource(new SqsEventSource(ingestQueue, {
+      batchSize: 10,
+      maxBatchingWindow: cdk.Duration.seconds(5),
+      reportBatchItemFailures: true,
+    }));
+
+    this.extractPdfCompletionLambda.addEventSource(new SqsEventSource(completionQueue, {
+      batchSize: 10,
+      maxBatchingWindow: cdk.Duration.seconds(5),
+      reportBatchItemFailures: true,
+    }));
+
     // ========================================
     // Permisos IAM
     // ========================================
 
-    // Permiso para leer del bucket S3
+    // Textract lee el PDF con las credenciales de quien inicia el job;
+    // la ingesta además lo lee para hashear objetos multipart
     bucket.grantRead(this.extractPdfLambda);
 
     // Permiso para Textract
     this.extractPdfLambda.addToRolePolicy(
       new iam.PolicyStatement({
         effect: iam.Effect.ALLOW,
-        actions: [
-          'textract:DetectDocumentText',
-          'textract:AnalyzeDocument',
-          'textract:StartDocumentTextDetection',
-          'textract:GetDocumentTextDetection',
-        ],
+        actions: ['textract:StartDocumentAnalysis'],
+        resources: ['*'], // Textract no soporta resource-level permissions
+      })
+    );
+    textractRole.grantPassRole(this.extractPdfLambda.role!);
+
+    this.extractPdfCompletionLambda.addToRolePolicy(
+      new iam.PolicyStatement({
+        effect: iam.Effect.ALLOW,
+        actions: ['textract:GetDocumentAnalysis'],
         resources: ['*'], // Textract no soporta resource-level permissions
       })
     );
 
     // Permiso para Bedrock (Amazon Nova Pro)
     // Nota: Los inference profiles pueden redirigir a múltiples regiones
-    this.extractPdfLambda.addToRolePolicy(
+    this.extractPdfCompletionLambda.addToRolePolicy(
       new iam.PolicyStatement({
         effect: iam.Effect.ALLOW,
         actions: [
@@ -107,34 +204,37 @@ export class AIExtractionStack extends cdk.Stack {
       })
     );
 
-    // Permiso para Secrets Manager (leer credenciales de Aurora)
-    this.extractPdfLambda.addToRolePolicy(
-      new iam.PolicyStatement({
-        effect: iam.Effect.ALLOW,
-        actions: ['secretsmanager:GetSecretValue'],
-        resources: [dbSecretArn],
-      })
-    );
+    // Ambas Lambdas usan Aurora: la ingesta consulta el cache de extracciones (extracciones_pdf)
+    for (const fn of [this.extractPdfLambda, this.extractPdfCompletionLambda]) {
+      // Permiso para Secrets Manager (leer credenciales de Aurora)
+      fn.addToRolePolicy(
+        new iam.PolicyStatement({
+          effect: iam.Effect.ALLOW,
+          actions: ['secretsmanager:GetSecretValue'],
+          resources: [dbSecretArn],
+        })
+      );
 
-    // Permiso para RDS Data API
-    this.extractPdfLambda.addToRolePolicy(
-      new iam.PolicyStatement({
-        effect: iam.Effect.ALLOW,
-        actions: [
-          'rds-data:ExecuteStatement',
-          'rds-data:BatchExecuteStatement',
-        ],
-        resources: [dbClusterArn],
-      })
-    );
+      // Permiso para RDS Data API
+      fn.addToRolePolicy(
+        new iam.PolicyStatement({
+          effect: iam.Effect.ALLOW,
+          actions: [
+            'rds-data:ExecuteStatement',
+            'rds-data:BatchExecuteStatement',
+          ],
+          resources: [dbClusterArn],
+        })
+      );
+    }
 
     // ========================================
     // S3 Event Notification
-    // Trigger cuando se sube un PDF a /external-reports/
+    // Cuando se sube un PDF a /external-reports/ se encola en la cola de ingesta
     // ========================================
     bucket.addEventNotification(
       s3.EventType.OBJECT_CREATED,
-      new s3n.LambdaDestination(this.extractPdfLambda),
+      new s3n.SqsDestination(ingestQueue),
       {
         prefix: 'external-reports/',
         suffix: '.pdf',
@@ -153,5 +253,25 @@ export class AIExtractionStack extends cdk.Stack {
       value: this.extractPdfLambda.functionName,
       description: 'Nombre de la Lambda de extracción',
     });
+
+    new cdk.CfnOutput(this, 'ExtractPdfCompletionLambdaName', {
+      value: this.extractPdfCompletionLambda.functionName,
+      description: 'Nombre de la Lambda que procesa los jobs terminados de Textract',
+    });
+
+    new cdk.CfnOutput(this, 'ExtractPdfIngestDlqUrl', {
+      value: ingestDlq.queueUrl,
+      description: 'DLQ de PDFs cuya ingesta falló tras los reintentos',
+    });
+
+    new cdk.CfnOutput(this, 'ExtractPdfCompletionDlqUrl', {
+      value: completionDlq.queueUrl,
+      description: 'DLQ de jobs de Textract cuyo procesamiento falló tras los reintentos',
+    });
+
+    new cdk.CfnOutput(this, 'TextractCompletionTopicArn', {
+      value: textractTopic.topicArn,
+      description: 'Tópico SNS de finalización de jobs de Textract',
+    });
   }
 }
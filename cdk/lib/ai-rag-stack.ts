@@ -4,6 +4,7 @@ import * as iam from 'aws-cdk-lib/aws-iam';
 import * as ec2 from 'aws-cdk-lib/aws-ec2';
 import * as s3 from 'aws-cdk-lib/aws-s3';
 import { Construct } from 'constructs';
+import { sharedLayerCode } from './shared-layer';
 
 export interface AIRAGStackProps extends cdk.StackProps {
   participantPrefix: string;
@@ -46,7 +47,7 @@ export class AIRAGStack extends cdk.Stack {
     // ========================================
     this.similaritySearchLayer = new lambda.LayerVersion(this, 'SimilaritySearchLayer', {
       layerVersionName: `${participantPrefix}-similarity-search`,
-      code: lambda.Code.fromAsset('../lambda/shared'),
+      code: sharedLayerCode(),
       compatibleRuntimes: [lambda.Runtime.PYTHON_3_11],
       description: 'Funciones compartidas para búsqueda por similitud con pgvector',
     });
@@ -107,6 +108,9 @@ export class AIRAGStack extends cdk.Stack {
         actions: [
           'rds-data:ExecuteStatement',
           'rds-data:BatchExecuteStatement',
+          'rds-data:BeginTransaction',
+          'rds-data:CommitTransaction',
+          'rds-data:RollbackTransaction',
         ],
         resources: [dbClusterArn],
       })
@@ -39,6 +39,13 @@ export class AISummaryStack extends cdk.Stack {
     // Importar bucket S3 (para leer prompts)
     const bucket = s3.Bucket.fromBucketName(this, 'ImportedBucket', bucketName);
 
+    // Lambda Layer compartido (lambda/shared) exportado por AIRAGStack
+    const sharedLayer = lambda.LayerVersion.fromLayerVersionArn(
+      this,
+      'ImportedSharedLayer',
+      cdk.Fn.importValue(`${participantPrefix}-SimilaritySearchLayerArn`)
+    );
+
     // ========================================
     // Lambda: Generador de Resúmenes con RAG
     // ========================================
@@ -47,12 +54,15 @@ export class AISummaryStack extends cdk.Stack {
       runtime: lambda.Runtime.PYTHON_3_11,
       handler: 'index.handler',
       code: lambda.Code.fromAsset('../lambda/ai/generate_summary'),
-      timeout: cdk.Duration.seconds(30),
+      // El modo batch (pendientes) pagina hasta BATCH_SAFETY_SECONDS antes del timeout:
+      // se invoca directamente (CLI, EventBridge), no a través de API Gateway (29s)
+      timeout: cdk.Duration.minutes(5),
       memorySize: 1024,
       vpc,
       vpcSubnets: {
         subnetType: ec2.SubnetType.PRIVATE_WITH_EGRESS,
       },
+      layers: [sharedLayer],
       environment: {
         DB_SECRET_ARN: dbSecretArn,
         DB_CLUSTER_ARN: dbClusterArn,
@@ -4,9 +4,12 @@ import * as rds from 'aws-cdk-lib/aws-rds';
 import * as s3 from 'aws-cdk-lib/aws-s3';
 import * as s3deploy from 'aws-cdk-lib/aws-s3-deployment';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
+import * as sqs from 'aws-cdk-lib/aws-sqs';
+import { SqsEventSource } from 'aws-cdk-lib/aws-lambda-event-sources';
 import * as apigateway from 'aws-cdk-lib/aws-apigateway';
 import * as cr from 'aws-cdk-lib/custom-resources';
 import { Construct } from 'constructs';
+import { sharedLayerCode } from './shared-layer';
 
 export interface LegacyStackProps extends cdk.StackProps {
   participantPrefix: string;
@@ -163,6 +166,16 @@ export class LegacyStack extends cdk.Stack {
     // ========================================
     // Lambda: Registro de Exámenes
     // ========================================
+    // ========================================
+    // Lambda Layer: Acceso compartido a la base de datos (lambda/shared)
+    // ========================================
+    const sharedDbLayer = new lambda.LayerVersion(this, 'SharedDbLayer', {
+      layerVersionName: `${participantPrefix}-shared-db`,
+      code: sharedLayerCode(),
+      compatibleRuntimes: [lambda.Runtime.PYTHON_3_11],
+      description: 'Acceso compartido a Aurora (Data API o conexión directa con pool)',
+    });
+
     // ========================================
     // Lambda: Generador de PDFs (debe crearse primero)
     // ========================================
@@ -177,6 +190,7 @@ export class LegacyStack extends cdk.Stack {
       vpcSubnets: {
         subnetType: ec2.SubnetType.PRIVATE_WITH_EGRESS,
       },
+      layers: [sharedDbLayer],
       environment: {
         DB_SECRET_ARN: this.database.secret!.secretArn,
         DB_CLUSTER_ARN: this.database.clusterArn,
@@ -194,6 +208,90 @@ export class LegacyStack extends cdk.Stack {
       'Allow Lambda access'
     );
 
+    // ========================================
+    // Cola de generación de PDFs: register-exam encola el informe (pdf_status
+    // PENDING) y el worker lo renderiza fuera del request
+    // ========================================
+    const pdfDlq = new sqs.Queue(this, 'PdfGenerationDLQ', {
+      queueName: `${participantPrefix}-generate-pdf-dlq`,
+      retentionPeriod: cdk.Duration.days(14),
+    });
+
+    const pdfQueue = new sqs.Queue(this, 'PdfGenerationQueue', {
+      queueName: `${participantPrefix}-generate-pdf`,
+      visibilityTimeout: cdk.Duration.minutes(6), // 6x el timeout del worker
+      deadLetterQueue: { queue: pdfDlq, maxReceiveCount: 3 },
+    });
+
+    const generatePdfWorkerLambda = new lambda.Function(this, 'GeneratePdfWorkerFunction', {
+      functionName: `${participantPrefix}-generate-pdf-worker`,
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: 'index.queue_handler',
+      code: lambda.Code.fromAsset('../lambda/legacy/generate_pdf'),
+      timeout: cdk.Duration.seconds(60),
+      memorySize: 1024,
+      vpc: this.vpc,
+      vpcSubnets: {
+        subnetType: ec2.SubnetType.PRIVATE_WITH_EGRESS,
+      },
+      layers: [sharedDbLayer],
+      environment: {
+        DB_SECRET_ARN: this.database.secret!.secretArn,
+        DB_CLUSTER_ARN: this.database.clusterArn,
+        DATABASE_NAME: 'medical_reports',
+        BUCKET_NAME: this.bucket.bucketName,
+        PDF_MAX_RECEIVE_COUNT: '3', // Igual al maxReceiveCount de la DLQ
+      },
+    });
+
+    this.database.secret!.grantRead(generatePdfWorkerLambda);
+    this.database.grantDataApiAccess(generatePdfWorkerLambda);
+    this.bucket.grantReadWrite(generatePdfWorkerLambda);
+    dbSecurityGroup.addIngressRule(
+      ec2.Peer.securityGroupId(generatePdfWorkerLambda.connections.securityGroups[0].securityGroupId),
+      ec2.Port.tcp(5432),
+      'Allow Lambda access'
+    );
+
+    generatePdfWorkerLambda.addEventSource(new SqsEventSource(pdfQueue, {
+      batchSize: 5,
+      maxBatchingWindow: cdk.Duration.seconds(1),
+      reportBatchItemFailures: true,
+    }));
+
+    // ========================================
+    // Lambda: Regeneración masiva de PDFs (invocación manual con un rango
+    // de ids o un filtro; renderiza en un proceso por vCPU)
+    // ========================================
+    const generatePdfBatchLambda = new lambda.Function(this, 'GeneratePdfBatchFunction', {
+      functionName: `${participantPrefix}-generate-pdf-batch`,
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: 'index.batch_handler',
+      code: lambda.Code.fromAsset('../lambda/legacy/generate_pdf'),
+      timeout: cdk.Duration.minutes(15),
+      memorySize: 3538, // ~2 vCPUs para el pool de procesos de render
+      vpc: this.vpc,
+      vpcSubnets: {
+        subnetType: ec2.SubnetType.PRIVATE_WITH_EGRESS,
+      },
+      layers: [sharedDbLayer],
+      environment: {
+        DB_SECRET_ARN: this.database.secret!.secretArn,
+        DB_CLUSTER_ARN: this.database.clusterArn,
+        DATABASE_NAME: 'medical_reports',
+        BUCKET_NAME: this.bucket.bucketName,
+      },
+    });
+
+    this.database.secret!.grantRead(generatePdfBatchLambda);
+    this.database.grantDataApiAccess(generatePdfBatchLambda);
+    this.bucket.grantReadWrite(generatePdfBatchLambda);
+    dbSecurityGroup.addIngressRule(
+      ec2.Peer.securityGroupId(generatePdfBatchLambda.connections.securityGroups[0].securityGroupId),
+      ec2.Port.tcp(5432),
+      'Allow Lambda access'
+    );
+
     // ========================================
     // Lambda: Registro de Exámenes
     // ========================================
@@ -208,17 +306,20 @@ export class LegacyStack extends cdk.Stack {
       vpcSubnets: {
         subnetType: ec2.SubnetType.PRIVATE_WITH_EGRESS,
       },
+      layers: [sharedDbLayer],
       environment: {
         DB_SECRET_ARN: this.database.secret!.secretArn,
         DB_CLUSTER_ARN: this.database.clusterArn,
         DATABASE_NAME: 'medical_reports',
         BUCKET_NAME: this.bucket.bucketName,
         GENERATE_PDF_LAMBDA_ARN: generatePdfLambda.functionArn,
+        PDF_QUEUE_URL: pdfQueue.queueUrl,
       },
     });
 
-    // Permisos para acceder a Secrets Manager y Aurora
+    // Permisos para acceder a Secrets Manager, Aurora y la cola de PDFs
     this.database.secret!.grantRead(registerExamLambda);
+    pdfQueue.grantSendMessages(registerExamLambda);
     this.database.grantDataApiAccess(registerExamLambda);
     dbSecurityGroup.addIngressRule(
       ec2.Peer.securityGroupId(registerExamLambda.connections.securityGroups[0].securityGroupId),
@@ -278,10 +379,13 @@ export class LegacyStack extends cdk.Stack {
       vpcSubnets: {
         subnetType: ec2.SubnetType.PRIVATE_WITH_EGRESS,
       },
+      layers: [sharedDbLayer],
       environment: {
         DB_SECRET_ARN: this.database.secret!.secretArn,
         DB_CLUSTER_ARN: this.database.clusterArn,
         DATABASE_NAME: 'medical_reports',
+        LIST_PAGE_SIZE: '50',
+        LIST_CACHE_TTL_SECONDS: '2',
       },
     });
 
@@ -294,6 +398,96 @@ export class LegacyStack extends cdk.Stack {
       'Allow Lambda access'
     );
 
+    // ========================================
+    // Lambda: Estado del PDF de un informe
+    // ========================================
+    const getPdfStatusLambda = new lambda.Function(this, 'GetPdfStatusFunction', {
+      functionName: `${participantPrefix}-get-pdf-status`,
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: 'index.handler',
+      code: lambda.Code.fromAsset('../lambda/legacy/get_pdf_status'),
+      timeout: cdk.Duration.seconds(10),
+      memorySize: 256,
+      vpc: this.vpc,
+      vpcSubnets: {
+        subnetType: ec2.SubnetType.PRIVATE_WITH_EGRESS,
+      },
+      layers: [sharedDbLayer],
+      environment: {
+        DB_SECRET_ARN: this.database.secret!.secretArn,
+        DB_CLUSTER_ARN: this.database.clusterArn,
+        DATABASE_NAME: 'medical_reports',
+      },
+    });
+
+    this.database.secret!.grantRead(getPdfStatusLambda);
+    this.database.grantDataApiAccess(getPdfStatusLambda);
+    dbSecurityGroup.addIngressRule(
+      ec2.Peer.securityGroupId(getPdfStatusLambda.connections.securityGroups[0].securityGroupId),
+      ec2.Port.tcp(5432),
+      'Allow Lambda access'
+    );
+
+    // ========================================
+    // Lambda: Detalle de un informe (para App Web)
+    // ========================================
+    const getInformeLambda = new lambda.Function(this, 'GetInformeFunction', {
+      functionName: `${participantPrefix}-get-informe`,
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: 'index.handler',
+      code: lambda.Code.fromAsset('../lambda/legacy/get_informe'),
+      timeout: cdk.Duration.seconds(10),
+      memorySize: 256,
+      vpc: this.vpc,
+      vpcSubnets: {
+        subnetType: ec2.SubnetType.PRIVATE_WITH_EGRESS,
+      },
+      layers: [sharedDbLayer],
+      environment: {
+        DB_SECRET_ARN: this.database.secret!.secretArn,
+        DB_CLUSTER_ARN: this.database.clusterArn,
+        DATABASE_NAME: 'medical_reports',
+      },
+    });
+
+    this.database.secret!.grantRead(getInformeLambda);
+    this.database.grantDataApiAccess(getInformeLambda);
+    dbSecurityGroup.addIngressRule(
+      ec2.Peer.securityGroupId(getInformeLambda.connections.securityGroups[0].securityGroupId),
+      ec2.Port.tcp(5432),
+      'Allow Lambda access'
+    );
+
+    // ========================================
+    // Lambda: Estadísticas del dashboard (para App Web)
+    // ========================================
+    const getStatsLambda = new lambda.Function(this, 'GetStatsFunction', {
+      functionName: `${participantPrefix}-get-stats`,
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: 'index.handler',
+      code: lambda.Code.fromAsset('../lambda/legacy/get_stats'),
+      timeout: cdk.Duration.seconds(10),
+      memorySize: 256,
+      vpc: this.vpc,
+      vpcSubnets: {
+        subnetType: ec2.SubnetType.PRIVATE_WITH_EGRESS,
+      },
+      layers: [sharedDbLayer],
+      environment: {
+        DB_SECRET_ARN: this.database.secret!.secretArn,
+        DB_CLUSTER_ARN: this.database.clusterArn,
+        DATABASE_NAME: 'medical_reports',
+      },
+    });
+
+    this.database.secret!.grantRead(getStatsLambda);
+    this.database.grantDataApiAccess(getStatsLambda);
+    dbSecurityGroup.addIngressRule(
+      ec2.Peer.securityGroupId(getStatsLambda.connections.securityGroups[0].securityGroupId),
+      ec2.Port.tcp(5432),
+      'Allow Lambda access'
+    );
+
     // ========================================
     // API Gateway
     // ========================================
@@ -308,6 +502,8 @@ export class LegacyStack extends cdk.Stack {
       defaultCorsPreflightOptions: {
         allowOrigins: apigateway.Cors.ALL_ORIGINS,
         allowMethods: apigateway.Cors.ALL_METHODS,
+        // GET /informes revalida con If-None-Match (ETag de list-informes)
+        allowHeaders: [...apigateway.Cors.DEFAULT_HEADERS, 'If-None-Match'],
       },
     });
 
@@ -329,6 +525,24 @@ export class LegacyStack extends cdk.Stack {
       apiKeyRequired: false,
     });
 
+    // Endpoint: GET /informes/{id} (detalle desde informes_completos)
+    const informeResource = informesResource.addResource('{id}');
+    informeResource.addMethod('GET', new apigateway.LambdaIntegration(getInformeLambda), {
+      apiKeyRequired: false,
+    });
+
+    // Endpoint: GET /informes/{id}/pdf (estado de la generación del PDF)
+    const informePdfResource = informeResource.addResource('pdf');
+    informePdfResource.addMethod('GET', new apigateway.LambdaIntegration(getPdfStatusLambda), {
+      apiKeyRequired: false,
+    });
+
+    // Endpoint: GET /estadisticas (contadores del dashboard)
+    const estadisticasResource = this.api.root.addResource('estadisticas');
+    estadisticasResource.addMethod('GET', new apigateway.LambdaIntegration(getStatsLambda), {
+      apiKeyRequired: false,
+    });
+
     // ========================================
     // App Web Estática en S3
     // ========================================
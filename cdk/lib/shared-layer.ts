@@ -0,0 +1,56 @@
+import * as lambda from 'aws-cdk-lib/aws-lambda';
+import { spawnSync } from 'child_process';
+import * as fs from 'fs';
+import * as path from 'path';
+
+const SHARED_DIR = '../lambda/shared';
+
+// Dependencias con wheels para el runtime de Lambda (pg8000 es Python puro)
+const PIP_TARGET_ARGS = [
+  '--platform', 'manylinux2014_x86_64',
+  '--implementation', 'cp',
+  '--python-version', '3.11',
+  '--only-binary=:all:',
+];
+
+/**
+ * Código del Lambda Layer compartido (lambda/shared).
+ *
+ * Python en Lambda solo agrega /opt/python al sys.path, por lo que los
+ * módulos (db, upserts, worker_history, vector_codec, ...) y las dependencias
+ * de requirements.txt (pg8000 para DB_BACKEND=postgres) se empaquetan bajo
+ * python/. Usa pip local si está disponible; si no, la imagen de build de
+ * Python 3.11 (requiere Docker).
+ */
+export function sharedLayerCode(): lambda.Code {
+  return lambda.Code.fromAsset(SHARED_DIR, {
+    exclude: ['__pycache__', '*.pyc'],
+    bundling: {
+      image: lambda.Runtime.PYTHON_3_11.bundlingImage,
+      command: [
+        'bash', '-c',
+        'pip install --no-cache-dir -r requirements.txt -t /asset-output/python && cp -au . /asset-output/python',
+      ],
+      local: {
+        tryBundle(outputDir: string): boolean {
+          const target = path.join(outputDir, 'python');
+          const python = process.platform === 'win32' ? 'python' : 'python3';
+          const pip = spawnSync(
+            python,
+            ['-m', 'pip', 'install', '--no-cache-dir', '-r', path.join(SHARED_DIR, 'requirements.txt'),
+              '-t', target, ...PIP_TARGET_ARGS],
+            { stdio: 'inherit' },
+          );
+          if (pip.status !== 0) {
+            return false;
+          }
+          fs.cpSync(SHARED_DIR, target, {
+            recursive: true,
+            filter: (source) => !source.includes('__pycache__') && !source.endsWith('.pyc'),
+          });
+          return true;
+        },
+      },
+    },
+  });
+}
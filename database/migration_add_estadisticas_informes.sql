@@ -0,0 +1,152 @@
+-- ========================================
+-- Migración: Contadores de estadísticas de informes
+-- Fecha: 2026-10-17
+-- Descripción: Tabla estadisticas_informes mantenida por triggers
+--              (GET /estadisticas sin GROUP BY sobre informes_medicos)
+-- ========================================
+
+BEGIN;
+
+-- Bloquea escrituras en informes_medicos mientras se cuentan los
+-- informes existentes y se crean los triggers (no se pierde ni se
+-- cuenta dos veces ningún cambio)
+LOCK TABLE informes_medicos IN SHARE ROW EXCLUSIVE MODE;
+
+-- Una fila por agregado: dimension 'total' (clave ''), 'contratista'
+-- (clave = contratista_id) y 'dia' (clave = fecha_examen YYYY-MM-DD)
+CREATE TABLE IF NOT EXISTS estadisticas_informes (
+    dimension VARCHAR(20) NOT NULL,
+    clave VARCHAR(20) NOT NULL,
+    total INT NOT NULL DEFAULT 0,
+    riesgo_bajo INT NOT NULL DEFAULT 0,
+    riesgo_medio INT NOT NULL DEFAULT 0,
+    riesgo_alto INT NOT NULL DEFAULT 0,
+    con_resumen INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, clave)
+);
+
+-- Suma las filas nuevas y resta las viejas de cada sentencia: un INSERT,
+-- una clasificación o un UPDATE de muchas filas es un solo upsert por
+-- agregado afectado
+CREATE OR REPLACE FUNCTION actualizar_estadisticas_informes()
+RETURNS TRIGGER AS $$
+DECLARE
+    filas TEXT;
+BEGIN
+    -- Solo existen las tablas de transición de la operación
+    filas := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT 1 AS signo, * FROM filas_nuevas'
+        WHEN 'DELETE' THEN 'SELECT -1 AS signo, * FROM filas_viejas'
+        ELSE 'SELECT 1 AS signo, * FROM filas_nuevas UNION ALL SELECT -1, * FROM filas_viejas'
+    END;
+
+    EXECUTE format($sql$
+        INSERT INTO estadisticas_informes AS e
+            (dimension, clave, total, riesgo_bajo, riesgo_medio, riesgo_alto, con_resumen)
+        SELECT
+            k.dimension,
+            k.clave,
+            SUM(d.signo),
+            COALESCE(SUM(d.signo) FILTER (WHERE d.nivel_riesgo = 'BAJO'), 0),
+            COALESCE(SUM(d.signo) FILTER (WHERE d.nivel_riesgo = 'MEDIO'), 0),
+            COALESCE(SUM(d.signo) FILTER (WHERE d.nivel_riesgo = 'ALTO'), 0),
+            COALESCE(SUM(d.signo) FILTER (WHERE d.resumen_ejecutivo IS NOT NULL), 0)
+        FROM (%s) d
+        CROSS JOIN LATERAL (VALUES
+            ('total', ''),
+            ('contratista', d.contratista_id::TEXT),
+            ('dia', d.fecha_examen::DATE::TEXT)
+        ) AS k(dimension, clave)
+        GROUP BY k.dimension, k.clave
+        -- Un UPDATE que no cambia los contadores (pdf_status, embeddings) no escribe
+        HAVING SUM(d.signo) <> 0
+            OR SUM(d.signo) FILTER (WHERE d.nivel_riesgo = 'BAJO') <> 0
+            OR SUM(d.signo) FILTER (WHERE d.nivel_riesgo = 'MEDIO') <> 0
+            OR SUM(d.signo) FILTER (WHERE d.nivel_riesgo = 'ALTO') <> 0
+            OR SUM(d.signo) FILTER (WHERE d.resumen_ejecutivo IS NOT NULL) <> 0
+        -- Mismo orden de bloqueo en todas las sentencias (sin deadlocks)
+        ORDER BY k.dimension, k.clave
+        ON CONFLICT (dimension, clave) DO UPDATE SET
+            total = e.total + EXCLUDED.total,
+            riesgo_bajo = e.riesgo_bajo + EXCLUDED.riesgo_bajo,
+            riesgo_medio = e.riesgo_medio + EXCLUDED.riesgo_medio,
+            riesgo_alto = e.riesgo_alto + EXCLUDED.riesgo_alto,
+            con_resumen = e.con_resumen + EXCLUDED.con_resumen
+    $sql$, filas);
+
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Contar los informes existentes
+DELETE FROM estadisticas_informes;
+
+INSERT INTO estadisticas_informes
+    (dimension, clave, total, riesgo_bajo, riesgo_medio, riesgo_alto, con_resumen)
+SELECT
+    k.dimension,
+    k.clave,
+    COUNT(*),
+    COUNT(*) FILTER (WHERE i.nivel_riesgo = 'BAJO'),
+    COUNT(*) FILTER (WHERE i.nivel_riesgo = 'MEDIO'),
+    COUNT(*) FILTER (WHERE i.nivel_riesgo = 'ALTO'),
+    COUNT(*) FILTER (WHERE i.resumen_ejecutivo IS NOT NULL)
+FROM informes_medicos i
+CROSS JOIN LATERAL (VALUES
+    ('total', ''),
+    ('contratista', i.contratista_id::TEXT),
+    ('dia', i.fecha_examen::DATE::TEXT)
+) AS k(dimension, clave)
+GROUP BY k.dimension, k.clave;
+
+-- La fila total existe aunque no haya informes
+INSERT INTO estadisticas_informes (dimension, clave)
+VALUES ('total', '')
+ON CONFLICT (dimension, clave) DO NOTHING;
+
+-- Triggers por sentencia (las tablas de transición no admiten más de un evento)
+DROP TRIGGER IF EXISTS estadisticas_informes_insert ON informes_medicos;
+CREATE TRIGGER estadisticas_informes_insert
+    AFTER INSERT ON informes_medicos
+    REFERENCING NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION actualizar_estadisticas_informes();
+
+DROP TRIGGER IF EXISTS estadisticas_informes_update ON informes_medicos;
+CREATE TRIGGER estadisticas_informes_update
+    AFTER UPDATE ON informes_medicos
+    REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION actualizar_estadisticas_informes();
+
+DROP TRIGGER IF EXISTS estadisticas_informes_delete ON informes_medicos;
+CREATE TRIGGER estadisticas_informes_delete
+    AFTER DELETE ON informes_medicos
+    REFERENCING OLD TABLE AS filas_viejas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION actualizar_estadisticas_informes();
+
+-- La vista lee los contadores en lugar de agrupar informes_medicos
+DROP VIEW IF EXISTS estadisticas_riesgo;
+CREATE VIEW estadisticas_riesgo AS
+SELECT
+    r.nivel_riesgo,
+    r.total,
+    r.total * 100.0 / NULLIF(SUM(r.total) OVER (), 0) as porcentaje
+FROM estadisticas_informes e
+CROSS JOIN LATERAL (VALUES
+    ('BAJO', e.riesgo_bajo),
+    ('MEDIO', e.riesgo_medio),
+    ('ALTO', e.riesgo_alto)
+) AS r(nivel_riesgo, total)
+WHERE e.dimension = 'total'
+  AND r.total > 0;
+
+COMMENT ON TABLE estadisticas_informes
+IS 'Contadores de informes (total, por contratista y por día) mantenidos por triggers; los lee GET /estadisticas';
+
+COMMIT;
+
+-- ========================================
+-- Fin de la migración
+-- ========================================
@@ -0,0 +1,31 @@
+-- ========================================
+-- Migración: Cache de extracciones de PDFs externos
+-- Fecha: 2026-10-17
+-- Descripción: Crea la tabla extracciones_pdf, que guarda el texto de
+-- Textract y el JSON de Bedrock por hash de contenido del PDF. extract_pdf
+-- la usa para no reprocesar ni duplicar informes cuando el mismo PDF se
+-- sube más de una vez a external-reports/.
+-- ========================================
+
+CREATE TABLE IF NOT EXISTS extracciones_pdf (
+    content_hash VARCHAR(64) PRIMARY KEY, -- 'md5:<hex>' del contenido del PDF
+    pdf_s3_path VARCHAR(500) NOT NULL,
+    estado VARCHAR(20) NOT NULL DEFAULT 'PROCESANDO', -- 'PROCESANDO', 'COMPLETADO', 'ERROR'
+    texto_extraido TEXT,
+    datos_estructurados JSONB,
+    informe_id INT,
+    hits INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    
+    FOREIGN KEY (informe_id) REFERENCES informes_medicos(id) ON DELETE SET NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_extracciones_informe ON extracciones_pdf(informe_id);
+
+COMMENT ON TABLE extracciones_pdf
+IS 'Cache de extracciones de PDFs externos por hash de contenido (extract_pdf)';
+
+-- ========================================
+-- Fin de la migración
+-- ========================================
@@ -0,0 +1,44 @@
+-- ========================================
+-- Migración: Columna halfvec para embeddings
+-- Fecha: 2026-10-17
+-- Descripción: Agrega una copia float16 (halfvec) del embedding para
+--              búsquedas con la mitad de memoria y menor payload.
+--              Requiere pgvector >= 0.7.0.
+-- Uso: desplegar las Lambdas con VECTOR_STORAGE=halfvec
+-- ========================================
+
+ALTER TABLE informes_embeddings
+ADD COLUMN IF NOT EXISTS embedding_half halfvec(1024);
+
+-- Poblar filas existentes
+UPDATE informes_embeddings
+SET embedding_half = embedding::halfvec(1024)
+WHERE embedding IS NOT NULL
+  AND embedding_half IS NULL;
+
+-- Mantener embedding_half sincronizado con embedding
+CREATE OR REPLACE FUNCTION sync_embedding_half()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.embedding_half = NEW.embedding::halfvec(1024);
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS sync_informes_embeddings_half ON informes_embeddings;
+CREATE TRIGGER sync_informes_embeddings_half
+    BEFORE INSERT OR UPDATE OF embedding ON informes_embeddings
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_embedding_half();
+
+-- Índice de similitud sobre la columna halfvec
+CREATE INDEX IF NOT EXISTS idx_embedding_half_vector ON informes_embeddings
+USING ivfflat (embedding_half halfvec_cosine_ops)
+WITH (lists = 100);
+
+COMMENT ON COLUMN informes_embeddings.embedding_half
+IS 'Copia float16 del embedding (halfvec), mantenida por trigger';
+
+-- ========================================
+-- Fin de la migración
+-- ========================================
@@ -0,0 +1,17 @@
+-- ========================================
+-- Migración: Índice para historial por trabajador
+-- Fecha: 2026-10-17
+-- Descripción: Agrega índice compuesto (trabajador_id, fecha_examen DESC)
+--              para las consultas de historial RAG: últimos informes de un
+--              trabajador (get_worker_history) y ROW_NUMBER() por trabajador
+--              en procesos batch (get_worker_histories)
+-- ========================================
+
+CREATE INDEX IF NOT EXISTS idx_informes_trabajador_fecha
+ON informes_medicos(trabajador_id, fecha_examen DESC);
+
+ANALYZE informes_medicos;
+
+-- ========================================
+-- Fin de la migración
+-- ========================================
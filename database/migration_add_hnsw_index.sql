@@ -0,0 +1,83 @@
+-- ========================================
+-- Migración: Índice HNSW opcional para embeddings
+-- Fecha: 2026-10-17
+-- Descripción: Agrega una función para crear un índice HNSW con m y
+--              ef_construction configurables (alternativa a IVFFlat),
+--              sobre embedding (vector) o embedding_half (halfvec).
+--              Aplicar la migración solo crea la función: el índice se
+--              crea llamándola. Requiere pgvector >= 0.5.0 (0.7.0 para
+--              halfvec).
+-- ========================================
+
+-- Versión anterior de la función (sin p_storage)
+DROP FUNCTION IF EXISTS create_embedding_hnsw_index(INT, INT, BOOLEAN);
+
+-- Crea (o recrea) el índice HNSW sobre informes_embeddings
+--   p_m:               conexiones por nodo (más = mejor recall, más memoria)
+--   p_ef_construction: tamaño de la lista de candidatos al construir
+--   p_drop_ivfflat:    eliminar el índice IVFFlat de la misma columna para
+--                      que el planner use HNSW (por defecto se conserva)
+--   p_storage:         'vector' (embedding) o 'halfvec' (embedding_half,
+--                      ver migration_add_halfvec_embedding.sql)
+CREATE OR REPLACE FUNCTION create_embedding_hnsw_index(
+    p_m INT DEFAULT 16,
+    p_ef_construction INT DEFAULT 64,
+    p_drop_ivfflat BOOLEAN DEFAULT FALSE,
+    p_storage TEXT DEFAULT 'vector'
+)
+RETURNS VOID AS $$
+DECLARE
+    v_index TEXT;
+    v_column TEXT;
+    v_opclass TEXT;
+    v_ivfflat TEXT;
+BEGIN
+    IF p_m < 2 OR p_m > 100 THEN
+        RAISE EXCEPTION 'm debe estar entre 2 y 100 (recibido: %)', p_m;
+    END IF;
+    IF p_ef_construction < 2 * p_m THEN
+        RAISE EXCEPTION 'ef_construction debe ser >= 2 * m (recibido: %)', p_ef_construction;
+    END IF;
+
+    IF p_storage = 'vector' THEN
+        v_index := 'idx_embedding_hnsw';
+        v_column := 'embedding';
+        v_opclass := 'vector_cosine_ops';
+        v_ivfflat := 'idx_embedding_vector';
+    ELSIF p_storage = 'halfvec' THEN
+        v_index := 'idx_embedding_half_hnsw';
+        v_column := 'embedding_half';
+        v_opclass := 'halfvec_cosine_ops';
+        v_ivfflat := 'idx_embedding_half_vector';
+    ELSE
+        RAISE EXCEPTION 'storage debe ser vector o halfvec (recibido: %)', p_storage;
+    END IF;
+
+    EXECUTE format('DROP INDEX IF EXISTS %I', v_index);
+    EXECUTE format(
+        'CREATE INDEX %I ON informes_embeddings '
+        'USING hnsw (%I %s) '
+        'WITH (m = %s, ef_construction = %s)',
+        v_index, v_column, v_opclass, p_m, p_ef_construction
+    );
+
+    IF p_drop_ivfflat THEN
+        EXECUTE format('DROP INDEX IF EXISTS %I', v_ivfflat);
+    END IF;
+END;
+$$ language 'plpgsql';
+
+-- El cambio a HNSW es opcional. Ejemplos:
+--   SELECT create_embedding_hnsw_index();                       -- embedding, conserva IVFFlat
+--   SELECT create_embedding_hnsw_index(24, 128, TRUE);          -- y elimina IVFFlat
+--   SELECT create_embedding_hnsw_index(16, 64, TRUE, 'halfvec'); -- embedding_half (VECTOR_STORAGE=halfvec)
+-- Con ambos índices sobre la misma columna el planner elige por costo;
+-- eliminar IVFFlat fuerza el uso de HNSW.
+
+-- Recall en tiempo de consulta (por sesión o transacción):
+--   SET LOCAL hnsw.ef_search = 100;   -- default 40; debe ser >= LIMIT
+--   SET LOCAL ivfflat.probes = 10;    -- default 1 (solo índice IVFFlat)
+
+-- ========================================
+-- Fin de la migración
+-- ========================================
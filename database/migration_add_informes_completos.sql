@@ -0,0 +1,347 @@
+-- ========================================
+-- Migración: Modelo de lectura informes_completos
+-- Fecha: 2026-10-17
+-- Descripción: Reemplaza la vista informes_completos por una tabla
+--              mantenida por triggers (GET /informes y GET /informes/{id}
+--              sin JOIN con trabajadores y contratistas)
+-- ========================================
+
+BEGIN;
+
+-- Bloquea escrituras en las tres tablas mientras se copian los informes
+-- existentes y se crean los triggers (no se pierde ningún cambio)
+LOCK TABLE informes_medicos, trabajadores, contratistas IN SHARE ROW EXCLUSIVE MODE;
+
+-- Las tablas creadas por init-database antes de este cambio no tienen
+-- updated_at en informes_medicos (se copia en informes_completos)
+ALTER TABLE informes_medicos
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+CREATE OR REPLACE FUNCTION update_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS update_informes_updated_at ON informes_medicos;
+CREATE TRIGGER update_informes_updated_at
+    BEFORE UPDATE ON informes_medicos
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+-- informes_pendientes_ia e informes_alto_riesgo dependen de la vista; se
+-- vuelven a crear sobre la tabla al final (la migración se puede repetir)
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_views
+               WHERE schemaname = current_schema() AND viewname = 'informes_completos') THEN
+        DROP VIEW informes_completos CASCADE;
+    END IF;
+END
+$$;
+
+-- Mismas columnas que la vista, más trabajador_id y contratista_id para
+-- propagar los cambios de trabajadores y contratistas. Un DELETE en
+-- informes_medicos borra la fila por la FK.
+CREATE TABLE IF NOT EXISTS informes_completos (
+    id INT PRIMARY KEY REFERENCES informes_medicos(id) ON DELETE CASCADE,
+    trabajador_id INT NOT NULL,
+    contratista_id INT NOT NULL,
+    tipo_examen VARCHAR(100) NOT NULL,
+    fecha_examen TIMESTAMP NOT NULL,
+    presion_arterial VARCHAR(20),
+    frecuencia_cardiaca INT,
+    frecuencia_respiratoria INT,
+    temperatura DECIMAL(3,1),
+    saturacion_oxigeno INT,
+    peso DECIMAL(5,2),
+    altura DECIMAL(3,2),
+    imc DECIMAL(4,1),
+    perimetro_abdominal INT,
+    vision VARCHAR(200),
+    audiometria VARCHAR(200),
+    antecedentes_medicos TEXT,
+    examen_fisico JSONB,
+    examenes_adicionales JSONB,
+    observaciones TEXT,
+    pdf_s3_path VARCHAR(500),
+    origen VARCHAR(20),
+    nivel_riesgo VARCHAR(20),
+    justificacion_riesgo TEXT,
+    resumen_ejecutivo TEXT,
+    recomendaciones TEXT,
+    procesado_por_ia BOOLEAN,
+    email_enviado BOOLEAN,
+    fecha_email_enviado TIMESTAMP,
+    email_message_id VARCHAR(255),
+    trabajador_nombre VARCHAR(200),
+    trabajador_documento VARCHAR(50),
+    trabajador_fecha_nacimiento DATE,
+    trabajador_edad INT,
+    trabajador_genero VARCHAR(20),
+    trabajador_puesto VARCHAR(100),
+    trabajador_cargo VARCHAR(100),
+    contratista_nombre VARCHAR(200),
+    contratista_ruc VARCHAR(20),
+    contratista_email VARCHAR(200),
+    contratista_telefono VARCHAR(50),
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP
+);
+
+-- Copia los informes de cada sentencia (INSERT, ON CONFLICT DO UPDATE,
+-- clasificación, UPDATE de muchas filas) con un solo upsert. FOR SHARE
+-- espera a que termine un cambio concurrente del trabajador o contratista
+-- (y lo lee) en lugar de copiar el nombre anterior.
+--
+-- Los triggers se llaman copiar_* para dispararse antes que
+-- estadisticas_informes_* (orden alfabético): trabajadores y contratistas se
+-- bloquean antes que las filas de estadisticas_informes, en el mismo orden
+-- que register_exam. Con el orden inverso una clasificación y un registro del
+-- mismo contratista se esperaban mutuamente (deadlock).
+CREATE OR REPLACE FUNCTION refrescar_informes_completos()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Primero todos los trabajadores y luego todos los contratistas, por id:
+    -- el mismo orden que register_exam (trabajador, contratista, informe)
+    PERFORM 1 FROM trabajadores
+    WHERE id IN (SELECT trabajador_id FROM filas_nuevas)
+    ORDER BY id FOR SHARE;
+    PERFORM 1 FROM contratistas
+    WHERE id IN (SELECT contratista_id FROM filas_nuevas)
+    ORDER BY id FOR SHARE;
+
+    INSERT INTO informes_completos AS ic
+    SELECT
+        im.id,
+        im.trabajador_id,
+        im.contratista_id,
+        im.tipo_examen,
+        im.fecha_examen,
+        im.presion_arterial,
+        im.frecuencia_cardiaca,
+        im.frecuencia_respiratoria,
+        im.temperatura,
+        im.saturacion_oxigeno,
+        im.peso,
+        im.altura,
+        im.imc,
+        im.perimetro_abdominal,
+        im.vision,
+        im.audiometria,
+        im.antecedentes_medicos,
+        im.examen_fisico,
+        im.examenes_adicionales,
+        im.observaciones,
+        im.pdf_s3_path,
+        im.origen,
+        im.nivel_riesgo,
+        im.justificacion_riesgo,
+        im.resumen_ejecutivo,
+        im.recomendaciones,
+        im.procesado_por_ia,
+        im.email_enviado,
+        im.fecha_email_enviado,
+        im.email_message_id,
+        t.nombre,
+        t.documento,
+        t.fecha_nacimiento,
+        t.edad,
+        t.genero,
+        t.puesto,
+        t.cargo,
+        c.nombre,
+        c.ruc,
+        c.email,
+        c.telefono,
+        im.created_at,
+        im.updated_at
+    FROM filas_nuevas im
+    JOIN trabajadores t ON im.trabajador_id = t.id
+    JOIN contratistas c ON im.contratista_id = c.id
+    -- Mismo orden de bloqueo en todas las sentencias (sin deadlocks)
+    ORDER BY im.id
+    FOR SHARE OF t, c
+    ON CONFLICT (id) DO UPDATE SET
+        (trabajador_id, contratista_id, tipo_examen, fecha_examen, presion_arterial,
+         frecuencia_cardiaca, frecuencia_respiratoria, temperatura, saturacion_oxigeno,
+         peso, altura, imc, perimetro_abdominal, vision, audiometria,
+         antecedentes_medicos, examen_fisico, examenes_adicionales, observaciones,
+         pdf_s3_path, origen, nivel_riesgo, justificacion_riesgo, resumen_ejecutivo,
+         recomendaciones, procesado_por_ia, email_enviado, fecha_email_enviado,
+         email_message_id, trabajador_nombre, trabajador_documento,
+         trabajador_fecha_nacimiento, trabajador_edad, trabajador_genero,
+         trabajador_puesto, trabajador_cargo, contratista_nombre, contratista_ruc,
+         contratista_email, contratista_telefono, created_at, updated_at)
+        = (EXCLUDED.trabajador_id, EXCLUDED.contratista_id, EXCLUDED.tipo_examen,
+           EXCLUDED.fecha_examen, EXCLUDED.presion_arterial, EXCLUDED.frecuencia_cardiaca,
+           EXCLUDED.frecuencia_respiratoria, EXCLUDED.temperatura,
+           EXCLUDED.saturacion_oxigeno, EXCLUDED.peso, EXCLUDED.altura, EXCLUDED.imc,
+           EXCLUDED.perimetro_abdominal, EXCLUDED.vision, EXCLUDED.audiometria,
+           EXCLUDED.antecedentes_medicos, EXCLUDED.examen_fisico,
+           EXCLUDED.examenes_adicionales, EXCLUDED.observaciones, EXCLUDED.pdf_s3_path,
+           EXCLUDED.origen, EXCLUDED.nivel_riesgo, EXCLUDED.justificacion_riesgo,
+           EXCLUDED.resumen_ejecutivo, EXCLUDED.recomendaciones, EXCLUDED.procesado_por_ia,
+           EXCLUDED.email_enviado, EXCLUDED.fecha_email_enviado, EXCLUDED.email_message_id,
+           EXCLUDED.trabajador_nombre, EXCLUDED.trabajador_documento,
+           EXCLUDED.trabajador_fecha_nacimiento, EXCLUDED.trabajador_edad,
+           EXCLUDED.trabajador_genero, EXCLUDED.trabajador_puesto, EXCLUDED.trabajador_cargo,
+           EXCLUDED.contratista_nombre, EXCLUDED.contratista_ruc, EXCLUDED.contratista_email,
+           EXCLUDED.contratista_telefono, EXCLUDED.created_at, EXCLUDED.updated_at);
+
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Un cambio de trabajador actualiza solo las filas de sus informes; un
+-- upsert que no cambia los datos (register_exam) no escribe
+CREATE OR REPLACE FUNCTION refrescar_informes_completos_trabajador()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE informes_completos ic
+    SET (trabajador_nombre, trabajador_documento, trabajador_fecha_nacimiento,
+         trabajador_edad, trabajador_genero, trabajador_puesto, trabajador_cargo)
+        = (t.nombre, t.documento, t.fecha_nacimiento, t.edad, t.genero, t.puesto, t.cargo)
+    FROM filas_nuevas t
+    WHERE ic.trabajador_id = t.id
+      AND (ic.trabajador_nombre, ic.trabajador_documento, ic.trabajador_fecha_nacimiento,
+           ic.trabajador_edad, ic.trabajador_genero, ic.trabajador_puesto, ic.trabajador_cargo)
+          IS DISTINCT FROM
+          (t.nombre, t.documento, t.fecha_nacimiento, t.edad, t.genero, t.puesto, t.cargo);
+
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION refrescar_informes_completos_contratista()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE informes_completos ic
+    SET (contratista_nombre, contratista_ruc, contratista_email, contratista_telefono)
+        = (c.nombre, c.ruc, c.email, c.telefono)
+    FROM filas_nuevas c
+    WHERE ic.contratista_id = c.id
+      AND (ic.contratista_nombre, ic.contratista_ruc, ic.contratista_email, ic.contratista_telefono)
+          IS DISTINCT FROM (c.nombre, c.ruc, c.email, c.telefono);
+
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Copiar los informes existentes
+DELETE FROM informes_completos;
+
+INSERT INTO informes_completos
+SELECT
+    im.id,
+    im.trabajador_id,
+    im.contratista_id,
+    im.tipo_examen,
+    im.fecha_examen,
+    im.presion_arterial,
+    im.frecuencia_cardiaca,
+    im.frecuencia_respiratoria,
+    im.temperatura,
+    im.saturacion_oxigeno,
+    im.peso,
+    im.altura,
+    im.imc,
+    im.perimetro_abdominal,
+    im.vision,
+    im.audiometria,
+    im.antecedentes_medicos,
+    im.examen_fisico,
+    im.examenes_adicionales,
+    im.observaciones,
+    im.pdf_s3_path,
+    im.origen,
+    im.nivel_riesgo,
+    im.justificacion_riesgo,
+    im.resumen_ejecutivo,
+    im.recomendaciones,
+    im.procesado_por_ia,
+    im.email_enviado,
+    im.fecha_email_enviado,
+    im.email_message_id,
+    t.nombre,
+    t.documento,
+    t.fecha_nacimiento,
+    t.edad,
+    t.genero,
+    t.puesto,
+    t.cargo,
+    c.nombre,
+    c.ruc,
+    c.email,
+    c.telefono,
+    im.created_at,
+    im.updated_at
+FROM informes_medicos im
+JOIN trabajadores t ON im.trabajador_id = t.id
+JOIN contratistas c ON im.contratista_id = c.id;
+
+-- Índices después de la copia (más rápido que mantenerlos fila a fila).
+-- Paginación por keyset de list_informes: (filtro, fecha_examen DESC, id DESC)
+CREATE INDEX IF NOT EXISTS idx_completos_fecha_id ON informes_completos(fecha_examen DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_completos_nivel_riesgo_fecha ON informes_completos(nivel_riesgo, fecha_examen DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_completos_contratista_fecha ON informes_completos(contratista_id, fecha_examen DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_completos_origen_fecha ON informes_completos(origen, fecha_examen DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_completos_procesado_fecha ON informes_completos(procesado_por_ia, fecha_examen DESC, id DESC);
+-- Propagación de los cambios de un trabajador
+CREATE INDEX IF NOT EXISTS idx_completos_trabajador ON informes_completos(trabajador_id);
+
+-- Triggers por sentencia (las tablas de transición no admiten más de un evento)
+DROP TRIGGER IF EXISTS informes_completos_insert ON informes_medicos;
+DROP TRIGGER IF EXISTS copiar_informes_completos_insert ON informes_medicos;
+CREATE TRIGGER copiar_informes_completos_insert
+    AFTER INSERT ON informes_medicos
+    REFERENCING NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION refrescar_informes_completos();
+
+DROP TRIGGER IF EXISTS informes_completos_update ON informes_medicos;
+DROP TRIGGER IF EXISTS copiar_informes_completos_update ON informes_medicos;
+CREATE TRIGGER copiar_informes_completos_update
+    AFTER UPDATE ON informes_medicos
+    REFERENCING NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION refrescar_informes_completos();
+
+DROP TRIGGER IF EXISTS informes_completos_trabajador ON trabajadores;
+CREATE TRIGGER informes_completos_trabajador
+    AFTER UPDATE ON trabajadores
+    REFERENCING NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION refrescar_informes_completos_trabajador();
+
+DROP TRIGGER IF EXISTS informes_completos_contratista ON contratistas;
+CREATE TRIGGER informes_completos_contratista
+    AFTER UPDATE ON contratistas
+    REFERENCING NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION refrescar_informes_completos_contratista();
+
+-- Las vistas derivadas leen la tabla (mismas columnas que antes, más
+-- trabajador_id y contratista_id)
+CREATE OR REPLACE VIEW informes_pendientes_ia AS
+SELECT * FROM informes_completos
+WHERE procesado_por_ia = FALSE
+ORDER BY fecha_examen DESC;
+
+CREATE OR REPLACE VIEW informes_alto_riesgo AS
+SELECT * FROM informes_completos
+WHERE nivel_riesgo = 'ALTO'
+ORDER BY fecha_examen DESC;
+
+ANALYZE informes_completos;
+
+COMMENT ON TABLE informes_completos
+IS 'Informes con los datos del trabajador y del contratista, mantenida por triggers; la leen GET /informes y GET /informes/{id}';
+
+COMMIT;
+
+-- ========================================
+-- Fin de la migración
+-- ========================================
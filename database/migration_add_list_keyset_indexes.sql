@@ -0,0 +1,38 @@
+-- ========================================
+-- Migración: Índices para la paginación de list_informes
+-- Fecha: 2026-10-17
+-- Descripción: GET /informes pagina por keyset sobre (fecha_examen, id)
+--              con filtros opcionales por nivel_riesgo, contratista_id,
+--              origen y rango de fechas. Cada filtro de igualdad necesita
+--              un índice (filtro, fecha_examen DESC, id DESC) para leer la
+--              página en orden sin ordenar todas las filas que coinciden.
+--              Los índices de una columna que quedan cubiertos se eliminan.
+-- ========================================
+
+-- Sin filtros y rango de fechas
+CREATE INDEX IF NOT EXISTS idx_informes_fecha_id
+ON informes_medicos(fecha_examen DESC, id DESC);
+
+-- Filtros de igualdad
+CREATE INDEX IF NOT EXISTS idx_informes_nivel_riesgo_fecha
+ON informes_medicos(nivel_riesgo, fecha_examen DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_informes_contratista_fecha
+ON informes_medicos(contratista_id, fecha_examen DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_informes_origen_fecha
+ON informes_medicos(origen, fecha_examen DESC, id DESC);
+
+-- Cubiertos por los índices compuestos (mismo prefijo)
+DROP INDEX IF EXISTS idx_informes_fecha;
+DROP INDEX IF EXISTS idx_fecha_examen;
+DROP INDEX IF EXISTS idx_informes_nivel_riesgo;
+DROP INDEX IF EXISTS idx_nivel_riesgo;
+DROP INDEX IF EXISTS idx_informes_contratista;
+DROP INDEX IF EXISTS idx_informes_origen;
+
+ANALYZE informes_medicos;
+
+-- ========================================
+-- Fin de la migración
+-- ========================================
@@ -0,0 +1,78 @@
+-- ========================================
+-- Migración: Versión de la lista de informes
+-- Fecha: 2026-10-17
+-- Descripción: Contador que se incrementa al confirmar cada transacción que
+--              escribe informes_medicos, trabajadores o contratistas
+--              (token del ETag y la cache de GET /informes)
+-- ========================================
+
+-- Índice del token anterior (MAX(updated_at)); ya nada lo lee
+DROP INDEX IF EXISTS idx_informes_updated_at;
+
+-- MAX(updated_at) no sirve como versión: updated_at es la hora de inicio de
+-- la transacción y los escritores confirman en otro orden, y un cambio de
+-- nombre de un trabajador (que list_informes lee de informes_completos) no
+-- escribe informes_medicos. El UPDATE del contador se confirma junto con la
+-- escritura: un lector que ve la versión nueva ve también los datos nuevos.
+--
+-- Los triggers son CONSTRAINT TRIGGER diferidos: el UPDATE corre al COMMIT,
+-- después de todos los demás bloqueos de la transacción, una sola vez por
+-- transacción. Con triggers inmediatos la fila del contador se bloqueaba a
+-- mitad de transacción (register_exam la tomaba antes que las filas de
+-- estadisticas_informes, una clasificación después) y las dos esperas se
+-- cruzaban en deadlocks. Tomada siempre al final no forma ciclos; solo
+-- serializa los COMMIT.
+
+CREATE TABLE IF NOT EXISTS version_lista_informes (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO version_lista_informes (id, version) VALUES (1, 0)
+ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION incrementar_version_lista_informes()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Un incremento por transacción aunque el trigger dispare por fila
+    IF current_setting('lista_informes.version_xact', true)
+            IS DISTINCT FROM txid_current()::text THEN
+        PERFORM set_config('lista_informes.version_xact', txid_current()::text, true);
+        UPDATE version_lista_informes SET version = version + 1 WHERE id = 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS version_lista_informes ON informes_medicos;
+CREATE CONSTRAINT TRIGGER version_lista_informes
+    AFTER INSERT OR UPDATE OR DELETE ON informes_medicos
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW
+    EXECUTE FUNCTION incrementar_version_lista_informes();
+
+-- TRUNCATE no admite triggers diferidos; ya toma un bloqueo exclusivo de la tabla
+DROP TRIGGER IF EXISTS version_lista_informes_truncate ON informes_medicos;
+CREATE TRIGGER version_lista_informes_truncate
+    AFTER TRUNCATE ON informes_medicos
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION incrementar_version_lista_informes();
+
+-- Nombre del trabajador y datos del contratista copiados en informes_completos
+DROP TRIGGER IF EXISTS version_lista_informes ON trabajadores;
+CREATE CONSTRAINT TRIGGER version_lista_informes
+    AFTER UPDATE OR DELETE ON trabajadores
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW
+    EXECUTE FUNCTION incrementar_version_lista_informes();
+
+DROP TRIGGER IF EXISTS version_lista_informes ON contratistas;
+CREATE CONSTRAINT TRIGGER version_lista_informes
+    AFTER UPDATE OR DELETE ON contratistas
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW
+    EXECUTE FUNCTION incrementar_version_lista_informes();
+
+-- ========================================
+-- Fin de la migración
+-- ========================================
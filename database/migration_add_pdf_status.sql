@@ -0,0 +1,24 @@
+-- ========================================
+-- Migración: Agregar columna pdf_status
+-- Fecha: 2026-10-17
+-- Descripción: Estado de la generación asíncrona del PDF legacy
+--              (register_exam encola el render y retorna PENDING)
+-- ========================================
+
+-- Agregar columna pdf_status a informes_medicos
+ALTER TABLE informes_medicos
+ADD COLUMN IF NOT EXISTS pdf_status VARCHAR(20);
+
+-- Los informes que ya tienen PDF quedan listos
+UPDATE informes_medicos
+SET pdf_status = 'READY'
+WHERE pdf_status IS NULL
+  AND pdf_s3_path IS NOT NULL;
+
+-- Agregar comentario explicativo
+COMMENT ON COLUMN informes_medicos.pdf_status
+IS 'Generación asíncrona del PDF legacy: PENDING, READY, FAILED (NULL si el informe no la usa)';
+
+-- ========================================
+-- Fin de la migración
+-- ========================================
@@ -0,0 +1,19 @@
+-- ========================================
+-- Migración: Índice de informes pendientes de resumen
+-- Fecha: 2026-10-17
+-- Descripción: Agrega un índice parcial sobre id de los informes clasificados
+--              sin resumen ejecutivo. El modo batch de generate_summary
+--              recorre esos informes por páginas (id > último id) y con el
+--              índice cada página lee solo informes pendientes, aunque la
+--              mayoría de la tabla ya tenga resumen
+-- ========================================
+
+CREATE INDEX IF NOT EXISTS idx_informes_pendientes_resumen
+ON informes_medicos(id)
+WHERE nivel_riesgo IS NOT NULL AND resumen_ejecutivo IS NULL;
+
+ANALYZE informes_medicos;
+
+-- ========================================
+-- Fin de la migración
+-- ========================================
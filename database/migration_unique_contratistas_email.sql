@@ -0,0 +1,37 @@
+-- ========================================
+-- Migración: Un contratista por email
+-- Fecha: 2026-10-17
+-- Descripción: Agrega índice único en contratistas.email para permitir
+--              escrituras con INSERT ... ON CONFLICT (email) DO UPDATE
+--              (lambda/shared/upserts.py)
+-- ========================================
+
+-- Reasignar los informes de contratistas duplicados al de menor id
+UPDATE informes_medicos im
+SET contratista_id = keeper.id
+FROM contratistas dup
+JOIN (
+    SELECT email, MIN(id) AS id
+    FROM contratistas
+    GROUP BY email
+    HAVING COUNT(*) > 1
+) keeper ON keeper.email = dup.email
+WHERE im.contratista_id = dup.id
+  AND dup.id <> keeper.id;
+
+-- Eliminar los duplicados (conserva el contratista más antiguo)
+DELETE FROM contratistas c
+USING contratistas older
+WHERE c.email = older.email
+  AND c.id > older.id;
+
+-- Índice único: actúa como árbitro del ON CONFLICT (email)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_contratistas_email
+ON contratistas(email);
+
+-- El índice no único anterior queda redundante
+DROP INDEX IF EXISTS idx_contratistas_email;
+
+-- ========================================
+-- Fin de la migración
+-- ========================================
@@ -0,0 +1,23 @@
+-- ========================================
+-- Migración: Un embedding por informe
+-- Fecha: 2026-10-17
+-- Descripción: Agrega índice único en informes_embeddings.informe_id para
+--              permitir escrituras con INSERT ... ON CONFLICT DO UPDATE
+-- ========================================
+
+-- Eliminar duplicados existentes (conserva el embedding más reciente)
+DELETE FROM informes_embeddings ie
+USING informes_embeddings newer
+WHERE ie.informe_id = newer.informe_id
+  AND ie.id < newer.id;
+
+-- Índice único: actúa como árbitro del ON CONFLICT (informe_id)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_embedding_informe
+ON informes_embeddings(informe_id);
+
+-- El índice no único anterior queda redundante
+DROP INDEX IF EXISTS idx_embedding_informe;
+
+-- ========================================
+-- Fin de la migración
+-- ========================================
@@ -42,7 +42,8 @@ CREATE TABLE IF NOT EXISTS contratistas (
 );
 
 -- Índices para contratistas
-CREATE INDEX IF NOT EXISTS idx_contratistas_email ON contratistas(email);
+-- Único: árbitro de INSERT ... ON CONFLICT (email) en lambda/shared/upserts.py
+CREATE UNIQUE INDEX IF NOT EXISTS uq_contratistas_email ON contratistas(email);
 CREATE INDEX IF NOT EXISTS idx_contratistas_nombre ON contratistas(nombre);
 
 -- ========================================
@@ -87,6 +88,7 @@ CREATE TABLE IF NOT EXISTS informes_medicos (
     
     -- Referencia al PDF
     pdf_s3_path VARCHAR(500),
+    pdf_status VARCHAR(20), -- 'PENDING', 'READY', 'FAILED' (generación asíncrona del PDF legacy)
     origen VARCHAR(20) DEFAULT 'LEGACY', -- 'LEGACY' o 'EXTERNO'
     
     -- Datos agregados por IA (inicialmente NULL)
@@ -110,11 +112,17 @@ CREATE TABLE IF NOT EXISTS informes_medicos (
 
 -- Índices para informes_medicos
 CREATE INDEX IF NOT EXISTS idx_informes_trabajador ON informes_medicos(trabajador_id);
-CREATE INDEX IF NOT EXISTS idx_informes_contratista ON informes_medicos(contratista_id);
-CREATE INDEX IF NOT EXISTS idx_informes_fecha ON informes_medicos(fecha_examen DESC);
+-- Paginación por keyset de list_informes: (filtro, fecha_examen DESC, id DESC)
+CREATE INDEX IF NOT EXISTS idx_informes_fecha_id ON informes_medicos(fecha_examen DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_informes_contratista_fecha ON informes_medicos(contratista_id, fecha_examen DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_informes_nivel_riesgo_fecha ON informes_medicos(nivel_riesgo, fecha_examen DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_informes_origen_fecha ON informes_medicos(origen, fecha_examen DESC, id DESC);
+-- Historial por trabajador (RAG): últimos informes de cada trabajador
+CREATE INDEX IF NOT EXISTS idx_informes_trabajador_fecha ON informes_medicos(trabajador_id, fecha_examen DESC);
+-- Modo batch de generate_summary: informes clasificados sin resumen, por id
+CREATE INDEX IF NOT EXISTS idx_informes_pendientes_resumen ON informes_medicos(id)
+    WHERE nivel_riesgo IS NOT NULL AND resumen_ejecutivo IS NULL;
 CREATE INDEX IF NOT EXISTS idx_informes_procesado ON informes_medicos(procesado_por_ia);
-CREATE INDEX IF NOT EXISTS idx_informes_nivel_riesgo ON informes_medicos(nivel_riesgo);
-CREATE INDEX IF NOT EXISTS idx_informes_origen ON informes_medicos(origen);
 CREATE INDEX IF NOT EXISTS idx_informes_email_enviado ON informes_medicos(email_enviado);
 CREATE INDEX IF NOT EXISTS idx_informes_email_message_id ON informes_medicos(email_message_id);
 
@@ -137,13 +145,15 @@ CREATE TABLE IF NOT EXISTS informes_embeddings (
 
 -- Índice para búsqueda de similitud eficiente con pgvector
 -- Usa IVFFlat para búsquedas aproximadas rápidas
+-- (alternativa HNSW: ver migration_add_hnsw_index.sql)
 CREATE INDEX IF NOT EXISTS idx_embedding_vector ON informes_embeddings 
 USING ivfflat (embedding vector_cosine_ops)
 WITH (lists = 100);
 
 -- Índice para filtrar por trabajador
 CREATE INDEX IF NOT EXISTS idx_embedding_trabajador ON informes_embeddings(trabajador_id);
-CREATE INDEX IF NOT EXISTS idx_embedding_informe ON informes_embeddings(informe_id);
+-- Único: un embedding por informe (árbitro de INSERT ... ON CONFLICT)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_embedding_informe ON informes_embeddings(informe_id);
 
 -- ========================================
 -- Tabla: laboratorio_resultados
@@ -208,6 +218,114 @@ CREATE INDEX IF NOT EXISTS idx_emails_informe ON historial_emails(informe_id);
 CREATE INDEX IF NOT EXISTS idx_emails_estado ON historial_emails(estado);
 CREATE INDEX IF NOT EXISTS idx_emails_fecha ON historial_emails(fecha_envio DESC);
 
+-- ========================================
+-- Tabla: extracciones_pdf
+-- Cache de extracciones de PDFs externos por hash de contenido:
+-- una nueva subida del mismo PDF se resuelve al informe existente
+-- sin volver a llamar a Textract ni a Bedrock
+-- ========================================
+CREATE TABLE IF NOT EXISTS extracciones_pdf (
+    content_hash VARCHAR(64) PRIMARY KEY, -- 'md5:<hex>' del contenido del PDF
+    pdf_s3_path VARCHAR(500) NOT NULL,
+    estado VARCHAR(20) NOT NULL DEFAULT 'PROCESANDO', -- 'PROCESANDO', 'COMPLETADO', 'ERROR'
+    texto_extraido TEXT,
+    datos_estructurados JSONB,
+    informe_id INT,
+    hits INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    
+    FOREIGN KEY (informe_id) REFERENCES informes_medicos(id) ON DELETE SET NULL
+);
+
+-- Índice para resolver el informe de una extracción
+CREATE INDEX IF NOT EXISTS idx_extracciones_informe ON extracciones_pdf(informe_id);
+
+-- ========================================
+-- Tabla: estadisticas_informes
+-- Contadores del dashboard (GET /estadisticas) mantenidos por triggers
+-- sobre informes_medicos: una fila por agregado, dimension 'total'
+-- (clave ''), 'contratista' (clave = contratista_id) y 'dia'
+-- (clave = fecha_examen YYYY-MM-DD)
+-- ========================================
+CREATE TABLE IF NOT EXISTS estadisticas_informes (
+    dimension VARCHAR(20) NOT NULL,
+    clave VARCHAR(20) NOT NULL,
+    total INT NOT NULL DEFAULT 0,
+    riesgo_bajo INT NOT NULL DEFAULT 0,
+    riesgo_medio INT NOT NULL DEFAULT 0,
+    riesgo_alto INT NOT NULL DEFAULT 0,
+    con_resumen INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, clave)
+);
+
+-- La fila total existe aunque no haya informes
+INSERT INTO estadisticas_informes (dimension, clave)
+VALUES ('total', '')
+ON CONFLICT (dimension, clave) DO NOTHING;
+
+-- ========================================
+-- Tabla: informes_completos
+-- Modelo de lectura de informes_medicos con los datos del trabajador y
+-- del contratista, mantenido por triggers (GET /informes y
+-- GET /informes/{id} sin JOIN). Un DELETE en informes_medicos borra la
+-- fila por la FK.
+-- ========================================
+CREATE TABLE IF NOT EXISTS informes_completos (
+    id INT PRIMARY KEY REFERENCES informes_medicos(id) ON DELETE CASCADE,
+    trabajador_id INT NOT NULL,
+    contratista_id INT NOT NULL,
+    tipo_examen VARCHAR(100) NOT NULL,
+    fecha_examen TIMESTAMP NOT NULL,
+    presion_arterial VARCHAR(20),
+    frecuencia_cardiaca INT,
+    frecuencia_respiratoria INT,
+    temperatura DECIMAL(3,1),
+    saturacion_oxigeno INT,
+    peso DECIMAL(5,2),
+    altura DECIMAL(3,2),
+    imc DECIMAL(4,1),
+    perimetro_abdominal INT,
+    vision VARCHAR(200),
+    audiometria VARCHAR(200),
+    antecedentes_medicos TEXT,
+    examen_fisico JSONB,
+    examenes_adicionales JSONB,
+    observaciones TEXT,
+    pdf_s3_path VARCHAR(500),
+    origen VARCHAR(20),
+    nivel_riesgo VARCHAR(20),
+    justificacion_riesgo TEXT,
+    resumen_ejecutivo TEXT,
+    recomendaciones TEXT,
+    procesado_por_ia BOOLEAN,
+    email_enviado BOOLEAN,
+    fecha_email_enviado TIMESTAMP,
+    email_message_id VARCHAR(255),
+    trabajador_nombre VARCHAR(200),
+    trabajador_documento VARCHAR(50),
+    trabajador_fecha_nacimiento DATE,
+    trabajador_edad INT,
+    trabajador_genero VARCHAR(20),
+    trabajador_puesto VARCHAR(100),
+    trabajador_cargo VARCHAR(100),
+    contratista_nombre VARCHAR(200),
+    contratista_ruc VARCHAR(20),
+    contratista_email VARCHAR(200),
+    contratista_telefono VARCHAR(50),
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP
+);
+
+-- Paginación por keyset de list_informes: (filtro, fecha_examen DESC, id DESC)
+CREATE INDEX IF NOT EXISTS idx_completos_fecha_id ON informes_completos(fecha_examen DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_completos_nivel_riesgo_fecha ON informes_completos(nivel_riesgo, fecha_examen DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_completos_contratista_fecha ON informes_completos(contratista_id, fecha_examen DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_completos_origen_fecha ON informes_completos(origen, fecha_examen DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_completos_procesado_fecha ON informes_completos(procesado_por_ia, fecha_examen DESC, id DESC);
+-- Propagación de los cambios de un trabajador
+CREATE INDEX IF NOT EXISTS idx_completos_trabajador ON informes_completos(trabajador_id);
+
 -- ========================================
 -- Triggers para updated_at
 -- ========================================
@@ -243,60 +361,331 @@ CREATE TRIGGER update_informes_updated_at
     EXECUTE FUNCTION update_updated_at_column();
 
 -- ========================================
--- Vistas útiles
+-- Triggers para estadisticas_informes
+-- ========================================
+
+-- Suma las filas nuevas y resta las viejas de cada sentencia: un INSERT,
+-- una clasificación o un UPDATE de muchas filas es un solo upsert por
+-- agregado afectado
+CREATE OR REPLACE FUNCTION actualizar_estadisticas_informes()
+RETURNS TRIGGER AS $$
+DECLARE
+    filas TEXT;
+BEGIN
+    -- Solo existen las tablas de transición de la operación
+    filas := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT 1 AS signo, * FROM filas_nuevas'
+        WHEN 'DELETE' THEN 'SELECT -1 AS signo, * FROM filas_viejas'
+        ELSE 'SELECT 1 AS signo, * FROM filas_nuevas UNION ALL SELECT -1, * FROM filas_viejas'
+    END;
+
+    EXECUTE format($sql$
+        INSERT INTO estadisticas_informes AS e
+            (dimension, clave, total, riesgo_bajo, riesgo_medio, riesgo_alto, con_resumen)
+        SELECT
+            k.dimension,
+            k.clave,
+            SUM(d.signo),
+            COALESCE(SUM(d.signo) FILTER (WHERE d.nivel_riesgo = 'BAJO'), 0),
+            COALESCE(SUM(d.signo) FILTER (WHERE d.nivel_riesgo = 'MEDIO'), 0),
+            COALESCE(SUM(d.signo) FILTER (WHERE d.nivel_riesgo = 'ALTO'), 0),
+            COALESCE(SUM(d.signo) FILTER (WHERE d.resumen_ejecutivo IS NOT NULL), 0)
+        FROM (%s) d
+        CROSS JOIN LATERAL (VALUES
+            ('total', ''),
+            ('contratista', d.contratista_id::TEXT),
+            ('dia', d.fecha_examen::DATE::TEXT)
+        ) AS k(dimension, clave)
+        GROUP BY k.dimension, k.clave
+        -- Un UPDATE que no cambia los contadores (pdf_status, embeddings) no escribe
+        HAVING SUM(d.signo) <> 0
+            OR SUM(d.signo) FILTER (WHERE d.nivel_riesgo = 'BAJO') <> 0
+            OR SUM(d.signo) FILTER (WHERE d.nivel_riesgo = 'MEDIO') <> 0
+            OR SUM(d.signo) FILTER (WHERE d.nivel_riesgo = 'ALTO') <> 0
+            OR SUM(d.signo) FILTER (WHERE d.resumen_ejecutivo IS NOT NULL) <> 0
+        -- Mismo orden de bloqueo en todas las sentencias (sin deadlocks)
+        ORDER BY k.dimension, k.clave
+        ON CONFLICT (dimension, clave) DO UPDATE SET
+            total = e.total + EXCLUDED.total,
+            riesgo_bajo = e.riesgo_bajo + EXCLUDED.riesgo_bajo,
+            riesgo_medio = e.riesgo_medio + EXCLUDED.riesgo_medio,
+            riesgo_alto = e.riesgo_alto + EXCLUDED.riesgo_alto,
+            con_resumen = e.con_resumen + EXCLUDED.con_resumen
+    $sql$, filas);
+
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Triggers por sentencia (las tablas de transición no admiten más de un evento)
+DROP TRIGGER IF EXISTS estadisticas_informes_insert ON informes_medicos;
+CREATE TRIGGER estadisticas_informes_insert
+    AFTER INSERT ON informes_medicos
+    REFERENCING NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION actualizar_estadisticas_informes();
+
+DROP TRIGGER IF EXISTS estadisticas_informes_update ON informes_medicos;
+CREATE TRIGGER estadisticas_informes_update
+    AFTER UPDATE ON informes_medicos
+    REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION actualizar_estadisticas_informes();
+
+DROP TRIGGER IF EXISTS estadisticas_informes_delete ON informes_medicos;
+CREATE TRIGGER estadisticas_informes_delete
+    AFTER DELETE ON informes_medicos
+    REFERENCING OLD TABLE AS filas_viejas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION actualizar_estadisticas_informes();
+
+
+-- ========================================
+-- Triggers para informes_completos
+-- ========================================
+
+-- Copia los informes de cada sentencia (INSERT, ON CONFLICT DO UPDATE,
+-- clasificación, UPDATE de muchas filas) con un solo upsert. FOR SHARE
+-- espera a que termine un cambio concurrente del trabajador o contratista
+-- (y lo lee) en lugar de copiar el nombre anterior.
+--
+-- Los triggers se llaman copiar_* para dispararse antes que
+-- estadisticas_informes_* (orden alfabético): trabajadores y contratistas se
+-- bloquean antes que las filas de estadisticas_informes, en el mismo orden
+-- que register_exam. Con el orden inverso una clasificación y un registro del
+-- mismo contratista se esperaban mutuamente (deadlock).
+CREATE OR REPLACE FUNCTION refrescar_informes_completos()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Primero todos los trabajadores y luego todos los contratistas, por id:
+    -- el mismo orden que register_exam (trabajador, contratista, informe)
+    PERFORM 1 FROM trabajadores
+    WHERE id IN (SELECT trabajador_id FROM filas_nuevas)
+    ORDER BY id FOR SHARE;
+    PERFORM 1 FROM contratistas
+    WHERE id IN (SELECT contratista_id FROM filas_nuevas)
+    ORDER BY id FOR SHARE;
+
+    INSERT INTO informes_completos AS ic
+    SELECT
+        im.id,
+        im.trabajador_id,
+        im.contratista_id,
+        im.tipo_examen,
+        im.fecha_examen,
+        im.presion_arterial,
+        im.frecuencia_cardiaca,
+        im.frecuencia_respiratoria,
+        im.temperatura,
+        im.saturacion_oxigeno,
+        im.peso,
+        im.altura,
+        im.imc,
+        im.perimetro_abdominal,
+        im.vision,
+        im.audiometria,
+        im.antecedentes_medicos,
+        im.examen_fisico,
+        im.examenes_adicionales,
+        im.observaciones,
+        im.pdf_s3_path,
+        im.origen,
+        im.nivel_riesgo,
+        im.justificacion_riesgo,
+        im.resumen_ejecutivo,
+        im.recomendaciones,
+        im.procesado_por_ia,
+        im.email_enviado,
+        im.fecha_email_enviado,
+        im.email_message_id,
+        t.nombre,
+        t.documento,
+        t.fecha_nacimiento,
+        t.edad,
+        t.genero,
+        t.puesto,
+        t.cargo,
+        c.nombre,
+        c.ruc,
+        c.email,
+        c.telefono,
+        im.created_at,
+        im.updated_at
+    FROM filas_nuevas im
+    JOIN trabajadores t ON im.trabajador_id = t.id
+    JOIN contratistas c ON im.contratista_id = c.id
+    -- Mismo orden de bloqueo en todas las sentencias (sin deadlocks)
+    ORDER BY im.id
+    FOR SHARE OF t, c
+    ON CONFLICT (id) DO UPDATE SET
+        (trabajador_id, contratista_id, tipo_examen, fecha_examen, presion_arterial,
+         frecuencia_cardiaca, frecuencia_respiratoria, temperatura, saturacion_oxigeno,
+         peso, altura, imc, perimetro_abdominal, vision, audiometria,
+         antecedentes_medicos, examen_fisico, examenes_adicionales, observaciones,
+         pdf_s3_path, origen, nivel_riesgo, justificacion_riesgo, resumen_ejecutivo,
+         recomendaciones, procesado_por_ia, email_enviado, fecha_email_enviado,
+         email_message_id, trabajador_nombre, trabajador_documento,
+         trabajador_fecha_nacimiento, trabajador_edad, trabajador_genero,
+         trabajador_puesto, trabajador_cargo, contratista_nombre, contratista_ruc,
+         contratista_email, contratista_telefono, created_at, updated_at)
+        = (EXCLUDED.trabajador_id, EXCLUDED.contratista_id, EXCLUDED.tipo_examen,
+           EXCLUDED.fecha_examen, EXCLUDED.presion_arterial, EXCLUDED.frecuencia_cardiaca,
+           EXCLUDED.frecuencia_respiratoria, EXCLUDED.temperatura,
+           EXCLUDED.saturacion_oxigeno, EXCLUDED.peso, EXCLUDED.altura, EXCLUDED.imc,
+           EXCLUDED.perimetro_abdominal, EXCLUDED.vision, EXCLUDED.audiometria,
+           EXCLUDED.antecedentes_medicos, EXCLUDED.examen_fisico,
+           EXCLUDED.examenes_adicionales, EXCLUDED.observaciones, EXCLUDED.pdf_s3_path,
+           EXCLUDED.origen, EXCLUDED.nivel_riesgo, EXCLUDED.justificacion_riesgo,
+           EXCLUDED.resumen_ejecutivo, EXCLUDED.recomendaciones, EXCLUDED.procesado_por_ia,
+           EXCLUDED.email_enviado, EXCLUDED.fecha_email_enviado, EXCLUDED.email_message_id,
+           EXCLUDED.trabajador_nombre, EXCLUDED.trabajador_documento,
+           EXCLUDED.trabajador_fecha_nacimiento, EXCLUDED.trabajador_edad,
+           EXCLUDED.trabajador_genero, EXCLUDED.trabajador_puesto, EXCLUDED.trabajador_cargo,
+           EXCLUDED.contratista_nombre, EXCLUDED.contratista_ruc, EXCLUDED.contratista_email,
+           EXCLUDED.contratista_telefono, EXCLUDED.created_at, EXCLUDED.updated_at);
+
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Un cambio de trabajador actualiza solo las filas de sus informes; un
+-- upsert que no cambia los datos (register_exam) no escribe
+CREATE OR REPLACE FUNCTION refrescar_informes_completos_trabajador()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE informes_completos ic
+    SET (trabajador_nombre, trabajador_documento, trabajador_fecha_nacimiento,
+         trabajador_edad, trabajador_genero, trabajador_puesto, trabajador_cargo)
+        = (t.nombre, t.documento, t.fecha_nacimiento, t.edad, t.genero, t.puesto, t.cargo)
+    FROM filas_nuevas t
+    WHERE ic.trabajador_id = t.id
+      AND (ic.trabajador_nombre, ic.trabajador_documento, ic.trabajador_fecha_nacimiento,
+           ic.trabajador_edad, ic.trabajador_genero, ic.trabajador_puesto, ic.trabajador_cargo)
+          IS DISTINCT FROM
+          (t.nombre, t.documento, t.fecha_nacimiento, t.edad, t.genero, t.puesto, t.cargo);
+
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE OR REPLACE FUNCTION refrescar_informes_completos_contratista()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE informes_completos ic
+    SET (contratista_nombre, contratista_ruc, contratista_email, contratista_telefono)
+        = (c.nombre, c.ruc, c.email, c.telefono)
+    FROM filas_nuevas c
+    WHERE ic.contratista_id = c.id
+      AND (ic.contratista_nombre, ic.contratista_ruc, ic.contratista_email, ic.contratista_telefono)
+          IS DISTINCT FROM (c.nombre, c.ruc, c.email, c.telefono);
+
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS informes_completos_insert ON informes_medicos;
+DROP TRIGGER IF EXISTS copiar_informes_completos_insert ON informes_medicos;
+CREATE TRIGGER copiar_informes_completos_insert
+    AFTER INSERT ON informes_medicos
+    REFERENCING NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION refrescar_informes_completos();
+
+DROP TRIGGER IF EXISTS informes_completos_update ON informes_medicos;
+DROP TRIGGER IF EXISTS copiar_informes_completos_update ON informes_medicos;
+CREATE TRIGGER copiar_informes_completos_update
+    AFTER UPDATE ON informes_medicos
+    REFERENCING NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION refrescar_informes_completos();
+
+DROP TRIGGER IF EXISTS informes_completos_trabajador ON trabajadores;
+CREATE TRIGGER informes_completos_trabajador
+    AFTER UPDATE ON trabajadores
+    REFERENCING NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION refrescar_informes_completos_trabajador();
+
+DROP TRIGGER IF EXISTS informes_completos_contratista ON contratistas;
+CREATE TRIGGER informes_completos_contratista
+    AFTER UPDATE ON contratistas
+    REFERENCING NEW TABLE AS filas_nuevas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION refrescar_informes_completos_contratista();
+
+-- ========================================
+-- Versión de la lista de informes (ETag y cache de GET /informes)
 -- ========================================
 
--- Vista: informes_completos
--- Combina información de trabajador, contratista e informe
-CREATE OR REPLACE VIEW informes_completos AS
-SELECT 
-    im.id,
-    im.tipo_examen,
-    im.fecha_examen,
-    im.presion_arterial,
-    im.frecuencia_cardiaca,
-    im.frecuencia_respiratoria,
-    im.temperatura,
-    im.saturacion_oxigeno,
-    im.peso,
-    im.altura,
-    im.imc,
-    im.perimetro_abdominal,
-    im.vision,
-    im.audiometria,
-    im.antecedentes_medicos,
-    im.examen_fisico,
-    im.examenes_adicionales,
-    im.observaciones,
-    im.pdf_s3_path,
-    im.origen,
-    im.nivel_riesgo,
-    im.justificacion_riesgo,
-    im.resumen_ejecutivo,
-    im.recomendaciones,
-    im.procesado_por_ia,
-    im.email_enviado,
-    im.fecha_email_enviado,
-    im.email_message_id,
-    t.nombre as trabajador_nombre,
-    t.documento as trabajador_documento,
-    t.fecha_nacimiento as trabajador_fecha_nacimiento,
-    t.edad as trabajador_edad,
-    t.genero as trabajador_genero,
-    t.puesto as trabajador_puesto,
-    t.cargo as trabajador_cargo,
-    c.nombre as contratista_nombre,
-    c.ruc as contratista_ruc,
-    c.email as contratista_email,
-    c.telefono as contratista_telefono,
-    im.created_at,
-    im.updated_at
-FROM informes_medicos im
-JOIN trabajadores t ON im.trabajador_id = t.id
-JOIN contratistas c ON im.contratista_id = c.id;
+-- MAX(updated_at) no sirve como versión: updated_at es la hora de inicio de
+-- la transacción y los escritores confirman en otro orden, y un cambio de
+-- nombre de un trabajador (que list_informes lee de informes_completos) no
+-- escribe informes_medicos. El UPDATE del contador se confirma junto con la
+-- escritura: un lector que ve la versión nueva ve también los datos nuevos.
+--
+-- Los triggers son CONSTRAINT TRIGGER diferidos: el UPDATE corre al COMMIT,
+-- después de todos los demás bloqueos de la transacción, una sola vez por
+-- transacción. Con triggers inmediatos la fila del contador se bloqueaba a
+-- mitad de transacción (register_exam la tomaba antes que las filas de
+-- estadisticas_informes, una clasificación después) y las dos esperas se
+-- cruzaban en deadlocks. Tomada siempre al final no forma ciclos; solo
+-- serializa los COMMIT.
+CREATE TABLE IF NOT EXISTS version_lista_informes (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO version_lista_informes (id, version) VALUES (1, 0)
+ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION incrementar_version_lista_informes()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Un incremento por transacción aunque el trigger dispare por fila
+    IF current_setting('lista_informes.version_xact', true)
+            IS DISTINCT FROM txid_current()::text THEN
+        PERFORM set_config('lista_informes.version_xact', txid_current()::text, true);
+        UPDATE version_lista_informes SET version = version + 1 WHERE id = 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS version_lista_informes ON informes_medicos;
+CREATE CONSTRAINT TRIGGER version_lista_informes
+    AFTER INSERT OR UPDATE OR DELETE ON informes_medicos
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW
+    EXECUTE FUNCTION incrementar_version_lista_informes();
+
+-- TRUNCATE no admite triggers diferidos; ya toma un bloqueo exclusivo de la tabla
+DROP TRIGGER IF EXISTS version_lista_informes_truncate ON informes_medicos;
+CREATE TRIGGER version_lista_informes_truncate
+    AFTER TRUNCATE ON informes_medicos
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION incrementar_version_lista_informes();
+
+-- Nombre del trabajador y datos del contratista copiados en informes_completos
+DROP TRIGGER IF EXISTS version_lista_informes ON trabajadores;
+CREATE CONSTRAINT TRIGGER version_lista_informes
+    AFTER UPDATE OR DELETE ON trabajadores
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW
+    EXECUTE FUNCTION incrementar_version_lista_informes();
+
+DROP TRIGGER IF EXISTS version_lista_informes ON contratistas;
+CREATE CONSTRAINT TRIGGER version_lista_informes
+    AFTER UPDATE OR DELETE ON contratistas
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW
+    EXECUTE FUNCTION incrementar_version_lista_informes();
+
+-- ========================================
+-- Vistas útiles
+-- ========================================
 
 -- Vista: informes_pendientes_ia
--- Informes que aún no han sido procesados por IA
+-- Informes que aún no han sido procesados por IA (sobre informes_completos)
 CREATE OR REPLACE VIEW informes_pendientes_ia AS
 SELECT * FROM informes_completos
 WHERE procesado_por_ia = FALSE
@@ -310,15 +699,21 @@ WHERE nivel_riesgo = 'ALTO'
 ORDER BY fecha_examen DESC;
 
 -- Vista: estadisticas_riesgo
--- Estadísticas de clasificación de riesgo
-CREATE OR REPLACE VIEW estadisticas_riesgo AS
-SELECT 
-    nivel_riesgo,
-    COUNT(*) as total,
-    COUNT(*) * 100.0 / SUM(COUNT(*)) OVER () as porcentaje
-FROM informes_medicos
-WHERE nivel_riesgo IS NOT NULL
-GROUP BY nivel_riesgo;
+-- Estadísticas de clasificación de riesgo (desde los contadores)
+DROP VIEW IF EXISTS estadisticas_riesgo;
+CREATE VIEW estadisticas_riesgo AS
+SELECT
+    r.nivel_riesgo,
+    r.total,
+    r.total * 100.0 / NULLIF(SUM(r.total) OVER (), 0) as porcentaje
+FROM estadisticas_informes e
+CROSS JOIN LATERAL (VALUES
+    ('BAJO', e.riesgo_bajo),
+    ('MEDIO', e.riesgo_medio),
+    ('ALTO', e.riesgo_alto)
+) AS r(nivel_riesgo, total)
+WHERE e.dimension = 'total'
+  AND r.total > 0;
 
 -- ========================================
 -- Comentarios en tablas
@@ -330,10 +725,13 @@ COMMENT ON TABLE informes_medicos IS 'Tabla central con todos los informes médi
 COMMENT ON TABLE informes_embeddings IS 'Embeddings vectoriales para RAG con pgvector';
 COMMENT ON TABLE laboratorio_resultados IS 'Resultados detallados de laboratorio';
 COMMENT ON TABLE historial_emails IS 'Registro de emails enviados';
+COMMENT ON TABLE estadisticas_informes IS 'Contadores de informes (total, por contratista y por día) mantenidos por triggers';
+COMMENT ON TABLE informes_completos IS 'Informes con los datos del trabajador y del contratista, mantenida por triggers';
 
 COMMENT ON COLUMN informes_medicos.origen IS 'LEGACY: del sistema legacy, EXTERNO: PDF externo procesado';
 COMMENT ON COLUMN informes_medicos.nivel_riesgo IS 'Clasificación de IA: BAJO, MEDIO, ALTO';
 COMMENT ON COLUMN informes_medicos.procesado_por_ia IS 'Indica si el informe fue procesado por el sistema de IA';
+COMMENT ON COLUMN informes_medicos.pdf_status IS 'Generación asíncrona del PDF legacy: PENDING, READY, FAILED (NULL si el informe no la usa)';
 COMMENT ON COLUMN informes_medicos.email_message_id IS 'ID del mensaje de Amazon SES para tracking y verificación';
 COMMENT ON COLUMN informes_embeddings.embedding IS 'Vector de 1024 dimensiones de Amazon Titan Embeddings v2';
 
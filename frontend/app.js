@@ -6,6 +6,7 @@
 // Estado global de la aplicación
 let informesData = [];
 let currentInformeId = null;
+let informesNextCursor = null;
 
 // ========================================
 // Inicialización
@@ -90,15 +91,32 @@ async function loadInformes() {
         
         const data = await apiCall('informes');
         informesData = data.informes || data;
+        informesNextCursor = data.next_cursor || null;
         
         renderInformesList(informesData);
-        updateStats(informesData);
+        loadStats();
         
     } catch (error) {
         showErrorInformes('No se pudieron cargar los informes. Verifica la conexión con el API.');
     }
 }
 
+// Siguiente página (paginación por cursor de GET /informes)
+async function loadMoreInformes() {
+    if (!informesNextCursor) return;
+    
+    try {
+        const data = await apiCall(`informes?cursor=${encodeURIComponent(informesNextCursor)}`);
+        informesData = informesData.concat(data.informes);
+        informesNextCursor = data.next_cursor || null;
+        
+        renderInformesList(informesData);
+        
+    } catch (error) {
+        showError('No se pudo cargar la siguiente página de informes.');
+    }
+}
+
 function showLoadingInformes() {
     const tbody = document.getElementById('informes-tbody');
     tbody.innerHTML = `
@@ -172,7 +190,15 @@ function renderInformesList(informes) {
                 </button>
             </td>
         </tr>
-    `).join('');
+    `).join('') + (informesNextCursor ? `
+        <tr>
+            <td colspan="6" class="px-6 py-4 text-center">
+                <button onclick="loadMoreInformes()" class="text-blue-600 hover:text-blue-700 text-sm font-medium">
+                    Cargar más
+                </button>
+            </td>
+        </tr>
+    ` : '');
 }
 
 function renderEstadoBadge(nivelRiesgo) {
@@ -189,14 +215,18 @@ function renderEstadoBadge(nivelRiesgo) {
     return badges[nivelRiesgo] || badges['BAJO'];
 }
 
-function updateStats(informes) {
-    const total = informes.length;
-    const clasificados = informes.filter(i => i.nivel_riesgo).length;
-    const conResumen = informes.filter(i => i.resumen_ejecutivo).length;
-    
-    document.getElementById('stat-total').textContent = total;
-    document.getElementById('stat-clasificados').textContent = clasificados;
-    document.getElementById('stat-resumenes').textContent = conResumen;
+// Contadores de todos los informes (GET /estadisticas), no solo de la página cargada
+async function loadStats() {
+    try {
+        const stats = await apiCall('estadisticas');
+        
+        document.getElementById('stat-total').textContent = stats.total;
+        document.getElementById('stat-clasificados').textContent = stats.clasificados;
+        document.getElementById('stat-resumenes').textContent = stats.con_resumen;
+        
+    } catch (error) {
+        console.error('❌ Error cargando estadísticas:', error);
+    }
 }
 
 // ========================================
@@ -205,14 +235,9 @@ function updateStats(informes) {
 
 async function loadInformeDetail(informeId) {
     try {
-        // Buscar en datos cargados
-        const informe = informesData.find(i => i.id === informeId);
-        
-        if (!informe) {
-            showError('Informe no encontrado');
-            showVistaLista();
-            return;
-        }
+        // Detalle completo desde GET /informes/{id} (la lista solo trae
+        // nombre, tipo, presión, riesgo y fecha)
+        const informe = await apiCall(`informes/${informeId}`);
         
         // Poblar datos del trabajador
         document.getElementById('detalle-trabajador-nombre').textContent = informe.trabajador_nombre || '-';
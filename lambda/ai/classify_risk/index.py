@@ -9,16 +9,21 @@ import boto3
 import logging
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+# Lambda Layer compartido (lambda/shared)
+import db
+import prompt_templates
+import worker_history
+from retry import BEDROCK_RETRYABLE_ERROR_CODES, call_with_backoff
+
 # Configurar logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # Clientes AWS
-rds_data = boto3.client('rds-data')
 bedrock_runtime = boto3.client('bedrock-runtime', region_name='us-east-2')
-s3_client = boto3.client('s3')
 
 # Variables de entorno
 DB_CLUSTER_ARN = os.environ['DB_CLUSTER_ARN']
@@ -29,6 +34,31 @@ PROMPTS_BUCKET = os.environ['PROMPTS_BUCKET']
 # Modelo de Bedrock
 BEDROCK_MODEL_ID = 'us.amazon.nova-pro-v1:0'
 
+# Template de prompt y sus placeholders
+PROMPT_KEY = 'prompts/classification.txt'
+PROMPT_PLACEHOLDERS = ('informes_anteriores', 'datos_informe')
+
+# Modo batch: máximo de informes por invocación y llamadas concurrentes a Bedrock
+BATCH_MAX_INFORMES = int(os.environ.get('BATCH_MAX_INFORMES', '100'))
+BATCH_MAX_CONCURRENCY = int(os.environ.get('BATCH_MAX_CONCURRENCY', '4'))
+BEDROCK_MAX_RETRIES = int(os.environ.get('BEDROCK_MAX_RETRIES', '5'))
+
+# Columnas del informe a clasificar (modo individual y batch)
+INFORME_COLUMNS = """
+        i.id,
+        i.trabajador_id,
+        t.nombre as trabajador_nombre,
+        t.documento as trabajador_documento,
+        i.tipo_examen,
+        i.fecha_examen,
+        i.presion_arterial,
+        i.peso,
+        i.altura,
+        i.vision,
+        i.audiometria,
+        i.observaciones,
+        c.nombre as contratista_nombre"""
+
 
 # ========================================
 # Excepciones personalizadas
@@ -47,6 +77,16 @@ class InformeNotFoundError(ClassificationError):
 class BedrockInvocationError(ClassificationError):
     """Error al invocar Bedrock"""
     http_status = 502
+    
+    def __init__(self, message, error_code=None):
+        super().__init__(message)
+        # Código de error de Bedrock (p.ej. ThrottlingException) si lo hay
+        self.error_code = error_code
+
+
+class BadRequestError(ClassificationError):
+    """Parámetros inválidos en la solicitud"""
+    http_status = 400
 
 
 class DatabaseError(ClassificationError):
@@ -60,82 +100,26 @@ class DatabaseError(ClassificationError):
 
 def execute_query(sql, parameters=None):
     """
-    Ejecuta una query SQL usando RDS Data API.
+    Ejecuta una query SQL con el backend configurado en DB_BACKEND
+    (RDS Data API o conexión directa con pool) y retorna las filas como diccionarios.
     """
     try:
-        params = {
-            'resourceArn': DB_CLUSTER_ARN,
-            'secretArn': DB_SECRET_ARN,
-            'database': DATABASE_NAME,
-            'sql': sql,
-            'includeResultMetadata': True
-        }
-        
-        if parameters:
-            params['parameters'] = parameters
-        
-        response = rds_data.execute_statement(**params)
-        return response
+        return db.query(sql, parameters, db_secret_arn=DB_SECRET_ARN,
+                        db_cluster_arn=DB_CLUSTER_ARN, database_name=DATABASE_NAME)
         
     except Exception as e:
         logger.error(f"Error ejecutando query: {str(e)}")
         raise DatabaseError(f"Error en base de datos: {str(e)}")
 
 
-def format_records(response):
-    """
-    Formatea los registros de RDS Data API a diccionarios Python.
-    """
-    if 'records' not in response or not response['records']:
-        return []
-    
-    columns = [col['name'] for col in response['columnMetadata']]
-    
-    formatted_records = []
-    for record in response['records']:
-        formatted_record = {}
-        for i, col_name in enumerate(columns):
-            value = record[i]
-            
-            if 'stringValue' in value:
-                formatted_record[col_name] = value['stringValue']
-            elif 'longValue' in value:
-                formatted_record[col_name] = value['longValue']
-            elif 'doubleValue' in value:
-                formatted_record[col_name] = value['doubleValue']
-            elif 'booleanValue' in value:
-                formatted_record[col_name] = value['booleanValue']
-            elif 'isNull' in value and value['isNull']:
-                formatted_record[col_name] = None
-            else:
-                formatted_record[col_name] = None
-        
-        formatted_records.append(formatted_record)
-    
-    return formatted_records
-
-
 def get_informe(informe_id):
     """
     Obtiene los datos completos de un informe médico.
     """
     logger.info(f"Obteniendo informe {informe_id}...")
     
-    sql = """
-    SELECT 
-        i.id,
-        i.trabajador_id,
-        t.nombre as trabajador_nombre,
-        t.documento as trabajador_documento,
-        i.tipo_examen,
-        i.fecha_examen,
-        i.presion_arterial,
-        i.peso,
-        i.altura,
-        i.vision,
-        i.audiometria,
-        i.observaciones,
-        c.nombre as contratista_nombre
+    sql = f"""
+    SELECT {INFORME_COLUMNS}
     FROM informes_medicos i
     JOIN trabajadores t ON i.trabajador_id = t.id
     JOIN contratistas c ON i.contratista_id = c.id
@@ -146,15 +130,21 @@ def get_informe(informe_id):
         {'name': 'informe_id', 'value': {'longValue': informe_id}}
     ]
     
-    response = execute_query(sql, parameters)
-    informes = format_records(response)
+    informes = execute_query(sql, parameters)
     
     if not informes:
         raise InformeNotFoundError(f"Informe con ID {informe_id} no existe")
     
-    informe = informes[0]
+    informe = add_imc(informes[0])
     
-    # Calcular IMC si hay peso y altura
+    logger.info(f"✓ Informe {informe_id} obtenido")
+    return informe
+
+
+def add_imc(informe):
+    """
+    Calcula el IMC si hay peso y altura y lo agrega al informe.
+    """
     if informe.get('peso') and informe.get('altura'):
         peso = float(informe['peso'])
         altura = float(informe['altura'])
@@ -162,7 +152,6 @@ def get_informe(informe_id):
     else:
         informe['imc'] = None
     
-    logger.info(f"✓ Informe {informe_id} obtenido")
     return informe
 
 
@@ -174,39 +163,32 @@ def get_worker_history(trabajador_id, current_informe_id, limit=3):
     """
     RAG Step 1: RETRIEVE
     Busca informes anteriores del mismo trabajador usando SQL simple.
+    El resultado se cachea en la Lambda caliente (ver lambda/shared/worker_history.py).
     
     Día 1 del workshop: Búsqueda SQL por trabajador_id
     Día 2 del workshop: Búsqueda vectorial con embeddings
-    """
-    logger.info(f"[RAG] Buscando historial del trabajador {trabajador_id}...")
     
-    sql = """
-    SELECT 
-        fecha_examen,
-        presion_arterial,
-        peso,
-        altura,
-        nivel_riesgo,
-        observaciones
-    FROM informes_medicos
-    WHERE trabajador_id = :trabajador_id
-    AND id != :current_informe_id
-    AND nivel_riesgo IS NOT NULL
-    ORDER BY fecha_examen DESC
-    LIMIT :limit;
+    Returns:
+        tuple: (historial, True si vino del cache)
     """
+    logger.info(f"[RAG] Buscando historial del trabajador {trabajador_id}...")
     
-    parameters = [
-        {'name': 'trabajador_id', 'value': {'longValue': trabajador_id}},
-        {'name': 'current_informe_id', 'value': {'longValue': current_informe_id}},
-        {'name': 'limit', 'value': {'longValue': limit}}
-    ]
-    
-    response = execute_query(sql, parameters)
-    history = format_records(response)
+    try:
+        history, cache_hit = worker_history.get_worker_history(
+            trabajador_id,
+            current_informe_id,
+            limit,
+            db_secret_arn=DB_SECRET_ARN,
+            db_cluster_arn=DB_CLUSTER_ARN,
+            database_name=DATABASE_NAME
+        )
+    except Exception as e:
+        logger.error(f"Error ejecutando query: {str(e)}")
+        raise DatabaseError(f"Error en base de datos: {str(e)}")
     
-    logger.info(f"[RAG] ✓ {len(history)} informes anteriores encontrados")
-    return history
+    origen = "cache" if cache_hit else "Aurora"
+    logger.info(f"[RAG] ✓ {len(history)} informes anteriores encontrados ({origen})")
+    return history, cache_hit
 
 
 def format_historical_context(history):
@@ -270,19 +252,11 @@ def format_historical_context(history):
 
 def load_prompt_template():
     """
-    Carga el template de prompt desde S3.
+    Carga el template de prompt desde S3. Se cachea en la Lambda caliente y se
+    revalida con ETag (ver lambda/shared/prompt_templates.py).
     """
-    logger.info(f"Cargando prompt template desde S3: {PROMPTS_BUCKET}/prompts/classification.txt")
-    
     try:
-        response = s3_client.get_object(
-            Bucket=PROMPTS_BUCKET,
-            Key='prompts/classification.txt'
-        )
-        
-        template = response['Body'].read().decode('utf-8')
-        logger.info("✓ Prompt template cargado")
-        return template
+        return prompt_templates.get_template(PROMPTS_BUCKET, PROMPT_KEY, PROMPT_PLACEHOLDERS)
         
     except Exception as e:
         logger.error(f"Error cargando prompt template: {str(e)}")
@@ -317,9 +291,11 @@ OBSERVACIONES:
 {informe.get('observaciones', 'Sin observaciones')}
 """
     
-    # Reemplazar placeholders
-    prompt = template.replace('{informes_anteriores}', historical_context)
-    prompt = prompt.replace('{datos_informe}', datos_informe)
+    # Reemplazar placeholders (un solo join sobre los segmentos del template)
+    prompt = template.render(
+        informes_anteriores=historical_context,
+        datos_informe=datos_informe
+    )
     
     logger.info("✓ Prompt construido")
     return prompt
@@ -383,7 +359,18 @@ def invoke_bedrock(prompt, temperature=0.1, max_tokens=1000):
         
     except Exception as e:
         logger.error(f"Error invocando Bedrock: {str(e)}")
-        raise BedrockInvocationError(f"Error en Bedrock: {str(e)}")
+        error_code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+        raise BedrockInvocationError(f"Error en Bedrock: {str(e)}", error_code)
+
+
+def invoke_bedrock_with_retry(prompt, temperature=0.1, max_tokens=1000, max_retries=None):
+    """
+    Invoca Bedrock reintentando con backoff exponencial y jitter cuando
+    responde con throttling o errores transitorios (modo batch).
+    """
+    max_retries = BEDROCK_MAX_RETRIES if max_retries is None else max_retries
+    return call_with_backoff(lambda: invoke_bedrock(prompt, temperature, max_tokens),
+                             BEDROCK_RETRYABLE_ERROR_CODES, max_retries)
 
 
 def parse_classification_response(response_text):
@@ -432,9 +419,12 @@ def parse_classification_response(response_text):
 # Guardar Resultado
 # ========================================
 
-def save_classification(informe_id, nivel_riesgo, justificacion):
+def save_classification(informe_id, nivel_riesgo, justificacion, trabajador_id=None):
     """
     Guarda el resultado de la clasificación en Aurora.
+    
+    El nuevo nivel_riesgo cambia el historial de los demás informes del
+    trabajador, por lo que se invalidan sus historiales cacheados.
     """
     logger.info(f"Guardando clasificación en Aurora...")
     
@@ -454,6 +444,242 @@ def save_classification(informe_id, nivel_riesgo, justificacion):
     
     execute_query(sql, parameters)
     logger.info("✓ Clasificación guardada en Aurora")
+    
+    if trabajador_id is not None:
+        invalidated = worker_history.invalidate_worker(trabajador_id)
+        if invalidated:
+            logger.info(f"[RAG] {invalidated} historiales cacheados invalidados")
+
+
+# ========================================
+# Modo Batch
+# ========================================
+
+def get_informes_batch(informe_ids=None, filtro=None, limit=BATCH_MAX_INFORMES):
+    """
+    Obtiene en una sola query los informes a clasificar, por lista de IDs o por filtro.
+    
+    Filtros soportados (todos opcionales, se combinan con AND):
+    - nivel_riesgo: null para informes sin clasificar, o 'BAJO' / 'MEDIO' / 'ALTO'
+    - tipo_examen: tipo de examen exacto
+    - fecha_desde / fecha_hasta: rango de fecha_examen ('YYYY-MM-DD')
+    """
+    conditions = []
+    parameters = [{'name': 'limit', 'value': {'longValue': limit}}]
+    
+    if informe_ids is not None:
+        if not isinstance(informe_ids, list) or not informe_ids:
+            raise BadRequestError("informe_ids debe ser una lista no vacía")
+        try:
+            ids = ','.join(str(int(informe_id)) for informe_id in informe_ids)
+        except (TypeError, ValueError):
+            raise BadRequestError("informe_ids debe contener solo enteros")
+        if len(informe_ids) > limit:
+            raise BadRequestError(f"Máximo {limit} informes por lote")
+        conditions.append("i.id = ANY(CAST(string_to_array(:ids, ',') AS int[]))")
+        parameters.append({'name': 'ids', 'value': {'stringValue': ids}})
+    else:
+        filtro = filtro or {}
+        if not isinstance(filtro, dict):
+            raise BadRequestError("filtro debe ser un objeto")
+        unknown = set(filtro) - {'nivel_riesgo', 'tipo_examen', 'fecha_desde', 'fecha_hasta'}
+        if unknown:
+            raise BadRequestError(f"Filtros no soportados: {', '.join(sorted(unknown))}")
+        
+        if 'nivel_riesgo' in filtro:
+            nivel = filtro['nivel_riesgo']
+            if nivel is None:
+                conditions.append("i.nivel_riesgo IS NULL")
+            elif str(nivel).upper() in ('BAJO', 'MEDIO', 'ALTO'):
+                conditions.append("i.nivel_riesgo = :nivel_riesgo")
+                parameters.append({'name': 'nivel_riesgo', 'value': {'stringValue': str(nivel).upper()}})
+            else:
+                raise BadRequestError(f"nivel_riesgo inválido: {nivel}")
+        if filtro.get('tipo_examen'):
+            conditions.append("i.tipo_examen = :tipo_examen")
+            parameters.append({'name': 'tipo_examen', 'value': {'stringValue': str(filtro['tipo_examen'])}})
+        if filtro.get('fecha_desde'):
+            conditions.append("i.fecha_examen >= CAST(:fecha_desde AS date)")
+            parameters.append({'name': 'fecha_desde', 'value': {'stringValue': str(filtro['fecha_desde'])}})
+        if filtro.get('fecha_hasta'):
+            conditions.append("i.fecha_examen < CAST(:fecha_hasta AS date) + 1")
+            parameters.append({'name': 'fecha_hasta', 'value': {'stringValue': str(filtro['fecha_hasta'])}})
+    
+    where = ' AND '.join(conditions) if conditions else 'TRUE'
+    sql = f"""
+    SELECT {INFORME_COLUMNS}
+    FROM informes_medicos i
+    JOIN trabajadores t ON i.trabajador_id = t.id
+    JOIN contratistas c ON i.contratista_id = c.id
+    WHERE {where}
+    ORDER BY i.id
+    LIMIT :limit;
+    """
+    
+    return [add_imc(informe) for informe in execute_query(sql, parameters)]
+
+
+def get_worker_histories_batch(informes, limit=3):
+    """
+    RAG Step 1 (batch): recupera el historial de todos los informes del lote
+    en una sola query (ver worker_history.get_worker_histories).
+    
+    Returns:
+        dict: {informe_id: [historial del más reciente al más antiguo]}
+    """
+    if not informes:
+        return {}
+    
+    try:
+        return worker_history.get_worker_histories(
+            [informe['id'] for informe in informes],
+            limit,
+            db_secret_arn=DB_SECRET_ARN,
+            db_cluster_arn=DB_CLUSTER_ARN,
+            database_name=DATABASE_NAME
+        )
+    except Exception as e:
+        logger.error(f"Error ejecutando query: {str(e)}")
+        raise DatabaseError(f"Error en base de datos: {str(e)}")
+
+
+def save_classifications_batch(classifications):
+    """
+    Guarda todas las clasificaciones del lote con un solo UPDATE.
+    
+    Args:
+        classifications: Lista de {'informe_id', 'nivel_riesgo', 'justificacion'}
+    
+    Returns:
+        int: Filas actualizadas
+    """
+    if not classifications:
+        return 0
+    
+    sql = """
+    UPDATE informes_medicos i
+    SET
+        nivel_riesgo = c.nivel_riesgo,
+        justificacion_riesgo = c.justificacion
+    FROM json_to_recordset(CAST(:clasificaciones AS json))
+        AS c(informe_id int, nivel_riesgo varchar, justificacion text)
+    WHERE i.id = c.informe_id;
+    """
+    
+    parameters = [
+        {'name': 'clasificaciones', 'value': {'stringValue': json.dumps(classifications)}}
+    ]
+    
+    try:
+        updated = db.execute(sql, parameters, db_secret_arn=DB_SECRET_ARN,
+                             db_cluster_arn=DB_CLUSTER_ARN, database_name=DATABASE_NAME)
+    except Exception as e:
+        logger.error(f"Error ejecutando query: {str(e)}")
+        raise DatabaseError(f"Error en base de datos: {str(e)}")
+    
+    logger.info(f"✓ {updated} clasificaciones guardadas en Aurora")
+    return updated
+
+
+def classify_prepared(informe, history, temperature, max_tokens):
+    """
+    Clasifica un informe ya cargado (prompt + Bedrock + parseo), sin acceso a la base de datos.
+    Se ejecuta en el pool de hilos del modo batch.
+    """
+    historical_context = format_historical_context(history)
+    prompt = build_classification_prompt(informe, historical_context)
+    response_text, bedrock_time = invoke_bedrock_with_retry(prompt, temperature, max_tokens)
+    classification = parse_classification_response(response_text)
+    
+    return {
+        'informe_id': informe['id'],
+        'nivel_riesgo': classification['nivel_riesgo'],
+        'justificacion': classification['justificacion'],
+        'informes_anteriores_encontrados': len(history)
+    }, bedrock_time
+
+
+def classify_batch(informe_ids=None, filtro=None, limit=None, temperature=0.1, max_tokens=1000):
+    """
+    Clasifica un lote de informes:
+    1. Una query para los informes (por IDs o filtro)
+    2. Una query para el historial de todos los trabajadores del lote
+    3. Llamadas a Bedrock en un pool acotado (BATCH_MAX_CONCURRENCY) con backoff ante throttling
+    4. Un solo UPDATE con todas las clasificaciones
+    
+    Returns:
+        dict: Resultados, errores por informe y tiempos por etapa
+    """
+    start_time = time.perf_counter()
+    timings = {}
+    
+    try:
+        limit = min(int(limit or BATCH_MAX_INFORMES), BATCH_MAX_INFORMES)
+    except (TypeError, ValueError):
+        raise BadRequestError("limit debe ser un entero")
+    logger.info(f"=== Iniciando clasificación batch (límite {limit}) ===")
+    
+    # 1. Informes del lote
+    stage = time.perf_counter()
+    informes = get_informes_batch(informe_ids, filtro, limit)
+    timings['informes_ms'] = round((time.perf_counter() - stage) * 1000, 1)
+    
+    if informe_ids is not None:
+        found = {informe['id'] for informe in informes}
+        missing = [int(informe_id) for informe_id in informe_ids if int(informe_id) not in found]
+    else:
+        missing = []
+    
+    # 2. RAG: historial de todos los trabajadores del lote
+    stage = time.perf_counter()
+    histories = get_worker_histories_batch(informes, limit=3)
+    timings['historial_ms'] = round((time.perf_counter() - stage) * 1000, 1)
+    
+    # 3. Bedrock en paralelo (el template de prompt se carga una vez y queda en cache)
+    stage = time.perf_counter()
+    results = []
+    errors = [{'informe_id': informe_id, 'error': 'InformeNotFoundError'} for informe_id in missing]
+    bedrock_total = 0.0
+    
+    with ThreadPoolExecutor(max_workers=max(1, BATCH_MAX_CONCURRENCY)) as executor:
+        futures = {
+            executor.submit(classify_prepared, informe, histories.get(informe['id'], []),
+                            temperature, max_tokens): informe['id']
+            for informe in informes
+        }
+        for future, informe_id in futures.items():
+            try:
+                result, bedrock_time = future.result()
+                results.append(result)
+                bedrock_total += bedrock_time
+            except Exception as e:
+                logger.error(f"Error clasificando informe {informe_id}: {str(e)}")
+                errors.append({'informe_id': informe_id, 'error': type(e).__name__, 'message': str(e)})
+    
+    timings['bedrock_ms'] = round((time.perf_counter() - stage) * 1000, 1)
+    timings['bedrock_promedio_ms'] = round(bedrock_total * 1000 / len(results), 1) if results else 0
+    
+    # 4. Un solo UPDATE para todo el lote
+    stage = time.perf_counter()
+    save_classifications_batch([
+        {k: r[k] for k in ('informe_id', 'nivel_riesgo', 'justificacion')} for r in results
+    ])
+    for trabajador_id in {informe['trabajador_id'] for informe in informes}:
+        worker_history.invalidate_worker(trabajador_id)
+    timings['guardar_ms'] = round((time.perf_counter() - stage) * 1000, 1)
+    
+    timings['total_ms'] = round((time.perf_counter() - start_time) * 1000, 1)
+    
+    logger.info(f"=== Batch completado: {len(results)} clasificados, {len(errors)} errores, {timings} ===")
+    
+    return {
+        'modo': 'batch',
+        'procesados': len(results),
+        'total': len(informes) + len(missing),
+        'resultados': results,
+        'errores': errors,
+        'tiempos': timings
+    }
 
 
 # ========================================
@@ -472,7 +698,7 @@ def classify_risk(informe_id, temperature=0.1, max_tokens=1000):
     informe = get_informe(informe_id)
     
     # 2. RAG: Recuperar historial del trabajador
-    history = get_worker_history(
+    history, history_cache_hit = get_worker_history(
         informe['trabajador_id'],
         informe_id,
         limit=3
@@ -494,7 +720,8 @@ def classify_risk(informe_id, temperature=0.1, max_tokens=1000):
     save_classification(
         informe_id,
         classification['nivel_riesgo'],
-        classification['justificacion']
+        classification['justificacion'],
+        trabajador_id=informe['trabajador_id']
     )
     
     total_time = time.time() - start_time
@@ -506,7 +733,8 @@ def classify_risk(informe_id, temperature=0.1, max_tokens=1000):
         'nivel_riesgo': classification['nivel_riesgo'],
         'justificacion': classification['justificacion'],
         'tiempo_procesamiento': f"{total_time:.2f}s",
-        'informes_anteriores_encontrados': len(history)
+        'informes_anteriores_encontrados': len(history),
+        'cache_historial': {'hit': history_cache_hit, **worker_history.cache_stats()}
     }
 
 
@@ -523,6 +751,29 @@ def handler(event, context):
         else:
             body = event
         
+        temperature = body.get('temperature', 0.1)
+        max_tokens = body.get('maxTokens', 1000)
+        
+        # Modo batch: lista de IDs o filtro
+        if 'informe_ids' in body or 'filtro' in body:
+            result = classify_batch(
+                informe_ids=body.get('informe_ids'),
+                filtro=body.get('filtro'),
+                limit=body.get('limit'),
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Methods': 'POST, OPTIONS',
+                    'Access-Control-Allow-Headers': 'Content-Type'
+                },
+                'body': json.dumps(result)
+            }
+        
         # Extraer parámetros
         informe_id = body.get('informe_id')
         if not informe_id:
@@ -535,9 +786,6 @@ def handler(event, context):
                 })
             }
         
-        temperature = body.get('temperature', 0.1)
-        max_tokens = body.get('maxTokens', 1000)
-        
         # Clasificar
         result = classify_risk(informe_id, temperature, max_tokens)
         
@@ -553,6 +801,17 @@ def handler(event, context):
             'body': json.dumps(result)
         }
         
+    except BadRequestError as e:
+        logger.error(f"Solicitud inválida: {str(e)}")
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({
+                'error': 'BadRequest',
+                'message': str(e)
+            })
+        }
+        
     except InformeNotFoundError as e:
         logger.error(f"Informe no encontrado: {str(e)}")
         return {
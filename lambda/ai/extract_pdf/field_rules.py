@@ -0,0 +1,201 @@
+"""
+Extracción determinística de los datos del informe a partir del DocumentLayout.
+
+Los PDFs del sistema legacy (generate_pdf) y los de
+generate_textract_compatible_pdfs.py tienen un formato fijo de etiqueta y
+valor: "Presión Arterial: 118/78 mmHg", "DNI | 43567821". extract_fields()
+busca esas etiquetas en, por orden:
+
+1. pares clave-valor de FORMS
+2. filas de dos o más columnas de TABLES (etiqueta | valor | ...)
+3. líneas de texto "Etiqueta: valor", o una línea "Etiqueta:" seguida del valor
+
+valida cada valor con una expresión regular o un rango y arma el mismo JSON
+que retorna Bedrock. Si falta un campo requerido, un valor no pasa la
+validación o Textract lo detectó con confianza baja, retorna None con los
+motivos para que extract_pdf use Bedrock.
+"""
+
+import re
+from collections import Counter
+
+from textract_layout import normalize_text
+
+# Etiqueta normalizada -> (sección, campo)
+FIELD_LABELS = {
+    'empresa contratista': ('contratista', 'nombre'),
+    'empresa': ('contratista', 'nombre'),
+    'contratista': ('contratista', 'nombre'),
+    'razon social': ('contratista', 'nombre'),
+    'email': ('contratista', 'email'),
+    'e-mail': ('contratista', 'email'),
+    'correo': ('contratista', 'email'),
+    'correo electronico': ('contratista', 'email'),
+    'nombre': ('trabajador', 'nombre'),
+    'nombre completo': ('trabajador', 'nombre'),
+    'apellidos y nombres': ('trabajador', 'nombre'),
+    'trabajador': ('trabajador', 'nombre'),
+    'dni': ('trabajador', 'documento'),
+    'documento': ('trabajador', 'documento'),
+    'documento de identidad': ('trabajador', 'documento'),
+    'tipo de examen': ('examen', 'tipo'),
+    'tipo examen': ('examen', 'tipo'),
+    'presion arterial': ('examen', 'presion_arterial'),
+    'peso': ('examen', 'peso'),
+    'altura': ('examen', 'altura'),
+    'talla': ('examen', 'altura'),
+    'estatura': ('examen', 'altura'),
+    'vision': ('examen', 'vision'),
+    'agudeza visual': ('examen', 'vision'),
+    'audiometria': ('examen', 'audiometria'),
+}
+
+# Campos sin los cuales se usa Bedrock
+REQUIRED_FIELDS = (
+    ('trabajador', 'nombre'),
+    ('trabajador', 'documento'),
+    ('contratista', 'nombre'),
+    ('examen', 'presion_arterial'),
+    ('examen', 'peso'),
+    ('examen', 'altura'),
+    ('examen', 'vision'),
+    ('examen', 'audiometria'),
+)
+
+_LABEL_LINE = re.compile(r'^\s*([^:]{2,40}):\s*(.*)$')
+_NAME = re.compile(r"^[^\W\d_]+(?:[ '.-]+[^\W\d_]+)+\.?$")
+_DOCUMENT = re.compile(r'^[0-9A-Z]{8,12}$')
+_EMAIL = re.compile(r'^[^@\s]+@[^@\s]+\.[a-z]{2,}$', re.IGNORECASE)
+_PRESSURE = re.compile(r'^(\d{2,3})\s*/\s*(\d{2,3})\s*(mm\s*hg)?$', re.IGNORECASE)
+_NUMBER = re.compile(r'^(\d+(?:[.,]\d+)?)\s*([a-z]*)$', re.IGNORECASE)
+
+
+def extract_fields(layout, min_confidence):
+    """
+    Extrae los datos del informe sin usar el LLM.
+
+    Args:
+        layout: DocumentLayout del documento
+        min_confidence: Confianza mínima de Textract (0-100) para aceptar un campo requerido
+
+    Returns:
+        tuple: (datos estructurados o None, lista de motivos para usar Bedrock)
+    """
+    found = {}
+    problems = {}
+
+    for label, value, confidence in _candidates(layout):
+        target = FIELD_LABELS.get(normalize_text(label).rstrip(': ').strip())
+        if target is None or target in found:
+            continue
+        parsed = _parse(target, value)
+        if parsed is None:
+            problems.setdefault(target, f"{target[1]}: valor no válido '{value}'")
+        elif confidence < min_confidence:
+            problems.setdefault(target, f"{target[1]}: confianza {confidence:.0f}")
+        else:
+            found[target] = parsed
+
+    reasons = [problems.get(target, f"{target[1]}: no encontrado") for target in REQUIRED_FIELDS if target not in found]
+    if reasons:
+        return None, reasons
+
+    data = {'trabajador': {}, 'contratista': {}, 'examen': {}}
+    for (section, field), value in found.items():
+        data[section][field] = value
+    observaciones = _observations(layout)
+    if observaciones:
+        data['examen']['observaciones'] = observaciones
+    return data, []
+
+
+def _candidates(layout):
+    """Pares (etiqueta, valor, confianza) en orden de preferencia: FORMS, TABLES, líneas."""
+    yield from layout.key_values
+
+    for table, confidence in zip(layout.tables, layout.table_confidence):
+        for row in table:
+            if len(row) >= 2 and row[0] and row[1]:
+                yield row[0], row[1], confidence
+
+    lines = [text for _, text in layout.lines]
+    for index, text in enumerate(lines):
+        match = _LABEL_LINE.match(text)
+        if not match:
+            continue
+        label, value = match.groups()
+        confidence = layout.line_confidence[index]
+        if not value and index + 1 < len(lines):
+            # Valor en la línea siguiente: vale la menor confianza de las dos
+            value = lines[index + 1]
+            confidence = min(confidence, layout.line_confidence[index + 1])
+        if value:
+            yield label, value, confidence
+
+
+def _parse(target, value):
+    """Normaliza y valida el valor de un campo; None si no tiene el formato esperado."""
+    section, field = target
+    value = ' '.join(value.split())
+
+    if field == 'nombre':
+        if section == 'trabajador':
+            return value if _NAME.match(value) else None
+        return value if len(value) >= 3 else None
+    if field == 'documento':
+        document = re.sub(r'[\s.-]', '', value).upper()
+        return document if _DOCUMENT.match(document) else None
+    if field == 'email':
+        return value.lower() if _EMAIL.match(value) else None
+    if field == 'tipo':
+        return re.sub(r'^examen\s+', '', value, flags=re.IGNORECASE) or None
+    if field == 'presion_arterial':
+        match = _PRESSURE.match(value)
+        if not match:
+            return None
+        systolic, diastolic = int(match.group(1)), int(match.group(2))
+        if not (60 <= systolic <= 260 and 30 <= diastolic <= 160 and systolic > diastolic):
+            return None
+        # Sin unidad, igual que Bedrock y el sistema legacy ("118/78")
+        return f"{systolic}/{diastolic}"
+    if field in ('peso', 'altura'):
+        match = _NUMBER.match(value)
+        if not match:
+            return None
+        number = float(match.group(1).replace(',', '.'))
+        if field == 'altura' and (match.group(2).lower() == 'cm' or number > 3):
+            number /= 100
+        low, high = (25, 300) if field == 'peso' else (0.5, 2.5)
+        return number if low <= number <= high else None
+    # vision, audiometria: texto libre
+    return value if len(value) >= 2 else None
+
+
+def _observations(layout):
+    """
+    Texto libre de observaciones: lo que sigue a la etiqueta en la misma línea
+    ("Observaciones: ...") y las líneas bajo el título, hasta la firma. Si
+    FORMS detectó la etiqueta como par clave-valor, su valor va primero.
+    """
+    lines = [text for _, text in layout.lines]
+    counts = Counter(normalize_text(text) for text in lines)
+
+    collected = [value for key, value, _ in layout.key_values if normalize_text(key).startswith('observaciones')]
+    started = False
+    for text in lines:
+        normalized = normalize_text(text)
+        if not started:
+            if normalized.startswith('observaciones'):
+                started = True
+                match = _LABEL_LINE.match(text)
+                remainder = match.group(2).strip() if match else ''
+                if remainder and remainder not in collected:
+                    collected.append(remainder)
+            continue
+        # Línea sin letras ni dígitos (firma '_____', separador)
+        if not re.search(r'[^\W_]', text):
+            break
+        # Encabezados y pies de página repetidos en cada hoja
+        if counts[normalized] == 1:
+            collected.append(text)
+    return '\n'.join(collected)
@@ -1,15 +1,59 @@
+import hashlib
 import json
 import os
+import threading
+import time
+import traceback
 import boto3
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import urllib.parse
 
+from field_rules import extract_fields
+from textract_layout import LayoutBuilder, compact_text, estimate_tokens
+
+# Lambda Layer compartido (lambda/shared)
+import db
+import upserts
+from retry import BEDROCK_RETRYABLE_ERROR_CODES, TEXTRACT_RETRYABLE_ERROR_CODES, call_with_backoff
+
 # Variables de entorno
 DB_SECRET_ARN = os.environ['DB_SECRET_ARN']
 DB_CLUSTER_ARN = os.environ['DB_CLUSTER_ARN']
 DATABASE_NAME = os.environ['DATABASE_NAME']
 BUCKET_NAME = os.environ['BUCKET_NAME']
 
+# Canal de notificación de los jobs asíncronos de Textract (tópico SNS y rol que Textract asume para publicar)
+TEXTRACT_SNS_TOPIC_ARN = os.environ.get('TEXTRACT_SNS_TOPIC_ARN', '')
+TEXTRACT_ROLE_ARN = os.environ.get('TEXTRACT_ROLE_ARN', '')
+
+# Reintentos ante throttling de Textract (ráfagas de PDFs)
+TEXTRACT_MAX_RETRIES = int(os.environ.get('TEXTRACT_MAX_RETRIES', '5'))
+
+# Bloques por página de resultados de get_document_analysis (máximo 1000)
+TEXTRACT_PAGE_SIZE = int(os.environ.get('TEXTRACT_PAGE_SIZE', '1000'))
+
+# Presupuesto de tokens del contenido del informe en el prompt de Bedrock
+EXTRACTION_TOKEN_BUDGET = int(os.environ.get('EXTRACTION_TOKEN_BUDGET', '750'))
+
+# Extracción por reglas antes de Bedrock (PDFs con formato etiqueta/valor conocido)
+EXTRACTION_RULES_ENABLED = os.environ.get('EXTRACTION_RULES_ENABLED', 'true').lower() == 'true'
+
+# Confianza mínima de Textract (0-100) para aceptar un campo extraído por reglas
+EXTRACTION_RULES_MIN_CONFIDENCE = float(os.environ.get('EXTRACTION_RULES_MIN_CONFIDENCE', '80'))
+
+# Records procesados en paralelo por invocación (mensajes SQS del lote)
+EXTRACT_MAX_CONCURRENCY = int(os.environ.get('EXTRACT_MAX_CONCURRENCY', '4'))
+
+# Segundos tras los cuales una extracción PROCESANDO se considera abandonada y se puede reintentar
+EXTRACTION_CACHE_STALE_SECONDS = int(os.environ.get('EXTRACTION_CACHE_STALE_SECONDS', '3600'))
+
+# Prefijo de los hashes de contenido (MD5, el mismo que el ETag de un PUT simple en S3)
+CONTENT_HASH_PREFIX = 'md5:'
+
+# Reintentos ante throttling y errores transitorios de Bedrock
+BEDROCK_MAX_RETRIES = int(os.environ.get('BEDROCK_MAX_RETRIES', '5'))
+
 # Obtener región desde el ARN del cluster (más confiable)
 AWS_REGION = DB_CLUSTER_ARN.split(':')[3] if DB_CLUSTER_ARN else 'us-east-2'
 print(f"Using AWS Region: {AWS_REGION}")
@@ -18,127 +62,635 @@ print(f"Using AWS Region: {AWS_REGION}")
 s3_client = boto3.client('s3')
 textract_client = boto3.client('textract')
 bedrock_runtime = boto3.client('bedrock-runtime', region_name=AWS_REGION)
-rds_data = boto3.client('rds-data')
 print(f"Bedrock client configured for region: {bedrock_runtime.meta.region_name}")
 
+# Aciertos del cache de extracciones en este entorno de ejecución
+cache_stats = {'hits': 0, 'misses': 0}
+_cache_stats_lock = threading.Lock()
+
+# Informes estructurados por reglas vs por Bedrock en este entorno de ejecución
+structuring_stats = {'reglas': 0, 'bedrock': 0}
+_structuring_stats_lock = threading.Lock()
+
 
 def handler(event, context):
     """
-    Lambda para extraer y procesar PDFs externos con IA.
-    Usa Textract para extraer texto y Bedrock para estructurar datos.
+    Lambda de ingesta de PDFs externos (trigger SQS con eventos S3, o S3 directo).
+    
+    Por cada PDF inicia un job asíncrono de Textract (start_document_analysis)
+    y retorna sin esperar el resultado. Cuando el job termina, Textract publica
+    en SNS y completion_handler estructura los datos con Bedrock y los guarda.
+    
+    Antes de iniciar el job se busca el hash del contenido en extracciones_pdf:
+    si el mismo PDF ya se subió, no se vuelve a llamar a Textract ni a Bedrock
+    y la subida se resuelve al informe existente.
+    
+    Los mensajes se procesan en paralelo (EXTRACT_MAX_CONCURRENCY) y un error
+    en uno no afecta a los demás: con SQS solo los fallidos se reportan en
+    batchItemFailures y vuelven a la cola; el ClientRequestToken hace que los
+    jobs ya iniciados no se dupliquen.
+    """
+    print(f"Event received: {json.dumps(event)}")
+    
+    items = []
+    for record in event.get('Records', []):
+        if record.get('eventSource') == 'aws:sqs':
+            # Cada mensaje SQS trae una notificación S3 completa
+            notification = json.loads(record['body'])
+            items.append((record['messageId'], notification.get('Records', [])))
+        else:
+            items.append((record['s3']['object']['key'], [record]))
+    
+    resultados = process_concurrently(items, ingest_s3_records)
+    return build_batch_response(event, resultados, 'Textract jobs started')
+
+
+def completion_handler(event, context):
     """
-    try:
-        print(f"Event received: {json.dumps(event)}")
+    Lambda de finalización (trigger SQS suscrita al tópico SNS de Textract, o SNS directo).
+    
+    Recibe las notificaciones de jobs terminados, pagina los resultados con
+    get_document_analysis (documentos de varias páginas), estructura el texto
+    con Bedrock y guarda el informe en Aurora. Los jobs del lote se procesan
+    en paralelo; los que fallan se reportan en batchItemFailures para que SQS
+    los reintente (los resultados siguen disponibles en Textract durante 7 días).
+    """
+    print(f"Event received: {json.dumps(event)}")
+    
+    items = []
+    for record in event.get('Records', []):
+        if record.get('eventSource') == 'aws:sqs':
+            body = json.loads(record['body'])
+            # Suscripción con raw message delivery: el cuerpo es el mensaje de Textract
+            message = json.loads(body['Message']) if body.get('Type') == 'Notification' else body
+            items.append((record['messageId'], message))
+        else:
+            message = json.loads(record['Sns']['Message'])
+            items.append((message['JobId'], message))
+    
+    resultados = process_concurrently(items, complete_textract_job)
+    return build_batch_response(event, resultados, 'PDFs processed successfully')
+
+
+def ingest_s3_records(records):
+    """
+    Inicia la extracción de los PDFs de una notificación S3.
+    
+    Args:
+        records: Records S3 de la notificación
+    
+    Returns:
+        dict: {'archivos': [estado por archivo]}
+    """
+    archivos = []
+    
+    for record in records:
+        # Obtener información del archivo
+        bucket = record['s3']['bucket']['name']
+        key = urllib.parse.unquote_plus(record['s3']['object']['key'])
+        etag = record['s3']['object'].get('eTag', '')
         
-        # Parsear evento de S3
-        for record in event.get('Records', []):
-            # Obtener información del archivo
-            bucket = record['s3']['bucket']['name']
-            key = urllib.parse.unquote_plus(record['s3']['object']['key'])
-            
-            print(f"Processing file: s3://{bucket}/{key}")
-            
-            # Verificar que es un PDF externo
-            if not key.startswith('external-reports/'):
-                print(f"Skipping file (not in external-reports/): {key}")
-                continue
-            
-            # Extraer texto con Textract
-            extracted_text = extract_text_from_pdf(bucket, key)
-            
-            if not extracted_text:
-                print(f"No text extracted from {key}")
-                continue
-            
-            # Estructurar datos con Bedrock
-            structured_data = structure_data_with_bedrock(extracted_text)
+        # Verificar que es un PDF externo
+        if not key.startswith('external-reports/'):
+            print(f"Skipping file (not in external-reports/): {key}")
+            archivos.append({'key': key, 'estado': 'OMITIDO'})
+            continue
+        
+        content_hash = None
+        try:
+            content_hash = compute_content_hash(bucket, key, etag)
+            claim = claim_extraction(content_hash, f"s3://{bucket}/{key}")
+            cached = None if claim['reclamado'] else claim
+            log_cache_result(content_hash, cached)
             
-            if not structured_data:
-                print(f"Failed to structure data from {key}")
+            if cached is not None:
+                print(f"Duplicate upload s3://{bucket}/{key} resolves to informe {cached['informe_id']} "
+                      f"(estado: {cached['estado']})")
+                archivos.append({'key': key, 'estado': 'DUPLICADO', 'content_hash': content_hash,
+                                 'informe_id': cached['informe_id']})
                 continue
             
-            # Guardar en Aurora
-            informe_id = save_to_aurora(structured_data, f"s3://{bucket}/{key}")
-            
-            print(f"Successfully processed PDF. Informe ID: {informe_id}")
-        
-        return {
-            'statusCode': 200,
-            'body': json.dumps({'message': 'PDFs processed successfully'})
-        }
-        
-    except Exception as e:
-        print(f"Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+            job_id = start_text_extraction(bucket, key, etag, content_hash, claim['reclamado_en'])
+            print(f"Textract job {job_id} started for s3://{bucket}/{key}")
+            archivos.append({'key': key, 'estado': 'INICIADO', 'job_id': job_id, 'content_hash': content_hash})
+        except Exception:
+            if content_hash:
+                # Liberar el hash para que el reintento del mensaje lo vuelva a reclamar
+                fail_extraction(content_hash)
+            raise
+    
+    return {'archivos': archivos}
+
+
+def complete_textract_job(message):
+    """
+    Procesa la notificación de un job terminado y retorna su estado.
+    
+    Args:
+        message: Mensaje de Textract (JobId, Status, DocumentLocation, ...)
+    
+    Returns:
+        dict: {'job_id', 'estado': 'GUARDADO' | 'OMITIDO', 'informe_id'}
+    """
+    informe_id = process_completed_job(message)
+    return {
+        'job_id': message['JobId'],
+        'estado': 'GUARDADO' if informe_id is not None else 'OMITIDO',
+        'informe_id': informe_id
+    }
+
+
+def process_concurrently(items, process):
+    """
+    Procesa items en paralelo con un pool acotado, aislando los errores.
+    
+    Args:
+        items: Lista de (item_id, payload); item_id es el messageId de SQS
+               o un identificador del record
+        process: Función que recibe el payload y retorna un dict de estado
+    
+    Returns:
+        list: Un dict por item, en el mismo orden: {'item_id', 'ok', ...}
+              con 'error' si falló
+    """
+    def run(item):
+        item_id, payload = item
+        try:
+            return {'item_id': item_id, 'ok': True, **process(payload)}
+        except Exception as e:
+            print(f"Error processing {item_id}: {str(e)}")
+            traceback.print_exc()
+            return {'item_id': item_id, 'ok': False, 'error': str(e)}
+    
+    if len(items) <= 1:
+        return [run(item) for item in items]
+    
+    with ThreadPoolExecutor(max_workers=min(EXTRACT_MAX_CONCURRENCY, len(items))) as executor:
+        return list(executor.map(run, items))
+
+
+def build_batch_response(event, resultados, message):
+    """
+    Arma la respuesta con el estado por record.
+    
+    Con trigger SQS retorna batchItemFailures (respuesta parcial de lote) para
+    que solo los mensajes fallidos vuelvan a la cola. Con S3 o SNS directos,
+    si algo falló se lanza una excepción para que Lambda reintente el evento.
+    """
+    fallidos = [r for r in resultados if not r['ok']]
+    print(f"Processed {len(resultados)} record(s): {len(resultados) - len(fallidos)} OK, {len(fallidos)} failed")
+    
+    records = event.get('Records', [])
+    if records and records[0].get('eventSource') == 'aws:sqs':
         return {
-            'statusCode': 500,
-            'body': json.dumps({
-                'error': 'Internal server error',
-                'message': str(e)
-            })
+            'batchItemFailures': [{'itemIdentifier': r['item_id']} for r in fallidos],
+            'resultados': resultados
         }
+    
+    if fallidos:
+        raise RuntimeError(f"{len(fallidos)} record(s) failed: {json.dumps(fallidos)}")
+    
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'message': message, 'resultados': resultados, 'cache': cache_stats,
+                            'estructuracion': structuring_stats})
+    }
 
 
-def extract_text_from_pdf(bucket, key):
+def process_completed_job(message):
     """
-    Extrae texto de un PDF usando Amazon Textract.
+    Procesa la notificación de un job de Textract.
+    
+    Args:
+        message: Mensaje SNS de Textract (JobId, Status, DocumentLocation, ...)
+    
+    Returns:
+        int: ID del informe creado, o None si el PDF no se pudo procesar
+    """
+    job_id = message['JobId']
+    location = message.get('DocumentLocation', {})
+    bucket = location.get('S3Bucket')
+    key = location.get('S3ObjectName')
+    
+    # El hash de contenido viaja como JobTag del job
+    content_hash = message.get('JobTag') or ''
+    if not content_hash.startswith(CONTENT_HASH_PREFIX):
+        content_hash = None
+    
+    print(f"Textract job {job_id} for s3://{bucket}/{key}: {message.get('Status')}")
+    
+    cached = get_extraction(content_hash) if content_hash else None
+    if cached and cached['informe_id'] is not None:
+        # Notificación repetida: el PDF ya se guardó
+        print(f"Job {job_id} already processed. Informe ID: {cached['informe_id']}")
+        return cached['informe_id']
+    
+    if message.get('Status') != 'SUCCEEDED':
+        print(f"Textract job {job_id} did not succeed, skipping {key}")
+        if content_hash:
+            fail_extraction(content_hash)
+        return None
+    
+    # Extraer campos, tablas y texto de todas las páginas
+    layout, pages = get_analysis_layout(job_id)
+    extracted_text = compact_text(layout, EXTRACTION_TOKEN_BUDGET)
+    print(f"Extracted {len(layout.key_values)} field(s), {len(layout.tables)} table(s) and "
+          f"{len(layout.lines)} line(s) from {pages} page(s): "
+          f"{len(extracted_text)} characters (~{estimate_tokens(extracted_text)} tokens)")
+    
+    if not extracted_text:
+        print(f"No text extracted from {key}")
+        if content_hash:
+            fail_extraction(content_hash)
+        return None
+    
+    # Estructurar datos por reglas o con Bedrock (salvo que un intento anterior ya lo haya hecho)
+    if cached and cached['datos_estructurados']:
+        structured_data = cached['datos_estructurados']
+        print("Using structured data from extraction cache")
+    else:
+        structured_data = structure_data(layout, extracted_text)
+    
+    if not structured_data:
+        print(f"Failed to structure data from {key}")
+        if content_hash:
+            fail_extraction(content_hash)
+        return None
+    
+    if content_hash:
+        store_extraction(content_hash, extracted_text, structured_data)
+    
+    # Guardar en Aurora (con el hash, en la misma transacción que completa la extracción)
+    informe_id = save_to_aurora(structured_data, f"s3://{bucket}/{key}", content_hash)
+    if informe_id is None:
+        return None
+    
+    print(f"Successfully processed PDF. Informe ID: {informe_id}")
+    return informe_id
+
+
+def compute_content_hash(bucket, key, etag=''):
+    """
+    Calcula el hash MD5 del contenido de un PDF.
+    
+    El ETag de un objeto subido con un PUT simple (SSE-S3) ya es el MD5 del
+    contenido, así que no hace falta descargarlo. Los objetos multipart tienen
+    un ETag compuesto ('<md5>-<partes>') y se hashean leyendo el objeto.
     
     Args:
         bucket: Nombre del bucket S3
         key: Clave del objeto en S3
+        etag: ETag del evento S3
     
     Returns:
-        str: Texto extraído del PDF
+        str: Hash con prefijo, p.ej. 'md5:9e107d9d372bb6826bd81d3542a419d6'
+    """
+    etag = (etag or '').strip('"')
+    if etag and '-' not in etag:
+        return f"{CONTENT_HASH_PREFIX}{etag}"
+    
+    digest = hashlib.md5()
+    body = s3_client.get_object(Bucket=bucket, Key=key)['Body']
+    for chunk in body.iter_chunks(1024 * 1024):
+        digest.update(chunk)
+    return f"{CONTENT_HASH_PREFIX}{digest.hexdigest()}"
+
+
+def claim_extraction(content_hash, pdf_s3_path):
+    """
+    Reclama un hash de contenido en extracciones_pdf.
+    
+    Solo la primera subida de un contenido (o la siguiente a una extracción
+    fallida, abandonada o cuyo informe se eliminó) lo reclama e inicia
+    Textract. Las demás cuentan un acierto del cache.
+    
+    Args:
+        content_hash: Hash del contenido del PDF
+        pdf_s3_path: Ruta del PDF en S3
+    
+    Returns:
+        dict: {'reclamado': True, 'reclamado_en'} si esta subida la reclamó y
+              debe procesarla ('reclamado_en' identifica el intento), o
+              {'reclamado': False, 'informe_id', 'estado'} de la extracción existente
+    """
+    claim_sql = """
+        INSERT INTO extracciones_pdf (content_hash, pdf_s3_path)
+        VALUES (:content_hash, :pdf_s3_path)
+        ON CONFLICT (content_hash) DO UPDATE
+            SET pdf_s3_path = EXCLUDED.pdf_s3_path,
+                estado = 'PROCESANDO',
+                updated_at = CURRENT_TIMESTAMP
+            WHERE extracciones_pdf.estado = 'ERROR'
+               OR (extracciones_pdf.estado = 'COMPLETADO' AND extracciones_pdf.informe_id IS NULL)
+               OR (extracciones_pdf.estado = 'PROCESANDO'
+                   AND extracciones_pdf.updated_at < CURRENT_TIMESTAMP - make_interval(secs => :stale_seconds))
+        RETURNING CAST(updated_at AS TEXT) AS reclamado_en
+    """
+    claimed = db.query_one(
+        claim_sql,
+        [
+            {'name': 'content_hash', 'value': {'stringValue': content_hash}},
+            {'name': 'pdf_s3_path', 'value': {'stringValue': pdf_s3_path}},
+            {'name': 'stale_seconds', 'value': {'longValue': EXTRACTION_CACHE_STALE_SECONDS}}
+        ],
+        db_secret_arn=DB_SECRET_ARN,
+        db_cluster_arn=DB_CLUSTER_ARN,
+        database_name=DATABASE_NAME
+    )
+    
+    if claimed is not None:
+        return {'reclamado': True, 'reclamado_en': claimed['reclamado_en']}
+    
+    hit_sql = """
+        UPDATE extracciones_pdf
+        SET hits = hits + 1
+        WHERE content_hash = :content_hash
+        RETURNING informe_id, estado
+    """
+    row = db.query_one(
+        hit_sql,
+        [{'name': 'content_hash', 'value': {'stringValue': content_hash}}],
+        db_secret_arn=DB_SECRET_ARN,
+        db_cluster_arn=DB_CLUSTER_ARN,
+        database_name=DATABASE_NAME
+    )
+    return {'reclamado': False, 'informe_id': row['informe_id'], 'estado': row['estado']}
+
+
+def get_extraction(content_hash):
+    """
+    Obtiene la extracción cacheada de un hash de contenido.
+    
+    Returns:
+        dict: {'informe_id', 'datos_estructurados'} o None si no existe
+    """
+    sql = """
+        SELECT informe_id, datos_estructurados::text AS datos_estructurados
+        FROM extracciones_pdf
+        WHERE content_hash = :content_hash
     """
+    row = db.query_one(
+        sql,
+        [{'name': 'content_hash', 'value': {'stringValue': content_hash}}],
+        db_secret_arn=DB_SECRET_ARN,
+        db_cluster_arn=DB_CLUSTER_ARN,
+        database_name=DATABASE_NAME
+    )
+    
+    if row is None:
+        return None
+    
+    datos = row['datos_estructurados']
+    return {
+        'informe_id': row['informe_id'],
+        'datos_estructurados': json.loads(datos) if datos is not None else None
+    }
+
+
+def store_extraction(content_hash, extracted_text, structured_data):
+    """Guarda el texto de Textract y el JSON de Bedrock de un hash de contenido."""
+    sql = """
+        UPDATE extracciones_pdf
+        SET texto_extraido = :texto_extraido,
+            datos_estructurados = CAST(:datos_estructurados AS jsonb)
+        WHERE content_hash = :content_hash
+    """
+    db.execute(
+        sql,
+        [
+            {'name': 'content_hash', 'value': {'stringValue': content_hash}},
+            {'name': 'texto_extraido', 'value': {'stringValue': extracted_text}},
+            {'name': 'datos_estructurados', 'value': {'stringValue': json.dumps(structured_data)}}
+        ],
+        db_secret_arn=DB_SECRET_ARN,
+        db_cluster_arn=DB_CLUSTER_ARN,
+        database_name=DATABASE_NAME
+    )
+
+
+def lock_extraction(content_hash, transaction):
+    """
+    Bloquea la fila de un hash de contenido hasta el fin de la transacción.
+    
+    Una notificación repetida del mismo job (o el job de un reintento) espera
+    aquí a que termine la primera y lee su informe_id.
+    
+    Returns:
+        dict: {'informe_id', 'estado'} o None si no existe
+    """
+    sql = """
+        SELECT informe_id, estado
+        FROM extracciones_pdf
+        WHERE content_hash = :content_hash
+        FOR UPDATE
+    """
+    return db.query_one(
+        sql,
+        [{'name': 'content_hash', 'value': {'stringValue': content_hash}}],
+        transaction=transaction,
+        db_secret_arn=DB_SECRET_ARN,
+        db_cluster_arn=DB_CLUSTER_ARN,
+        database_name=DATABASE_NAME
+    )
+
+
+def complete_extraction(content_hash, informe_id, transaction=None):
+    """Asocia el informe creado al hash de contenido."""
+    sql = """
+        UPDATE extracciones_pdf
+        SET informe_id = :informe_id, estado = 'COMPLETADO'
+        WHERE content_hash = :content_hash
+    """
+    db.execute(
+        sql,
+        [
+            {'name': 'content_hash', 'value': {'stringValue': content_hash}},
+            {'name': 'informe_id', 'value': {'longValue': informe_id}}
+        ],
+        transaction=transaction,
+        db_secret_arn=DB_SECRET_ARN,
+        db_cluster_arn=DB_CLUSTER_ARN,
+        database_name=DATABASE_NAME
+    )
+
+
+def fail_extraction(content_hash):
+    """Marca la extracción como fallida para que una nueva subida la reintente."""
     try:
-        print(f"Extracting text with Textract from s3://{bucket}/{key}")
-        
-        # Llamar a Textract AnalyzeDocument (más robusto que DetectDocumentText)
-        response = textract_client.analyze_document(
-            Document={
-                'S3Object': {
-                    'Bucket': bucket,
-                    'Name': key
-                }
-            },
-            FeatureTypes=['TABLES', 'FORMS']  # Extraer tablas y formularios también
+        sql = """
+            UPDATE extracciones_pdf
+            SET estado = 'ERROR'
+            WHERE content_hash = :content_hash AND informe_id IS NULL
+        """
+        db.execute(
+            sql,
+            [{'name': 'content_hash', 'value': {'stringValue': content_hash}}],
+            db_secret_arn=DB_SECRET_ARN,
+            db_cluster_arn=DB_CLUSTER_ARN,
+            database_name=DATABASE_NAME
         )
+    except Exception as e:
+        print(f"Error marking extraction {content_hash} as failed: {str(e)}")
+
+
+def log_cache_result(content_hash, cached):
+    """Cuenta el acierto o fallo del cache de extracciones y registra la tasa de aciertos."""
+    with _cache_stats_lock:
+        cache_stats['hits' if cached is not None else 'misses'] += 1
+        hits = cache_stats['hits']
+        lookups = hits + cache_stats['misses']
+    print(f"Extraction cache {'HIT' if cached is not None else 'MISS'} for {content_hash}. "
+          f"Hit rate: {hits}/{lookups} ({hits / lookups:.0%})")
+
+
+def start_text_extraction(bucket, key, etag='', content_hash='', attempt=''):
+    """
+    Inicia un job asíncrono de Textract AnalyzeDocument para un PDF.
+    
+    Args:
+        bucket: Nombre del bucket S3
+        key: Clave del objeto en S3
+        etag: ETag del objeto (parte del token de idempotencia)
+        content_hash: Hash del contenido, se envía como JobTag para completion_handler
+        attempt: Intento del reclamo en extracciones_pdf (parte del token de idempotencia)
+    
+    Returns:
+        str: JobId de Textract
+    """
+    # Mismo archivo, contenido e intento -> mismo token -> Textract retorna el mismo JobId.
+    # Un reintento tras una extracción fallida es otro intento: si reusara el token,
+    # Textract devolvería el job anterior sin volver a notificar por SNS.
+    token = hashlib.sha256(f"{bucket}/{key}/{etag}/{attempt}".encode('utf-8')).hexdigest()[:64]
+    
+    response = call_textract_with_retry(
+        textract_client.start_document_analysis,
+        DocumentLocation={
+            'S3Object': {
+                'Bucket': bucket,
+                'Name': key
+            }
+        },
+        FeatureTypes=['TABLES', 'FORMS'],  # Extraer tablas y formularios también
+        ClientRequestToken=token,
+        JobTag=content_hash or 'extract-pdf',
+        NotificationChannel={
+            'SNSTopicArn': TEXTRACT_SNS_TOPIC_ARN,
+            'RoleArn': TEXTRACT_ROLE_ARN
+        }
+    )
+    
+    return response['JobId']
+
+
+def get_analysis_layout(job_id):
+    """
+    Procesa los bloques de un job de Textract terminado, paginando con NextToken.
+    
+    Cada página de resultados se incorpora al LayoutBuilder apenas llega, sin
+    acumular la lista completa de bloques.
+    
+    Args:
+        job_id: JobId de Textract
+    
+    Returns:
+        tuple: (DocumentLayout, número de páginas del documento)
+    """
+    builder = LayoutBuilder()
+    pages = 0
+    next_token = None
+    
+    while True:
+        request = {'JobId': job_id, 'MaxResults': TEXTRACT_PAGE_SIZE}
+        if next_token:
+            request['NextToken'] = next_token
         
-        # Extraer todo el texto de los bloques
-        text_blocks = []
-        for block in response.get('Blocks', []):
-            if block['BlockType'] == 'LINE':
-                text_blocks.append(block['Text'])
+        response = call_textract_with_retry(textract_client.get_document_analysis, **request)
         
-        extracted_text = '\n'.join(text_blocks)
-        print(f"Extracted {len(extracted_text)} characters")
+        status = response.get('JobStatus')
+        if status == 'PARTIAL_SUCCESS':
+            print(f"Textract job {job_id} partially succeeded: {response.get('Warnings')}")
+        elif status != 'SUCCEEDED':
+            raise RuntimeError(f"Textract job {job_id} status: {status} {response.get('StatusMessage', '')}")
         
-        return extracted_text
+        pages = response.get('DocumentMetadata', {}).get('Pages', pages)
+        builder.add(response.get('Blocks', []))
         
-    except Exception as e:
-        print(f"Error extracting text with Textract: {str(e)}")
-        return None
+        next_token = response.get('NextToken')
+        if not next_token:
+            return builder.build(), pages
 
 
-def structure_data_with_bedrock(text):
+def call_textract_with_retry(operation, **kwargs):
     """
-    Usa Amazon Bedrock (Nova Pro) para estructurar los datos extraídos.
+    Llama a una operación de Textract reintentando con backoff exponencial y
+    jitter cuando responde con throttling o límite de jobs concurrentes.
+    """
+    return call_with_backoff(lambda: operation(**kwargs), TEXTRACT_RETRYABLE_ERROR_CODES,
+                             TEXTRACT_MAX_RETRIES, service='Textract')
+
+
+def structure_data(layout, text):
+    """
+    Estructura los datos del informe: primero por reglas y, si faltan campos
+    requeridos o la confianza de Textract es baja, con Bedrock.
     
     Args:
-        text: Texto extraído del PDF
+        layout: DocumentLayout del documento
+        text: Contenido armado por compact_text (para el prompt de Bedrock)
     
     Returns:
         dict: Datos estructurados en formato JSON
     """
-    try:
-        print("Structuring data with Bedrock (Amazon Nova Pro)")
+    if EXTRACTION_RULES_ENABLED:
+        start = time.perf_counter()
+        structured_data, reasons = extract_fields(layout, EXTRACTION_RULES_MIN_CONFIDENCE)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        
+        if structured_data:
+            with _structuring_stats_lock:
+                structuring_stats['reglas'] += 1
+            print(f"Structured data with rules in {elapsed_ms:.1f} ms, Bedrock skipped")
+            return structured_data
         
-        # Prompt para estructurar datos médicos
-        prompt = f"""Extrae la siguiente información del informe médico y responde ÚNICAMENTE con un objeto JSON válido, sin texto adicional:
+        print(f"Rule-based extraction incomplete ({'; '.join(reasons)}), falling back to Bedrock")
+    
+    with _structuring_stats_lock:
+        structuring_stats['bedrock'] += 1
+    return structure_data_with_bedrock(text)
+
+
+def invoke_bedrock_with_retry(model_id, request_body):
+    """
+    Invoca Bedrock reintentando con backoff exponencial y jitter cuando
+    responde con throttling o errores transitorios. Si se agotan los
+    reintentos (o el error no es transitorio) la excepción se propaga para
+    que el mensaje SQS vuelva a la cola en lugar de descartar el PDF.
+    """
+    body = json.dumps(request_body)
+    return call_with_backoff(lambda: bedrock_runtime.invoke_model(modelId=model_id, body=body),
+                             BEDROCK_RETRYABLE_ERROR_CODES, BEDROCK_MAX_RETRIES)
 
-Texto del informe:
-{text[:4000]}
+
+def structure_data_with_bedrock(text):
+    """
+    Usa Amazon Bedrock (Nova Pro) para estructurar los datos extraídos.
+    
+    Los errores de invocación se propagan (ver invoke_bedrock_with_retry);
+    solo una respuesta que no se puede interpretar retorna None.
+    
+    Args:
+        text: Contenido del PDF armado por compact_text (ya dentro del presupuesto de tokens)
+    
+    Returns:
+        dict: Datos estructurados en formato JSON, o None si la respuesta no es JSON válido
+    """
+    print("Structuring data with Bedrock (Amazon Nova Pro)")
+    
+    # Prompt para estructurar datos médicos
+    prompt = f"""Extrae la siguiente información del informe médico y responde ÚNICAMENTE con un objeto JSON válido, sin texto adicional:
+
+Contenido del informe (campos del formulario, texto y tablas):
+{text}
 
 Extrae:
 - trabajador: {{nombre, documento}}
@@ -148,220 +700,132 @@ Extrae:
 Si algún campo no está presente, usa una cadena vacía o 0 para números.
 
 Responde SOLO con el JSON, sin explicaciones:"""
-        
-        # Invocar Bedrock con Amazon Nova Pro
-        request_body = {
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [{"text": prompt}]
-                }
-            ],
-            "inferenceConfig": {
-                "max_new_tokens": 2000,
-                "temperature": 0.1,  # Bajo para extracción precisa
-                "top_p": 0.9
+    
+    # Invocar Bedrock con Amazon Nova Pro
+    request_body = {
+        "messages": [
+            {
+                "role": "user",
+                "content": [{"text": prompt}]
             }
+        ],
+        "inferenceConfig": {
+            "max_new_tokens": 2000,
+            "temperature": 0.1,  # Bajo para extracción precisa
+            "top_p": 0.9
         }
-        
-        # Usar inference profile (soporta on-demand throughput)
-        model_id = 'us.amazon.nova-pro-v1:0'
-        print(f"Invoking Bedrock with inference profile: {model_id} in region: {AWS_REGION}")
-        
-        response = bedrock_runtime.invoke_model(
-            modelId=model_id,
-            body=json.dumps(request_body)
-        )
-        
-        # Parsear respuesta
-        response_body = json.loads(response['body'].read())
-        
-        # Extraer el texto de la respuesta
-        content = response_body.get('output', {}).get('message', {}).get('content', [])
-        if content and len(content) > 0:
-            generated_text = content[0].get('text', '')
-        else:
-            print("No content in Bedrock response")
-            return None
-        
-        print(f"Bedrock response: {generated_text[:500]}")
-        print(f"Full Bedrock response: {generated_text}")
-        
-        # Intentar parsear el JSON
-        # Limpiar el texto por si tiene markdown
-        generated_text = generated_text.strip()
-        if generated_text.startswith('```json'):
-            generated_text = generated_text[7:]
-        if generated_text.startswith('```'):
-            generated_text = generated_text[3:]
-        if generated_text.endswith('```'):
-            generated_text = generated_text[:-3]
-        generated_text = generated_text.strip()
-        
+    }
+    
+    # Usar inference profile (soporta on-demand throughput)
+    model_id = 'us.amazon.nova-pro-v1:0'
+    print(f"Invoking Bedrock with inference profile: {model_id} in region: {AWS_REGION}")
+    
+    response = invoke_bedrock_with_retry(model_id, request_body)
+    
+    # Parsear respuesta
+    response_body = json.loads(response['body'].read())
+    
+    # Extraer el texto de la respuesta
+    content = response_body.get('output', {}).get('message', {}).get('content', [])
+    if content and len(content) > 0:
+        generated_text = content[0].get('text', '')
+    else:
+        print("No content in Bedrock response")
+        return None
+    
+    print(f"Bedrock response: {generated_text[:500]}")
+    print(f"Full Bedrock response: {generated_text}")
+    
+    # Intentar parsear el JSON
+    # Limpiar el texto por si tiene markdown
+    generated_text = generated_text.strip()
+    if generated_text.startswith('```json'):
+        generated_text = generated_text[7:]
+    if generated_text.startswith('```'):
+        generated_text = generated_text[3:]
+    if generated_text.endswith('```'):
+        generated_text = generated_text[:-3]
+    generated_text = generated_text.strip()
+    
+    try:
         structured_data = json.loads(generated_text)
-        
-        print(f"Successfully structured data: {json.dumps(structured_data, indent=2)}")
-        return structured_data
-        
     except json.JSONDecodeError as e:
         print(f"Error parsing JSON from Bedrock: {str(e)}")
         print(f"Generated text: {generated_text}")
         return None
-    except Exception as e:
-        print(f"Error structuring data with Bedrock: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return None
+    
+    print(f"Successfully structured data: {json.dumps(structured_data, indent=2)}")
+    return structured_data
 
 
-def save_to_aurora(data, pdf_s3_path):
+def save_to_aurora(data, pdf_s3_path, content_hash=None):
     """
     Guarda los datos estructurados en Aurora con el mismo formato que el sistema legacy.
     
+    Trabajador, contratista e informe se registran en una sola sentencia
+    (upserts.insert_informe_with_upserts del Layer compartido). Con hash de
+    contenido, el informe y el informe_id de extracciones_pdf se confirman en
+    la misma transacción, con la fila de la extracción bloqueada: una entrega
+    repetida o el reintento de una que falló no crean un segundo informe.
+    
     Args:
         data: Datos estructurados
         pdf_s3_path: Ruta del PDF en S3
+        content_hash: Hash del contenido del PDF (opcional)
     
     Returns:
-        int: ID del informe creado
+        int: ID del informe creado (o el ya guardado para ese hash), o None
+             si la extracción ya no está PROCESANDO
     """
     try:
         print("Saving structured data to Aurora")
         
         trabajador = data.get('trabajador', {})
-        contratista = data.get('contratista', {})
-        examen = data.get('examen', {})
-        
-        # 1. Upsert trabajador
-        trabajador_id = upsert_trabajador(trabajador)
         
-        # 2. Upsert contratista
-        contratista_id = upsert_contratista(contratista)
-        
-        # 3. Insert informe
-        informe_id = insert_informe(trabajador_id, contratista_id, examen, pdf_s3_path)
+        with db.transaction(db_secret_arn=DB_SECRET_ARN, db_cluster_arn=DB_CLUSTER_ARN,
+                            database_name=DATABASE_NAME) as tx:
+            if content_hash:
+                extraction = lock_extraction(content_hash, tx)
+                if extraction and extraction['informe_id'] is not None:
+                    print(f"Extraction {content_hash} already saved. Informe ID: {extraction['informe_id']}")
+                    return extraction['informe_id']
+                if not extraction or extraction['estado'] != 'PROCESANDO':
+                    print(f"Extraction {content_hash} is no longer PROCESANDO, skipping")
+                    return None
+            
+            result = upserts.insert_informe_with_upserts(
+                # fecha_nacimiento no se extrae del PDF
+                {'nombre': trabajador.get('nombre'), 'documento': trabajador.get('documento')},
+                contratista_with_email(data.get('contratista', {})),
+                data.get('examen', {}),
+                'EXTERNO',
+                pdf_s3_path=pdf_s3_path,
+                transaction=tx,
+                db_secret_arn=DB_SECRET_ARN,
+                db_cluster_arn=DB_CLUSTER_ARN,
+                database_name=DATABASE_NAME
+            )
+            
+            if content_hash:
+                complete_extraction(content_hash, result['informe_id'], transaction=tx)
         
-        print(f"Saved to Aurora. Informe ID: {informe_id}")
-        return informe_id
+        print(f"Saved to Aurora. Informe ID: {result['informe_id']}")
+        return result['informe_id']
         
     except Exception as e:
         print(f"Error saving to Aurora: {str(e)}")
         raise
 
 
-def upsert_trabajador(trabajador):
-    """Inserta o busca trabajador existente."""
-    documento = trabajador.get('documento', '').strip()
-    nombre = trabajador.get('nombre', '').strip()
-    
-    if not documento or not nombre:
-        raise ValueError("Trabajador debe tener nombre y documento")
-    
-    # Buscar si existe
-    select_sql = "SELECT id FROM trabajadores WHERE documento = :documento"
-    result = execute_sql(select_sql, [
-        {'name': 'documento', 'value': {'stringValue': documento}}
-    ])
-    
-    if result['records']:
-        return result['records'][0][0]['longValue']
-    
-    # Insertar nuevo (sin fecha_nacimiento por ahora, se puede agregar después)
-    insert_sql = """
-        INSERT INTO trabajadores (nombre, documento)
-        VALUES (:nombre, :documento)
-        RETURNING id
-    """
-    result = execute_sql(insert_sql, [
-        {'name': 'nombre', 'value': {'stringValue': nombre}},
-        {'name': 'documento', 'value': {'stringValue': documento}}
-    ])
+def contratista_with_email(contratista):
+    """Completa el email del contratista con uno por defecto basado en el nombre si no viene en el PDF."""
+    nombre = (contratista.get('nombre') or '').strip()
+    email = (contratista.get('email') or '').strip()
     
-    return result['records'][0][0]['longValue']
-
-
-def upsert_contratista(contratista):
-    """Inserta o busca contratista existente."""
-    nombre = contratista.get('nombre', '').strip()
-    email = contratista.get('email', '').strip()
-    
-    if not nombre:
-        raise ValueError("Contratista debe tener nombre")
-    
-    # Si no hay email, usar uno por defecto basado en el nombre
-    if not email:
+    if nombre and not email:
         # Generar email por defecto limpiando el nombre
         nombre_limpio = nombre.lower().replace(' ', '').replace('.', '').replace(',', '')
         email = f"contacto@{nombre_limpio}.com"
         print(f"Email no encontrado, usando email por defecto: {email}")
     
-    # Buscar si existe
-    select_sql = "SELECT id FROM contratistas WHERE email = :email"
-    result = execute_sql(select_sql, [
-        {'name': 'email', 'value': {'stringValue': email}}
-    ])
-    
-    if result['records']:
-        return result['records'][0][0]['longValue']
-    
-    # Insertar nuevo
-    insert_sql = """
-        INSERT INTO contratistas (nombre, email)
-        VALUES (:nombre, :email)
-        RETURNING id
-    """
-    result = execute_sql(insert_sql, [
-        {'name': 'nombre', 'value': {'stringValue': nombre}},
-        {'name': 'email', 'value': {'stringValue': email}}
-    ])
-    
-    return result['records'][0][0]['longValue']
-
-
-def insert_informe(trabajador_id, contratista_id, examen, pdf_s3_path):
-    """Inserta un nuevo informe médico."""
-    insert_sql = """
-        INSERT INTO informes_medicos (
-            trabajador_id, contratista_id, tipo_examen, fecha_examen,
-            presion_arterial, peso, altura, vision, audiometria, observaciones,
-            pdf_s3_path, origen
-        )
-        VALUES (
-            :trabajador_id, :contratista_id, :tipo_examen, CURRENT_TIMESTAMP,
-            :presion_arterial, :peso, :altura, :vision, :audiometria, :observaciones,
-            :pdf_s3_path, 'EXTERNO'
-        )
-        RETURNING id
-    """
-    
-    params = [
-        {'name': 'trabajador_id', 'value': {'longValue': trabajador_id}},
-        {'name': 'contratista_id', 'value': {'longValue': contratista_id}},
-        {'name': 'tipo_examen', 'value': {'stringValue': examen.get('tipo', 'General')}},
-        {'name': 'presion_arterial', 'value': {'stringValue': examen.get('presion_arterial', '')}},
-        {'name': 'peso', 'value': {'doubleValue': float(examen.get('peso', 0))}},
-        {'name': 'altura', 'value': {'doubleValue': float(examen.get('altura', 0))}},
-        {'name': 'vision', 'value': {'stringValue': examen.get('vision', '')}},
-        {'name': 'audiometria', 'value': {'stringValue': examen.get('audiometria', '')}},
-        {'name': 'observaciones', 'value': {'stringValue': examen.get('observaciones', '')}},
-        {'name': 'pdf_s3_path', 'value': {'stringValue': pdf_s3_path}}
-    ]
-    
-    result = execute_sql(insert_sql, params)
-    return result['records'][0][0]['longValue']
-
-
-def execute_sql(sql, parameters=None):
-    """Ejecuta una consulta SQL usando RDS Data API."""
-    params = {
-        'secretArn': DB_SECRET_ARN,
-        'resourceArn': DB_CLUSTER_ARN,
-        'database': DATABASE_NAME,
-        'sql': sql
-    }
-    
-    if parameters:
-        params['parameters'] = parameters
-    
-    response = rds_data.execute_statement(**params)
-    return response
+    return {'nombre': nombre, 'email': email}
@@ -0,0 +1,285 @@
+"""
+Procesamiento de los bloques de Textract AnalyzeDocument (FORMS + TABLES).
+
+LayoutBuilder consume los bloques a medida que llegan las páginas de
+resultados de get_document_analysis y guarda solo el texto y las relaciones
+entre bloques (sin geometría ni polígonos). Al terminar arma un DocumentLayout
+con:
+
+- pares clave-valor detectados por FORMS ("Nombre:" -> "Juan Pérez Gómez")
+- filas de las tablas detectadas por TABLES
+- líneas de texto que no pertenecen a un par clave-valor ni a una tabla
+
+compact_text() une esas partes en un texto compacto para el prompt de
+Bedrock que respeta un presupuesto de tokens: primero los campos del
+formulario (los que extract_pdf necesita van adelante), luego el texto libre
+(observaciones) y por último las tablas. Cuando algo no entra se descartan
+unidades completas (campos, líneas, filas) de menor prioridad, en lugar de
+cortar el texto en un carácter fijo.
+"""
+
+import re
+import unicodedata
+
+# Estimación de caracteres por token para texto en español
+CHARS_PER_TOKEN = 4
+
+# Claves de formulario que corresponden a los datos que se extraen, en orden de prioridad
+PRIORITY_KEYS = (
+    'nombre', 'dni', 'documento', 'empresa', 'contratista', 'ruc', 'email', 'correo',
+    'tipo de examen', 'presion', 'peso', 'altura', 'vision', 'audiometria'
+)
+
+# Líneas sin letras ni dígitos (firmas '_____', separadores)
+_NO_CONTENT = re.compile(r'^[\W_]*$')
+
+
+class DocumentLayout:
+    """Contenido de un documento separado en formulario, tablas y texto libre."""
+
+    __slots__ = ('key_values', 'tables', 'table_confidence', 'lines', 'line_confidence', 'pages')
+
+    def __init__(self, key_values, tables, table_confidence, lines, line_confidence, pages):
+        # [(clave, valor, confianza)] en orden de lectura
+        self.key_values = key_values
+        # [[celdas de la fila]] por tabla, la primera fila suele ser el encabezado
+        self.tables = tables
+        # Confianza mínima de las celdas de cada tabla
+        self.table_confidence = table_confidence
+        # [(página, texto)] en orden de lectura
+        self.lines = lines
+        # Confianza de Textract de cada línea (mismo orden que lines)
+        self.line_confidence = line_confidence
+        self.pages = pages
+
+
+class LayoutBuilder:
+    """Acumula bloques de Textract página de resultados por página."""
+
+    def __init__(self):
+        self._words = {}
+        self._lines = []
+        self._keys = []
+        self._values = {}
+        self._tables = []
+        self._cells = {}
+        self.pages = 0
+
+    def add(self, blocks):
+        """
+        Procesa una página de resultados de get_document_analysis.
+
+        Args:
+            blocks: Lista de bloques (response['Blocks'])
+        """
+        for block in blocks:
+            block_type = block['BlockType']
+            page = block.get('Page', 1)
+
+            if block_type == 'WORD':
+                self._words[block['Id']] = block.get('Text', '')
+            elif block_type == 'SELECTION_ELEMENT':
+                self._words[block['Id']] = '[X]' if block.get('SelectionStatus') == 'SELECTED' else '[ ]'
+            elif block_type == 'LINE':
+                self._lines.append((page, *_position(block), block.get('Text', ''), _related(block, 'CHILD'),
+                                    block.get('Confidence', 100.0)))
+            elif block_type == 'KEY_VALUE_SET':
+                if 'KEY' in block.get('EntityTypes', []):
+                    self._keys.append((page, *_position(block), _related(block, 'CHILD'), _related(block, 'VALUE'),
+                                       block.get('Confidence', 100.0)))
+                else:
+                    self._values[block['Id']] = (_related(block, 'CHILD'), block.get('Confidence', 100.0))
+            elif block_type == 'TABLE':
+                self._tables.append((page, *_position(block), _related(block, 'CHILD')))
+            elif block_type == 'CELL':
+                self._cells[block['Id']] = (block.get('RowIndex', 1), block.get('ColumnIndex', 1),
+                                            _related(block, 'CHILD'), block.get('Confidence', 100.0))
+            elif block_type == 'PAGE':
+                self.pages = max(self.pages, page)
+
+    def build(self):
+        """
+        Resuelve las relaciones acumuladas.
+
+        Returns:
+            DocumentLayout
+        """
+        consumed = set()
+
+        key_values = []
+        for _, _, _, key_ids, value_ids, confidence in sorted(self._keys, key=lambda k: k[:3]):
+            value_word_ids = []
+            for value_id in value_ids:
+                word_ids, value_confidence = self._values.get(value_id, ((), confidence))
+                value_word_ids.extend(word_ids)
+                confidence = min(confidence, value_confidence)
+            key = self._text(key_ids).rstrip(': ').strip()
+            value = self._text(value_word_ids)
+            consumed.update(key_ids)
+            consumed.update(value_word_ids)
+            if key and value:
+                key_values.append((key, value, confidence))
+
+        tables = []
+        table_confidence = []
+        for _, _, _, cell_ids in sorted(self._tables, key=lambda t: t[:3]):
+            rows = {}
+            confidence = 100.0
+            for cell_id in cell_ids:
+                if cell_id not in self._cells:
+                    continue
+                row, column, word_ids, cell_confidence = self._cells[cell_id]
+                consumed.update(word_ids)
+                confidence = min(confidence, cell_confidence)
+                rows.setdefault(row, {})[column] = self._text(word_ids)
+            table = [
+                [cells.get(column, '') for column in range(1, max(cells) + 1)]
+                for _, cells in sorted(rows.items())
+            ]
+            table = [row for row in table if any(row)]
+            if table:
+                tables.append(table)
+                table_confidence.append(confidence)
+
+        lines = []
+        line_confidence = []
+        for page, _, _, text, word_ids, confidence in sorted(self._lines, key=lambda line: line[:3]):
+            # Las líneas cuyo contenido ya está en un par clave-valor o una tabla se omiten
+            if word_ids and all(word_id in consumed for word_id in word_ids):
+                continue
+            lines.append((page, text))
+            line_confidence.append(confidence)
+
+        pages = self.pages or max([line[0] for line in self._lines], default=0)
+        return DocumentLayout(key_values, tables, table_confidence, lines, line_confidence, pages)
+
+    def _text(self, word_ids):
+        return ' '.join(self._words[word_id] for word_id in word_ids if self._words.get(word_id))
+
+
+def compact_text(layout, token_budget):
+    """
+    Arma el texto para el prompt de Bedrock dentro de un presupuesto de tokens.
+
+    Args:
+        layout: DocumentLayout del documento
+        token_budget: Máximo de tokens estimados (CHARS_PER_TOKEN caracteres por token)
+
+    Returns:
+        str: Texto con secciones CAMPOS, TEXTO y TABLAS
+    """
+    budget = token_budget * CHARS_PER_TOKEN
+    used = 0
+
+    def fits(text):
+        nonlocal used
+        if used + len(text) + 1 > budget:
+            return False
+        used += len(text) + 1
+        return True
+
+    # 1. Campos del formulario: los prioritarios primero, sin perder el orden de lectura al emitirlos
+    fields = [f"{key}: {value}" for key, value, _ in layout.key_values]
+    ranked = sorted(range(len(fields)), key=lambda i: (_key_rank(layout.key_values[i][0]), i))
+    kept_fields = set()
+    if fields and fits('CAMPOS:'):
+        kept_fields = {i for i in ranked if fits(fields[i])}
+
+    # 2. Texto libre: líneas con contenido, sin repetir encabezados/pies de página
+    free_lines = []
+    seen = set()
+    for _, text in layout.lines:
+        normalized = normalize_text(text)
+        if _NO_CONTENT.match(text) or normalized in seen:
+            continue
+        seen.add(normalized)
+        free_lines.append(text)
+
+    # Si no entra completo se conservan el inicio y el final (conclusión) y se omite el medio
+    head, tail = [], []
+    if free_lines and fits('TEXTO:'):
+        if sum(len(text) + 1 for text in free_lines) > budget - used:
+            # Lugar para el marcador de líneas omitidas
+            used += len('[999 líneas omitidas]') + 1
+        head_limit = used + (budget - used) // 2
+        for text in free_lines:
+            if used + len(text) + 1 > head_limit:
+                break
+            fits(text)
+            head.append(text)
+        for text in reversed(free_lines[len(head):]):
+            if not fits(text):
+                break
+            tail.insert(0, text)
+    omitted_lines = len(free_lines) - len(head) - len(tail)
+
+    # 3. Tablas: filas completas, el encabezado solo si entra al menos una fila más
+    kept_tables = []
+    if layout.tables:
+        # Lugar para el marcador de tablas omitidas
+        used += len('[99 tablas omitidas]') + 1
+    for number, table in enumerate(layout.tables, start=1):
+        title = f"TABLA {number}:"
+        rows = [' | '.join(cell for cell in row) for row in table]
+        if used + len(title) + 1 + sum(len(row) + 1 for row in rows[:2]) > budget:
+            break
+        fits(title)
+        kept_rows = []
+        for row in rows:
+            if not fits(row):
+                break
+            kept_rows.append(row)
+        kept_tables.append((title, kept_rows, len(rows) - len(kept_rows)))
+
+    parts = []
+    if kept_fields:
+        parts.append('CAMPOS:')
+        parts.extend(fields[i] for i in sorted(kept_fields))
+    if head or tail:
+        parts.append('TEXTO:')
+        parts.extend(head)
+        if omitted_lines:
+            parts.append(f"[{omitted_lines} líneas omitidas]")
+        parts.extend(tail)
+    for title, rows, omitted in kept_tables:
+        parts.append(title)
+        parts.extend(rows)
+        if omitted:
+            parts.append(f"[{omitted} filas omitidas]")
+    if len(kept_tables) < len(layout.tables):
+        parts.append(f"[{len(layout.tables) - len(kept_tables)} tablas omitidas]")
+
+    return '\n'.join(parts)
+
+
+def estimate_tokens(text):
+    """Estimación de tokens de un texto (CHARS_PER_TOKEN caracteres por token)."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _related(block, relationship_type):
+    return [
+        block_id
+        for relationship in block.get('Relationships', [])
+        if relationship['Type'] == relationship_type
+        for block_id in relationship['Ids']
+    ]
+
+
+def _position(block):
+    box = block.get('Geometry', {}).get('BoundingBox', {})
+    return round(box.get('Top', 0.0), 3), box.get('Left', 0.0)
+
+
+def normalize_text(text):
+    """Minúsculas y sin tildes, para comparar etiquetas y líneas."""
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in text if not unicodedata.combining(c)).strip()
+
+
+def _key_rank(key):
+    normalized = normalize_text(key)
+    for rank, priority in enumerate(PRIORITY_KEYS):
+        if normalized.startswith(priority):
+            return rank
+    return len(PRIORITY_KEYS)
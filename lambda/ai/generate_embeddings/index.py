@@ -1,30 +1,82 @@
 import json
 import os
+import time
 import boto3
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
+# Lambda Layer compartido (lambda/shared)
+import db
+from retry import BEDROCK_RETRYABLE_ERROR_CODES, call_with_backoff
+from vector_codec import encode_vector
+
 # Clientes AWS
 bedrock_runtime = boto3.client('bedrock-runtime')
-rds_data = boto3.client('rds-data')
 
 # Variables de entorno
 DB_SECRET_ARN = os.environ['DB_SECRET_ARN']
 DB_CLUSTER_ARN = os.environ['DB_CLUSTER_ARN']
 DATABASE_NAME = os.environ['DATABASE_NAME']
 
+# Configuración del modo backfill (sobrescribible desde el evento)
+BACKFILL_MAX_WORKERS = int(os.environ.get('BACKFILL_MAX_WORKERS', '8'))
+BACKFILL_PAGE_SIZE = int(os.environ.get('BACKFILL_PAGE_SIZE', '200'))
+EMBEDDING_WRITE_BATCH_SIZE = int(os.environ.get('EMBEDDING_WRITE_BATCH_SIZE', '25'))
+BEDROCK_MAX_RETRIES = int(os.environ.get('BEDROCK_MAX_RETRIES', '5'))
+
+# Columnas de informe para generar embeddings; NULL se reemplaza en SQL
+# por '' (o 0) para que las filas de db.query ya tengan la forma final
+INFORME_COLUMNS = """
+            im.id,
+            im.trabajador_id,
+            COALESCE(im.tipo_examen, '') AS tipo_examen,
+            COALESCE(im.fecha_examen::text, '') AS fecha_examen,
+            COALESCE(im.presion_arterial, '') AS presion_arterial,
+            COALESCE(im.peso, 0)::float8 AS peso,
+            COALESCE(im.altura, 0)::float8 AS altura,
+            COALESCE(im.vision, '') AS vision,
+            COALESCE(im.audiometria, '') AS audiometria,
+            COALESCE(im.observaciones, '') AS observaciones,
+            im.nivel_riesgo,
+            im.justificacion_riesgo,
+            im.resumen_ejecutivo,
+            COALESCE(t.nombre, '') AS trabajador_nombre,
+            COALESCE(t.documento, '') AS trabajador_documento"""
+
+# Margen de seguridad antes del timeout de la Lambda para cortar el backfill
+BACKFILL_TIME_MARGIN_MS = 30000
+
+# UPSERT de un embedding: requiere el índice único uq_embedding_informe
+UPSERT_EMBEDDING_SQL = """
+    INSERT INTO informes_embeddings (informe_id, embedding)
+    VALUES (:informe_id, :embedding::vector)
+    ON CONFLICT (informe_id) DO UPDATE
+    SET embedding = EXCLUDED.embedding,
+        fecha_generacion = CURRENT_TIMESTAMP
+"""
+
 
 def handler(event, context):
     """
     Lambda para generar embeddings de informes médicos usando Amazon Titan Embeddings.
     Lee informes de Aurora, genera embeddings y los guarda en la tabla informes_embeddings.
     
-    Puede ser invocada de dos formas:
+    Puede ser invocada de tres formas:
     1. Sin parámetros: procesa todos los informes sin embeddings
     2. Con informe_id: procesa solo ese informe específico
+    3. Con mode='backfill': procesa en paralelo todos los informes sin embeddings,
+       reanudable con 'cursor' (último informe_id procesado)
     """
     try:
         print(f"Event received: {json.dumps(event)}")
         
+        if event.get('mode') == 'backfill':
+            response_body = run_backfill(event, context)
+            return {
+                'statusCode': 200,
+                'body': json.dumps(response_body)
+            }
+        
         # Determinar qué informes procesar
         informe_id = event.get('informe_id')
         
@@ -107,23 +159,8 @@ def get_informes_without_embeddings():
     Returns:
         list: Lista de informes sin embeddings
     """
-    sql = """
-        SELECT 
-            im.id,
-            im.trabajador_id,
-            im.tipo_examen,
-            im.fecha_examen,
-            im.presion_arterial,
-            im.peso,
-            im.altura,
-            im.vision,
-            im.audiometria,
-            im.observaciones,
-            im.nivel_riesgo,
-            im.justificacion_riesgo,
-            im.resumen_ejecutivo,
-            t.nombre as trabajador_nombre,
-            t.documento as trabajador_documento
+    sql = f"""
+        SELECT {INFORME_COLUMNS}
         FROM informes_medicos im
         JOIN trabajadores t ON im.trabajador_id = t.id
         LEFT JOIN informes_embeddings ie ON im.id = ie.informe_id
@@ -132,8 +169,7 @@ def get_informes_without_embeddings():
         LIMIT 100
     """
     
-    result = execute_sql(sql)
-    return parse_informes(result)
+    return execute_sql(sql)
 
 
 def get_informe_by_id(informe_id):
@@ -146,90 +182,16 @@ def get_informe_by_id(informe_id):
     Returns:
         list: Lista con un solo informe
     """
-    sql = """
-        SELECT 
-            im.id,
-            im.trabajador_id,
-            im.tipo_examen,
-            im.fecha_examen,
-            im.presion_arterial,
-            im.peso,
-            im.altura,
-            im.vision,
-            im.audiometria,
-            im.observaciones,
-            im.nivel_riesgo,
-            im.justificacion_riesgo,
-            im.resumen_ejecutivo,
-            t.nombre as trabajador_nombre,
-            t.documento as trabajador_documento
+    sql = f"""
+        SELECT {INFORME_COLUMNS}
         FROM informes_medicos im
         JOIN trabajadores t ON im.trabajador_id = t.id
         WHERE im.id = :informe_id
     """
     
-    result = execute_sql(sql, [
+    return execute_sql(sql, [
         {'name': 'informe_id', 'value': {'longValue': int(informe_id)}}
     ])
-    
-    return parse_informes(result)
-
-
-def parse_informes(result):
-    """
-    Parsea los resultados de la consulta SQL a una lista de diccionarios.
-    
-    Args:
-        result: Resultado de execute_sql
-    
-    Returns:
-        list: Lista de informes como diccionarios
-    """
-    informes = []
-    records = result.get('records', [])
-    
-    print(f"Parsing {len(records)} records from database")
-    
-    if not records:
-        print("No records found in database result")
-        return informes
-    
-    for idx, record in enumerate(records):
-        try:
-            informe = {
-                'id': record[0].get('longValue'),
-                'trabajador_id': record[1].get('longValue'),
-                'tipo_examen': record[2].get('stringValue', ''),
-                'fecha_examen': record[3].get('stringValue', ''),
-                'presion_arterial': record[4].get('stringValue', ''),
-                'peso': record[5].get('doubleValue', 0),
-                'altura': record[6].get('doubleValue', 0),
-                'vision': record[7].get('stringValue', ''),
-                'audiometria': record[8].get('stringValue', ''),
-                'observaciones': record[9].get('stringValue', ''),
-                'nivel_riesgo': record[10].get('stringValue') if not record[10].get('isNull') else None,
-                'justificacion_riesgo': record[11].get('stringValue') if not record[11].get('isNull') else None,
-                'resumen_ejecutivo': record[12].get('stringValue') if not record[12].get('isNull') else None,
-                'trabajador_nombre': record[13].get('stringValue', ''),
-                'trabajador_documento': record[14].get('stringValue', '')
-            }
-            
-            # Validar que el informe tiene ID
-            if not informe['id']:
-                print(f"Warning: Record {idx} has no ID, skipping")
-                continue
-                
-            informes.append(informe)
-            print(f"✓ Parsed informe {informe['id']}: {informe['trabajador_nombre']}")
-            
-        except Exception as e:
-            print(f"Error parsing record {idx}: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            continue
-    
-    print(f"Successfully parsed {len(informes)} informes")
-    return informes
 
 
 def process_informe(informe):
@@ -373,6 +335,8 @@ def generate_embedding(text):
 def save_embedding(informe_id, embedding):
     """
     Guarda el embedding en la tabla informes_embeddings.
+    Usa un único INSERT ... ON CONFLICT (informe_id) DO UPDATE, por lo que
+    es un solo round trip y es seguro ante escritores concurrentes.
     
     Args:
         informe_id: ID del informe
@@ -381,52 +345,18 @@ def save_embedding(informe_id, embedding):
     try:
         print(f"Converting embedding to pgvector format (vector length: {len(embedding)})")
         
-        # Convertir embedding a formato pgvector (string)
-        embedding_str = '[' + ','.join(map(str, embedding)) + ']'
+        # Convertir embedding a formato pgvector (string con precisión fija;
+        # embedding_half lo deriva el trigger de la migración halfvec)
+        embedding_str = encode_vector(embedding)
         
         print(f"Embedding string length: {len(embedding_str)} chars")
+        print(f"Upserting embedding for informe {informe_id}")
         
-        # Verificar si ya existe un embedding para este informe
-        print(f"Checking if embedding already exists for informe {informe_id}")
-        check_sql = "SELECT id FROM informes_embeddings WHERE informe_id = :informe_id"
-        result = execute_sql(check_sql, [
-            {'name': 'informe_id', 'value': {'longValue': informe_id}}
+        execute_sql(UPSERT_EMBEDDING_SQL, [
+            {'name': 'informe_id', 'value': {'longValue': int(informe_id)}},
+            {'name': 'embedding', 'value': {'stringValue': embedding_str}}
         ])
         
-        if result.get('records'):
-            # Actualizar embedding existente
-            sql = """
-                UPDATE informes_embeddings
-                SET embedding = :embedding::vector,
-                    fecha_generacion = CURRENT_TIMESTAMP
-                WHERE informe_id = :informe_id
-            """
-            print(f"Updating existing embedding for informe {informe_id}")
-        else:
-            # Insertar nuevo embedding (fecha_generacion usa DEFAULT)
-            sql = """
-                INSERT INTO informes_embeddings (informe_id, embedding)
-                VALUES (:informe_id, :embedding::vector)
-            """
-            print(f"Inserting new embedding for informe {informe_id}")
-        
-        print(f"Executing SQL to save embedding...")
-        
-        # Para RDS Data API, usar CURRENT_TIMESTAMP en lugar de pasar el valor
-        # Esto evita problemas de conversión de tipos
-        if result.get('records'):
-            # UPDATE - no necesitamos fecha_generacion ya que se actualiza automáticamente
-            execute_sql(sql, [
-                {'name': 'informe_id', 'value': {'longValue': informe_id}},
-                {'name': 'embedding', 'value': {'stringValue': embedding_str}}
-            ])
-        else:
-            # INSERT - usar DEFAULT para fecha_generacion
-            execute_sql(sql, [
-                {'name': 'informe_id', 'value': {'longValue': informe_id}},
-                {'name': 'embedding', 'value': {'stringValue': embedding_str}}
-            ])
-        
         print(f"✓ Successfully saved embedding for informe {informe_id}")
         
     except Exception as e:
@@ -436,8 +366,200 @@ def save_embedding(informe_id, embedding):
         raise
 
 
+def save_embeddings_batch(items, batch_size=None):
+    """
+    Guarda varios embeddings con db.execute_batch (batch_execute_statement) usando
+    el mismo UPSERT que save_embedding: un round trip por lote en lugar de
+    dos por vector.
+    
+    Args:
+        items: Lista de tuplas (informe_id, embedding)
+        batch_size: Vectores por llamada a la Data API (default: EMBEDDING_WRITE_BATCH_SIZE)
+    """
+    if not items:
+        return
+    
+    batch_size = int(batch_size or EMBEDDING_WRITE_BATCH_SIZE)
+    
+    for start in range(0, len(items), batch_size):
+        chunk = items[start:start + batch_size]
+        parameter_sets = [
+            [
+                {'name': 'informe_id', 'value': {'longValue': int(informe_id)}},
+                {'name': 'embedding', 'value': {'stringValue': encode_vector(embedding)}}
+            ]
+            for informe_id, embedding in chunk
+        ]
+        execute_batch_sql(UPSERT_EMBEDDING_SQL, parameter_sets)
+        print(f"✓ Saved batch of {len(chunk)} embeddings")
+
+
+# ========================================
+# Modo Backfill (concurrente)
+# ========================================
+
+def run_backfill(event, context=None):
+    """
+    Genera embeddings para todos los informes sin embedding usando un pool
+    acotado de invocaciones a Titan y escrituras UPSERT en lotes.
+    
+    El recorrido es por informe_id ascendente, por lo que se puede reanudar
+    pasando el 'next_cursor' de la respuesta anterior como 'cursor'. Si hubo
+    informes fallidos, next_cursor queda antes del menor de ellos (la página
+    solo trae informes sin embedding, así que los ya guardados no se repiten)
+    y sus IDs se retornan en 'failed_ids'. Si falla una escritura, el backfill
+    se detiene y retorna el avance parcial con el cursor de la página en curso.
+    
+    Args:
+        event: Evento con parámetros opcionales: cursor, max_workers,
+               page_size, write_batch_size, max_informes
+        context: Contexto de Lambda (para respetar el tiempo restante)
+    
+    Returns:
+        dict: Resumen del backfill con cursor de reanudación y throughput
+    """
+    cursor = int(event.get('cursor', 0))
+    max_workers = int(event.get('max_workers', BACKFILL_MAX_WORKERS))
+    page_size = int(event.get('page_size', BACKFILL_PAGE_SIZE))
+    write_batch_size = int(event.get('write_batch_size', EMBEDDING_WRITE_BATCH_SIZE))
+    max_informes = event.get('max_informes')
+    
+    print(f"[BACKFILL] Starting from cursor={cursor} (workers={max_workers}, "
+          f"page_size={page_size}, write_batch_size={write_batch_size})")
+    
+    start_time = time.time()
+    processed_count = 0
+    errors = []
+    write_error = None
+    completed = False
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            if max_informes is not None and processed_count + len(errors) >= int(max_informes):
+                break
+            
+            if context and context.get_remaining_time_in_millis() < BACKFILL_TIME_MARGIN_MS:
+                print("[BACKFILL] Approaching Lambda timeout, stopping early")
+                break
+            
+            informes = get_informes_without_embeddings_page(cursor, page_size)
+            if not informes:
+                completed = True
+                break
+            
+            # Generar embeddings en paralelo
+            futures = {
+                executor.submit(generate_embedding_with_retry, create_text_for_embedding(inf)): inf
+                for inf in informes
+            }
+            
+            buffer = []
+            try:
+                for future in as_completed(futures):
+                    informe = futures[future]
+                    try:
+                        buffer.append((informe['id'], future.result()))
+                    except Exception as e:
+                        print(f"ERROR generating embedding for informe {informe['id']}: {str(e)}")
+                        errors.append({'informe_id': informe['id'], 'error': str(e)})
+                    
+                    if len(buffer) >= write_batch_size:
+                        save_embeddings_batch(buffer, write_batch_size)
+                        processed_count += len(buffer)
+                        buffer = []
+                
+                if buffer:
+                    save_embeddings_batch(buffer, write_batch_size)
+                    processed_count += len(buffer)
+            except Exception as e:
+                # No avanzar el cursor sobre una página con escrituras pendientes
+                print(f"ERROR saving embeddings, stopping backfill at cursor={cursor}: {str(e)}")
+                write_error = str(e)
+                for future in futures:
+                    future.cancel()
+                break
+            
+            # La página completa fue procesada: avanzar el cursor
+            cursor = max(inf['id'] for inf in informes)
+            print(f"[BACKFILL] Page done, cursor={cursor}, processed={processed_count}")
+    
+    elapsed = time.time() - start_time
+    throughput = processed_count / elapsed if elapsed > 0 else 0.0
+    
+    print(f"[BACKFILL] Processed {processed_count} informes in {elapsed:.2f}s "
+          f"({throughput:.2f} informes/s)")
+    
+    # Reanudar desde el menor informe fallido para reintentarlo
+    failed_ids = sorted({e['informe_id'] for e in errors})
+    if failed_ids:
+        cursor = min(cursor, failed_ids[0] - 1)
+    
+    result = {
+        'message': f'Backfill processed {processed_count} informes',
+        'processed': processed_count,
+        'failed': len(errors),
+        'completed': completed and not errors,
+        'next_cursor': cursor,
+        'elapsed_seconds': round(elapsed, 2),
+        'informes_por_segundo': round(throughput, 2)
+    }
+    
+    if errors:
+        result['errors'] = errors
+        result['failed_ids'] = failed_ids
+    
+    if write_error:
+        result['write_error'] = write_error
+    
+    return result
+
+
+def get_informes_without_embeddings_page(cursor, limit):
+    """
+    Obtiene una página de informes sin embeddings con id mayor al cursor.
+    
+    Args:
+        cursor: Último informe_id procesado (0 para empezar desde el inicio)
+        limit: Tamaño de la página
+    
+    Returns:
+        list: Lista de informes ordenados por id ascendente
+    """
+    sql = f"""
+        SELECT {INFORME_COLUMNS}
+        FROM informes_medicos im
+        JOIN trabajadores t ON im.trabajador_id = t.id
+        LEFT JOIN informes_embeddings ie ON im.id = ie.informe_id
+        WHERE ie.id IS NULL
+          AND im.id > :cursor
+        ORDER BY im.id ASC
+        LIMIT :limit
+    """
+    
+    return execute_sql(sql, [
+        {'name': 'cursor', 'value': {'longValue': int(cursor)}},
+        {'name': 'limit', 'value': {'longValue': int(limit)}}
+    ])
+
+
+def generate_embedding_with_retry(text, max_retries=None):
+    """
+    Genera un embedding reintentando con backoff exponencial y jitter
+    cuando Bedrock responde con throttling o errores transitorios.
+    
+    Args:
+        text: Texto para generar embedding
+        max_retries: Número máximo de reintentos (default: BEDROCK_MAX_RETRIES)
+    
+    Returns:
+        list: Vector de embedding (1024 dimensiones)
+    """
+    max_retries = BEDROCK_MAX_RETRIES if max_retries is None else max_retries
+    return call_with_backoff(lambda: generate_embedding(text), BEDROCK_RETRYABLE_ERROR_CODES, max_retries)
+
+
 def execute_sql(sql, parameters=None):
-    """Ejecuta una consulta SQL usando RDS Data API."""
+    """Ejecuta una consulta SQL con db (Data API o conexión directa) y retorna las filas como diccionarios."""
     try:
         # Log de la query (truncar si es muy larga)
         sql_preview = sql[:200] + '...' if len(sql) > 200 else sql
@@ -453,23 +575,32 @@ def execute_sql(sql, parameters=None):
                     params_preview.append(f"{p['name']}={p['value']}")
             print(f"Parameters: {', '.join(params_preview)}")
         
-        params = {
-            'secretArn': DB_SECRET_ARN,
-            'resourceArn': DB_CLUSTER_ARN,
-            'database': DATABASE_NAME,
-            'sql': sql
-        }
+        rows = db.query(sql, parameters, db_secret_arn=DB_SECRET_ARN,
+                        db_cluster_arn=DB_CLUSTER_ARN, database_name=DATABASE_NAME)
         
-        if parameters:
-            params['parameters'] = parameters
+        print(f"✓ SQL executed successfully ({len(rows)} rows)")
+        return rows
         
-        response = rds_data.execute_statement(**params)
+    except Exception as e:
+        print(f"ERROR executing SQL: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise
+
+
+def execute_batch_sql(sql, parameter_sets):
+    """Ejecuta una sentencia con varios sets de parámetros (un solo round trip con la Data API)."""
+    try:
+        sql_preview = sql[:200] + '...' if len(sql) > 200 else sql
+        print(f"Executing batch SQL ({len(parameter_sets)} parameter sets): {sql_preview}")
+        
+        db.execute_batch(sql, parameter_sets, db_secret_arn=DB_SECRET_ARN,
+                         db_cluster_arn=DB_CLUSTER_ARN, database_name=DATABASE_NAME)
         
-        print(f"✓ SQL executed successfully")
-        return response
+        print(f"✓ Batch SQL executed successfully")
         
     except Exception as e:
-        print(f"ERROR executing SQL: {str(e)}")
+        print(f"ERROR executing batch SQL: {str(e)}")
         import traceback
         traceback.print_exc()
         raise
@@ -9,16 +9,21 @@ import boto3
 import logging
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+# Lambda Layer compartido (lambda/shared)
+import db
+import prompt_templates
+import worker_history
+from retry import BEDROCK_RETRYABLE_ERROR_CODES, RateLimiter, call_with_backoff
+
 # Configurar logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # Clientes AWS
-rds_data = boto3.client('rds-data')
 bedrock_runtime = boto3.client('bedrock-runtime', region_name='us-east-2')
-s3_client = boto3.client('s3')
 
 # Variables de entorno
 DB_CLUSTER_ARN = os.environ['DB_CLUSTER_ARN']
@@ -29,6 +34,36 @@ PROMPTS_BUCKET = os.environ['PROMPTS_BUCKET']
 # Modelo de Bedrock
 BEDROCK_MODEL_ID = 'us.amazon.nova-pro-v1:0'
 
+# Template de prompt y sus placeholders
+PROMPT_KEY = 'prompts/summary.txt'
+PROMPT_PLACEHOLDERS = ('informes_anteriores', 'datos_informe', 'nivel_riesgo')
+
+# Modo batch: informes por página, llamadas concurrentes y por segundo a Bedrock
+BATCH_PAGE_SIZE = int(os.environ.get('BATCH_PAGE_SIZE', '50'))
+BATCH_MAX_CONCURRENCY = int(os.environ.get('BATCH_MAX_CONCURRENCY', '4'))
+BEDROCK_MAX_RPS = float(os.environ.get('BEDROCK_MAX_RPS', '2'))
+BEDROCK_MAX_RETRIES = int(os.environ.get('BEDROCK_MAX_RETRIES', '5'))
+# Segundos que se reservan antes del timeout de la Lambda para no empezar otra página
+BATCH_SAFETY_SECONDS = float(os.environ.get('BATCH_SAFETY_SECONDS', '30'))
+
+# Columnas del informe a resumir (modo individual y batch)
+INFORME_COLUMNS = """
+        i.id,
+        i.trabajador_id,
+        t.nombre as trabajador_nombre,
+        t.documento as trabajador_documento,
+        i.tipo_examen,
+        i.fecha_examen,
+        i.presion_arterial,
+        i.peso,
+        i.altura,
+        i.vision,
+        i.audiometria,
+        i.observaciones,
+        i.nivel_riesgo,
+        i.justificacion_riesgo,
+        c.nombre as contratista_nombre"""
+
 
 # ========================================
 # Excepciones personalizadas
@@ -52,6 +87,16 @@ class InformeNotClassifiedError(SummaryError):
 class BedrockInvocationError(SummaryError):
     """Error al invocar Bedrock"""
     http_status = 502
+    
+    def __init__(self, message, error_code=None):
+        super().__init__(message)
+        # Código de error de Bedrock (p.ej. ThrottlingException) si lo hay
+        self.error_code = error_code
+
+
+class BadRequestError(SummaryError):
+    """Parámetros inválidos en la solicitud"""
+    http_status = 400
 
 
 class DatabaseError(SummaryError):
@@ -65,84 +110,26 @@ class DatabaseError(SummaryError):
 
 def execute_query(sql, parameters=None):
     """
-    Ejecuta una query SQL usando RDS Data API.
+    Ejecuta una query SQL con el backend configurado en DB_BACKEND
+    (RDS Data API o conexión directa con pool) y retorna las filas como diccionarios.
     """
     try:
-        params = {
-            'resourceArn': DB_CLUSTER_ARN,
-            'secretArn': DB_SECRET_ARN,
-            'database': DATABASE_NAME,
-            'sql': sql,
-            'includeResultMetadata': True
-        }
-        
-        if parameters:
-            params['parameters'] = parameters
-        
-        response = rds_data.execute_statement(**params)
-        return response
+        return db.query(sql, parameters, db_secret_arn=DB_SECRET_ARN,
+                        db_cluster_arn=DB_CLUSTER_ARN, database_name=DATABASE_NAME)
         
     except Exception as e:
         logger.error(f"Error ejecutando query: {str(e)}")
         raise DatabaseError(f"Error en base de datos: {str(e)}")
 
 
-def format_records(response):
-    """
-    Formatea los registros de RDS Data API a diccionarios Python.
-    """
-    if 'records' not in response or not response['records']:
-        return []
-    
-    columns = [col['name'] for col in response['columnMetadata']]
-    
-    formatted_records = []
-    for record in response['records']:
-        formatted_record = {}
-        for i, col_name in enumerate(columns):
-            value = record[i]
-            
-            if 'stringValue' in value:
-                formatted_record[col_name] = value['stringValue']
-            elif 'longValue' in value:
-                formatted_record[col_name] = value['longValue']
-            elif 'doubleValue' in value:
-                formatted_record[col_name] = value['doubleValue']
-            elif 'booleanValue' in value:
-                formatted_record[col_name] = value['booleanValue']
-            elif 'isNull' in value and value['isNull']:
-                formatted_record[col_name] = None
-            else:
-                formatted_record[col_name] = None
-        
-        formatted_records.append(formatted_record)
-    
-    return formatted_records
-
-
 def get_informe(informe_id):
     """
     Obtiene los datos completos de un informe médico.
     """
     logger.info(f"Obteniendo informe {informe_id}...")
     
-    sql = """
-    SELECT 
-        i.id,
-        i.trabajador_id,
-        t.nombre as trabajador_nombre,
-        t.documento as trabajador_documento,
-        i.tipo_examen,
-        i.fecha_examen,
-        i.presion_arterial,
-        i.peso,
-        i.altura,
-        i.vision,
-        i.audiometria,
-        i.observaciones,
-        i.nivel_riesgo,
-        i.justificacion_riesgo,
-        c.nombre as contratista_nombre
+    sql = f"""
+    SELECT {INFORME_COLUMNS}
     FROM informes_medicos i
     JOIN trabajadores t ON i.trabajador_id = t.id
     JOIN contratistas c ON i.contratista_id = c.id
@@ -153,8 +140,7 @@ def get_informe(informe_id):
         {'name': 'informe_id', 'value': {'longValue': informe_id}}
     ]
     
-    response = execute_query(sql, parameters)
-    informes = format_records(response)
+    informes = execute_query(sql, parameters)
     
     if not informes:
         raise InformeNotFoundError(f"Informe con ID {informe_id} no existe")
@@ -167,7 +153,16 @@ def get_informe(informe_id):
             f"El informe {informe_id} debe ser clasificado antes de generar el resumen"
         )
     
-    # Calcular IMC si hay peso y altura
+    informe = add_imc(informe)
+    
+    logger.info(f"✓ Informe {informe_id} obtenido (Riesgo: {informe['nivel_riesgo']})")
+    return informe
+
+
+def add_imc(informe):
+    """
+    Calcula el IMC si hay peso y altura y lo agrega al informe.
+    """
     if informe.get('peso') and informe.get('altura'):
         peso = float(informe['peso'])
         altura = float(informe['altura'])
@@ -175,7 +170,6 @@ def get_informe(informe_id):
     else:
         informe['imc'] = None
     
-    logger.info(f"✓ Informe {informe_id} obtenido (Riesgo: {informe['nivel_riesgo']})")
     return informe
 
 
@@ -187,39 +181,32 @@ def get_worker_history(trabajador_id, current_informe_id, limit=3):
     """
     RAG Step 1: RETRIEVE
     Busca informes anteriores del mismo trabajador usando SQL simple.
+    El resultado se cachea en la Lambda caliente (ver lambda/shared/worker_history.py).
     
     Día 1 del workshop: Búsqueda SQL por trabajador_id
     Día 2 del workshop: Búsqueda vectorial con embeddings
-    """
-    logger.info(f"[RAG] Buscando historial del trabajador {trabajador_id}...")
     
-    sql = """
-    SELECT 
-        fecha_examen,
-        presion_arterial,
-        peso,
-        altura,
-        nivel_riesgo,
-        observaciones
-    FROM informes_medicos
-    WHERE trabajador_id = :trabajador_id
-    AND id != :current_informe_id
-    AND nivel_riesgo IS NOT NULL
-    ORDER BY fecha_examen DESC
-    LIMIT :limit;
+    Returns:
+        tuple: (historial, True si vino del cache)
     """
+    logger.info(f"[RAG] Buscando historial del trabajador {trabajador_id}...")
     
-    parameters = [
-        {'name': 'trabajador_id', 'value': {'longValue': trabajador_id}},
-        {'name': 'current_informe_id', 'value': {'longValue': current_informe_id}},
-        {'name': 'limit', 'value': {'longValue': limit}}
-    ]
-    
-    response = execute_query(sql, parameters)
-    history = format_records(response)
+    try:
+        history, cache_hit = worker_history.get_worker_history(
+            trabajador_id,
+            current_informe_id,
+            limit,
+            db_secret_arn=DB_SECRET_ARN,
+            db_cluster_arn=DB_CLUSTER_ARN,
+            database_name=DATABASE_NAME
+        )
+    except Exception as e:
+        logger.error(f"Error ejecutando query: {str(e)}")
+        raise DatabaseError(f"Error en base de datos: {str(e)}")
     
-    logger.info(f"[RAG] ✓ {len(history)} informes anteriores encontrados")
-    return history
+    origen = "cache" if cache_hit else "Aurora"
+    logger.info(f"[RAG] ✓ {len(history)} informes anteriores encontrados ({origen})")
+    return history, cache_hit
 
 
 def format_historical_context(history):
@@ -283,33 +270,27 @@ def format_historical_context(history):
 
 def load_prompt_template():
     """
-    Carga el template de prompt desde S3.
+    Carga el template de prompt desde S3. Se cachea en la Lambda caliente y se
+    revalida con ETag (ver lambda/shared/prompt_templates.py).
     """
-    logger.info(f"Cargando prompt template desde S3: {PROMPTS_BUCKET}/summary.txt")
-    
     try:
-        response = s3_client.get_object(
-            Bucket=PROMPTS_BUCKET,
-            Key='prompts/summary.txt'
-        )
-        
-        template = response['Body'].read().decode('utf-8')
-        logger.info("✓ Prompt template cargado")
-        return template
+        return prompt_templates.get_template(PROMPTS_BUCKET, PROMPT_KEY, PROMPT_PLACEHOLDERS)
         
     except Exception as e:
         logger.error(f"Error cargando prompt template: {str(e)}")
         raise DatabaseError(f"Error cargando prompt: {str(e)}")
 
 
-def build_summary_prompt(informe, historical_context):
+def build_summary_prompt(informe, historical_context, template=None):
     """
     Construye el prompt completo para generación de resumen con RAG.
+    El modo batch pasa el template ya cargado para toda la página.
     """
     logger.info("Construyendo prompt de resumen...")
     
     # Cargar template
-    template = load_prompt_template()
+    if template is None:
+        template = load_prompt_template()
     
     # Formatear datos del informe actual
     datos_informe = f"""
@@ -330,10 +311,12 @@ OBSERVACIONES:
 {informe.get('observaciones', 'Sin observaciones')}
 """
     
-    # Reemplazar placeholders
-    prompt = template.replace('{informes_anteriores}', historical_context)
-    prompt = prompt.replace('{datos_informe}', datos_informe)
-    prompt = prompt.replace('{nivel_riesgo}', informe.get('nivel_riesgo', 'N/A'))
+    # Reemplazar placeholders (un solo join sobre los segmentos del template)
+    prompt = template.render(
+        informes_anteriores=historical_context,
+        datos_informe=datos_informe,
+        nivel_riesgo=informe.get('nivel_riesgo', 'N/A')
+    )
     
     logger.info("✓ Prompt construido")
     return prompt
@@ -398,7 +381,23 @@ def invoke_bedrock(prompt, temperature=0.5, max_tokens=300):
         
     except Exception as e:
         logger.error(f"Error invocando Bedrock: {str(e)}")
-        raise BedrockInvocationError(f"Error en Bedrock: {str(e)}")
+        error_code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+        raise BedrockInvocationError(f"Error en Bedrock: {str(e)}", error_code)
+
+
+# Compartido por todas las invocaciones de la Lambda caliente
+bedrock_limiter = RateLimiter(BEDROCK_MAX_RPS)
+
+
+def invoke_bedrock_with_retry(prompt, temperature=0.5, max_tokens=300, max_retries=None):
+    """
+    Invoca Bedrock respetando BEDROCK_MAX_RPS y reintentando con backoff
+    exponencial y jitter cuando responde con throttling o errores transitorios
+    (modo batch). Cada reintento también espera su turno en el limitador.
+    """
+    max_retries = BEDROCK_MAX_RETRIES if max_retries is None else max_retries
+    return call_with_backoff(lambda: invoke_bedrock(prompt, temperature, max_tokens),
+                             BEDROCK_RETRYABLE_ERROR_CODES, max_retries, limiter=bedrock_limiter)
 
 
 def count_words(text):
@@ -435,6 +434,250 @@ def save_summary(informe_id, resumen):
     logger.info("✓ Resumen guardado en Aurora")
 
 
+# ========================================
+# Modo Batch
+# ========================================
+
+def get_informes_pendientes(after_id=0, limit=BATCH_PAGE_SIZE):
+    """
+    Obtiene una página de informes clasificados sin resumen, por id ascendente.
+    
+    La página siguiente se pide con el último id de la anterior (keyset), así
+    los informes que fallaron y siguen sin resumen no se vuelven a leer en la
+    misma invocación. Usa el índice parcial idx_informes_pendientes_resumen.
+    
+    Args:
+        after_id: Último id de la página anterior (0 para la primera)
+        limit: Informes por página
+    
+    Returns:
+        list: Informes con IMC calculado
+    """
+    sql = f"""
+    SELECT {INFORME_COLUMNS}
+    FROM informes_medicos i
+    JOIN trabajadores t ON i.trabajador_id = t.id
+    JOIN contratistas c ON i.contratista_id = c.id
+    WHERE i.nivel_riesgo IS NOT NULL
+      AND i.resumen_ejecutivo IS NULL
+      AND i.id > :after_id
+    ORDER BY i.id
+    LIMIT :limit;
+    """
+    
+    parameters = [
+        {'name': 'after_id', 'value': {'longValue': after_id}},
+        {'name': 'limit', 'value': {'longValue': limit}}
+    ]
+    
+    return [add_imc(informe) for informe in execute_query(sql, parameters)]
+
+
+def get_worker_histories_batch(informes, limit=3):
+    """
+    RAG Step 1 (batch): recupera el historial de todos los informes de la
+    página en una sola query (ver worker_history.get_worker_histories).
+    
+    Returns:
+        dict: {informe_id: [historial del más reciente al más antiguo]}
+    """
+    if not informes:
+        return {}
+    
+    try:
+        return worker_history.get_worker_histories(
+            [informe['id'] for informe in informes],
+            limit,
+            db_secret_arn=DB_SECRET_ARN,
+            db_cluster_arn=DB_CLUSTER_ARN,
+            database_name=DATABASE_NAME
+        )
+    except Exception as e:
+        logger.error(f"Error ejecutando query: {str(e)}")
+        raise DatabaseError(f"Error en base de datos: {str(e)}")
+
+
+def save_summaries_batch(summaries):
+    """
+    Guarda todos los resúmenes de la página con un solo UPDATE.
+    
+    Solo escribe en informes que siguen sin resumen: si otro proceso generó
+    uno mientras corría la página, se conserva ese.
+    
+    Args:
+        summaries: Lista de {'informe_id', 'resumen'}
+    
+    Returns:
+        int: Filas actualizadas
+    """
+    if not summaries:
+        return 0
+    
+    sql = """
+    UPDATE informes_medicos i
+    SET resumen_ejecutivo = r.resumen
+    FROM json_to_recordset(CAST(:resumenes AS json))
+        AS r(informe_id int, resumen text)
+    WHERE i.id = r.informe_id
+      AND i.resumen_ejecutivo IS NULL;
+    """
+    
+    parameters = [
+        {'name': 'resumenes', 'value': {'stringValue': json.dumps(summaries)}}
+    ]
+    
+    try:
+        updated = db.execute(sql, parameters, db_secret_arn=DB_SECRET_ARN,
+                             db_cluster_arn=DB_CLUSTER_ARN, database_name=DATABASE_NAME)
+    except Exception as e:
+        logger.error(f"Error ejecutando query: {str(e)}")
+        raise DatabaseError(f"Error en base de datos: {str(e)}")
+    
+    logger.info(f"✓ {updated} resúmenes guardados en Aurora")
+    return updated
+
+
+def summarize_prepared(informe, history, template, temperature, max_tokens):
+    """
+    Genera el resumen de un informe ya cargado (prompt + Bedrock), sin acceso
+    a la base de datos. Se ejecuta en el pool de hilos del modo batch.
+    """
+    historical_context = format_historical_context(history)
+    prompt = build_summary_prompt(informe, historical_context, template)
+    resumen, bedrock_time = invoke_bedrock_with_retry(prompt, temperature, max_tokens)
+    
+    return {
+        'informe_id': informe['id'],
+        'resumen': resumen,
+        'palabras': count_words(resumen),
+        'incluye_contexto_historico': len(history) > 0
+    }, bedrock_time
+
+
+def generate_summaries_batch(limit=None, page_size=None, temperature=0.5, max_tokens=300,
+                             remaining_ms=None):
+    """
+    Genera los resúmenes de los informes clasificados sin resumen, por páginas.
+    Por cada página:
+    1. Una query para los informes pendientes (keyset por id)
+    2. Una query para el historial de todos los informes de la página
+    3. Llamadas a Bedrock en un pool de BATCH_MAX_CONCURRENCY hilos, limitadas
+       a BEDROCK_MAX_RPS por segundo y con backoff ante throttling
+    4. Un solo UPDATE con todos los resúmenes de la página
+    
+    Args:
+        limit: Máximo de informes en la invocación (default: todos los pendientes)
+        page_size: Informes por página (default: BATCH_PAGE_SIZE)
+        temperature: Temperatura de Bedrock
+        max_tokens: Tokens máximos por resumen
+        remaining_ms: Tiempo restante de la Lambda; no se empieza una página si
+                      no alcanza antes de BATCH_SAFETY_SECONDS del timeout
+    
+    Returns:
+        dict: Resultados, errores por informe, tiempos por etapa y si quedan pendientes
+    """
+    start_time = time.perf_counter()
+    timings = {'informes_ms': 0.0, 'historial_ms': 0.0, 'bedrock_ms': 0.0, 'guardar_ms': 0.0}
+    
+    try:
+        limit = int(limit) if limit is not None else None
+        page_size = int(page_size or BATCH_PAGE_SIZE)
+    except (TypeError, ValueError):
+        raise BadRequestError("limit y page_size deben ser enteros")
+    if (limit is not None and limit < 1) or page_size < 1:
+        raise BadRequestError("limit y page_size deben ser mayores que 0")
+    
+    deadline = None
+    if remaining_ms is not None:
+        deadline = time.perf_counter() + remaining_ms / 1000 - BATCH_SAFETY_SECONDS
+    
+    logger.info(f"=== Iniciando resúmenes batch (páginas de {page_size}, límite {limit or 'sin límite'}) ===")
+    
+    results = []
+    errors = []
+    total = 0
+    pages = 0
+    after_id = 0
+    bedrock_total = 0.0
+    slowest_page = 0.0
+    hay_mas = True
+    
+    with ThreadPoolExecutor(max_workers=max(1, BATCH_MAX_CONCURRENCY)) as executor:
+        while limit is None or total < limit:
+            page_start = time.perf_counter()
+            if deadline is not None and page_start + slowest_page > deadline:
+                logger.warning("Tiempo restante insuficiente para otra página, se detiene el batch")
+                break
+            
+            # 1. Página de informes pendientes
+            page_limit = page_size if limit is None else min(page_size, limit - total)
+            informes = get_informes_pendientes(after_id, page_limit)
+            timings['informes_ms'] += (time.perf_counter() - page_start) * 1000
+            if not informes:
+                hay_mas = False
+                break
+            
+            pages += 1
+            total += len(informes)
+            after_id = informes[-1]['id']
+            
+            # 2. RAG: historial de todos los informes de la página
+            stage = time.perf_counter()
+            histories = get_worker_histories_batch(informes, limit=3)
+            timings['historial_ms'] += (time.perf_counter() - stage) * 1000
+            
+            # 3. Bedrock en paralelo con el template cargado una vez por página
+            stage = time.perf_counter()
+            template = load_prompt_template()
+            futures = {
+                executor.submit(summarize_prepared, informe, histories.get(informe['id'], []),
+                                template, temperature, max_tokens): informe['id']
+                for informe in informes
+            }
+            summaries = []
+            for future, informe_id in futures.items():
+                try:
+                    result, bedrock_time = future.result()
+                    summaries.append(result)
+                    bedrock_total += bedrock_time
+                except Exception as e:
+                    logger.error(f"Error generando resumen del informe {informe_id}: {str(e)}")
+                    errors.append({'informe_id': informe_id, 'error': type(e).__name__, 'message': str(e)})
+            timings['bedrock_ms'] += (time.perf_counter() - stage) * 1000
+            
+            # 4. Un solo UPDATE para la página
+            stage = time.perf_counter()
+            save_summaries_batch([
+                {'informe_id': r['informe_id'], 'resumen': r['resumen']} for r in summaries
+            ])
+            timings['guardar_ms'] += (time.perf_counter() - stage) * 1000
+            
+            results.extend({k: v for k, v in r.items() if k != 'resumen'} for r in summaries)
+            slowest_page = max(slowest_page, time.perf_counter() - page_start)
+            logger.info(f"Página {pages}: {len(summaries)}/{len(informes)} resúmenes (hasta id {after_id})")
+            
+            if len(informes) < page_limit:
+                hay_mas = False
+                break
+    
+    timings = {k: round(v, 1) for k, v in timings.items()}
+    timings['bedrock_promedio_ms'] = round(bedrock_total * 1000 / len(results), 1) if results else 0
+    timings['total_ms'] = round((time.perf_counter() - start_time) * 1000, 1)
+    
+    logger.info(f"=== Batch completado: {len(results)} resúmenes, {len(errors)} errores, {timings} ===")
+    
+    return {
+        'modo': 'batch',
+        'procesados': len(results),
+        'total': total,
+        'paginas': pages,
+        'hay_mas': hay_mas,
+        'resultados': results,
+        'errores': errors,
+        'tiempos': timings
+    }
+
+
 # ========================================
 # Handler Principal
 # ========================================
@@ -451,7 +694,7 @@ def generate_summary(informe_id, temperature=0.5, max_tokens=300):
     informe = get_informe(informe_id)
     
     # 2. RAG: Recuperar historial del trabajador
-    history = get_worker_history(
+    history, history_cache_hit = get_worker_history(
         informe['trabajador_id'],
         informe_id,
         limit=3
@@ -482,7 +725,8 @@ def generate_summary(informe_id, temperature=0.5, max_tokens=300):
         'resumen': resumen,
         'palabras': word_count,
         'tiempo_procesamiento': f"{total_time:.2f}s",
-        'incluye_contexto_historico': len(history) > 0
+        'incluye_contexto_historico': len(history) > 0,
+        'cache_historial': {'hit': history_cache_hit, **worker_history.cache_stats()}
     }
 
 
@@ -499,6 +743,36 @@ def handler(event, context):
         else:
             body = event
         
+        temperature = body.get('temperature', 0.5)
+        max_tokens = body.get('maxTokens', 300)
+        
+        # Modo batch: todos los informes clasificados sin resumen, por páginas
+        if body.get('pendientes'):
+            # API Gateway corta la integración a los 29 s y remaining_ms es el
+            # timeout de la Lambda (5 min): el batch solo se invoca directamente
+            if event.get('requestContext'):
+                raise BadRequestError(
+                    "El modo batch (pendientes) no está disponible por API Gateway: "
+                    "invocar la Lambda directamente o en forma asíncrona"
+                )
+            result = generate_summaries_batch(
+                limit=body.get('limit'),
+                page_size=body.get('page_size'),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                remaining_ms=context.get_remaining_time_in_millis() if context else None
+            )
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Allow-Methods': 'POST, OPTIONS',
+                    'Access-Control-Allow-Headers': 'Content-Type'
+                },
+                'body': json.dumps(result)
+            }
+        
         # Extraer parámetros
         informe_id = body.get('informe_id')
         if not informe_id:
@@ -511,9 +785,6 @@ def handler(event, context):
                 })
             }
         
-        temperature = body.get('temperature', 0.5)
-        max_tokens = body.get('maxTokens', 300)
-        
         # Generar resumen
         result = generate_summary(informe_id, temperature, max_tokens)
         
@@ -529,6 +800,17 @@ def handler(event, context):
             'body': json.dumps(result)
         }
         
+    except BadRequestError as e:
+        logger.error(f"Solicitud inválida: {str(e)}")
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({
+                'error': 'BadRequest',
+                'message': str(e)
+            })
+        }
+        
     except InformeNotFoundError as e:
         logger.error(f"Informe no encontrado: {str(e)}")
         return {
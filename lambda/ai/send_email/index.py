@@ -3,10 +3,12 @@ import os
 import boto3
 from datetime import datetime
 
+# Lambda Layer compartido (lambda/shared)
+import db
+
 # Clientes AWS
 bedrock_runtime = boto3.client('bedrock-runtime')
 ses_client = boto3.client('ses')
-rds_data = boto3.client('rds-data')
 
 # Variables de entorno
 DB_SECRET_ARN = os.environ['DB_SECRET_ARN']
@@ -14,12 +16,24 @@ DB_CLUSTER_ARN = os.environ['DB_CLUSTER_ARN']
 DATABASE_NAME = os.environ['DATABASE_NAME']
 VERIFIED_EMAIL = os.environ['VERIFIED_EMAIL']
 
+# Columnas del informe para el email (alias = claves del diccionario)
+EMAIL_COLUMNS = """im.id, im.trabajador_id,
+               COALESCE(im.nivel_riesgo, '') AS nivel_riesgo,
+               COALESCE(im.resumen_ejecutivo, '') AS resumen_ejecutivo,
+               COALESCE(t.nombre, '') AS trabajador_nombre,
+               COALESCE(c.email, '') AS contratista_email,
+               COALESCE(c.nombre, '') AS contratista_nombre"""
+
 
 def handler(event, context):
     """Lambda para enviar emails personalizados según nivel de riesgo."""
     try:
         informe_id = event.get('informe_id')
-        informes = [get_informe_by_id(informe_id)] if informe_id else get_informes_pending_email()
+        if informe_id:
+            informe = get_informe_by_id(informe_id)
+            informes = [informe] if informe else []
+        else:
+            informes = get_informes_pending_email()
         
         if not informes:
             return {'statusCode': 200, 'body': json.dumps({'message': 'No informes to process'})}
@@ -40,45 +54,28 @@ def handler(event, context):
 
 def get_informes_pending_email():
     """Obtiene informes con resumen pero sin email enviado."""
-    sql = """
-        SELECT im.id, im.trabajador_id, im.nivel_riesgo, im.resumen_ejecutivo,
-               t.nombre, c.email, c.nombre as contratista_nombre
+    sql = f"""
+        SELECT {EMAIL_COLUMNS}
         FROM informes_medicos im
         JOIN trabajadores t ON im.trabajador_id = t.id
         JOIN contratistas c ON im.contratista_id = c.id
         WHERE im.resumen_ejecutivo IS NOT NULL AND im.email_enviado = false
         LIMIT 50
     """
-    return parse_informes(execute_sql(sql))
+    return execute_sql(sql)
 
 
 def get_informe_by_id(informe_id):
-    """Obtiene un informe específico."""
-    sql = """
-        SELECT im.id, im.trabajador_id, im.nivel_riesgo, im.resumen_ejecutivo,
-               t.nombre, c.email, c.nombre as contratista_nombre
+    """Obtiene un informe específico (None si no existe)."""
+    sql = f"""
+        SELECT {EMAIL_COLUMNS}
         FROM informes_medicos im
         JOIN trabajadores t ON im.trabajador_id = t.id
         JOIN contratistas c ON im.contratista_id = c.id
         WHERE im.id = :informe_id
     """
-    return parse_informes(execute_sql(sql, [{'name': 'informe_id', 'value': {'longValue': int(informe_id)}}]))
-
-
-def parse_informes(result):
-    """Parsea resultados SQL."""
-    informes = []
-    for record in result.get('records', []):
-        informes.append({
-            'id': record[0].get('longValue'),
-            'trabajador_id': record[1].get('longValue'),
-            'nivel_riesgo': record[2].get('stringValue', ''),
-            'resumen_ejecutivo': record[3].get('stringValue', ''),
-            'trabajador_nombre': record[4].get('stringValue', ''),
-            'contratista_email': record[5].get('stringValue', ''),
-            'contratista_nombre': record[6].get('stringValue', '')
-        })
-    return informes
+    rows = execute_sql(sql, [{'name': 'informe_id', 'value': {'longValue': int(informe_id)}}])
+    return rows[0] if rows else None
 
 
 def process_informe(informe):
@@ -212,13 +209,6 @@ def register_email_sent(informe_id, email, content):
 
 
 def execute_sql(sql, parameters=None):
-    """Ejecuta SQL usando RDS Data API."""
-    params = {
-        'secretArn': DB_SECRET_ARN,
-        'resourceArn': DB_CLUSTER_ARN,
-        'database': DATABASE_NAME,
-        'sql': sql
-    }
-    if parameters:
-        params['parameters'] = parameters
-    return rds_data.execute_statement(**params)
+    """Ejecuta SQL con db (Data API o conexión directa) y retorna las filas como diccionarios."""
+    return db.query(sql, parameters, db_secret_arn=DB_SECRET_ARN,
+                    db_cluster_arn=DB_CLUSTER_ARN, database_name=DATABASE_NAME)
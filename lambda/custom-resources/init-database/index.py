@@ -110,13 +110,35 @@ def create_tables():
         justificacion_riesgo TEXT,
         resumen_ejecutivo TEXT,
         pdf_s3_path VARCHAR(500),
+        pdf_status VARCHAR(20),
         origen VARCHAR(20) DEFAULT 'LEGACY',
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY (trabajador_id) REFERENCES trabajadores(id),
         FOREIGN KEY (contratista_id) REFERENCES contratistas(id)
     );
     """
     execute_sql(sql_informes)
+    # Tablas creadas antes de la generación asíncrona de PDFs
+    execute_sql("ALTER TABLE informes_medicos ADD COLUMN IF NOT EXISTS pdf_status VARCHAR(20);")
+    # updated_at se copia en informes_completos
+    execute_sql("ALTER TABLE informes_medicos ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;")
+    execute_sql("""
+    CREATE OR REPLACE FUNCTION update_updated_at_column()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        NEW.updated_at = CURRENT_TIMESTAMP;
+        RETURN NEW;
+    END;
+    $$ language 'plpgsql';
+    """)
+    execute_sql("DROP TRIGGER IF EXISTS update_informes_updated_at ON informes_medicos;")
+    execute_sql("""
+    CREATE TRIGGER update_informes_updated_at
+        BEFORE UPDATE ON informes_medicos
+        FOR EACH ROW
+        EXECUTE FUNCTION update_updated_at_column();
+    """)
     logger.info("✓ Tabla informes_medicos creada")
     
     # Tabla: informes_embeddings (para RAG con pgvector - Día 2)
@@ -132,12 +154,391 @@ def create_tables():
     execute_sql(sql_embeddings)
     logger.info("✓ Tabla informes_embeddings creada (preparación para Día 2)")
     
+    # Tabla: extracciones_pdf (cache de extract_pdf por hash de contenido)
+    sql_extracciones = """
+    CREATE TABLE IF NOT EXISTS extracciones_pdf (
+        content_hash VARCHAR(64) PRIMARY KEY, -- 'md5:<hex>' del contenido del PDF
+        pdf_s3_path VARCHAR(500) NOT NULL,
+        estado VARCHAR(20) NOT NULL DEFAULT 'PROCESANDO', -- 'PROCESANDO', 'COMPLETADO', 'ERROR'
+        texto_extraido TEXT,
+        datos_estructurados JSONB,
+        informe_id INT,
+        hits INT NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        
+        FOREIGN KEY (informe_id) REFERENCES informes_medicos(id) ON DELETE SET NULL
+    );
+    """
+    execute_sql(sql_extracciones)
+    logger.info("✓ Tabla extracciones_pdf creada")
+    
+    # Tabla: estadisticas_informes (contadores del dashboard, GET /estadisticas)
+    sql_estadisticas = """
+    CREATE TABLE IF NOT EXISTS estadisticas_informes (
+        dimension VARCHAR(20) NOT NULL, -- 'total', 'contratista', 'dia'
+        clave VARCHAR(20) NOT NULL, -- '', contratista_id, YYYY-MM-DD
+        total INT NOT NULL DEFAULT 0,
+        riesgo_bajo INT NOT NULL DEFAULT 0,
+        riesgo_medio INT NOT NULL DEFAULT 0,
+        riesgo_alto INT NOT NULL DEFAULT 0,
+        con_resumen INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (dimension, clave)
+    );
+    """
+    execute_sql(sql_estadisticas)
+    
+    # Los triggers suman las filas nuevas y restan las viejas de cada sentencia
+    execute_sql("""
+    CREATE OR REPLACE FUNCTION actualizar_estadisticas_informes()
+    RETURNS TRIGGER AS $$
+    DECLARE
+        filas TEXT;
+    BEGIN
+        -- Solo existen las tablas de transición de la operación
+        filas := CASE TG_OP
+            WHEN 'INSERT' THEN 'SELECT 1 AS signo, * FROM filas_nuevas'
+            WHEN 'DELETE' THEN 'SELECT -1 AS signo, * FROM filas_viejas'
+            ELSE 'SELECT 1 AS signo, * FROM filas_nuevas UNION ALL SELECT -1, * FROM filas_viejas'
+        END;
+        
+        EXECUTE format($sql$
+            INSERT INTO estadisticas_informes AS e
+                (dimension, clave, total, riesgo_bajo, riesgo_medio, riesgo_alto, con_resumen)
+            SELECT
+                k.dimension,
+                k.clave,
+                SUM(d.signo),
+                COALESCE(SUM(d.signo) FILTER (WHERE d.nivel_riesgo = 'BAJO'), 0),
+                COALESCE(SUM(d.signo) FILTER (WHERE d.nivel_riesgo = 'MEDIO'), 0),
+                COALESCE(SUM(d.signo) FILTER (WHERE d.nivel_riesgo = 'ALTO'), 0),
+                COALESCE(SUM(d.signo) FILTER (WHERE d.resumen_ejecutivo IS NOT NULL), 0)
+            FROM (%s) d
+            CROSS JOIN LATERAL (VALUES
+                ('total', ''),
+                ('contratista', d.contratista_id::TEXT),
+                ('dia', d.fecha_examen::DATE::TEXT)
+            ) AS k(dimension, clave)
+            GROUP BY k.dimension, k.clave
+            -- Un UPDATE que no cambia los contadores (pdf_status, embeddings) no escribe
+            HAVING SUM(d.signo) <> 0
+                OR SUM(d.signo) FILTER (WHERE d.nivel_riesgo = 'BAJO') <> 0
+                OR SUM(d.signo) FILTER (WHERE d.nivel_riesgo = 'MEDIO') <> 0
+                OR SUM(d.signo) FILTER (WHERE d.nivel_riesgo = 'ALTO') <> 0
+                OR SUM(d.signo) FILTER (WHERE d.resumen_ejecutivo IS NOT NULL) <> 0
+            -- Mismo orden de bloqueo en todas las sentencias (sin deadlocks)
+            ORDER BY k.dimension, k.clave
+            ON CONFLICT (dimension, clave) DO UPDATE SET
+                total = e.total + EXCLUDED.total,
+                riesgo_bajo = e.riesgo_bajo + EXCLUDED.riesgo_bajo,
+                riesgo_medio = e.riesgo_medio + EXCLUDED.riesgo_medio,
+                riesgo_alto = e.riesgo_alto + EXCLUDED.riesgo_alto,
+                con_resumen = e.con_resumen + EXCLUDED.con_resumen
+        $sql$, filas);
+        
+        RETURN NULL;
+    END;
+    $$ language 'plpgsql';
+    """)
+    
+    # Contar los informes existentes (solo la primera vez) y crear los
+    # triggers en una sola transacción, con las escrituras bloqueadas
+    execute_sql("""
+    DO $do$
+    BEGIN
+        LOCK TABLE informes_medicos IN SHARE ROW EXCLUSIVE MODE;
+        
+        IF NOT EXISTS (SELECT 1 FROM estadisticas_informes WHERE dimension = 'total') THEN
+            INSERT INTO estadisticas_informes
+                (dimension, clave, total, riesgo_bajo, riesgo_medio, riesgo_alto, con_resumen)
+            SELECT
+                k.dimension,
+                k.clave,
+                COUNT(*),
+                COUNT(*) FILTER (WHERE i.nivel_riesgo = 'BAJO'),
+                COUNT(*) FILTER (WHERE i.nivel_riesgo = 'MEDIO'),
+                COUNT(*) FILTER (WHERE i.nivel_riesgo = 'ALTO'),
+                COUNT(*) FILTER (WHERE i.resumen_ejecutivo IS NOT NULL)
+            FROM informes_medicos i
+            CROSS JOIN LATERAL (VALUES
+                ('total', ''),
+                ('contratista', i.contratista_id::TEXT),
+                ('dia', i.fecha_examen::DATE::TEXT)
+            ) AS k(dimension, clave)
+            GROUP BY k.dimension, k.clave;
+            
+            INSERT INTO estadisticas_informes (dimension, clave)
+            VALUES ('total', '')
+            ON CONFLICT (dimension, clave) DO NOTHING;
+        END IF;
+        
+        DROP TRIGGER IF EXISTS estadisticas_informes_insert ON informes_medicos;
+        CREATE TRIGGER estadisticas_informes_insert
+            AFTER INSERT ON informes_medicos
+            REFERENCING NEW TABLE AS filas_nuevas
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION actualizar_estadisticas_informes();
+        
+        DROP TRIGGER IF EXISTS estadisticas_informes_update ON informes_medicos;
+        CREATE TRIGGER estadisticas_informes_update
+            AFTER UPDATE ON informes_medicos
+            REFERENCING OLD TABLE AS filas_viejas NEW TABLE AS filas_nuevas
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION actualizar_estadisticas_informes();
+        
+        DROP TRIGGER IF EXISTS estadisticas_informes_delete ON informes_medicos;
+        CREATE TRIGGER estadisticas_informes_delete
+            AFTER DELETE ON informes_medicos
+            REFERENCING OLD TABLE AS filas_viejas
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION actualizar_estadisticas_informes();
+    END
+    $do$;
+    """)
+    logger.info("✓ Tabla estadisticas_informes creada")
+    
+    # Tabla: informes_completos (modelo de lectura de GET /informes y
+    # GET /informes/{id}, mantenido por triggers). Mismas columnas que
+    # informes_medicos en estas tablas, más los datos del trabajador y del
+    # contratista; un DELETE en informes_medicos borra la fila por la FK.
+    sql_completos = """
+    CREATE TABLE IF NOT EXISTS informes_completos (
+        id INT PRIMARY KEY REFERENCES informes_medicos(id) ON DELETE CASCADE,
+        trabajador_id INT NOT NULL,
+        contratista_id INT NOT NULL,
+        tipo_examen VARCHAR(100) NOT NULL,
+        fecha_examen TIMESTAMP NOT NULL,
+        presion_arterial VARCHAR(20),
+        peso DECIMAL(5,2),
+        altura DECIMAL(3,2),
+        vision VARCHAR(200),
+        audiometria VARCHAR(200),
+        observaciones TEXT,
+        pdf_s3_path VARCHAR(500),
+        origen VARCHAR(20),
+        nivel_riesgo VARCHAR(10),
+        justificacion_riesgo TEXT,
+        resumen_ejecutivo TEXT,
+        trabajador_nombre VARCHAR(200),
+        trabajador_documento VARCHAR(50),
+        contratista_nombre VARCHAR(200),
+        contratista_email VARCHAR(200),
+        created_at TIMESTAMP,
+        updated_at TIMESTAMP
+    );
+    """
+    execute_sql(sql_completos)
+    
+    # Un upsert por sentencia con las filas nuevas; FOR SHARE espera a que
+    # termine un cambio concurrente del trabajador o contratista. Los triggers
+    # se llaman copiar_* para dispararse antes que estadisticas_informes_*
+    # (orden alfabético): trabajadores y contratistas se bloquean antes que
+    # las filas de estadisticas_informes, como en register_exam
+    execute_sql("""
+    CREATE OR REPLACE FUNCTION refrescar_informes_completos()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        -- Primero todos los trabajadores y luego todos los contratistas, por id:
+        -- el mismo orden que register_exam (trabajador, contratista, informe)
+        PERFORM 1 FROM trabajadores
+        WHERE id IN (SELECT trabajador_id FROM filas_nuevas)
+        ORDER BY id FOR SHARE;
+        PERFORM 1 FROM contratistas
+        WHERE id IN (SELECT contratista_id FROM filas_nuevas)
+        ORDER BY id FOR SHARE;
+        
+        INSERT INTO informes_completos AS ic
+        SELECT
+            im.id, im.trabajador_id, im.contratista_id, im.tipo_examen, im.fecha_examen,
+            im.presion_arterial, im.peso, im.altura, im.vision, im.audiometria,
+            im.observaciones, im.pdf_s3_path, im.origen, im.nivel_riesgo,
+            im.justificacion_riesgo, im.resumen_ejecutivo,
+            t.nombre, t.documento, c.nombre, c.email,
+            im.created_at, im.updated_at
+        FROM filas_nuevas im
+        JOIN trabajadores t ON im.trabajador_id = t.id
+        JOIN contratistas c ON im.contratista_id = c.id
+        ORDER BY im.id
+        FOR SHARE OF t, c
+        ON CONFLICT (id) DO UPDATE SET
+            (trabajador_id, contratista_id, tipo_examen, fecha_examen, presion_arterial,
+             peso, altura, vision, audiometria, observaciones, pdf_s3_path, origen,
+             nivel_riesgo, justificacion_riesgo, resumen_ejecutivo, trabajador_nombre,
+             trabajador_documento, contratista_nombre, contratista_email, created_at, updated_at)
+            = (EXCLUDED.trabajador_id, EXCLUDED.contratista_id, EXCLUDED.tipo_examen,
+               EXCLUDED.fecha_examen, EXCLUDED.presion_arterial, EXCLUDED.peso, EXCLUDED.altura,
+               EXCLUDED.vision, EXCLUDED.audiometria, EXCLUDED.observaciones,
+               EXCLUDED.pdf_s3_path, EXCLUDED.origen, EXCLUDED.nivel_riesgo,
+               EXCLUDED.justificacion_riesgo, EXCLUDED.resumen_ejecutivo,
+               EXCLUDED.trabajador_nombre, EXCLUDED.trabajador_documento,
+               EXCLUDED.contratista_nombre, EXCLUDED.contratista_email,
+               EXCLUDED.created_at, EXCLUDED.updated_at);
+        
+        RETURN NULL;
+    END;
+    $$ language 'plpgsql';
+    """)
+    execute_sql("""
+    CREATE OR REPLACE FUNCTION refrescar_informes_completos_trabajador()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        UPDATE informes_completos ic
+        SET (trabajador_nombre, trabajador_documento) = (t.nombre, t.documento)
+        FROM filas_nuevas t
+        WHERE ic.trabajador_id = t.id
+          AND (ic.trabajador_nombre, ic.trabajador_documento) IS DISTINCT FROM (t.nombre, t.documento);
+        
+        RETURN NULL;
+    END;
+    $$ language 'plpgsql';
+    """)
+    execute_sql("""
+    CREATE OR REPLACE FUNCTION refrescar_informes_completos_contratista()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        UPDATE informes_completos ic
+        SET (contratista_nombre, contratista_email) = (c.nombre, c.email)
+        FROM filas_nuevas c
+        WHERE ic.contratista_id = c.id
+          AND (ic.contratista_nombre, ic.contratista_email) IS DISTINCT FROM (c.nombre, c.email);
+        
+        RETURN NULL;
+    END;
+    $$ language 'plpgsql';
+    """)
+    
+    # Copiar los informes existentes (solo la primera vez) y crear los
+    # triggers en una sola transacción, con las escrituras bloqueadas
+    execute_sql("""
+    DO $do$
+    BEGIN
+        LOCK TABLE informes_medicos, trabajadores, contratistas IN SHARE ROW EXCLUSIVE MODE;
+        
+        IF NOT EXISTS (SELECT 1 FROM informes_completos) THEN
+            INSERT INTO informes_completos
+            SELECT
+                im.id, im.trabajador_id, im.contratista_id, im.tipo_examen, im.fecha_examen,
+                im.presion_arterial, im.peso, im.altura, im.vision, im.audiometria,
+                im.observaciones, im.pdf_s3_path, im.origen, im.nivel_riesgo,
+                im.justificacion_riesgo, im.resumen_ejecutivo,
+                t.nombre, t.documento, c.nombre, c.email,
+                im.created_at, im.updated_at
+            FROM informes_medicos im
+            JOIN trabajadores t ON im.trabajador_id = t.id
+            JOIN contratistas c ON im.contratista_id = c.id;
+        END IF;
+        
+        DROP TRIGGER IF EXISTS informes_completos_insert ON informes_medicos;
+        DROP TRIGGER IF EXISTS copiar_informes_completos_insert ON informes_medicos;
+        CREATE TRIGGER copiar_informes_completos_insert
+            AFTER INSERT ON informes_medicos
+            REFERENCING NEW TABLE AS filas_nuevas
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION refrescar_informes_completos();
+        
+        DROP TRIGGER IF EXISTS informes_completos_update ON informes_medicos;
+        DROP TRIGGER IF EXISTS copiar_informes_completos_update ON informes_medicos;
+        CREATE TRIGGER copiar_informes_completos_update
+            AFTER UPDATE ON informes_medicos
+            REFERENCING NEW TABLE AS filas_nuevas
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION refrescar_informes_completos();
+        
+        DROP TRIGGER IF EXISTS informes_completos_trabajador ON trabajadores;
+        CREATE TRIGGER informes_completos_trabajador
+            AFTER UPDATE ON trabajadores
+            REFERENCING NEW TABLE AS filas_nuevas
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION refrescar_informes_completos_trabajador();
+        
+        DROP TRIGGER IF EXISTS informes_completos_contratista ON contratistas;
+        CREATE TRIGGER informes_completos_contratista
+            AFTER UPDATE ON contratistas
+            REFERENCING NEW TABLE AS filas_nuevas
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION refrescar_informes_completos_contratista();
+    END
+    $do$;
+    """)
+    logger.info("✓ Tabla informes_completos creada")
+    
+    # Tabla: version_lista_informes (token del ETag y la cache de GET /informes).
+    # Triggers diferidos la incrementan al COMMIT de cada transacción que
+    # escribe informes_medicos, trabajadores o contratistas: la fila se bloquea
+    # siempre al final, después de los demás bloqueos, y no forma deadlocks
+    execute_sql("""
+    CREATE TABLE IF NOT EXISTS version_lista_informes (
+        id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+        version BIGINT NOT NULL DEFAULT 0
+    );
+    """)
+    execute_sql("""
+    INSERT INTO version_lista_informes (id, version) VALUES (1, 0)
+    ON CONFLICT (id) DO NOTHING;
+    """)
+    execute_sql("""
+    CREATE OR REPLACE FUNCTION incrementar_version_lista_informes()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        -- Un incremento por transacción aunque el trigger dispare por fila
+        IF current_setting('lista_informes.version_xact', true)
+                IS DISTINCT FROM txid_current()::text THEN
+            PERFORM set_config('lista_informes.version_xact', txid_current()::text, true);
+            UPDATE version_lista_informes SET version = version + 1 WHERE id = 1;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ language 'plpgsql';
+    """)
+    for table, events in (('informes_medicos', 'INSERT OR UPDATE OR DELETE'),
+                          ('trabajadores', 'UPDATE OR DELETE'),
+                          ('contratistas', 'UPDATE OR DELETE')):
+        execute_sql(f"DROP TRIGGER IF EXISTS version_lista_informes ON {table};")
+        execute_sql(f"""
+        CREATE CONSTRAINT TRIGGER version_lista_informes
+            AFTER {events} ON {table}
+            DEFERRABLE INITIALLY DEFERRED
+            FOR EACH ROW
+            EXECUTE FUNCTION incrementar_version_lista_informes();
+        """)
+    # TRUNCATE no admite triggers diferidos; ya toma un bloqueo exclusivo de la tabla
+    execute_sql("DROP TRIGGER IF EXISTS version_lista_informes_truncate ON informes_medicos;")
+    execute_sql("""
+    CREATE TRIGGER version_lista_informes_truncate
+        AFTER TRUNCATE ON informes_medicos
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION incrementar_version_lista_informes();
+    """)
+    logger.info("✓ Tabla version_lista_informes creada")
+    
+    # Eliminar embeddings duplicados antes de crear el índice único
+    execute_sql("""
+    DELETE FROM informes_embeddings ie
+    USING informes_embeddings newer
+    WHERE ie.informe_id = newer.informe_id
+      AND ie.id < newer.id;
+    """)
+    
     # Crear índices
     indices = [
         "CREATE INDEX IF NOT EXISTS idx_trabajador ON informes_medicos(trabajador_id);",
-        "CREATE INDEX IF NOT EXISTS idx_nivel_riesgo ON informes_medicos(nivel_riesgo);",
-        "CREATE INDEX IF NOT EXISTS idx_fecha_examen ON informes_medicos(fecha_examen DESC);",
-        "CREATE INDEX IF NOT EXISTS idx_embedding_informe ON informes_embeddings(informe_id);"
+        "CREATE INDEX IF NOT EXISTS idx_informes_fecha_id ON informes_medicos(fecha_examen DESC, id DESC);",
+        "CREATE INDEX IF NOT EXISTS idx_informes_nivel_riesgo_fecha ON informes_medicos(nivel_riesgo, fecha_examen DESC, id DESC);",
+        "CREATE INDEX IF NOT EXISTS idx_informes_contratista_fecha ON informes_medicos(contratista_id, fecha_examen DESC, id DESC);",
+        "CREATE INDEX IF NOT EXISTS idx_informes_origen_fecha ON informes_medicos(origen, fecha_examen DESC, id DESC);",
+        "DROP INDEX IF EXISTS idx_nivel_riesgo;",
+        "DROP INDEX IF EXISTS idx_fecha_examen;",
+        "DROP INDEX IF EXISTS idx_informes_updated_at;",
+        "CREATE INDEX IF NOT EXISTS idx_informes_trabajador_fecha ON informes_medicos(trabajador_id, fecha_examen DESC);",
+        "CREATE INDEX IF NOT EXISTS idx_informes_pendientes_resumen ON informes_medicos(id) WHERE nivel_riesgo IS NOT NULL AND resumen_ejecutivo IS NULL;",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_embedding_informe ON informes_embeddings(informe_id);",
+        "CREATE INDEX IF NOT EXISTS idx_extracciones_informe ON extracciones_pdf(informe_id);",
+        # informes_completos: keyset de list_informes y propagación por trabajador
+        "CREATE INDEX IF NOT EXISTS idx_completos_fecha_id ON informes_completos(fecha_examen DESC, id DESC);",
+        "CREATE INDEX IF NOT EXISTS idx_completos_nivel_riesgo_fecha ON informes_completos(nivel_riesgo, fecha_examen DESC, id DESC);",
+        "CREATE INDEX IF NOT EXISTS idx_completos_contratista_fecha ON informes_completos(contratista_id, fecha_examen DESC, id DESC);",
+        "CREATE INDEX IF NOT EXISTS idx_completos_origen_fecha ON informes_completos(origen, fecha_examen DESC, id DESC);",
+        "CREATE INDEX IF NOT EXISTS idx_completos_trabajador ON informes_completos(trabajador_id);"
     ]
     
     for idx_sql in indices:
@@ -1,20 +1,19 @@
 import json
+import multiprocessing
 import os
+import traceback
 import boto3
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
 from datetime import datetime
 from io import BytesIO
+from multiprocessing.connection import wait
 
-# ReportLab imports
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+# Lambda Layer compartido (lambda/shared)
+import db
 
 # Clientes AWS
 secretsmanager = boto3.client('secretsmanager')
-rds_data = boto3.client('rds-data')
 s3_client = boto3.client('s3')
 
 # Variables de entorno
@@ -23,6 +22,100 @@ DB_CLUSTER_ARN = os.environ['DB_CLUSTER_ARN']
 DATABASE_NAME = os.environ['DATABASE_NAME']
 BUCKET_NAME = os.environ['BUCKET_NAME']
 
+# Recepción de un mensaje de la cola a partir de la cual el informe queda en
+# pdf_status = 'FAILED' (igual al maxReceiveCount de la DLQ en CDK)
+PDF_MAX_RECEIVE_COUNT = int(os.environ.get('PDF_MAX_RECEIVE_COUNT', '3'))
+
+# Modo batch (batch_handler): procesos de render (default: vCPUs de la
+# Lambda), informes por página y subidas a S3 en paralelo
+PDF_BATCH_WORKERS = int(os.environ.get('PDF_BATCH_WORKERS') or os.cpu_count() or 1)
+PDF_BATCH_PAGE_SIZE = int(os.environ.get('PDF_BATCH_PAGE_SIZE', '100'))
+PDF_UPLOAD_CONCURRENCY = int(os.environ.get('PDF_UPLOAD_CONCURRENCY', '8'))
+
+# Tiempo restante de la Lambda bajo el cual el modo batch no empieza otra página
+PDF_BATCH_MIN_REMAINING_MS = 90 * 1000
+
+# Resultados de laboratorio del PDF: (columna, nombre, unidad, rango de referencia)
+LABORATORIO_CAMPOS = (
+    ('hemoglobina', 'Hemoglobina', 'g/dL', '12.0 - 16.0 g/dL'),
+    ('glucosa_basal', 'Glucosa', 'mg/dL', '70 - 100 mg/dL'),
+    ('colesterol_total', 'Colesterol Total', 'mg/dL', '< 200 mg/dL'),
+    ('trigliceridos', 'Triglicéridos', 'mg/dL', '< 150 mg/dL'),
+    ('creatinina', 'Creatinina', 'mg/dL', '0.6 - 1.2 mg/dL'),
+    ('acido_urico', 'Ácido Úrico', 'mg/dL', '2.4 - 6.0 mg/dL'),
+)
+
+# Informe con trabajador, contratista y laboratorio para el PDF, sin WHERE:
+# get_informe_from_aurora filtra por id y el modo batch por rango o filtro.
+# Los alias y COALESCE dejan cada fila con la forma final del diccionario
+# (DECIMAL se castea a float8 para obtener números en ambos backends de db).
+# El laboratorio es el último resultado del informe (LATERAL ... LIMIT 1):
+# una fila por informe, así el LIMIT del modo batch cuenta informes
+INFORME_PDF_SQL = """
+    SELECT 
+        im.id, im.tipo_examen, im.fecha_examen::text AS fecha_examen,
+        COALESCE(im.presion_arterial, '') AS presion_arterial,
+        COALESCE(im.frecuencia_cardiaca, 0) AS frecuencia_cardiaca,
+        COALESCE(im.frecuencia_respiratoria, 0) AS frecuencia_respiratoria,
+        COALESCE(im.temperatura, 0)::float8 AS temperatura,
+        COALESCE(im.saturacion_oxigeno, 0) AS saturacion_oxigeno,
+        COALESCE(im.peso, 0)::float8 AS peso,
+        COALESCE(im.altura, 0)::float8 AS altura,
+        COALESCE(im.imc, 0)::float8 AS imc,
+        COALESCE(im.perimetro_abdominal, 0) AS perimetro_abdominal,
+        COALESCE(im.vision, '') AS vision,
+        COALESCE(im.audiometria, '') AS audiometria,
+        COALESCE(im.antecedentes_medicos, '') AS antecedentes_medicos,
+        COALESCE(im.examen_fisico::text, '[]') AS examen_fisico,
+        COALESCE(im.examenes_adicionales::text, '[]') AS examenes_adicionales,
+        COALESCE(im.observaciones, '') AS observaciones,
+        im.pdf_s3_path, COALESCE(im.pdf_status, '') AS pdf_status,
+        t.nombre as trabajador_nombre, t.documento as trabajador_documento,
+        COALESCE(t.fecha_nacimiento::text, '') AS trabajador_fecha_nacimiento,
+        COALESCE(t.edad, 0) AS trabajador_edad,
+        COALESCE(t.cargo, '') AS trabajador_cargo,
+        c.nombre as contratista_nombre,
+        COALESCE(c.ruc, '') AS contratista_ruc,
+        c.email as contratista_email,
+        lr.hemoglobina::float8 AS hemoglobina, lr.glucosa_basal,
+        lr.colesterol_total, lr.trigliceridos,
+        lr.creatinina::float8 AS creatinina, lr.acido_urico::float8 AS acido_urico
+    FROM informes_medicos im
+    JOIN trabajadores t ON im.trabajador_id = t.id
+    JOIN contratistas c ON im.contratista_id = c.id
+    LEFT JOIN LATERAL (
+        SELECT hemoglobina, glucosa_basal, colesterol_total, trigliceridos, creatinina, acido_urico
+        FROM laboratorio_resultados
+        WHERE informe_id = im.id
+        ORDER BY id DESC
+        LIMIT 1
+    ) lr ON TRUE
+    """
+
+UPDATE_PDF_READY_SQL = """
+    UPDATE informes_medicos
+    SET pdf_s3_path = :pdf_url, pdf_status = 'READY'
+    WHERE id = :informe_id
+"""
+
+# Sin pisar un PDF ya generado
+MARK_PDF_FAILED_SQL = """
+    UPDATE informes_medicos
+    SET pdf_status = 'FAILED'
+    WHERE id = :informe_id
+      AND pdf_status IS DISTINCT FROM 'READY'
+"""
+
+# ReportLab se importa en el primer render (_load_reportlab): el worker no lo
+# necesita para omitir informes ya READY y el cold start no lo paga
+colors = inch = letter = TA_CENTER = TA_LEFT = None
+getSampleStyleSheet = ParagraphStyle = None
+SimpleDocTemplate = Table = TableStyle = Paragraph = Spacer = None
+
+# Estilos y flowables estáticos del PDF, construidos en el primer render
+# (_pdf_templates) y reutilizados en las invocaciones en caliente
+_templates = None
+
 
 def handler(event, context):
     """
@@ -53,14 +146,8 @@ def handler(event, context):
                 'body': json.dumps({'error': 'Informe not found'})
             }
         
-        # Generar PDF
-        pdf_buffer = generar_pdf_profesional(informe_data)
-        
-        # Subir a S3
-        pdf_url = upload_to_s3(pdf_buffer, informe_id)
-        
-        # Actualizar Aurora con la ruta del PDF
-        update_pdf_path_in_aurora(informe_id, pdf_url)
+        # Generar PDF, subirlo a S3 y guardar la ruta en Aurora
+        pdf_url = generate_and_store(informe_id, informe_data)
         
         return {
             'statusCode': 200,
@@ -72,7 +159,6 @@ def handler(event, context):
         
     except Exception as e:
         print(f"Error: {str(e)}")
-        import traceback
         traceback.print_exc()
         return {
             'statusCode': 500,
@@ -83,123 +169,461 @@ def handler(event, context):
         }
 
 
-def get_informe_from_aurora(informe_id):
-    """Lee los datos completos del informe desde Aurora."""
+def queue_handler(event, context):
+    """
+    Worker de la cola de generación de PDFs (trigger SQS).
     
-    sql = """
-        SELECT 
-            im.id, im.tipo_examen, im.fecha_examen,
-            im.presion_arterial, im.frecuencia_cardiaca, im.frecuencia_respiratoria,
-            im.temperatura, im.saturacion_oxigeno, im.peso, im.altura, im.imc,
-            im.perimetro_abdominal, im.vision, im.audiometria,
-            im.antecedentes_medicos, im.examen_fisico, im.examenes_adicionales,
-            im.observaciones,
-            t.nombre as trabajador_nombre, t.documento as trabajador_documento,
-            t.fecha_nacimiento, t.edad, t.cargo,
-            c.nombre as contratista_nombre, c.ruc as contratista_ruc, c.email as contratista_email,
-            lr.hemoglobina, lr.glucosa_basal, lr.colesterol_total, lr.trigliceridos,
-            lr.creatinina, lr.acido_urico
-        FROM informes_medicos im
-        JOIN trabajadores t ON im.trabajador_id = t.id
-        JOIN contratistas c ON im.contratista_id = c.id
-        LEFT JOIN laboratorio_resultados lr ON im.id = lr.informe_id
-        WHERE im.id = :informe_id
+    register_exam encola {"informe_id": N} y responde con pdf_status PENDING
+    sin esperar el render. Cada mensaje genera el PDF, lo sube a S3 y deja el
+    informe en READY. Los mensajes que fallan se reportan en batchItemFailures
+    para que SQS los reintente; en la recepción PDF_MAX_RECEIVE_COUNT el
+    informe queda en FAILED y el mensaje pasa a la DLQ.
     """
+    failures = []
     
-    response = rds_data.execute_statement(
-        secretArn=DB_SECRET_ARN,
-        resourceArn=DB_CLUSTER_ARN,
-        database=DATABASE_NAME,
-        sql=sql,
-        parameters=[
-            {'name': 'informe_id', 'value': {'longValue': int(informe_id)}}
-        ]
-    )
+    for record in event.get('Records', []):
+        informe_id = None
+        try:
+            informe_id = json.loads(record['body'])['informe_id']
+            process_pdf_request(informe_id)
+        except Exception as e:
+            print(f"Error generating PDF for informe {informe_id}: {str(e)}")
+            traceback.print_exc()
+            receive_count = int(record.get('attributes', {}).get('ApproximateReceiveCount', '1'))
+            if informe_id and receive_count >= PDF_MAX_RECEIVE_COUNT:
+                mark_pdf_failed(informe_id)
+            failures.append({'itemIdentifier': record['messageId']})
+    
+    print(f"Processed {len(event.get('Records', []))} PDF request(s), {len(failures)} failed")
+    return {'batchItemFailures': failures}
+
+
+def process_pdf_request(informe_id):
+    """Genera el PDF de un informe encolado; retorna la URL o None si el informe no existe."""
+    informe_data = get_informe_from_aurora(informe_id)
     
-    if not response['records']:
+    if not informe_data:
+        print(f"Informe {informe_id} not found, skipping")
         return None
     
-    record = response['records'][0]
-    
-    # Convertir el record a dict
-    data = {
-        'id': record[0]['longValue'],
-        'tipo_examen': record[1]['stringValue'],
-        'fecha_examen': record[2]['stringValue'],
-        'presion_arterial': record[3].get('stringValue', ''),
-        'frecuencia_cardiaca': record[4].get('longValue', 0),
-        'frecuencia_respiratoria': record[5].get('longValue', 0),
-        'temperatura': record[6].get('doubleValue', 0),
-        'saturacion_oxigeno': record[7].get('longValue', 0),
-        'peso': record[8].get('doubleValue', 0),
-        'altura': record[9].get('doubleValue', 0),
-        'imc': record[10].get('doubleValue', 0),
-        'perimetro_abdominal': record[11].get('longValue', 0),
-        'vision': record[12].get('stringValue', ''),
-        'audiometria': record[13].get('stringValue', ''),
-        'antecedentes_medicos': record[14].get('stringValue', ''),
-        'examen_fisico': record[15].get('stringValue', '[]'),
-        'examenes_adicionales': record[16].get('stringValue', '[]'),
-        'observaciones': record[17].get('stringValue', ''),
-        'trabajador_nombre': record[18]['stringValue'],
-        'trabajador_documento': record[19]['stringValue'],
-        'trabajador_fecha_nacimiento': record[20].get('stringValue', ''),
-        'trabajador_edad': record[21].get('longValue', 0),
-        'trabajador_cargo': record[22].get('stringValue', ''),
-        'contratista_nombre': record[23]['stringValue'],
-        'contratista_ruc': record[24].get('stringValue', ''),
-        'contratista_email': record[25]['stringValue'],
+    # Entrega repetida de SQS: el PDF ya se generó
+    if informe_data['pdf_status'] == 'READY':
+        print(f"PDF for informe {informe_id} already generated: {informe_data['pdf_s3_path']}")
+        return informe_data['pdf_s3_path']
+    
+    pdf_url = generate_and_store(informe_id, informe_data)
+    print(f"PDF for informe {informe_id} generated: {pdf_url}")
+    return pdf_url
+
+
+def generate_and_store(informe_id, informe_data):
+    """Genera el PDF, lo sube a S3 y marca el informe como READY; retorna la URL."""
+    pdf_buffer = generar_pdf_profesional(informe_data)
+    pdf_url = upload_to_s3(pdf_buffer, informe_data)
+    update_pdf_path_in_aurora(informe_id, pdf_url)
+    return pdf_url
+
+
+def batch_handler(event, context):
+    """
+    Regenera los PDFs de muchos informes en una invocación (cambio de
+    plantilla, auditoría de un contratista).
+    
+    Evento (todos los filtros son opcionales y se combinan):
+        {"desde_id": 1, "hasta_id": 5000, "contratista_id": 7, "pdf_status": "FAILED"}
+    
+    Lee los informes por páginas de PDF_BATCH_PAGE_SIZE con una sola query
+    con JOIN por página, los renderiza en PDF_BATCH_WORKERS procesos, sube los
+    PDFs a S3 en paralelo mientras se siguen renderizando y actualiza
+    pdf_s3_path de toda la página con un solo execute_batch. Si queda poco
+    tiempo de la Lambda se detiene y retorna siguiente_desde_id para
+    continuar en otra invocación.
+    """
+    workers = max(1, int(event.get('workers') or PDF_BATCH_WORKERS))
+    hasta_id = event.get('hasta_id')
+    after_id = int(event.get('desde_id') or 1) - 1
+    totals = {'generados': 0, 'fallidos': 0}
+    
+    while True:
+        informes = get_informes_page(after_id, hasta_id, event.get('contratista_id'), event.get('pdf_status'))
+        if not informes:
+            after_id = None
+            break
+        
+        stored, failed = store_batch(render_batch(informes, workers), informes)
+        totals['generados'] += len(stored)
+        totals['fallidos'] += len(failed)
+        after_id = informes[-1]['id']
+        print(f"Batch page up to informe {after_id}: {len(stored)} PDFs, {len(failed)} failed")
+        
+        if len(informes) < PDF_BATCH_PAGE_SIZE:
+            after_id = None
+            break
+        if context and context.get_remaining_time_in_millis() < PDF_BATCH_MIN_REMAINING_MS:
+            break
+    
+    return {
+        **totals,
+        'workers': workers,
+        'siguiente_desde_id': after_id + 1 if after_id is not None else None
     }
+
+
+def get_informes_page(after_id, hasta_id=None, contratista_id=None, pdf_status=None):
+    """Lee una página de informes (id > after_id, en orden de id) con una sola query."""
+    conditions = ["im.id > :after_id"]
+    params = [
+        {'name': 'after_id', 'value': {'longValue': int(after_id)}},
+        {'name': 'limit', 'value': {'longValue': PDF_BATCH_PAGE_SIZE}},
+    ]
+    
+    if hasta_id:
+        conditions.append("im.id <= :hasta_id")
+        params.append({'name': 'hasta_id', 'value': {'longValue': int(hasta_id)}})
+    if contratista_id:
+        conditions.append("im.contratista_id = :contratista_id")
+        params.append({'name': 'contratista_id', 'value': {'longValue': int(contratista_id)}})
+    if pdf_status:
+        conditions.append("im.pdf_status = :pdf_status")
+        params.append({'name': 'pdf_status', 'value': {'stringValue': pdf_status}})
+    
+    rows = db.query(
+        INFORME_PDF_SQL + f"WHERE {' AND '.join(conditions)} ORDER BY im.id LIMIT :limit",
+        params,
+        db_secret_arn=DB_SECRET_ARN,
+        db_cluster_arn=DB_CLUSTER_ARN,
+        database_name=DATABASE_NAME
+    )
+    
+    return [add_laboratorio(row) for row in rows]
+
+
+def render_batch(informes, workers):
+    """
+    Renderiza los informes y genera (informe_id, pdf_bytes, error) a medida
+    que terminan.
+    
+    Con más de un worker usa multiprocessing.Process + Pipe (en Lambda no
+    hay /dev/shm, así que Pool y ProcessPoolExecutor no funcionan). Los
+    templates se construyen antes del fork y los procesos los heredan.
+    """
+    workers = min(workers, len(informes))
+    if workers <= 1:
+        for informe in informes:
+            yield _render_one(informe)
+        return
+    
+    _pdf_templates()
+    connections, processes = [], []
+    for index in range(workers):
+        recv_conn, send_conn = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(target=_render_worker, args=(informes[index::workers], send_conn))
+        process.start()
+        send_conn.close()
+        connections.append(recv_conn)
+        processes.append(process)
+    
+    while connections:
+        for conn in wait(connections):
+            try:
+                message = conn.recv()
+            except EOFError:
+                message = None  # El proceso terminó sin avisar; sus informes quedan fallidos
+            if message is None:
+                connections.remove(conn)
+                conn.close()
+            else:
+                yield message
+    
+    for process in processes:
+        process.join()
+
+
+def _render_worker(informes, conn):
+    for informe in informes:
+        conn.send(_render_one(informe))
+    conn.send(None)
+    conn.close()
+
+
+def _render_one(informe):
+    try:
+        return informe['id'], generar_pdf_profesional(informe).getvalue(), None
+    except Exception as e:
+        return informe['id'], None, str(e)
+
+
+def store_batch(rendered, informes):
+    """
+    Sube a S3 los PDFs a medida que se renderizan (PDF_UPLOAD_CONCURRENCY
+    subidas en paralelo) y actualiza Aurora con un execute_batch para los
+    READY y otro para los FAILED.
+    
+    Returns:
+        tuple: (lista de (informe_id, pdf_url), dict informe_id -> error)
+    """
+    failed = {}
+    uploads = {}
+    by_id = {informe['id']: informe for informe in informes}
+    
+    with ThreadPoolExecutor(max_workers=PDF_UPLOAD_CONCURRENCY) as pool:
+        for informe_id, pdf_bytes, error in rendered:
+            if error:
+                failed[informe_id] = error
+            else:
+                uploads[informe_id] = pool.submit(upload_to_s3, BytesIO(pdf_bytes), by_id[informe_id])
+    
+    stored = []
+    for informe_id, future in uploads.items():
+        try:
+            stored.append((informe_id, future.result()))
+        except Exception as e:
+            failed[informe_id] = str(e)
+    
+    for informe in informes:
+        if informe['id'] not in uploads and informe['id'] not in failed:
+            failed[informe['id']] = 'render process terminated'
+    
+    for informe_id, error in failed.items():
+        print(f"Error generating PDF for informe {informe_id}: {error}")
+    
+    if stored:
+        db.execute_batch(
+            UPDATE_PDF_READY_SQL,
+            [[
+                {'name': 'pdf_url', 'value': {'stringValue': pdf_url}},
+                {'name': 'informe_id', 'value': {'longValue': int(informe_id)}}
+            ] for informe_id, pdf_url in stored],
+            db_secret_arn=DB_SECRET_ARN,
+            db_cluster_arn=DB_CLUSTER_ARN,
+            database_name=DATABASE_NAME
+        )
+    if failed:
+        db.execute_batch(
+            MARK_PDF_FAILED_SQL,
+            [[{'name': 'informe_id', 'value': {'longValue': int(informe_id)}}] for informe_id in failed],
+            db_secret_arn=DB_SECRET_ARN,
+            db_cluster_arn=DB_CLUSTER_ARN,
+            database_name=DATABASE_NAME
+        )
+    
+    return stored, failed
+
+
+def get_informe_from_aurora(informe_id):
+    """Lee los datos completos del informe desde Aurora."""
+    
+    data = db.query_one(
+        INFORME_PDF_SQL + "WHERE im.id = :informe_id",
+        [{'name': 'informe_id', 'value': {'longValue': int(informe_id)}}],
+        db_secret_arn=DB_SECRET_ARN,
+        db_cluster_arn=DB_CLUSTER_ARN,
+        database_name=DATABASE_NAME
+    )
     
-    # Agregar datos de laboratorio si existen
+    if not data:
+        return None
+    
+    return add_laboratorio(data)
+
+
+def add_laboratorio(data):
+    """Agrega la lista 'laboratorio' al informe (las columnas de laboratorio se quitan del dict)."""
     laboratorio = []
-    if record[26].get('doubleValue'):  # hemoglobina
-        laboratorio.append({
-            'nombre': 'Hemoglobina',
-            'resultado': f"{record[26]['doubleValue']} g/dL",
-            'rango': '12.0 - 16.0 g/dL'
-        })
-    if record[27].get('longValue'):  # glucosa
-        laboratorio.append({
-            'nombre': 'Glucosa',
-            'resultado': f"{record[27]['longValue']} mg/dL",
-            'rango': '70 - 100 mg/dL'
-        })
-    if record[28].get('longValue'):  # colesterol
-        laboratorio.append({
-            'nombre': 'Colesterol Total',
-            'resultado': f"{record[28]['longValue']} mg/dL",
-            'rango': '< 200 mg/dL'
-        })
-    if record[29].get('longValue'):  # trigliceridos
-        laboratorio.append({
-            'nombre': 'Triglicéridos',
-            'resultado': f"{record[29]['longValue']} mg/dL",
-            'rango': '< 150 mg/dL'
-        })
-    if record[30].get('doubleValue'):  # creatinina
-        laboratorio.append({
-            'nombre': 'Creatinina',
-            'resultado': f"{record[30]['doubleValue']} mg/dL",
-            'rango': '0.6 - 1.2 mg/dL'
-        })
-    if record[31].get('doubleValue'):  # acido_urico
-        laboratorio.append({
-            'nombre': 'Ácido Úrico',
-            'resultado': f"{record[31]['doubleValue']} mg/dL",
-            'rango': '2.4 - 6.0 mg/dL'
-        })
+    for columna, nombre, unidad, rango in LABORATORIO_CAMPOS:
+        valor = data.pop(columna)
+        if valor:
+            laboratorio.append({
+                'nombre': nombre,
+                'resultado': f"{valor} {unidad}",
+                'rango': rango
+            })
     
     data['laboratorio'] = laboratorio
     
     return data
 
 
+def _load_reportlab():
+    """Importa ReportLab en el primer render (no se paga en el cold start del worker)."""
+    global colors, inch, letter, TA_CENTER, TA_LEFT, getSampleStyleSheet, ParagraphStyle
+    global SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    if Paragraph is not None:
+        return
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER, TA_LEFT
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+
+def _pdf_templates():
+    """
+    Retorna los estilos, TableStyles y flowables estáticos del PDF.
+    
+    Se construyen una sola vez por contenedor (o por proceso del modo batch)
+    y se reutilizan en cada render: getSampleStyleSheet(), los ParagraphStyle,
+    los TableStyle, el encabezado, los títulos de sección y la firma.
+    """
+    global _templates
+    if _templates is not None:
+        return _templates
+    
+    _load_reportlab()
+    styles = getSampleStyleSheet()
+    azul = colors.HexColor('#1a5490')
+    
+    paragraph_styles = {
+        'title': ParagraphStyle(
+            'CustomTitle', parent=styles['Heading1'], fontSize=18, textColor=azul,
+            spaceAfter=30, alignment=TA_CENTER, fontName='Helvetica-Bold'
+        ),
+        'subtitle': ParagraphStyle(
+            'SectionTitle', parent=styles['Heading2'], fontSize=14, textColor=azul,
+            spaceAfter=12, fontName='Helvetica-Bold'
+        ),
+        'antecedentes': ParagraphStyle(
+            'Antecedentes', parent=styles['Normal'], fontSize=10, alignment=TA_LEFT,
+            spaceAfter=8, leading=14
+        ),
+        'observaciones': ParagraphStyle(
+            'Observaciones', parent=styles['Normal'], fontSize=10, alignment=TA_LEFT,
+            spaceAfter=12, leading=14
+        ),
+        'cell': ParagraphStyle(
+            'CellStyle', parent=styles['Normal'], fontSize=9, leading=11, alignment=TA_LEFT
+        ),
+        'cell_bold': ParagraphStyle(
+            'CellStyleBold', parent=styles['Normal'], fontSize=9, leading=11, alignment=TA_LEFT,
+            fontName='Helvetica-Bold'
+        ),
+        'cell_examen': ParagraphStyle(
+            'CellStyle', parent=styles['Normal'], fontSize=9, leading=12, alignment=TA_LEFT
+        ),
+    }
+    
+    # Tabla de dos columnas con etiquetas en negrita (contratista y trabajador)
+    def ficha_style(background):
+        return TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor(background)),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 10),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 10),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ])
+    
+    # Tabla con encabezado azul (signos vitales y laboratorio)
+    resultados_style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), azul),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ])
+    
+    table_styles = {
+        'contratista': ficha_style('#e8f4f8'),
+        'trabajador': ficha_style('#f5f5f5'),
+        'vitales': resultados_style,
+        'laboratorio': resultados_style,
+        'complementarios': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), azul),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 10),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ]),
+        'fisico': TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f5f5f5')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 8),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ]),
+        'examenes': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), azul),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 8),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ]),
+    }
+    
+    # Flowables estáticos ya parseados. build() les agrega estado (p.ej.
+    # _postponed al saltar de página), así que cada render usa una copia
+    firma_table = Table([
+        ['_' * 40],
+        ['Dr. Roberto Sánchez Muñoz'],
+        ['Médico Ocupacional'],
+        ['Reg. Médico: 12345-6']
+    ], colWidths=[3*inch])
+    firma_table.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 1), (0, 1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('TOPPADDING', (0, 0), (-1, -1), 4),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ]))
+    
+    secciones = (
+        'DATOS DEL TRABAJADOR', 'ANTECEDENTES MÉDICOS', 'RESULTADOS DEL EXAMEN MÉDICO',
+        'EXAMEN FÍSICO', 'EXÁMENES COMPLEMENTARIOS', 'OBSERVACIONES Y RECOMENDACIONES',
+    )
+    
+    _templates = {
+        'styles': paragraph_styles,
+        'tables': table_styles,
+        'encabezado': [
+            Paragraph("INFORME MÉDICO OCUPACIONAL", paragraph_styles['title']),
+            Spacer(1, 0.2*inch),
+        ],
+        'secciones': {nombre: Paragraph(nombre, paragraph_styles['subtitle']) for nombre in secciones},
+        'firma': [Spacer(1, 0.5*inch), firma_table],
+    }
+    return _templates
+
+
 def generar_pdf_profesional(data):
     """
     Genera un PDF profesional con diseño atractivo y completo.
-    Usa ReportLab con platypus para layouts avanzados.
+    Usa ReportLab con platypus para layouts avanzados; los estilos y los
+    bloques fijos salen de _pdf_templates().
     """
+    templates = _pdf_templates()
+    styles = templates['styles']
+    table_styles = templates['tables']
+    secciones = templates['secciones']
     
     buffer = BytesIO()
     doc = SimpleDocTemplate(
@@ -211,38 +635,10 @@ def generar_pdf_profesional(data):
         rightMargin=0.75*inch
     )
     
-    # Contenedor para los elementos del PDF
-    elements = []
-    
-    # Estilos
-    styles = getSampleStyleSheet()
-    
-    # Estilo personalizado para el título
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.HexColor('#1a5490'),
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    # Estilo para subtítulos
-    subtitle_style = ParagraphStyle(
-        'SectionTitle',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=colors.HexColor('#1a5490'),
-        spaceAfter=12,
-        fontName='Helvetica-Bold'
-    )
-    
     # ========================================
     # ENCABEZADO
     # ========================================
-    elements.append(Paragraph("INFORME MÉDICO OCUPACIONAL", title_style))
-    elements.append(Spacer(1, 0.2*inch))
+    elements = [copy(flowable) for flowable in templates['encabezado']]
     
     # Información del contratista
     contratista_data = [
@@ -253,20 +649,7 @@ def generar_pdf_profesional(data):
     ]
     
     contratista_table = Table(contratista_data, colWidths=[2.5*inch, 4*inch])
-    contratista_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e8f4f8')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 10),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 10),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-    ]))
+    contratista_table.setStyle(table_styles['contratista'])
     
     elements.append(contratista_table)
     elements.append(Spacer(1, 0.3*inch))
@@ -274,7 +657,7 @@ def generar_pdf_profesional(data):
     # ========================================
     # DATOS DEL TRABAJADOR
     # ========================================
-    elements.append(Paragraph("DATOS DEL TRABAJADOR", subtitle_style))
+    elements.append(copy(secciones['DATOS DEL TRABAJADOR']))
     
     trabajador_data = [
         ['Nombre Completo', data['trabajador_nombre']],
@@ -291,20 +674,7 @@ def generar_pdf_profesional(data):
         trabajador_data.append(['Cargo', data['trabajador_cargo']])
     
     trabajador_table = Table(trabajador_data, colWidths=[2.5*inch, 4*inch])
-    trabajador_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f5f5f5')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 10),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 10),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-    ]))
+    trabajador_table.setStyle(table_styles['trabajador'])
     
     elements.append(trabajador_table)
     elements.append(Spacer(1, 0.3*inch))
@@ -313,24 +683,14 @@ def generar_pdf_profesional(data):
     # ANTECEDENTES MÉDICOS
     # ========================================
     if data.get('antecedentes_medicos'):
-        elements.append(Paragraph("ANTECEDENTES MÉDICOS", subtitle_style))
-        
-        ant_style = ParagraphStyle(
-            'Antecedentes',
-            parent=styles['Normal'],
-            fontSize=10,
-            alignment=TA_LEFT,
-            spaceAfter=8,
-            leading=14
-        )
-        
-        elements.append(Paragraph(data['antecedentes_medicos'], ant_style))
+        elements.append(copy(secciones['ANTECEDENTES MÉDICOS']))
+        elements.append(Paragraph(data['antecedentes_medicos'], styles['antecedentes']))
         elements.append(Spacer(1, 0.2*inch))
     
     # ========================================
     # RESULTADOS DEL EXAMEN MÉDICO
     # ========================================
-    elements.append(Paragraph("RESULTADOS DEL EXAMEN MÉDICO", subtitle_style))
+    elements.append(copy(secciones['RESULTADOS DEL EXAMEN MÉDICO']))
     
     # Signos vitales
     vitales_data = [
@@ -366,19 +726,7 @@ def generar_pdf_profesional(data):
     
     if len(vitales_data) > 1:  # Si hay datos además del encabezado
         vitales_table = Table(vitales_data, colWidths=[2.2*inch, 2.2*inch, 2.2*inch])
-        vitales_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a5490')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ]))
+        vitales_table.setStyle(table_styles['vitales'])
         
         elements.append(vitales_table)
         elements.append(Spacer(1, 0.2*inch))
@@ -396,20 +744,7 @@ def generar_pdf_profesional(data):
             complementarios_data.append(['Audiometría', data['audiometria']])
         
         complementarios_table = Table(complementarios_data, colWidths=[3*inch, 3.6*inch])
-        complementarios_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a5490')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 10),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ]))
+        complementarios_table.setStyle(table_styles['complementarios'])
         
         elements.append(complementarios_table)
         elements.append(Spacer(1, 0.2*inch))
@@ -423,19 +758,7 @@ def generar_pdf_profesional(data):
             lab_data.append([item['nombre'], item['resultado'], item['rango']])
         
         lab_table = Table(lab_data, colWidths=[2.2*inch, 2.2*inch, 2.2*inch])
-        lab_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a5490')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ]))
+        lab_table.setStyle(table_styles['laboratorio'])
         
         elements.append(lab_table)
     
@@ -449,44 +772,17 @@ def generar_pdf_profesional(data):
             examen_fisico = json.loads(data['examen_fisico']) if isinstance(data['examen_fisico'], str) else data['examen_fisico']
             
             if examen_fisico and len(examen_fisico) > 0:
-                elements.append(Paragraph("EXAMEN FÍSICO", subtitle_style))
-                
-                cell_style = ParagraphStyle(
-                    'CellStyle',
-                    parent=styles['Normal'],
-                    fontSize=9,
-                    leading=11,
-                    alignment=TA_LEFT
-                )
-                
-                cell_style_bold = ParagraphStyle(
-                    'CellStyleBold',
-                    parent=styles['Normal'],
-                    fontSize=9,
-                    leading=11,
-                    alignment=TA_LEFT,
-                    fontName='Helvetica-Bold'
-                )
+                elements.append(copy(secciones['EXAMEN FÍSICO']))
                 
                 fisico_data = []
                 for item in examen_fisico:
                     fisico_data.append([
-                        Paragraph(item.get('sistema', ''), cell_style_bold),
-                        Paragraph(item.get('hallazgo', ''), cell_style)
+                        Paragraph(item.get('sistema', ''), styles['cell_bold']),
+                        Paragraph(item.get('hallazgo', ''), styles['cell'])
                     ])
                 
                 fisico_table = Table(fisico_data, colWidths=[2*inch, 4.6*inch])
-                fisico_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f5f5f5')),
-                    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-                    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                    ('LEFTPADDING', (0, 0), (-1, -1), 8),
-                    ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-                    ('TOPPADDING', (0, 0), (-1, -1), 6),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                ]))
+                fisico_table.setStyle(table_styles['fisico'])
                 
                 elements.append(fisico_table)
                 elements.append(Spacer(1, 0.2*inch))
@@ -501,37 +797,17 @@ def generar_pdf_profesional(data):
             examenes_adicionales = json.loads(data['examenes_adicionales']) if isinstance(data['examenes_adicionales'], str) else data['examenes_adicionales']
             
             if examenes_adicionales and len(examenes_adicionales) > 0:
-                elements.append(Paragraph("EXÁMENES COMPLEMENTARIOS", subtitle_style))
-                
-                cell_style = ParagraphStyle(
-                    'CellStyle',
-                    parent=styles['Normal'],
-                    fontSize=9,
-                    leading=12,
-                    alignment=TA_LEFT
-                )
+                elements.append(copy(secciones['EXÁMENES COMPLEMENTARIOS']))
                 
                 exam_data = [['EXAMEN', 'RESULTADO']]
                 for ex in examenes_adicionales:
                     exam_data.append([
-                        Paragraph(f"<b>{ex.get('nombre', '')}</b>", cell_style),
-                        Paragraph(ex.get('resultado', ''), cell_style)
+                        Paragraph(f"<b>{ex.get('nombre', '')}</b>", styles['cell_examen']),
+                        Paragraph(ex.get('resultado', ''), styles['cell_examen'])
                     ])
                 
                 exam_table = Table(exam_data, colWidths=[2.2*inch, 4.4*inch])
-                exam_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a5490')),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 11),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-                    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                    ('LEFTPADDING', (0, 0), (-1, -1), 8),
-                    ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-                    ('TOPPADDING', (0, 0), (-1, -1), 8),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ]))
+                exam_table.setStyle(table_styles['examenes'])
                 
                 elements.append(exam_table)
                 elements.append(Spacer(1, 0.3*inch))
@@ -542,42 +818,14 @@ def generar_pdf_profesional(data):
     # OBSERVACIONES Y RECOMENDACIONES
     # ========================================
     if data.get('observaciones'):
-        elements.append(Paragraph("OBSERVACIONES Y RECOMENDACIONES", subtitle_style))
-        
-        obs_style = ParagraphStyle(
-            'Observaciones',
-            parent=styles['Normal'],
-            fontSize=10,
-            alignment=TA_LEFT,
-            spaceAfter=12,
-            leading=14
-        )
-        
-        elements.append(Paragraph(data['observaciones'], obs_style))
+        elements.append(copy(secciones['OBSERVACIONES Y RECOMENDACIONES']))
+        elements.append(Paragraph(data['observaciones'], styles['observaciones']))
         elements.append(Spacer(1, 0.3*inch))
     
     # ========================================
     # PIE DE PÁGINA - FIRMA
     # ========================================
-    elements.append(Spacer(1, 0.5*inch))
-    
-    firma_data = [
-        ['_' * 40],
-        ['Dr. Roberto Sánchez Muñoz'],
-        ['Médico Ocupacional'],
-        ['Reg. Médico: 12345-6']
-    ]
-    
-    firma_table = Table(firma_data, colWidths=[3*inch])
-    firma_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 1), (0, 1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('TOPPADDING', (0, 0), (-1, -1), 4),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-    ]))
-    
-    elements.append(firma_table)
+    elements.extend(copy(flowable) for flowable in templates['firma'])
     
     # Construir el PDF
     doc.build(elements)
@@ -586,12 +834,10 @@ def generar_pdf_profesional(data):
     return buffer
 
 
-def upload_to_s3(pdf_buffer, informe_id):
+def upload_to_s3(pdf_buffer, informe):
     """Sube el PDF a S3 y retorna la URL."""
     
-    # Generar ruta con estructura de carpetas por fecha
-    now = datetime.now()
-    s3_key = f"legacy-reports/{now.year}/{now.month:02d}/informe-{informe_id}.pdf"
+    s3_key = pdf_s3_key(informe)
     
     # Subir a S3
     s3_client.put_object(
@@ -606,22 +852,43 @@ def upload_to_s3(pdf_buffer, informe_id):
     return pdf_url
 
 
-def update_pdf_path_in_aurora(informe_id, pdf_url):
-    """Actualiza el registro en Aurora con la ruta del PDF."""
-    
-    sql = """
-        UPDATE informes_medicos
-        SET pdf_s3_path = :pdf_url
-        WHERE id = :informe_id
+def pdf_s3_key(informe):
     """
+    Clave S3 del PDF de un informe. Regenerar el PDF sobrescribe el objeto
+    existente (pdf_s3_path) en lugar de dejarlo huérfano; un informe sin PDF
+    usa la carpeta del año y mes de fecha_examen.
+    """
+    prefix = f"s3://{BUCKET_NAME}/"
+    pdf_s3_path = informe.get('pdf_s3_path') or ''
+    if pdf_s3_path.startswith(prefix + 'legacy-reports/'):
+        return pdf_s3_path[len(prefix):]
     
-    rds_data.execute_statement(
-        secretArn=DB_SECRET_ARN,
-        resourceArn=DB_CLUSTER_ARN,
-        database=DATABASE_NAME,
-        sql=sql,
-        parameters=[
+    fecha = datetime.fromisoformat(informe['fecha_examen'])
+    return f"legacy-reports/{fecha.year}/{fecha.month:02d}/informe-{informe['id']}.pdf"
+
+
+def update_pdf_path_in_aurora(informe_id, pdf_url):
+    """Actualiza el registro en Aurora con la ruta del PDF y lo marca como READY."""
+    
+    db.execute(
+        UPDATE_PDF_READY_SQL,
+        [
             {'name': 'pdf_url', 'value': {'stringValue': pdf_url}},
             {'name': 'informe_id', 'value': {'longValue': int(informe_id)}}
-        ]
+        ],
+        db_secret_arn=DB_SECRET_ARN,
+        db_cluster_arn=DB_CLUSTER_ARN,
+        database_name=DATABASE_NAME
+    )
+
+
+def mark_pdf_failed(informe_id):
+    """Marca la generación del PDF como fallida (sin pisar un PDF ya generado)."""
+    
+    db.execute(
+        MARK_PDF_FAILED_SQL,
+        [{'name': 'informe_id', 'value': {'longValue': int(informe_id)}}],
+        db_secret_arn=DB_SECRET_ARN,
+        db_cluster_arn=DB_CLUSTER_ARN,
+        database_name=DATABASE_NAME
     )
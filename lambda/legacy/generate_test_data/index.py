@@ -58,6 +58,7 @@ def handler(event, context):
         result_body = json.loads(result['body'])
         informe_id = result_body.get('informe_id')
         pdf_url = result_body.get('pdf_url')
+        pdf_status = result_body.get('pdf_status')
         
         return {
             'statusCode': 200,
@@ -65,6 +66,7 @@ def handler(event, context):
             'body': json.dumps({
                 'informe_id': informe_id,
                 'pdf_url': pdf_url,
+                'pdf_status': pdf_status,
                 'nivel_riesgo_generado': nivel_riesgo_deseado,
                 'datos_generados': datos_prueba,
                 'message': 'Datos de prueba generados exitosamente'
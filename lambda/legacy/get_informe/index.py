@@ -0,0 +1,97 @@
+"""
+Lambda para el detalle de un informe médico (GET /informes/{id}).
+Lee una fila de informes_completos por clave primaria: la tabla ya tiene
+los datos del trabajador y del contratista (la mantienen los triggers de
+informes_medicos, trabajadores y contratistas), sin JOIN.
+"""
+
+import json
+import logging
+import os
+
+# Configurar logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Lambda Layer compartido (lambda/shared)
+import db
+
+# Variables de entorno
+DB_CLUSTER_ARN = os.environ['DB_CLUSTER_ARN']
+DB_SECRET_ARN = os.environ['DB_SECRET_ARN']
+DATABASE_NAME = os.environ['DATABASE_NAME']
+
+CORS_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type'
+}
+
+INFORME_SQL = """
+SELECT *
+FROM informes_completos
+WHERE id = :informe_id;
+"""
+
+
+def get_informe(informe_id):
+    """
+    Obtiene el detalle de un informe.
+
+    Args:
+        informe_id: ID del informe
+
+    Returns:
+        dict: Columnas de informes_completos o None si no existe
+    """
+    return db.query_one(
+        INFORME_SQL,
+        [{'name': 'informe_id', 'value': {'longValue': informe_id}}],
+        db_secret_arn=DB_SECRET_ARN,
+        db_cluster_arn=DB_CLUSTER_ARN,
+        database_name=DATABASE_NAME
+    )
+
+
+def response(status_code, body):
+    return {
+        'statusCode': status_code,
+        'headers': CORS_HEADERS,
+        'body': json.dumps(body, default=str)  # default=str para datetime y Decimal
+    }
+
+
+def handler(event, context):
+    """
+    Handler principal de la Lambda (GET /informes/{id}).
+    """
+    logger.info(f"Evento recibido: {json.dumps(event)}")
+
+    try:
+        informe_id = int((event.get('pathParameters') or {}).get('id', ''))
+    except ValueError:
+        return response(400, {
+            'error': 'ValidationError',
+            'message': 'El id del informe debe ser numérico'
+        })
+
+    try:
+        informe = get_informe(informe_id)
+
+        if not informe:
+            return response(404, {
+                'error': 'NotFound',
+                'message': f'Informe {informe_id} no encontrado'
+            })
+
+        return response(200, informe)
+
+    except Exception as e:
+        logger.error(f"Error en handler: {str(e)}")
+
+        return response(500, {
+            'error': 'InternalServerError',
+            'message': 'Error al consultar el informe',
+            'details': str(e)
+        })
@@ -0,0 +1,102 @@
+"""
+Lambda para consultar el estado del PDF de un informe médico.
+register_exam responde con pdf_status PENDING y el worker de generate-pdf
+lo pasa a READY (con pdf_url) o FAILED; la app consulta GET /informes/{id}/pdf.
+"""
+
+import json
+import logging
+import os
+
+# Configurar logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Lambda Layer compartido (lambda/shared)
+import db
+
+# Variables de entorno
+DB_CLUSTER_ARN = os.environ['DB_CLUSTER_ARN']
+DB_SECRET_ARN = os.environ['DB_SECRET_ARN']
+DATABASE_NAME = os.environ['DATABASE_NAME']
+
+CORS_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type'
+}
+
+
+def get_pdf_status(informe_id):
+    """
+    Obtiene el estado del PDF de un informe.
+
+    Los informes anteriores a pdf_status (NULL) se consideran READY si ya
+    tienen pdf_s3_path.
+
+    Args:
+        informe_id: ID del informe
+
+    Returns:
+        dict: {'informe_id', 'pdf_status', 'pdf_url'} o None si no existe
+    """
+    sql = """
+    SELECT
+        id AS informe_id,
+        COALESCE(pdf_status, CASE WHEN pdf_s3_path IS NOT NULL THEN 'READY' END) AS pdf_status,
+        pdf_s3_path AS pdf_url
+    FROM informes_medicos
+    WHERE id = :informe_id
+    """
+
+    return db.query_one(
+        sql,
+        [{'name': 'informe_id', 'value': {'longValue': informe_id}}],
+        db_secret_arn=DB_SECRET_ARN,
+        db_cluster_arn=DB_CLUSTER_ARN,
+        database_name=DATABASE_NAME
+    )
+
+
+def response(status_code, body):
+    return {
+        'statusCode': status_code,
+        'headers': CORS_HEADERS,
+        'body': json.dumps(body)
+    }
+
+
+def handler(event, context):
+    """
+    Handler principal de la Lambda (GET /informes/{id}/pdf).
+    """
+    logger.info(f"Evento recibido: {json.dumps(event)}")
+
+    try:
+        informe_id = int((event.get('pathParameters') or {}).get('id', ''))
+    except ValueError:
+        return response(400, {
+            'error': 'ValidationError',
+            'message': 'El id del informe debe ser numérico'
+        })
+
+    try:
+        status = get_pdf_status(informe_id)
+
+        if not status:
+            return response(404, {
+                'error': 'NotFound',
+                'message': f'Informe {informe_id} no encontrado'
+            })
+
+        return response(200, status)
+
+    except Exception as e:
+        logger.error(f"Error en handler: {str(e)}")
+
+        return response(500, {
+            'error': 'InternalServerError',
+            'message': 'Error al consultar el estado del PDF',
+            'details': str(e)
+        })
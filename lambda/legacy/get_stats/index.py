@@ -0,0 +1,150 @@
+"""
+Lambda para las estadísticas del dashboard de la app web (GET /estadisticas).
+Lee los contadores de estadisticas_informes, que los triggers de
+informes_medicos mantienen en cada INSERT, UPDATE y DELETE: el costo no
+depende de la cantidad de informes.
+"""
+
+import json
+import logging
+import os
+from datetime import date, timedelta
+
+# Configurar logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Lambda Layer compartido (lambda/shared)
+import db
+
+# Variables de entorno
+DB_CLUSTER_ARN = os.environ['DB_CLUSTER_ARN']
+DB_SECRET_ARN = os.environ['DB_SECRET_ARN']
+DATABASE_NAME = os.environ['DATABASE_NAME']
+
+# Días de la serie por_dia por defecto y máximo (?dias=)
+STATS_DAYS = int(os.environ.get('STATS_DAYS', '30'))
+STATS_MAX_DAYS = int(os.environ.get('STATS_MAX_DAYS', '366'))
+
+CORS_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type'
+}
+
+# Una sola sentencia: la fila total, una por contratista y una por día
+# desde :desde (rango sobre la clave primaria)
+STATS_SQL = """
+SELECT
+    e.dimension,
+    e.clave,
+    c.nombre AS contratista_nombre,
+    e.total,
+    e.riesgo_bajo,
+    e.riesgo_medio,
+    e.riesgo_alto,
+    e.con_resumen
+FROM estadisticas_informes e
+LEFT JOIN contratistas c
+    ON e.dimension = 'contratista' AND c.id::TEXT = e.clave
+WHERE e.dimension = 'total'
+   OR (e.dimension = 'contratista' AND e.total > 0)
+   OR (e.dimension = 'dia' AND e.clave >= :desde AND e.total > 0)
+ORDER BY e.dimension, e.clave;
+"""
+
+
+def format_counters(row):
+    """Contadores de un agregado con la distribución de riesgo."""
+    sin_clasificar = row['total'] - row['riesgo_bajo'] - row['riesgo_medio'] - row['riesgo_alto']
+    return {
+        'total': row['total'],
+        'clasificados': row['total'] - sin_clasificar,
+        'con_resumen': row['con_resumen'],
+        'por_riesgo': {
+            'BAJO': row['riesgo_bajo'],
+            'MEDIO': row['riesgo_medio'],
+            'ALTO': row['riesgo_alto'],
+            'SIN_CLASIFICAR': sin_clasificar
+        }
+    }
+
+
+def get_stats(dias):
+    """
+    Obtiene las estadísticas del dashboard.
+    
+    Args:
+        dias: Días de la serie por_dia (incluye hoy)
+    
+    Returns:
+        dict: Contadores totales, por_contratista y por_dia
+    """
+    desde = date.today() - timedelta(days=dias - 1)
+    
+    rows = db.query(
+        STATS_SQL,
+        [{'name': 'desde', 'value': {'stringValue': desde.isoformat()}}],
+        db_secret_arn=DB_SECRET_ARN,
+        db_cluster_arn=DB_CLUSTER_ARN,
+        database_name=DATABASE_NAME
+    )
+    
+    stats = format_counters({
+        'total': 0, 'riesgo_bajo': 0, 'riesgo_medio': 0, 'riesgo_alto': 0, 'con_resumen': 0
+    })
+    stats['por_contratista'] = []
+    stats['por_dia'] = []
+    
+    for row in rows:
+        if row['dimension'] == 'total':
+            stats.update(format_counters(row))
+        elif row['dimension'] == 'contratista':
+            stats['por_contratista'].append({
+                'contratista_id': int(row['clave']),
+                'nombre': row['contratista_nombre'],
+                **format_counters(row)
+            })
+        else:
+            stats['por_dia'].append({'fecha': row['clave'], **format_counters(row)})
+    
+    return stats
+
+
+def response(status_code, body):
+    return {
+        'statusCode': status_code,
+        'headers': CORS_HEADERS,
+        'body': json.dumps(body)
+    }
+
+
+def handler(event, context):
+    """
+    Handler principal de la Lambda (GET /estadisticas).
+    """
+    logger.info(f"Evento recibido: {json.dumps(event)}")
+    
+    params = event.get('queryStringParameters') or {}
+    try:
+        dias = int(params.get('dias') or STATS_DAYS)
+    except ValueError:
+        dias = 0
+    if not 1 <= dias <= STATS_MAX_DAYS:
+        return response(400, {
+            'error': 'ValidationError',
+            'message': f'dias debe ser un número entre 1 y {STATS_MAX_DAYS}'
+        })
+    
+    try:
+        return response(200, get_stats(dias))
+    
+    except Exception as e:
+        logger.error(f"Error en handler: {str(e)}")
+        
+        return response(500, {
+            'error': 'InternalServerError',
+            'message': 'Error al consultar las estadísticas',
+            'details': str(e)
+        })
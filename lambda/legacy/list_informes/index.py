@@ -1,141 +1,358 @@
 """
 Lambda para listar informes médicos.
-Retorna un array con información básica de todos los informes para la app web.
+Retorna una página de informes con información básica para la app web,
+ordenada por fecha de examen (más recientes primero), con filtros y
+paginación por cursor. Responde con ETag y 304 Not Modified mientras la
+versión de la lista (version_lista_informes) no cambie.
 """
 
+import base64
+import hashlib
 import json
-import boto3
 import logging
 import os
-from datetime import datetime
+import time
+from datetime import date, datetime, timedelta
 
 # Configurar logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Cliente RDS Data API
-rds_data = boto3.client('rds-data')
+# Lambda Layer compartido (lambda/shared)
+import db
 
 # Variables de entorno
 DB_CLUSTER_ARN = os.environ['DB_CLUSTER_ARN']
 DB_SECRET_ARN = os.environ['DB_SECRET_ARN']
 DATABASE_NAME = os.environ['DATABASE_NAME']
 
+# Tamaño de página por defecto y máximo (?limit=)
+LIST_PAGE_SIZE = int(os.environ.get('LIST_PAGE_SIZE', '50'))
+LIST_MAX_PAGE_SIZE = int(os.environ.get('LIST_MAX_PAGE_SIZE', '200'))
+
+# Segundos que se reutiliza la versión de la lista sin consultar Aurora
+LIST_CACHE_TTL_SECONDS = float(os.environ.get('LIST_CACHE_TTL_SECONDS', '2'))
+# Páginas serializadas que se guardan por contenedor
+LIST_CACHE_MAX_ENTRIES = int(os.environ.get('LIST_CACHE_MAX_ENTRIES', '64'))
+
+NIVELES_RIESGO = ('BAJO', 'MEDIO', 'ALTO')
+ORIGENES = ('LEGACY', 'EXTERNO')
+
+# Contador incrementado al COMMIT de cada transacción que escribe
+# informes_medicos, trabajadores o contratistas (migration_add_list_version.sql)
+VERSION_SQL = """
+SELECT version FROM version_lista_informes WHERE id = 1;
+"""
+
+# Cache por contenedor: (token, time.monotonic() de la consulta) y
+# clave de filtros -> (token, body)
+_version = None
+_pages = {}
+
+
+class ValidationError(Exception):
+    """Parámetro de consulta inválido (respuesta 400)."""
+
 
 def execute_query(sql, parameters=None):
     """
-    Ejecuta una query SQL y retorna los resultados.
+    Ejecuta una query SQL y retorna las filas como diccionarios.
     """
     try:
-        params = {
-            'resourceArn': DB_CLUSTER_ARN,
-            'secretArn': DB_SECRET_ARN,
-            'database': DATABASE_NAME,
-            'sql': sql,
-            'includeResultMetadata': True
-        }
-        
-        if parameters:
-            params['parameters'] = parameters
-        
-        response = rds_data.execute_statement(**params)
-        return response
-        
+        return db.query(
+            sql,
+            parameters,
+            db_secret_arn=DB_SECRET_ARN,
+            db_cluster_arn=DB_CLUSTER_ARN,
+            database_name=DATABASE_NAME
+        )
+    
     except Exception as e:
         logger.error(f"Error ejecutando query: {str(e)}")
         raise
 
 
-def format_records(response):
+def encode_cursor(informe):
+    """Cursor opaco con la clave (fecha_examen, id) del último informe de la página."""
+    payload = json.dumps({'f': str(informe['fecha_examen']), 'i': informe['id']})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Retorna (fecha_examen, id) de un cursor de encode_cursor()."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        datetime.fromisoformat(payload['f'])
+        return payload['f'], int(payload['i'])
+    except (ValueError, KeyError, TypeError):
+        raise ValidationError("cursor inválido")
+
+
+def parse_filters(params):
     """
-    Formatea los registros de RDS Data API a formato JSON amigable.
+    Valida los parámetros de consulta.
+    
+    Args:
+        params: queryStringParameters del evento (limit, cursor, nivel_riesgo,
+            contratista_id, origen, fecha_desde, fecha_hasta)
+    
+    Returns:
+        dict: Filtros normalizados
     """
-    if 'records' not in response or not response['records']:
-        return []
-    
-    # Obtener nombres de columnas
-    columns = [col['name'] for col in response['columnMetadata']]
-    
-    # Formatear cada registro
-    formatted_records = []
-    for record in response['records']:
-        formatted_record = {}
-        for i, col_name in enumerate(columns):
-            value = record[i]
-            
-            # Extraer el valor según el tipo
-            if 'stringValue' in value:
-                formatted_record[col_name] = value['stringValue']
-            elif 'longValue' in value:
-                formatted_record[col_name] = value['longValue']
-            elif 'doubleValue' in value:
-                formatted_record[col_name] = value['doubleValue']
-            elif 'booleanValue' in value:
-                formatted_record[col_name] = value['booleanValue']
-            elif 'isNull' in value and value['isNull']:
-                formatted_record[col_name] = None
-            else:
-                formatted_record[col_name] = None
-        
-        formatted_records.append(formatted_record)
+    filters = {}
+    
+    try:
+        filters['limit'] = int(params.get('limit') or LIST_PAGE_SIZE)
+    except ValueError:
+        raise ValidationError("limit debe ser numérico")
+    if not 1 <= filters['limit'] <= LIST_MAX_PAGE_SIZE:
+        raise ValidationError(f"limit debe estar entre 1 y {LIST_MAX_PAGE_SIZE}")
+    
+    if params.get('cursor'):
+        filters['cursor'] = decode_cursor(params['cursor'])
     
-    return formatted_records
+    nivel_riesgo = (params.get('nivel_riesgo') or '').upper()
+    if nivel_riesgo:
+        if nivel_riesgo not in NIVELES_RIESGO:
+            raise ValidationError(f"nivel_riesgo debe ser uno de {', '.join(NIVELES_RIESGO)}")
+        filters['nivel_riesgo'] = nivel_riesgo
+    
+    origen = (params.get('origen') or '').upper()
+    if origen:
+        if origen not in ORIGENES:
+            raise ValidationError(f"origen debe ser uno de {', '.join(ORIGENES)}")
+        filters['origen'] = origen
+    
+    if params.get('contratista_id'):
+        try:
+            filters['contratista_id'] = int(params['contratista_id'])
+        except ValueError:
+            raise ValidationError("contratista_id debe ser numérico")
+    
+    for name in ('fecha_desde', 'fecha_hasta'):
+        if params.get(name):
+            try:
+                filters[name] = date.fromisoformat(params[name])
+            except ValueError:
+                raise ValidationError(f"{name} debe tener formato YYYY-MM-DD")
+    
+    return filters
 
 
-def list_informes():
+def list_informes(filters):
     """
-    Lista todos los informes médicos con información básica.
+    Lista una página de informes médicos con información básica.
+    
+    Paginación por keyset sobre (fecha_examen, id): cada página continúa
+    después del último informe de la anterior con un rango sobre el índice,
+    así el costo no crece con la profundidad como con OFFSET. Lee la tabla
+    informes_completos (con el nombre del trabajador, sin JOIN): cada filtro
+    de igualdad tiene su índice (filtro, fecha_examen DESC, id DESC) y el
+    rango de fechas usa idx_completos_fecha_id.
+    
+    Args:
+        filters: Resultado de parse_filters()
+    
+    Returns:
+        tuple: (lista de informes, next_cursor o None)
     """
-    logger.info("Listando informes médicos...")
+    logger.info(f"Listando informes médicos: {json.dumps(filters, default=str)}")
+    
+    conditions = []
+    parameters = [{'name': 'limit', 'value': {'longValue': filters['limit'] + 1}}]
+    
+    for name in ('nivel_riesgo', 'origen'):
+        if name in filters:
+            conditions.append(f"i.{name} = :{name}")
+            parameters.append({'name': name, 'value': {'stringValue': filters[name]}})
+    
+    if 'contratista_id' in filters:
+        conditions.append("i.contratista_id = :contratista_id")
+        parameters.append({'name': 'contratista_id', 'value': {'longValue': filters['contratista_id']}})
+    
+    if 'fecha_desde' in filters:
+        conditions.append("i.fecha_examen >= CAST(:fecha_desde AS TIMESTAMP)")
+        parameters.append({'name': 'fecha_desde', 'value': {'stringValue': filters['fecha_desde'].isoformat()}})
+    
+    if 'fecha_hasta' in filters:
+        # fecha_hasta es inclusiva: hasta el inicio del día siguiente
+        conditions.append("i.fecha_examen < CAST(:fecha_hasta AS TIMESTAMP)")
+        parameters.append({'name': 'fecha_hasta', 'value': {
+            'stringValue': (filters['fecha_hasta'] + timedelta(days=1)).isoformat()
+        }})
+    
+    if 'cursor' in filters:
+        cursor_fecha, cursor_id = filters['cursor']
+        conditions.append("(i.fecha_examen, i.id) < (CAST(:cursor_fecha AS TIMESTAMP), :cursor_id)")
+        parameters.append({'name': 'cursor_fecha', 'value': {'stringValue': cursor_fecha}})
+        parameters.append({'name': 'cursor_id', 'value': {'longValue': cursor_id}})
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
     
-    # Query con JOIN para obtener nombre del trabajador
-    sql = """
-    SELECT 
+    # Se pide una fila de más para saber si hay página siguiente
+    sql = f"""
+    SELECT
         i.id,
-        t.nombre as trabajador_nombre,
+        i.trabajador_nombre,
         i.tipo_examen,
         i.presion_arterial,
         i.nivel_riesgo,
         i.fecha_examen
-    FROM informes_medicos i
-    JOIN trabajadores t ON i.trabajador_id = t.id
-    ORDER BY i.fecha_examen DESC
-    LIMIT 50;
+    FROM informes_completos i
+    {where}
+    ORDER BY i.fecha_examen DESC, i.id DESC
+    LIMIT :limit;
     """
     
-    response = execute_query(sql)
-    informes = format_records(response)
+    informes = execute_query(sql, parameters)
+    
+    next_cursor = None
+    if len(informes) > filters['limit']:
+        informes = informes[:filters['limit']]
+        next_cursor = encode_cursor(informes[-1])
     
     logger.info(f"✓ {len(informes)} informes encontrados")
     
-    return informes
+    return informes, next_cursor
+
+
+def get_version():
+    """
+    Token de versión de la lista: el contador de version_lista_informes.
+    
+    Un trigger diferido lo incrementa al COMMIT de cada transacción con un
+    INSERT, UPDATE o DELETE de informes_medicos o un cambio de trabajadores o
+    contratistas (cuyos datos se copian en informes_completos), así que
+    mientras no cambie las páginas ya serializadas siguen siendo válidas.
+    No usa MAX(updated_at): es la hora de inicio de la transacción y con
+    escritores que confirman en otro orden el máximo puede no cambiar. Se
+    reutiliza durante LIST_CACHE_TTL_SECONDS sin consultar Aurora.
+    
+    Returns:
+        str: Token de versión
+    """
+    global _version
+    
+    now = time.monotonic()
+    if _version is None or now - _version[1] >= LIST_CACHE_TTL_SECONDS:
+        row = execute_query(VERSION_SQL)[0]
+        _version = (str(row['version']), now)
+    
+    return _version[0]
+
+
+def make_etag(version, key):
+    """ETag de una página: depende solo de la versión y los filtros, igual en todos los contenedores."""
+    return 'W/"' + hashlib.sha256(f"{version}|{key}".encode()).hexdigest()[:32] + '"'
+
+
+def get_header(event, name):
+    """Header del evento sin distinguir mayúsculas (API Gateway respeta las del cliente)."""
+    for header, value in (event.get('headers') or {}).items():
+        if header.lower() == name:
+            return value
+    return None
+
+
+def not_modified(event, etag):
+    """True si el If-None-Match del cliente incluye el ETag actual."""
+    if_none_match = get_header(event, 'if-none-match')
+    if not if_none_match:
+        return False
+    return any(tag.strip() in (etag, '*') for tag in if_none_match.split(','))
+
+
+def get_page(filters, key, version):
+    """
+    Retorna el body de una página, serializado una sola vez por versión.
+    
+    Args:
+        filters: Resultado de parse_filters()
+        key: Clave de cache de los filtros
+        version: Resultado de get_version()
+    
+    Returns:
+        str: Body JSON
+    """
+    cached = _pages.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    
+    informes, next_cursor = list_informes(filters)
+    body = json.dumps({
+        'informes': informes,
+        'total': len(informes),
+        'next_cursor': next_cursor
+    }, default=str)  # default=str para manejar datetime
+    
+    _pages.pop(key, None)
+    if len(_pages) >= LIST_CACHE_MAX_ENTRIES:
+        # Descartar la página guardada hace más tiempo
+        _pages.pop(next(iter(_pages)))
+    _pages[key] = (version, body)
+    
+    return body
 
 
 def handler(event, context):
     """
-    Handler principal de la Lambda.
+    Handler principal de la Lambda (GET /informes).
+    
+    Con If-None-Match igual al ETag de la versión actual responde 304 sin
+    consultar la página; si no, sirve el body guardado para esa versión o
+    lo consulta y serializa.
     """
     logger.info(f"Evento recibido: {json.dumps(event)}")
     
     try:
+        filters = parse_filters(event.get('queryStringParameters') or {})
+        version = get_version()
+        
+        key = json.dumps(filters, sort_keys=True, default=str)
+        etag = make_etag(version, key)
+        
+        headers = {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': 'GET, OPTIONS',
+            'Access-Control-Allow-Headers': 'Content-Type, If-None-Match',
+            'Access-Control-Expose-Headers': 'ETag',
+            # El navegador revalida cada vez con If-None-Match
+            'Cache-Control': 'no-cache',
+            'ETag': etag
+        }
+        
+        if not_modified(event, etag):
+            logger.info("✓ 304 Not Modified")
+            return {
+                'statusCode': 304,
+                'headers': headers,
+                'body': ''
+            }
+        
         # Listar informes
-        informes = list_informes()
+        body = get_page(filters, key, version)
         
         # Retornar respuesta exitosa
         return {
             'statusCode': 200,
+            'headers': headers,
+            'body': body
+        }
+    
+    except ValidationError as e:
+        return {
+            'statusCode': 400,
             'headers': {
                 'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type'
+                'Access-Control-Allow-Origin': '*'
             },
             'body': json.dumps({
-                'informes': informes,
-                'total': len(informes)
-            }, default=str)  # default=str para manejar datetime
+                'error': 'ValidationError',
+                'message': str(e)
+            })
         }
-        
+    
     except Exception as e:
         logger.error(f"Error en handler: {str(e)}")
         
@@ -3,10 +3,14 @@ import os
 import boto3
 from datetime import datetime
 
+# Lambda Layer compartido (lambda/shared)
+import db
+import upserts
+
 # Clientes AWS
 secretsmanager = boto3.client('secretsmanager')
-rds_data = boto3.client('rds-data')
 lambda_client = boto3.client('lambda')
+sqs = boto3.client('sqs')
 
 # Variables de entorno
 DB_SECRET_ARN = os.environ['DB_SECRET_ARN']
@@ -14,11 +18,16 @@ DB_CLUSTER_ARN = os.environ['DB_CLUSTER_ARN']
 DATABASE_NAME = os.environ['DATABASE_NAME']
 BUCKET_NAME = os.environ['BUCKET_NAME']
 
+# Cola de generación de PDFs; sin cola se invoca generate-pdf de forma síncrona
+PDF_QUEUE_URL = os.environ.get('PDF_QUEUE_URL')
+
 
 def handler(event, context):
     """
     Lambda para registrar exámenes médicos.
-    Recibe datos del formulario, los valida, guarda en Aurora y genera PDF.
+    Recibe datos del formulario, los valida, guarda en Aurora y encola la
+    generación del PDF (pdf_status PENDING; el estado se consulta en
+    GET /informes/{id}/pdf).
     """
     try:
         # Parsear el body del request
@@ -45,18 +54,23 @@ def handler(event, context):
         examen = body.get('examen', {})
         
         # Guardar en Aurora
-        informe_id = save_to_aurora(trabajador, contratista, examen)
-        
-        # Invocar Lambda de generación de PDF
-        pdf_result = invoke_pdf_generation(informe_id)
+        if PDF_QUEUE_URL:
+            informe_id = save_to_aurora(trabajador, contratista, examen, pdf_status='PENDING')
+            pdf_result = enqueue_pdf_generation(informe_id)
+        else:
+            informe_id = save_to_aurora(trabajador, contratista, examen)
+            pdf_result = invoke_pdf_generation(informe_id)
         
         return {
             'statusCode': 200,
             'headers': {'Content-Type': 'application/json'},
             'body': json.dumps({
                 'informe_id': informe_id,
+                'pdf_status': pdf_result['pdf_status'],
                 'pdf_url': pdf_result.get('pdf_url'),
-                'message': 'Informe generado exitosamente'
+                'pdf_status_url': f"informes/{informe_id}/pdf",
+                'message': ('Informe registrado, el PDF se está generando'
+                            if pdf_result['pdf_status'] == 'PENDING' else 'Informe generado exitosamente')
             })
         }
         
@@ -96,138 +110,66 @@ def validate_exam_data(body):
     return None
 
 
-def save_to_aurora(trabajador, contratista, examen):
-    """Guarda los datos del examen en Aurora y retorna el ID del informe."""
-    
-    # 1. Insertar o obtener trabajador
-    trabajador_id = upsert_trabajador(trabajador)
-    
-    # 2. Insertar o obtener contratista
-    contratista_id = upsert_contratista(contratista)
-    
-    # 3. Insertar informe médico
-    informe_id = insert_informe(trabajador_id, contratista_id, examen)
-    
-    return informe_id
-
-
-def upsert_trabajador(trabajador):
-    """Inserta o actualiza un trabajador y retorna su ID."""
-    
-    # Buscar si existe
-    select_sql = """
-        SELECT id FROM trabajadores 
-        WHERE documento = :documento
+def save_to_aurora(trabajador, contratista, examen, pdf_status=None):
     """
+    Guarda los datos del examen en Aurora y retorna el ID del informe.
     
-    result = execute_sql(select_sql, [
-        {'name': 'documento', 'value': {'stringValue': trabajador['documento']}}
-    ])
+    Trabajador, contratista e informe se registran en una sola sentencia
+    (upserts.insert_informe_with_upserts): una llamada a Aurora y, si algo
+    falla, no queda nada escrito, por lo que el request se puede reintentar.
     
-    if result['records']:
-        return result['records'][0][0]['longValue']
+    Args:
+        trabajador: Datos del trabajador
+        contratista: Datos del contratista
+        examen: Datos del examen
+        pdf_status: 'PENDING' si el PDF se genera en la cola (opcional)
     
-    # Insertar nuevo trabajador
-    insert_sql = """
-        INSERT INTO trabajadores (nombre, documento, fecha_nacimiento)
-        VALUES (:nombre, :documento, :fecha_nacimiento)
-        RETURNING id
+    Returns:
+        int: ID del informe creado
     """
-    
-    params = [
-        {'name': 'nombre', 'value': {'stringValue': trabajador['nombre']}},
-        {'name': 'documento', 'value': {'stringValue': trabajador['documento']}},
-        {'name': 'fecha_nacimiento', 'value': {'stringValue': trabajador.get('fecha_nacimiento', '1990-01-01')}}
-    ]
-    
-    result = execute_sql(insert_sql, params)
-    return result['records'][0][0]['longValue']
-
-
-def upsert_contratista(contratista):
-    """Inserta o actualiza un contratista y retorna su ID."""
-    
-    # Buscar si existe
-    select_sql = """
-        SELECT id FROM contratistas 
-        WHERE email = :email
+    result = upserts.insert_informe_with_upserts(
+        trabajador,
+        contratista,
+        examen,
+        'LEGACY',
+        fecha_examen=datetime.now().isoformat(),
+        pdf_status=pdf_status,
+        db_secret_arn=DB_SECRET_ARN,
+        db_cluster_arn=DB_CLUSTER_ARN,
+        database_name=DATABASE_NAME
+    )
+    return result['informe_id']
+
+
+def enqueue_pdf_generation(informe_id):
     """
+    Encola la generación del PDF para el worker de generate-pdf.
     
-    result = execute_sql(select_sql, [
-        {'name': 'email', 'value': {'stringValue': contratista['email']}}
-    ])
-    
-    if result['records']:
-        return result['records'][0][0]['longValue']
-    
-    # Insertar nuevo contratista
-    insert_sql = """
-        INSERT INTO contratistas (nombre, email)
-        VALUES (:nombre, :email)
-        RETURNING id
+    Returns:
+        dict: {'pdf_status': 'PENDING'}, o 'FAILED' si no se pudo encolar
     """
-    
-    params = [
-        {'name': 'nombre', 'value': {'stringValue': contratista['nombre']}},
-        {'name': 'email', 'value': {'stringValue': contratista['email']}}
-    ]
-    
-    result = execute_sql(insert_sql, params)
-    return result['records'][0][0]['longValue']
-
-
-def insert_informe(trabajador_id, contratista_id, examen):
-    """Inserta un nuevo informe médico y retorna su ID."""
-    
-    insert_sql = """
-        INSERT INTO informes_medicos (
-            trabajador_id, contratista_id, tipo_examen, fecha_examen,
-            presion_arterial, peso, altura, vision, audiometria, observaciones,
-            origen
+    try:
+        sqs.send_message(
+            QueueUrl=PDF_QUEUE_URL,
+            MessageBody=json.dumps({'informe_id': informe_id})
         )
-        VALUES (
-            :trabajador_id, :contratista_id, :tipo_examen, :fecha_examen,
-            :presion_arterial, :peso, :altura, :vision, :audiometria, :observaciones,
-            'LEGACY'
+        return {'pdf_status': 'PENDING', 'pdf_url': None}
+        
+    except Exception as e:
+        print(f"Error enqueuing PDF generation: {str(e)}")
+        # El informe ya está guardado: se marca para no quedar PENDING sin mensaje
+        db.execute(
+            "UPDATE informes_medicos SET pdf_status = 'FAILED' WHERE id = :informe_id",
+            [{'name': 'informe_id', 'value': {'longValue': informe_id}}],
+            db_secret_arn=DB_SECRET_ARN,
+            db_cluster_arn=DB_CLUSTER_ARN,
+            database_name=DATABASE_NAME
         )
-        RETURNING id
-    """
-    
-    params = [
-        {'name': 'trabajador_id', 'value': {'longValue': trabajador_id}},
-        {'name': 'contratista_id', 'value': {'longValue': contratista_id}},
-        {'name': 'tipo_examen', 'value': {'stringValue': examen.get('tipo', 'General')}},
-        {'name': 'fecha_examen', 'value': {'stringValue': datetime.now().isoformat()}},
-        {'name': 'presion_arterial', 'value': {'stringValue': examen.get('presion_arterial', '')}},
-        {'name': 'peso', 'value': {'doubleValue': float(examen.get('peso', 0))}},
-        {'name': 'altura', 'value': {'doubleValue': float(examen.get('altura', 0))}},
-        {'name': 'vision', 'value': {'stringValue': examen.get('vision', '')}},
-        {'name': 'audiometria', 'value': {'stringValue': examen.get('audiometria', '')}},
-        {'name': 'observaciones', 'value': {'stringValue': examen.get('observaciones', '')}}
-    ]
-    
-    result = execute_sql(insert_sql, params)
-    return result['records'][0][0]['longValue']
-
-
-def execute_sql(sql, parameters=None):
-    """Ejecuta una consulta SQL usando RDS Data API."""
-    params = {
-        'secretArn': DB_SECRET_ARN,
-        'resourceArn': DB_CLUSTER_ARN,
-        'database': DATABASE_NAME,
-        'sql': sql
-    }
-    
-    if parameters:
-        params['parameters'] = parameters
-    
-    response = rds_data.execute_statement(**params)
-    return response
+        return {'pdf_status': 'FAILED', 'pdf_url': None, 'error': str(e)}
 
 
 def invoke_pdf_generation(informe_id):
-    """Invoca la Lambda de generación de PDF de forma asíncrona."""
+    """Invoca la Lambda de generación de PDF de forma síncrona (sin PDF_QUEUE_URL)."""
     
     # Obtener el nombre de la función Lambda de generación de PDF
     # Asumimos que tiene el mismo prefijo que esta función
@@ -246,8 +188,9 @@ def invoke_pdf_generation(informe_id):
         )
         
         result = json.loads(response['Payload'].read())
-        return result
+        pdf_url = json.loads(result.get('body') or '{}').get('pdf_url')
+        return {'pdf_status': 'READY' if pdf_url else 'FAILED', 'pdf_url': pdf_url}
         
     except Exception as e:
         print(f"Error invoking PDF generation: {str(e)}")
-        return {'pdf_url': None, 'error': str(e)}
+        return {'pdf_status': 'FAILED', 'pdf_url': None, 'error': str(e)}
@@ -1,17 +1,45 @@
 """
-Lambda Layer compartido para funciones de búsqueda por similitud.
+Lambda Layer compartido: búsqueda por similitud, codec de vectores y acceso a Aurora.
 """
 
 from .similarity_search import (
     search_similar_informes,
     search_similar_informes_all_workers,
     get_historical_context,
+    get_historical_context_batch,
     format_context_for_prompt
 )
+from .db import (
+    query,
+    query_one,
+    execute,
+    execute_batch,
+    transaction
+)
+from .row_decoder import (
+    decode_rows,
+    compile_plan
+)
+from .vector_codec import (
+    encode_vector,
+    encode_query_vector,
+    decode_vector
+)
 
 __all__ = [
     'search_similar_informes',
     'search_similar_informes_all_workers',
     'get_historical_context',
-    'format_context_for_prompt'
+    'get_historical_context_batch',
+    'format_context_for_prompt',
+    'encode_vector',
+    'encode_query_vector',
+    'decode_vector',
+    'query',
+    'query_one',
+    'execute',
+    'execute_batch',
+    'transaction',
+    'decode_rows',
+    'compile_plan'
 ]
@@ -0,0 +1,172 @@
+"""
+Módulo compartido para cargar templates de prompts desde S3 con cache.
+
+Cada template se descarga la primera vez que se usa y queda en memoria
+mientras la Lambda siga caliente. Pasado PROMPT_CACHE_REVALIDATE_SECONDS
+se revalida con If-None-Match: si el ETag no cambió, S3 responde 304 sin
+cuerpo y se sigue usando la copia en memoria.
+
+Los templates se dividen una sola vez en segmentos estáticos alrededor de
+sus placeholders ({informes_anteriores}, {datos_informe}, ...), de modo que
+armar un prompt es un único ''.join en lugar de un str.replace por placeholder.
+"""
+
+import logging
+import os
+import threading
+import time
+
+# Segundos entre revalidaciones de un template cacheado (0 = revalidar siempre)
+PROMPT_CACHE_REVALIDATE_SECONDS = int(os.environ.get('PROMPT_CACHE_REVALIDATE_SECONDS', '300'))
+
+logger = logging.getLogger(__name__)
+
+# Cliente S3 (se crea al primer uso)
+_s3 = None
+
+# Templates cacheados: {(bucket, key, placeholders): _CachedTemplate}
+_templates = {}
+_lock = threading.Lock()
+
+# Llamadas a S3 realizadas por este entorno de ejecución
+_stats = {'s3_get': 0, 's3_not_modified': 0, 'cache_hits': 0}
+
+
+class PromptTemplate:
+    """Template dividido en segmentos estáticos y placeholders."""
+
+    __slots__ = ('text', 'segments', 'slots')
+
+    def __init__(self, text, placeholders):
+        """
+        Args:
+            text: Contenido del template
+            placeholders: Nombres de placeholder a reemplazar (sin llaves)
+        """
+        self.text = text
+        # segments[i] va antes de slots[i]; el último segmento cierra el template
+        self.segments = []
+        self.slots = []
+
+        markers = {f"{{{name}}}": name for name in placeholders}
+        position = 0
+        while True:
+            found = [(text.find(marker, position), marker) for marker in markers]
+            found = [(index, marker) for index, marker in found if index >= 0]
+            if not found:
+                break
+            index, marker = min(found)
+            self.segments.append(text[position:index])
+            self.slots.append(markers[marker])
+            position = index + len(marker)
+        self.segments.append(text[position:])
+
+    def render(self, **values):
+        """
+        Arma el prompt con los valores de los placeholders.
+
+        Args:
+            **values: Valor de cada placeholder (los que falten quedan como '{nombre}')
+
+        Returns:
+            str: Prompt completo
+        """
+        parts = [self.segments[0]]
+        for slot, segment in zip(self.slots, self.segments[1:]):
+            value = values.get(slot)
+            parts.append(f"{{{slot}}}" if value is None else str(value))
+            parts.append(segment)
+        return ''.join(parts)
+
+
+class _CachedTemplate:
+    __slots__ = ('template', 'etag', 'checked_at')
+
+    def __init__(self, template, etag, checked_at):
+        self.template = template
+        self.etag = etag
+        self.checked_at = checked_at
+
+
+def get_template(bucket, key, placeholders=()):
+    """
+    Obtiene un template desde el cache, descargándolo o revalidándolo si corresponde.
+
+    Args:
+        bucket: Bucket S3 de los prompts
+        key: Key del template (p.ej. 'prompts/classification.txt')
+        placeholders: Nombres de placeholder a pre-dividir (sin llaves)
+
+    Returns:
+        PromptTemplate: Template listo para render()
+    """
+    cache_key = (bucket, key, tuple(placeholders))
+    now = time.monotonic()
+
+    with _lock:
+        cached = _templates.get(cache_key)
+        if cached is not None and now - cached.checked_at < PROMPT_CACHE_REVALIDATE_SECONDS:
+            _stats['cache_hits'] += 1
+            return cached.template
+
+    request = {'Bucket': bucket, 'Key': key}
+    if cached is not None and cached.etag:
+        request['IfNoneMatch'] = cached.etag
+
+    try:
+        response = _s3_client().get_object(**request)
+    except Exception as e:
+        if cached is not None and _is_not_modified(e):
+            with _lock:
+                _stats['s3_not_modified'] += 1
+                cached.checked_at = now
+            logger.info(f"Template s3://{bucket}/{key} sin cambios (304)")
+            return cached.template
+        if cached is not None:
+            # S3 no disponible: se sigue usando la última versión conocida
+            logger.warning(f"No se pudo revalidar s3://{bucket}/{key}, usando copia en cache: {str(e)}")
+            return cached.template
+        raise
+
+    text = response['Body'].read().decode('utf-8')
+    template = PromptTemplate(text, placeholders)
+
+    with _lock:
+        _stats['s3_get'] += 1
+        _templates[cache_key] = _CachedTemplate(template, response.get('ETag'), now)
+
+    logger.info(f"Template s3://{bucket}/{key} cargado ({len(text)} caracteres)")
+    return template
+
+
+def cache_stats():
+    """
+    Contadores del cache de templates en este entorno de ejecución.
+
+    Returns:
+        dict: {'s3_get': int, 's3_not_modified': int, 'cache_hits': int}
+    """
+    with _lock:
+        return dict(_stats)
+
+
+def clear_cache():
+    """Descarta los templates cacheados (fuerza una descarga en el próximo uso)."""
+    with _lock:
+        _templates.clear()
+
+
+def _is_not_modified(error):
+    """True si el error de get_object es la respuesta 304 de If-None-Match."""
+    response = getattr(error, 'response', None) or {}
+    code = str(response.get('Error', {}).get('Code', ''))
+    status = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    return code in ('304', 'NotModified') or status == 304
+
+
+def _s3_client():
+    global _s3
+    if _s3 is None:
+        import boto3
+        _s3 = boto3.client('s3')
+    return _s3
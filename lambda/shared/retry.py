@@ -0,0 +1,110 @@
+"""
+Módulo compartido para reintentar llamadas a servicios de AWS (Bedrock,
+Textract) con backoff exponencial y jitter, y para limitar las llamadas por
+segundo entre hilos.
+
+classify_risk, generate_summary, generate_embeddings y extract_pdf reintentan
+el throttling y los errores transitorios con el mismo backoff: 0.5 s, 1 s,
+2 s, ... hasta 20 s, multiplicado por un jitter entre 0.5 y 1 para que los
+hilos y las Lambdas concurrentes no reintenten a la vez.
+"""
+
+import random
+import threading
+import time
+
+# Errores transitorios de Bedrock (InvokeModel) que ameritan reintento
+BEDROCK_RETRYABLE_ERROR_CODES = frozenset({
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'ServiceUnavailableException',
+    'ModelTimeoutException',
+    'InternalServerException',
+})
+
+# Errores transitorios de Textract (throttling y límite de jobs concurrentes)
+TEXTRACT_RETRYABLE_ERROR_CODES = frozenset({
+    'ThrottlingException',
+    'ProvisionedThroughputExceededException',
+    'LimitExceededException',
+    'InternalServerError',
+})
+
+# Tope de la espera entre reintentos (segundos)
+MAX_BACKOFF_SECONDS = 20.0
+
+
+class RateLimiter:
+    """
+    Limita las llamadas por segundo compartidas entre hilos: cada llamada
+    reserva el siguiente turno libre (1 / max_rps segundos después del
+    anterior) y espera hasta él. max_rps <= 0 desactiva el límite.
+    """
+
+    def __init__(self, max_rps):
+        self.interval = 1.0 / max_rps if max_rps > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            turn = max(now, self._next)
+            self._next = turn + self.interval
+        if turn > now:
+            time.sleep(turn - now)
+
+
+def error_code(error):
+    """
+    Código de error de AWS de una excepción.
+
+    Acepta ClientError de botocore (response['Error']['Code']) y excepciones
+    propias que exponen el código en 'error_code'.
+
+    Returns:
+        str: Código de error, o None si la excepción no trae uno
+    """
+    code = getattr(error, 'error_code', None)
+    if code:
+        return code
+    return (getattr(error, 'response', None) or {}).get('Error', {}).get('Code')
+
+
+def backoff_delay(attempt):
+    """Espera antes del reintento 'attempt' (desde 0): exponencial con jitter."""
+    return min(MAX_BACKOFF_SECONDS, 0.5 * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+
+def call_with_backoff(fn, retryable_codes, max_retries, limiter=None, service='Bedrock'):
+    """
+    Llama a fn() reintentando los errores transitorios con backoff exponencial y jitter.
+
+    Un error cuyo código no está en retryable_codes, o el último intento, se
+    propaga sin cambios.
+
+    Args:
+        fn: Función sin argumentos que hace la llamada
+        retryable_codes: Códigos de error que ameritan reintento
+        max_retries: Número máximo de reintentos
+        limiter: RateLimiter a respetar en cada intento (opcional)
+        service: Nombre del servicio para el log
+
+    Returns:
+        Lo que retorne fn()
+    """
+    for attempt in range(max_retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return fn()
+        except Exception as e:
+            code = error_code(e)
+            if code not in retryable_codes or attempt == max_retries:
+                raise
+
+            delay = backoff_delay(attempt)
+            print(f"{service} {code}, reintentando en {delay:.2f}s (intento {attempt + 1}/{max_retries})")
+            time.sleep(delay)
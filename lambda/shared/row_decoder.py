@@ -0,0 +1,289 @@
+"""
+Módulo compartido para decodificar resultados de la RDS Data API.
+
+En lugar de recorrer cada celda probando 'stringValue', 'longValue', ...
+(o de mapear posiciones a mano), se compila una vez por forma de resultado
+un plan columna -> campo a partir de columnMetadata, y con él una función
+equivalente a un parser escrito a mano para esa query. Los planes se cachean
+por firma de columnas, por lo que una Lambda caliente compila cada query una
+sola vez.
+
+Las filas pueden retornarse como diccionarios (default), tuplas u objetos
+con __slots__ (acceso por atributo, menos memoria que un dict por fila).
+"""
+
+import keyword
+from collections import OrderedDict
+
+# Campo de la Data API según el typeName de la columna (el resto usa stringValue:
+# varchar, text, numeric, date, timestamp, json, uuid, vector, ...)
+FIELD_BY_TYPE = {
+    'int2': 'longValue',
+    'int4': 'longValue',
+    'int8': 'longValue',
+    'serial': 'longValue',
+    'bigserial': 'longValue',
+    'oid': 'longValue',
+    'float4': 'doubleValue',
+    'float8': 'doubleValue',
+    'bool': 'booleanValue',
+    'bytea': 'blobValue',
+}
+
+ROW_TYPES = ('dict', 'tuple', 'object')
+
+# Planes compilados por firma de columnas (por ejecución de Lambda)
+_PLAN_CACHE_SIZE = 64
+_plans = OrderedDict()
+
+
+class RowPlan:
+    """Plan de decodificación compilado para una forma de resultado."""
+
+    __slots__ = ('names', 'fields', 'row_class', 'decoders', 'checked')
+
+    def __init__(self, names, fields):
+        self.names = names
+        # Campo de la Data API por columna (None = decodificación genérica:
+        # arrays, typeName ausente)
+        self.fields = fields
+        self.row_class = None
+        # Funciones de decodificación generadas por row_type
+        self.decoders = {}
+        self.checked = False
+
+    def decode(self, records, row_type='dict'):
+        """
+        Decodifica los records de la Data API.
+
+        Args:
+            records: Lista de records (response['records'])
+            row_type: 'dict', 'tuple' u 'object'
+
+        Returns:
+            list: Filas en el formato pedido
+        """
+        if not records:
+            return []
+
+        if not self.checked:
+            self._verify(records[0])
+
+        decoder = self.decoders.get(row_type)
+        if decoder is None:
+            decoder = self._compile_decoder(row_type)
+        return decoder(records)
+
+    def build(self, rows, row_type='dict'):
+        """
+        Construye filas del tipo pedido a partir de secuencias de valores.
+        Lo usa también el backend de conexión directa de db.py.
+
+        Args:
+            rows: Iterable de secuencias de valores (en el orden de names)
+            row_type: 'dict', 'tuple' u 'object'
+
+        Returns:
+            list: Filas en el formato pedido
+        """
+        if row_type == 'dict':
+            names = self.names
+            return [dict(zip(names, values)) for values in rows]
+        if row_type == 'tuple':
+            return [tuple(values) for values in rows]
+        if row_type == 'object':
+            row_class = self.row_class or self._make_row_class()
+            return [row_class(*values) for values in rows]
+        raise ValueError(f"row_type inválido: {row_type} (usar {', '.join(ROW_TYPES)})")
+
+    def _verify(self, record):
+        """
+        Comprueba el plan contra la primera fila: si una columna trae el valor
+        en otro campo del previsto (typeName inesperado), pasa a decodificación genérica.
+        """
+        fields = list(self.fields)
+        for i, (cell, field) in enumerate(zip(record, fields)):
+            if field is not None and field not in cell and not cell.get('isNull'):
+                fields[i] = None
+        if None in fields and tuple(fields) != self.fields:
+            self.fields = tuple(fields)
+            self.decoders.clear()
+        self.checked = True
+
+    def _compile_decoder(self, row_type):
+        """
+        Genera (una vez por plan y row_type) una función que decodifica todos los
+        records con una comprehension: r[i].get('campo') por columna, sin loops
+        internos ni búsquedas de tipo por celda.
+        """
+        cells = ', '.join(
+            f"r[{i}].get({field!r})" if field else f"decode_field(r[{i}])"
+            for i, field in enumerate(self.fields)
+        )
+        if row_type == 'dict':
+            items = ', '.join(
+                f"{name!r}: r[{i}].get({field!r})" if field else f"{name!r}: decode_field(r[{i}])"
+                for i, (name, field) in enumerate(zip(self.names, self.fields))
+            )
+            expression = f"{{{items}}}"
+        elif row_type == 'tuple':
+            expression = f"({cells},)" if self.fields else "()"
+        elif row_type == 'object':
+            expression = f"Row({cells})"
+        else:
+            raise ValueError(f"row_type inválido: {row_type} (usar {', '.join(ROW_TYPES)})")
+
+        namespace = {'decode_field': decode_field}
+        if row_type == 'object':
+            namespace['Row'] = self.row_class or self._make_row_class()
+        exec(f"def decode(records):\n    return [{expression} for r in records]\n", namespace)
+        decoder = self.decoders[row_type] = namespace['decode']
+        return decoder
+
+    def _make_row_class(self):
+        """Crea una clase con __slots__ para las columnas del plan."""
+        attrs = []
+        for i, name in enumerate(self.names):
+            attr = _attribute_name(name, i)
+            attrs.append(attr if attr not in attrs else f"col_{i}")
+        self.row_class = make_row_class(tuple(attrs))
+        return self.row_class
+
+
+def make_row_class(attrs):
+    """
+    Crea una clase de fila con __slots__ (acceso por atributo y _asdict()).
+
+    Args:
+        attrs: Nombres de atributo válidos, en el orden de las columnas
+
+    Returns:
+        type: Clase cuyo constructor recibe los valores posicionalmente
+    """
+    namespace = {
+        '__slots__': attrs,
+        '__init__': _build_init(attrs),
+        '__repr__': lambda self: f"Row({', '.join(f'{a}={getattr(self, a)!r}' for a in attrs)})",
+        '__eq__': lambda self, other: type(self) is type(other) and self._astuple() == other._astuple(),
+        '__hash__': None,
+        '_astuple': lambda self: tuple(getattr(self, a) for a in attrs),
+        '_asdict': lambda self: {a: getattr(self, a) for a in attrs},
+    }
+    return type('Row', (), namespace)
+
+
+def compile_plan(column_metadata):
+    """
+    Compila (o toma del cache) el plan de decodificación para un columnMetadata.
+
+    Args:
+        column_metadata: response['columnMetadata'] (requiere includeResultMetadata=True)
+
+    Returns:
+        RowPlan: Plan reutilizable para todas las respuestas con esas columnas
+    """
+    signature = tuple((col['name'], col.get('typeName')) for col in column_metadata)
+
+    plan = _plans.get(signature)
+    if plan is None:
+        names = tuple(name for name, _ in signature)
+        fields = tuple(_field_for(type_name) for _, type_name in signature)
+        plan = RowPlan(names, fields)
+        _plans[signature] = plan
+        if len(_plans) > _PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+    else:
+        _plans.move_to_end(signature)
+
+    return plan
+
+
+def plan_for_names(names):
+    """
+    Plan sin tipos (solo nombres) para construir filas desde otro origen,
+    por ejemplo las tuplas de un driver de Postgres.
+
+    Args:
+        names: Nombres de columnas
+
+    Returns:
+        RowPlan: Plan cacheado por nombres
+    """
+    return compile_plan([{'name': name, 'typeName': None} for name in names])
+
+
+def decode_rows(response, row_type='dict'):
+    """
+    Decodifica una respuesta de execute_statement.
+
+    Args:
+        response: Respuesta de la Data API con includeResultMetadata=True
+        row_type: 'dict' (default), 'tuple' u 'object'
+
+    Returns:
+        list: Filas decodificadas
+    """
+    records = response.get('records')
+    if not records:
+        return []
+    return compile_plan(response['columnMetadata']).decode(records, row_type)
+
+
+def decode_field(cell):
+    """
+    Decodificación genérica de una celda de la Data API (tipo no conocido de antemano).
+
+    Args:
+        cell: Celda del record ({'stringValue': ...}, {'isNull': True}, ...)
+
+    Returns:
+        Valor Python de la celda
+    """
+    if cell.get('isNull'):
+        return None
+    if 'stringValue' in cell:
+        return cell['stringValue']
+    if 'longValue' in cell:
+        return cell['longValue']
+    if 'doubleValue' in cell:
+        return cell['doubleValue']
+    if 'booleanValue' in cell:
+        return cell['booleanValue']
+    if 'blobValue' in cell:
+        return cell['blobValue']
+    if 'arrayValue' in cell:
+        return _decode_array(cell['arrayValue'])
+    return None
+
+
+def _decode_array(array):
+    """Convierte un arrayValue de la Data API a lista."""
+    if 'arrayValues' in array:
+        return [_decode_array(item) for item in array['arrayValues']]
+    for values in array.values():
+        return list(values)
+    return []
+
+
+def _field_for(type_name):
+    """Campo de la Data API para un typeName (None = decodificación genérica)."""
+    if not type_name or type_name.startswith('_'):
+        return None
+    return FIELD_BY_TYPE.get(type_name, 'stringValue')
+
+
+def _attribute_name(name, index):
+    """Nombre de atributo válido para una columna (p.ej. '?column?' -> 'col_3')."""
+    if name.isidentifier() and not keyword.iskeyword(name):
+        return name
+    return f"col_{index}"
+
+
+def _build_init(attrs):
+    """Genera un __init__ posicional para los atributos dados."""
+    args = ', '.join(attrs)
+    body = '\n'.join(f"    self.{a} = {a}" for a in attrs) or '    pass'
+    source = f"def __init__(self, {args}):\n{body}\n" if attrs else f"def __init__(self):\n{body}\n"
+    namespace = {}
+    exec(source, namespace)
+    return namespace['__init__']
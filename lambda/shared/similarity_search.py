@@ -5,16 +5,77 @@ Este módulo se empaqueta como Lambda Layer y se comparte entre múltiples Lambd
 
 import json
 import os
-import boto3
+import time
 
-# Cliente RDS Data API
-rds_data = boto3.client('rds-data')
+try:
+    from . import db, worker_history
+    from .vector_codec import encode_query_vector, vector_cast, vector_column
+except ImportError:
+    import db
+    import worker_history
+    from vector_codec import encode_query_vector, vector_cast, vector_column
 
+# Recall por defecto de las búsquedas vectoriales (vacío = defaults de pgvector)
+# hnsw.ef_search: candidatos explorados en índices HNSW (pgvector default: 40)
+# ivfflat.probes: listas visitadas en índices IVFFlat (pgvector default: 1)
+HNSW_EF_SEARCH = os.environ.get('HNSW_EF_SEARCH')
+IVFFLAT_PROBES = os.environ.get('IVFFLAT_PROBES')
 
-def search_similar_informes(trabajador_id, query_embedding, limit=3, db_secret_arn=None, db_cluster_arn=None, database_name=None):
+# Búsqueda por trabajador: 'auto', 'exact' o 'iterative'
+WORKER_SEARCH_STRATEGY = os.environ.get('WORKER_SEARCH_STRATEGY', 'auto')
+
+# En 'auto', trabajadores con hasta este número de vectores usan búsqueda exacta
+WORKER_EXACT_SEARCH_THRESHOLD = int(os.environ.get('WORKER_EXACT_SEARCH_THRESHOLD', '2000'))
+
+# Iterative index scans de pgvector >= 0.8.0 (orden relajado, se reordena afuera)
+ITERATIVE_SCAN_SETTINGS = {
+    'hnsw.iterative_scan': 'relaxed_order',
+    'ivfflat.iterative_scan': 'relaxed_order',
+}
+ITERATIVE_SCAN_MIN_VERSION = (0, 8, 0)
+
+# Versión de pgvector, consultada una vez por entorno de ejecución
+_pgvector_version = None
+
+# Columnas de informe compartidas por las búsquedas. NULL se reemplaza por ''
+# (o 0 en peso/altura) en SQL, de modo que las filas salen de db.query con
+# la forma final y no hace falta un parser por query
+INFORME_COLUMNS = """
+            COALESCE(im.tipo_examen, '') AS tipo_examen,
+            COALESCE(im.fecha_examen::text, '') AS fecha_examen,
+            COALESCE(im.presion_arterial, '') AS presion_arterial,
+            COALESCE(im.peso, 0)::float8 AS peso,
+            COALESCE(im.altura, 0)::float8 AS altura,
+            COALESCE(im.vision, '') AS vision,
+            COALESCE(im.audiometria, '') AS audiometria,
+            COALESCE(im.observaciones, '') AS observaciones,
+            im.nivel_riesgo,
+            im.justificacion_riesgo,
+            im.resumen_ejecutivo,
+            COALESCE(t.nombre, '') AS trabajador_nombre,
+            COALESCE(t.documento, '') AS trabajador_documento"""
+
+# Cache de conteo de vectores por trabajador: {trabajador_id: (total, timestamp)}
+WORKER_COUNT_TTL_SECONDS = 300
+_worker_counts = {}
+
+
+def search_similar_informes(trabajador_id, query_embedding, limit=3, db_secret_arn=None, db_cluster_arn=None, database_name=None, ef_search=None, probes=None, strategy=None):
     """
     Busca informes similares usando búsqueda por similitud con pgvector.
     
+    Filtrar por trabajador después de un índice ANN global puede retornar
+    menos de 'limit' filas (el índice solo entrega los vecinos globales más
+    cercanos) o caer en un scan secuencial de toda la tabla. Por eso la
+    búsqueda se acota al trabajador con una de dos estrategias:
+    
+    - 'exact': materializa los vectores del trabajador (índice por
+      trabajador_id) y ordena por distancia. Exacta y O(informes del trabajador).
+    - 'iterative': usa el índice ANN con iterative scan de pgvector (>= 0.8.0),
+      que sigue recorriendo el índice hasta completar 'limit' filas del trabajador.
+    - 'auto' (default): 'exact' si el trabajador tiene hasta
+      WORKER_EXACT_SEARCH_THRESHOLD vectores, 'iterative' si tiene más.
+    
     Args:
         trabajador_id: ID del trabajador para filtrar resultados
         query_embedding: Vector de embedding de la consulta (lista de floats)
@@ -22,6 +83,9 @@ def search_similar_informes(trabajador_id, query_embedding, limit=3, db_secret_a
         db_secret_arn: ARN del secreto de la base de datos (opcional, usa env var si no se provee)
         db_cluster_arn: ARN del cluster Aurora (opcional, usa env var si no se provee)
         database_name: Nombre de la base de datos (opcional, usa env var si no se provee)
+        ef_search: Recall para índices HNSW (opcional, usa HNSW_EF_SEARCH si no se provee)
+        probes: Recall para índices IVFFlat (opcional, usa IVFFLAT_PROBES si no se provee)
+        strategy: 'auto', 'exact' o 'iterative' (opcional, usa WORKER_SEARCH_STRATEGY si no se provee)
     
     Returns:
         list: Lista de informes similares ordenados por similitud (más similar primero)
@@ -34,35 +98,60 @@ def search_similar_informes(trabajador_id, query_embedding, limit=3, db_secret_a
     if not all([db_secret_arn, db_cluster_arn, database_name]):
         raise ValueError("Database credentials not provided")
     
-    # Convertir embedding a formato pgvector
-    embedding_str = '[' + ','.join(map(str, query_embedding)) + ']'
+    strategy = strategy or WORKER_SEARCH_STRATEGY
+    if strategy == 'auto':
+        total = count_worker_embeddings(trabajador_id, db_secret_arn, db_cluster_arn, database_name)
+        strategy = 'exact' if total <= WORKER_EXACT_SEARCH_THRESHOLD else 'iterative'
+    
+    if strategy not in ('exact', 'iterative'):
+        raise ValueError(f"Estrategia de búsqueda inválida: {strategy}")
+    
+    # Con pgvector < 0.8.0 los parámetros iterative_scan no existen y SET LOCAL falla
+    if strategy == 'iterative' and not supports_iterative_scan(db_secret_arn, db_cluster_arn, database_name):
+        strategy = 'exact'
+    
+    # Convertir embedding a formato pgvector (precisión fija, cacheado por ejecución)
+    embedding_str = encode_query_vector(query_embedding)
+    
+    if strategy == 'exact':
+        # Los vectores del trabajador se leen por el índice de trabajador_id;
+        # MATERIALIZED evita que el planner use el índice ANN global
+        candidatos_sql = f"""
+            SELECT ie.informe_id, ie.trabajador_id, ie.contenido, ie.fecha_examen,
+                   ({vector_column('ie')} <=> :query_embedding{vector_cast()}) as distance
+            FROM informes_embeddings ie
+            WHERE ie.trabajador_id = :trabajador_id
+        """
+        settings = {}
+    else:
+        # Iterative scan: el índice ANN sigue entregando candidatos hasta que
+        # 'limit' filas pasan el filtro de trabajador (orden relajado, se
+        # reordena en la query externa)
+        distance_expr = f"{vector_column('ie')} <=> :query_embedding{vector_cast()}"
+        candidatos_sql = f"""
+            SELECT ie.informe_id, ie.trabajador_id, ie.contenido, ie.fecha_examen,
+                   ({distance_expr}) as distance
+            FROM informes_embeddings ie
+            WHERE ie.trabajador_id = :trabajador_id
+            ORDER BY {distance_expr}
+            LIMIT :limit
+        """
+        settings = build_search_settings(limit, ef_search, probes)
+        settings.update(ITERATIVE_SCAN_SETTINGS)
     
-    # Query SQL con operador de distancia coseno de pgvector
     # El operador <=> calcula la distancia coseno (menor = más similar)
-    sql = """
+    sql = f"""
+        WITH candidatos AS MATERIALIZED ({candidatos_sql})
         SELECT 
-            ie.informe_id,
-            ie.trabajador_id,
-            ie.contenido,
-            ie.fecha_examen,
-            im.tipo_examen,
-            im.presion_arterial,
-            im.peso,
-            im.altura,
-            im.vision,
-            im.audiometria,
-            im.observaciones,
-            im.nivel_riesgo,
-            im.justificacion_riesgo,
-            im.resumen_ejecutivo,
-            t.nombre as trabajador_nombre,
-            t.documento as trabajador_documento,
-            (ie.embedding <=> :query_embedding::vector) as distance
-        FROM informes_embeddings ie
-        JOIN informes_medicos im ON ie.informe_id = im.id
-        JOIN trabajadores t ON ie.trabajador_id = t.id
-        WHERE ie.trabajador_id = :trabajador_id
-        ORDER BY ie.embedding <=> :query_embedding::vector
+            c.informe_id,
+            c.trabajador_id,
+            COALESCE(c.contenido, '') AS contenido,{INFORME_COLUMNS},
+            c.distance,
+            1 - c.distance AS similarity
+        FROM candidatos c
+        JOIN informes_medicos im ON c.informe_id = im.id
+        JOIN trabajadores t ON c.trabajador_id = t.id
+        ORDER BY c.distance
         LIMIT :limit
     """
     
@@ -72,12 +161,73 @@ def search_similar_informes(trabajador_id, query_embedding, limit=3, db_secret_a
         {'name': 'limit', 'value': {'longValue': int(limit)}}
     ]
     
-    result = execute_sql(sql, params, db_secret_arn, db_cluster_arn, database_name)
+    # distance: distancia coseno (0 = idéntico); similarity: 1 - distance
+    return execute_sql_with_settings(sql, params, settings, db_secret_arn, db_cluster_arn, database_name)
+
+
+def count_worker_embeddings(trabajador_id, db_secret_arn=None, db_cluster_arn=None, database_name=None):
+    """
+    Cuenta los embeddings de un trabajador (index-only scan sobre trabajador_id).
+    El resultado se cachea WORKER_COUNT_TTL_SECONDS en el entorno de ejecución
+    para no pagar el round trip en cada búsqueda de una Lambda caliente.
+    
+    Args:
+        trabajador_id: ID del trabajador
+        db_secret_arn: ARN del secreto de la base de datos
+        db_cluster_arn: ARN del cluster Aurora
+        database_name: Nombre de la base de datos
+    
+    Returns:
+        int: Número de embeddings del trabajador
+    """
+    cached = _worker_counts.get(trabajador_id)
+    if cached and time.time() - cached[1] < WORKER_COUNT_TTL_SECONDS:
+        return cached[0]
+    
+    sql = "SELECT COUNT(*) AS total FROM informes_embeddings WHERE trabajador_id = :trabajador_id"
+    rows = execute_sql(sql, [
+        {'name': 'trabajador_id', 'value': {'longValue': int(trabajador_id)}}
+    ], db_secret_arn, db_cluster_arn, database_name)
+    
+    total = rows[0]['total'] if rows else 0
+    _worker_counts[trabajador_id] = (total, time.time())
+    return total
+
+
+def supports_iterative_scan(db_secret_arn=None, db_cluster_arn=None, database_name=None):
+    """
+    Indica si la extensión pgvector instalada soporta iterative index scans
+    (>= 0.8.0). La versión se consulta una vez por entorno de ejecución.
+    
+    Args:
+        db_secret_arn: ARN del secreto de la base de datos
+        db_cluster_arn: ARN del cluster Aurora
+        database_name: Nombre de la base de datos
     
-    return parse_similarity_results(result)
+    Returns:
+        bool: True si se pueden usar hnsw.iterative_scan / ivfflat.iterative_scan
+    """
+    global _pgvector_version
+    
+    if _pgvector_version is None:
+        rows = execute_sql(
+            "SELECT extversion FROM pg_extension WHERE extname = 'vector'",
+            None, db_secret_arn, db_cluster_arn, database_name
+        )
+        version = rows[0]['extversion'] if rows else '0'
+        # '0.8.0' -> (0, 8, 0); sufijos no numéricos (p.ej. '0.8.0-dev') se ignoran
+        parts = []
+        for part in version.split('.'):
+            digits = ''.join(ch for ch in part if ch.isdigit())
+            parts.append(int(digits) if digits else 0)
+        _pgvector_version = tuple(parts)
+        if _pgvector_version < ITERATIVE_SCAN_MIN_VERSION:
+            print(f"pgvector {version} no soporta iterative scan: la búsqueda por trabajador usa 'exact'")
+    
+    return _pgvector_version >= ITERATIVE_SCAN_MIN_VERSION
 
 
-def search_similar_informes_all_workers(query_embedding, current_informe_id=None, limit=5, db_secret_arn=None, db_cluster_arn=None, database_name=None):
+def search_similar_informes_all_workers(query_embedding, current_informe_id=None, limit=5, db_secret_arn=None, db_cluster_arn=None, database_name=None, ef_search=None, probes=None):
     """
     Busca informes similares en toda la base de datos (sin filtrar por trabajador).
     Útil para análisis generales o comparaciones entre trabajadores.
@@ -89,6 +239,8 @@ def search_similar_informes_all_workers(query_embedding, current_informe_id=None
         db_secret_arn: ARN del secreto de la base de datos (opcional)
         db_cluster_arn: ARN del cluster Aurora (opcional)
         database_name: Nombre de la base de datos (opcional)
+        ef_search: Recall para índices HNSW (opcional, usa HNSW_EF_SEARCH si no se provee)
+        probes: Recall para índices IVFFlat (opcional, usa IVFFLAT_PROBES si no se provee)
     
     Returns:
         list: Lista de informes similares ordenados por similitud
@@ -101,36 +253,25 @@ def search_similar_informes_all_workers(query_embedding, current_informe_id=None
     if not all([db_secret_arn, db_cluster_arn, database_name]):
         raise ValueError("Database credentials not provided")
     
-    # Convertir embedding a formato pgvector
-    embedding_str = '[' + ','.join(map(str, query_embedding)) + ']'
+    # Convertir embedding a formato pgvector (precisión fija, cacheado por ejecución)
+    embedding_str = encode_query_vector(query_embedding)
+    distance_expr = f"{vector_column('ie')} <=> :query_embedding{vector_cast()}"
     
     # Query con estructura correcta: tabla separada informes_embeddings
     # Usa operador <=> para distancia coseno (0 = idéntico, 2 = opuesto)
     # Similitud = 1 - distancia
     if current_informe_id:
-        sql = """
+        sql = f"""
             SELECT 
-                im.id,
-                im.trabajador_id,
-                im.tipo_examen,
-                im.fecha_examen,
-                im.presion_arterial,
-                im.peso,
-                im.altura,
-                im.vision,
-                im.audiometria,
-                im.observaciones,
-                im.nivel_riesgo,
-                im.justificacion_riesgo,
-                im.resumen_ejecutivo,
-                t.nombre as trabajador_nombre,
-                t.documento as trabajador_documento,
-                1 - (ie.embedding <=> :query_embedding::vector) as similarity
+                im.id AS informe_id,
+                im.trabajador_id,{INFORME_COLUMNS},
+                1 - ({distance_expr}) AS similarity_score,
+                COALESCE(im.observaciones, '') AS hallazgos_clave
             FROM informes_medicos im
             JOIN informes_embeddings ie ON im.id = ie.informe_id
             JOIN trabajadores t ON im.trabajador_id = t.id
             WHERE im.id != :current_informe_id
-            ORDER BY ie.embedding <=> :query_embedding::vector
+            ORDER BY {distance_expr}
             LIMIT :limit
         """
         params = [
@@ -139,28 +280,16 @@ def search_similar_informes_all_workers(query_embedding, current_informe_id=None
             {'name': 'limit', 'value': {'longValue': int(limit)}}
         ]
     else:
-        sql = """
+        sql = f"""
             SELECT 
-                im.id,
-                im.trabajador_id,
-                im.tipo_examen,
-                im.fecha_examen,
-                im.presion_arterial,
-                im.peso,
-                im.altura,
-                im.vision,
-                im.audiometria,
-                im.observaciones,
-                im.nivel_riesgo,
-                im.justificacion_riesgo,
-                im.resumen_ejecutivo,
-                t.nombre as trabajador_nombre,
-                t.documento as trabajador_documento,
-                1 - (ie.embedding <=> :query_embedding::vector) as similarity
+                im.id AS informe_id,
+                im.trabajador_id,{INFORME_COLUMNS},
+                1 - ({distance_expr}) AS similarity_score,
+                COALESCE(im.observaciones, '') AS hallazgos_clave
             FROM informes_medicos im
             JOIN informes_embeddings ie ON im.id = ie.informe_id
             JOIN trabajadores t ON im.trabajador_id = t.id
-            ORDER BY ie.embedding <=> :query_embedding::vector
+            ORDER BY {distance_expr}
             LIMIT :limit
         """
         params = [
@@ -168,9 +297,9 @@ def search_similar_informes_all_workers(query_embedding, current_informe_id=None
             {'name': 'limit', 'value': {'longValue': int(limit)}}
         ]
     
-    result = execute_sql(sql, params, db_secret_arn, db_cluster_arn, database_name)
-    
-    return parse_similarity_results_v2(result)
+    settings = build_search_settings(limit, ef_search, probes)
+    # similarity_score: 1 - distancia coseno; hallazgos_clave: observaciones
+    return execute_sql_with_settings(sql, params, settings, db_secret_arn, db_cluster_arn, database_name)
 
 
 def get_historical_context(trabajador_id, current_informe_id=None, limit=3, db_secret_arn=None, db_cluster_arn=None, database_name=None):
@@ -199,28 +328,15 @@ def get_historical_context(trabajador_id, current_informe_id=None, limit=3, db_s
     
     # Query para obtener informes históricos
     if current_informe_id:
-        sql = """
+        sql = f"""
             SELECT 
-                im.id as informe_id,
-                im.trabajador_id,
-                im.tipo_examen,
-                im.fecha_examen,
-                im.presion_arterial,
-                im.peso,
-                im.altura,
-                im.vision,
-                im.audiometria,
-                im.observaciones,
-                im.nivel_riesgo,
-                im.justificacion_riesgo,
-                im.resumen_ejecutivo,
-                t.nombre as trabajador_nombre,
-                t.documento as trabajador_documento
+                im.id AS informe_id,
+                im.trabajador_id,{INFORME_COLUMNS}
             FROM informes_medicos im
             JOIN trabajadores t ON im.trabajador_id = t.id
             WHERE im.trabajador_id = :trabajador_id
               AND im.id != :current_informe_id
-            ORDER BY im.fecha_examen DESC
+            ORDER BY im.fecha_examen DESC, im.id DESC
             LIMIT :limit
         """
         params = [
@@ -229,27 +345,14 @@ def get_historical_context(trabajador_id, current_informe_id=None, limit=3, db_s
             {'name': 'limit', 'value': {'longValue': int(limit)}}
         ]
     else:
-        sql = """
+        sql = f"""
             SELECT 
-                im.id as informe_id,
-                im.trabajador_id,
-                im.tipo_examen,
-                im.fecha_examen,
-                im.presion_arterial,
-                im.peso,
-                im.altura,
-                im.vision,
-                im.audiometria,
-                im.observaciones,
-                im.nivel_riesgo,
-                im.justificacion_riesgo,
-                im.resumen_ejecutivo,
-                t.nombre as trabajador_nombre,
-                t.documento as trabajador_documento
+                im.id AS informe_id,
+                im.trabajador_id,{INFORME_COLUMNS}
             FROM informes_medicos im
             JOIN trabajadores t ON im.trabajador_id = t.id
             WHERE im.trabajador_id = :trabajador_id
-            ORDER BY im.fecha_examen DESC
+            ORDER BY im.fecha_examen DESC, im.id DESC
             LIMIT :limit
         """
         params = [
@@ -257,9 +360,44 @@ def get_historical_context(trabajador_id, current_informe_id=None, limit=3, db_s
             {'name': 'limit', 'value': {'longValue': int(limit)}}
         ]
     
-    result = execute_sql(sql, params, db_secret_arn, db_cluster_arn, database_name)
+    return execute_sql(sql, params, db_secret_arn, db_cluster_arn, database_name)
+
+
+def get_historical_context_batch(informe_ids, limit=3, db_secret_arn=None, db_cluster_arn=None, database_name=None):
+    """
+    Contexto histórico de varios informes en una sola query (procesos batch).
+    Equivale a llamar get_historical_context(trabajador_id, informe_id, limit)
+    por cada informe.
+    
+    Args:
+        informe_ids: IDs de los informes actuales
+        limit: Número máximo de informes históricos por informe (default: 3)
+        db_secret_arn: ARN del secreto de la base de datos (opcional)
+        db_cluster_arn: ARN del cluster Aurora (opcional)
+        database_name: Nombre de la base de datos (opcional)
+    
+    Returns:
+        dict: {informe_id: [informes históricos, más reciente primero]}
+    """
+    db_secret_arn = db_secret_arn or os.environ.get('DB_SECRET_ARN')
+    db_cluster_arn = db_cluster_arn or os.environ.get('DB_CLUSTER_ARN')
+    database_name = database_name or os.environ.get('DATABASE_NAME')
     
-    return parse_historical_results(result)
+    if not all([db_secret_arn, db_cluster_arn, database_name]):
+        raise ValueError("Database credentials not provided")
+    
+    return worker_history.get_worker_histories(
+        informe_ids,
+        limit,
+        columns=f"""
+            im.id AS informe_id,
+            im.trabajador_id,{INFORME_COLUMNS}""",
+        only_classified=False,
+        join_trabajadores=True,
+        db_secret_arn=db_secret_arn,
+        db_cluster_arn=db_cluster_arn,
+        database_name=database_name
+    )
 
 
 def cosine_similarity(vec1, vec2):
@@ -293,142 +431,73 @@ def cosine_similarity(vec1, vec2):
     return similarity
 
 
-def parse_similarity_results(result):
+def execute_sql(sql, parameters=None, db_secret_arn=None, db_cluster_arn=None, database_name=None, transaction=None):
     """
-    Parsea los resultados de búsqueda por similitud (formato antiguo).
+    Ejecuta una consulta SQL con el backend de db (Data API o conexión directa).
     
     Args:
-        result: Resultado de execute_sql
+        sql: Consulta SQL a ejecutar
+        parameters: Parámetros de la consulta (opcional)
+        db_secret_arn: ARN del secreto de la base de datos
+        db_cluster_arn: ARN del cluster Aurora
+        database_name: Nombre de la base de datos
+        transaction: Transacción de db.transaction() (opcional)
     
     Returns:
-        list: Lista de diccionarios con información de informes similares
+        list: Filas como diccionarios
     """
-    informes = []
-    
-    for record in result.get('records', []):
-        informe = {
-            'informe_id': record[0].get('longValue'),
-            'trabajador_id': record[1].get('longValue'),
-            'contenido': record[2].get('stringValue', ''),
-            'fecha_examen': record[3].get('stringValue', ''),
-            'tipo_examen': record[4].get('stringValue', ''),
-            'presion_arterial': record[5].get('stringValue', ''),
-            'peso': record[6].get('doubleValue', 0),
-            'altura': record[7].get('doubleValue', 0),
-            'vision': record[8].get('stringValue', ''),
-            'audiometria': record[9].get('stringValue', ''),
-            'observaciones': record[10].get('stringValue', ''),
-            'nivel_riesgo': record[11].get('stringValue') if not record[11].get('isNull') else None,
-            'justificacion_riesgo': record[12].get('stringValue') if not record[12].get('isNull') else None,
-            'resumen_ejecutivo': record[13].get('stringValue') if not record[13].get('isNull') else None,
-            'trabajador_nombre': record[14].get('stringValue', ''),
-            'trabajador_documento': record[15].get('stringValue', ''),
-            'distance': record[16].get('doubleValue', 1.0),  # Distancia coseno (0 = idéntico, 1 = opuesto)
-            'similarity': 1.0 - record[16].get('doubleValue', 1.0)  # Similitud (1 = idéntico, 0 = opuesto)
-        }
-        informes.append(informe)
-    
-    return informes
+    return db.query(sql, parameters, transaction, db_secret_arn, db_cluster_arn, database_name)
 
 
-def parse_similarity_results_v2(result):
+def build_search_settings(limit, ef_search=None, probes=None):
     """
-    Parsea los resultados de búsqueda por similitud (formato actualizado con tabla separada).
+    Construye los parámetros de recall de pgvector para una búsqueda.
     
     Args:
-        result: Resultado de execute_sql
+        limit: Número de resultados pedidos (ef_search nunca puede ser menor)
+        ef_search: Candidatos explorados en índices HNSW (opcional)
+        probes: Listas visitadas en índices IVFFlat (opcional)
     
     Returns:
-        list: Lista de diccionarios con información de informes similares
-    """
-    informes = []
-    
-    for record in result.get('records', []):
-        informe = {
-            'informe_id': record[0].get('longValue'),
-            'trabajador_id': record[1].get('longValue'),
-            'tipo_examen': record[2].get('stringValue', ''),
-            'fecha_examen': record[3].get('stringValue', ''),
-            'presion_arterial': record[4].get('stringValue', ''),
-            'peso': record[5].get('doubleValue', 0),
-            'altura': record[6].get('doubleValue', 0),
-            'vision': record[7].get('stringValue', ''),
-            'audiometria': record[8].get('stringValue', ''),
-            'observaciones': record[9].get('stringValue', ''),
-            'nivel_riesgo': record[10].get('stringValue') if not record[10].get('isNull') else None,
-            'justificacion_riesgo': record[11].get('stringValue') if not record[11].get('isNull') else None,
-            'resumen_ejecutivo': record[12].get('stringValue') if not record[12].get('isNull') else None,
-            'trabajador_nombre': record[13].get('stringValue', ''),
-            'trabajador_documento': record[14].get('stringValue', ''),
-            'similarity_score': record[15].get('doubleValue', 0.0),  # Similitud (1 = idéntico, 0 = opuesto)
-            'hallazgos_clave': record[9].get('stringValue', '')  # Usar observaciones como hallazgos
-        }
-        informes.append(informe)
-    
-    return informes
-
-
-def parse_historical_results(result):
+        dict: Parámetros GUC a aplicar con SET LOCAL (vacío si no hay ajustes)
     """
-    Parsea los resultados de consulta histórica.
+    settings = {}
     
-    Args:
-        result: Resultado de execute_sql
+    ef_search = ef_search or HNSW_EF_SEARCH
+    probes = probes or IVFFLAT_PROBES
     
-    Returns:
-        list: Lista de diccionarios con información de informes históricos
-    """
-    informes = []
-    
-    for record in result.get('records', []):
-        informe = {
-            'informe_id': record[0].get('longValue'),
-            'trabajador_id': record[1].get('longValue'),
-            'tipo_examen': record[2].get('stringValue', ''),
-            'fecha_examen': record[3].get('stringValue', ''),
-            'presion_arterial': record[4].get('stringValue', ''),
-            'peso': record[5].get('doubleValue', 0),
-            'altura': record[6].get('doubleValue', 0),
-            'vision': record[7].get('stringValue', ''),
-            'audiometria': record[8].get('stringValue', ''),
-            'observaciones': record[9].get('stringValue', ''),
-            'nivel_riesgo': record[10].get('stringValue') if not record[10].get('isNull') else None,
-            'justificacion_riesgo': record[11].get('stringValue') if not record[11].get('isNull') else None,
-            'resumen_ejecutivo': record[12].get('stringValue') if not record[12].get('isNull') else None,
-            'trabajador_nombre': record[13].get('stringValue', ''),
-            'trabajador_documento': record[14].get('stringValue', '')
-        }
-        informes.append(informe)
-    
-    return informes
+    if ef_search:
+        settings['hnsw.ef_search'] = max(int(ef_search), int(limit))
+    if probes:
+        settings['ivfflat.probes'] = int(probes)
+    
+    return settings
 
 
-def execute_sql(sql, parameters=None, db_secret_arn=None, db_cluster_arn=None, database_name=None):
+def execute_sql_with_settings(sql, parameters, settings, db_secret_arn, db_cluster_arn, database_name):
     """
-    Ejecuta una consulta SQL usando RDS Data API.
+    Ejecuta una consulta aplicando parámetros de pgvector con SET LOCAL.
+    
+    SET LOCAL solo dura hasta el fin de la transacción, por lo que la consulta
+    se ejecuta dentro de una transacción y el ajuste no afecta a otras
+    consultas que reutilicen la misma conexión.
     
     Args:
         sql: Consulta SQL a ejecutar
-        parameters: Parámetros de la consulta (opcional)
+        parameters: Parámetros de la consulta
+        settings: Dict de parámetros GUC (de build_search_settings)
         db_secret_arn: ARN del secreto de la base de datos
         db_cluster_arn: ARN del cluster Aurora
         database_name: Nombre de la base de datos
     
     Returns:
-        dict: Respuesta de RDS Data API
+        list: Filas como diccionarios
     """
-    params = {
-        'secretArn': db_secret_arn,
-        'resourceArn': db_cluster_arn,
-        'database': database_name,
-        'sql': sql
-    }
-    
-    if parameters:
-        params['parameters'] = parameters
-    
-    response = rds_data.execute_statement(**params)
-    return response
+    if not settings:
+        return execute_sql(sql, parameters, db_secret_arn, db_cluster_arn, database_name)
+    
+    with db.transaction(settings, db_secret_arn, db_cluster_arn, database_name) as tx:
+        return execute_sql(sql, parameters, transaction=tx)
 
 
 def format_context_for_prompt(informes):
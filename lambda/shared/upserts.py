@@ -0,0 +1,170 @@
+"""
+Módulo compartido para registrar informes con su trabajador y su contratista.
+
+register_exam (formulario legacy) y extract_pdf (PDFs externos) guardan el
+mismo trío trabajador -> contratista -> informe. Cada upsert es una sola
+sentencia INSERT ... ON CONFLICT ... DO UPDATE ... RETURNING id, apoyada en
+los índices únicos trabajadores(documento) y contratistas(email)
+(database/migration_unique_contratistas_email.sql para bases existentes):
+
+- Un viaje a Aurora por entidad en lugar de SELECT + INSERT.
+- Sin carrera entre el SELECT y el INSERT: si dos registros del mismo
+  trabajador llegan a la vez, el segundo espera al primero y recibe su id en
+  vez de fallar con la restricción UNIQUE.
+- El DO UPDATE no pisa los datos existentes (solo completa fecha_nacimiento
+  si faltaba). Se usa en lugar de DO NOTHING porque DO NOTHING no retorna la
+  fila cuando ya existía.
+
+insert_informe_with_upserts() hace los tres pasos en una sola sentencia con
+CTEs: un viaje a Aurora y atómica sin abrir una transacción.
+"""
+
+try:
+    from . import db
+except ImportError:
+    import db
+
+TRABAJADOR_UPSERT_SQL = """
+    INSERT INTO trabajadores (nombre, documento, fecha_nacimiento)
+    VALUES (:trabajador_nombre, :documento, CAST(:fecha_nacimiento AS DATE))
+    ON CONFLICT (documento) DO UPDATE
+    SET fecha_nacimiento = COALESCE(trabajadores.fecha_nacimiento, EXCLUDED.fecha_nacimiento)
+    RETURNING id
+"""
+
+CONTRATISTA_UPSERT_SQL = """
+    INSERT INTO contratistas (nombre, email)
+    VALUES (:contratista_nombre, :email)
+    ON CONFLICT (email) DO UPDATE
+    SET nombre = contratistas.nombre
+    RETURNING id
+"""
+
+# Trabajador, contratista e informe en una sentencia. Las claves foráneas del
+# informe se verifican al final de la sentencia, cuando las filas de los CTEs
+# ya existen.
+INFORME_WITH_UPSERTS_SQL = f"""
+    WITH trabajador AS ({TRABAJADOR_UPSERT_SQL}),
+    contratista AS ({CONTRATISTA_UPSERT_SQL})
+    INSERT INTO informes_medicos (
+        trabajador_id, contratista_id, tipo_examen, fecha_examen,
+        presion_arterial, peso, altura, vision, audiometria, observaciones,
+        pdf_s3_path, pdf_status, origen
+    )
+    SELECT
+        trabajador.id, contratista.id, :tipo_examen,
+        COALESCE(CAST(:fecha_examen AS TIMESTAMP), CURRENT_TIMESTAMP),
+        :presion_arterial, :peso, :altura, :vision, :audiometria, :observaciones,
+        :pdf_s3_path, :pdf_status, :origen
+    FROM trabajador, contratista
+    RETURNING id AS informe_id, trabajador_id, contratista_id
+"""
+
+
+def upsert_trabajador(trabajador, transaction=None, db_secret_arn=None, db_cluster_arn=None, database_name=None):
+    """
+    Inserta el trabajador si su documento no existe y retorna su ID.
+
+    Args:
+        trabajador: Dict con nombre, documento y fecha_nacimiento (opcional, YYYY-MM-DD)
+        transaction: Transacción de db.transaction() (opcional)
+        db_secret_arn: ARN del secreto de Aurora (opcional, usa env var)
+        db_cluster_arn: ARN del cluster Aurora (opcional, usa env var)
+        database_name: Nombre de la base de datos (opcional, usa env var)
+
+    Returns:
+        int: ID del trabajador
+    """
+    row = db.query_one(TRABAJADOR_UPSERT_SQL, _trabajador_params(trabajador), transaction=transaction,
+                       db_secret_arn=db_secret_arn, db_cluster_arn=db_cluster_arn,
+                       database_name=database_name)
+    return row['id']
+
+
+def upsert_contratista(contratista, transaction=None, db_secret_arn=None, db_cluster_arn=None, database_name=None):
+    """
+    Inserta el contratista si su email no existe y retorna su ID.
+
+    Args:
+        contratista: Dict con nombre y email
+        transaction: Transacción de db.transaction() (opcional)
+        db_secret_arn: ARN del secreto de Aurora (opcional, usa env var)
+        db_cluster_arn: ARN del cluster Aurora (opcional, usa env var)
+        database_name: Nombre de la base de datos (opcional, usa env var)
+
+    Returns:
+        int: ID del contratista
+    """
+    row = db.query_one(CONTRATISTA_UPSERT_SQL, _contratista_params(contratista), transaction=transaction,
+                       db_secret_arn=db_secret_arn, db_cluster_arn=db_cluster_arn,
+                       database_name=database_name)
+    return row['id']
+
+
+def insert_informe_with_upserts(trabajador, contratista, examen, origen, fecha_examen=None, pdf_s3_path=None,
+                                pdf_status=None, transaction=None, db_secret_arn=None, db_cluster_arn=None,
+                                database_name=None):
+    """
+    Registra trabajador, contratista e informe médico en una sola sentencia.
+
+    Args:
+        trabajador: Dict con nombre, documento y fecha_nacimiento (opcional)
+        contratista: Dict con nombre y email
+        examen: Dict con tipo, presion_arterial, peso, altura, vision, audiometria y observaciones
+        origen: 'LEGACY' o 'EXTERNO'
+        fecha_examen: Fecha ISO del examen (opcional, default CURRENT_TIMESTAMP)
+        pdf_s3_path: Ruta del PDF en S3 (opcional)
+        pdf_status: Estado de la generación del PDF, p.ej. 'PENDING' (opcional)
+        transaction: Transacción de db.transaction() (opcional)
+        db_secret_arn: ARN del secreto de Aurora (opcional, usa env var)
+        db_cluster_arn: ARN del cluster Aurora (opcional, usa env var)
+        database_name: Nombre de la base de datos (opcional, usa env var)
+
+    Returns:
+        dict: {'informe_id': ..., 'trabajador_id': ..., 'contratista_id': ...}
+    """
+    params = _trabajador_params(trabajador) + _contratista_params(contratista) + [
+        {'name': 'tipo_examen', 'value': {'stringValue': examen.get('tipo') or 'General'}},
+        _nullable_string('fecha_examen', fecha_examen),
+        {'name': 'presion_arterial', 'value': {'stringValue': examen.get('presion_arterial', '')}},
+        {'name': 'peso', 'value': {'doubleValue': float(examen.get('peso') or 0)}},
+        {'name': 'altura', 'value': {'doubleValue': float(examen.get('altura') or 0)}},
+        {'name': 'vision', 'value': {'stringValue': examen.get('vision', '')}},
+        {'name': 'audiometria', 'value': {'stringValue': examen.get('audiometria', '')}},
+        {'name': 'observaciones', 'value': {'stringValue': examen.get('observaciones', '')}},
+        _nullable_string('pdf_s3_path', pdf_s3_path),
+        _nullable_string('pdf_status', pdf_status),
+        {'name': 'origen', 'value': {'stringValue': origen}},
+    ]
+    return db.query_one(INFORME_WITH_UPSERTS_SQL, params, transaction=transaction,
+                        db_secret_arn=db_secret_arn, db_cluster_arn=db_cluster_arn,
+                        database_name=database_name)
+
+
+def _trabajador_params(trabajador):
+    nombre = (trabajador.get('nombre') or '').strip()
+    documento = (trabajador.get('documento') or '').strip()
+    if not nombre or not documento:
+        raise ValueError("Trabajador debe tener nombre y documento")
+    return [
+        {'name': 'trabajador_nombre', 'value': {'stringValue': nombre}},
+        {'name': 'documento', 'value': {'stringValue': documento}},
+        _nullable_string('fecha_nacimiento', trabajador.get('fecha_nacimiento')),
+    ]
+
+
+def _contratista_params(contratista):
+    nombre = (contratista.get('nombre') or '').strip()
+    email = (contratista.get('email') or '').strip()
+    if not nombre or not email:
+        raise ValueError("Contratista debe tener nombre y email")
+    return [
+        {'name': 'contratista_nombre', 'value': {'stringValue': nombre}},
+        {'name': 'email', 'value': {'stringValue': email}},
+    ]
+
+
+def _nullable_string(name, value):
+    if not value:
+        return {'name': name, 'value': {'isNull': True}}
+    return {'name': name, 'value': {'stringValue': value}}
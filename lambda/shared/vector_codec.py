@@ -0,0 +1,135 @@
+"""
+Módulo compartido para serializar embeddings hacia/desde pgvector.
+
+Los embeddings de Titan v2 (1024 dims, normalizados) serializados con str()
+ocupan ~20 KB de texto decimal por vector. Este módulo los codifica con
+precisión fija, lo que reduce el payload de la Data API a la mitad (~11 KB)
+sin pérdida relevante para la distancia coseno. La columna embedding siempre
+se escribe con esa precisión (embedding_half la deriva un trigger); la
+precisión de float16 (~9 KB) solo se usa para vectores de consulta contra
+embedding_half.
+"""
+
+import os
+from collections import OrderedDict
+
+# Dígitos significativos al serializar como texto
+# float32 tiene ~7 dígitos; 6 mantiene el error relativo en ~1e-6
+VECTOR_PRECISION = int(os.environ.get('VECTOR_PRECISION', '6'))
+
+# float16 tiene ~3.3 dígitos significativos; más dígitos no aportan nada
+HALFVEC_PRECISION = 4
+
+# Tipo de almacenamiento de embeddings: 'vector' (float32) o 'halfvec' (float16)
+VECTOR_STORAGE = os.environ.get('VECTOR_STORAGE', 'vector')
+
+# Cache de vectores de consulta ya codificados (por ejecución de Lambda)
+_QUERY_CACHE_SIZE = 32
+_query_cache = OrderedDict()
+
+
+def encode_vector(embedding, precision=None):
+    """
+    Serializa un embedding al formato de texto de pgvector con precisión fija.
+
+    Args:
+        embedding: Vector de embedding (lista de floats)
+        precision: Dígitos significativos (default: VECTOR_PRECISION)
+
+    Returns:
+        str: Vector en formato '[0.0123457,-0.0456789,...]'
+    """
+    fmt = f"%.{precision or VECTOR_PRECISION}g"
+    return '[' + ','.join(map(fmt.__mod__, embedding)) + ']'
+
+
+def encode_halfvec(embedding):
+    """
+    Serializa un embedding con la precisión útil de float16 (columnas halfvec).
+
+    Args:
+        embedding: Vector de embedding (lista de floats)
+
+    Returns:
+        str: Vector en formato de texto de pgvector
+    """
+    return encode_vector(embedding, HALFVEC_PRECISION)
+
+
+def encode_query_vector(query_embedding):
+    """
+    Serializa el vector de consulta una sola vez por ejecución.
+
+    Con VECTOR_STORAGE=halfvec la consulta se compara con embedding_half y
+    se serializa con la precisión de float16 (encode_halfvec).
+
+    Si el mismo embedding se usa en varias búsquedas (por ejemplo, búsqueda
+    por trabajador y luego en toda la base), las siguientes llamadas
+    reutilizan el string ya codificado. También acepta un string ya
+    codificado, que se retorna sin cambios.
+
+    Args:
+        query_embedding: Vector de embedding (lista de floats) o string pgvector
+
+    Returns:
+        str: Vector en formato de texto de pgvector
+    """
+    if isinstance(query_embedding, str):
+        return query_embedding
+
+    key = tuple(query_embedding)
+    encoded = _query_cache.get(key)
+
+    if encoded is None:
+        if VECTOR_STORAGE == 'halfvec':
+            encoded = encode_halfvec(query_embedding)
+        else:
+            encoded = encode_vector(query_embedding)
+        _query_cache[key] = encoded
+        if len(_query_cache) > _QUERY_CACHE_SIZE:
+            _query_cache.popitem(last=False)
+    else:
+        _query_cache.move_to_end(key)
+
+    return encoded
+
+
+def decode_vector(text):
+    """
+    Convierte el formato de texto de pgvector a lista de floats.
+
+    Args:
+        text: Vector en formato '[0.1,0.2,...]'
+
+    Returns:
+        list: Vector de floats
+    """
+    body = text.strip()[1:-1]
+    if not body:
+        return []
+    return [float(x) for x in body.split(',')]
+
+
+def vector_cast():
+    """
+    Retorna el cast SQL del parámetro de consulta según VECTOR_STORAGE.
+
+    Returns:
+        str: '::vector' o '::halfvec'
+    """
+    return '::halfvec' if VECTOR_STORAGE == 'halfvec' else '::vector'
+
+
+def vector_column(alias='ie'):
+    """
+    Retorna la columna de embedding a usar en búsquedas según VECTOR_STORAGE.
+
+    Args:
+        alias: Alias de la tabla informes_embeddings en la query
+
+    Returns:
+        str: 'ie.embedding' o 'ie.embedding_half'
+    """
+    column = 'embedding_half' if VECTOR_STORAGE == 'halfvec' else 'embedding'
+    return f"{alias}.{column}"
+
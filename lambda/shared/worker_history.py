@@ -0,0 +1,270 @@
+"""
+Módulo compartido para el historial de informes de un trabajador (RAG).
+
+classify_risk y generate_summary recuperan los mismos últimos informes del
+trabajador para armar el contexto del prompt. El resultado se guarda en un
+cache LRU con TTL a nivel de módulo, que vive mientras el entorno de ejecución
+de la Lambda siga caliente, con clave (trabajador_id, current_informe_id, limit).
+
+Para procesos batch, get_worker_histories() obtiene el historial de muchos
+informes en una sola query con ROW_NUMBER() por trabajador, apoyada en el
+índice (trabajador_id, fecha_examen DESC).
+
+Cuando cambia el nivel de riesgo de un informe, el historial de los demás
+informes del mismo trabajador cambia, por lo que quien escribe nivel_riesgo
+debe llamar a invalidate_worker(trabajador_id). Cada Lambda tiene su propio
+cache, así que entre Lambdas distintas el TTL acota cuánto puede quedar
+desactualizado un historial.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from . import db
+except ImportError:
+    import db
+
+# Segundos que una entrada del cache es válida (0 desactiva el cache)
+HISTORY_CACHE_TTL_SECONDS = int(os.environ.get('HISTORY_CACHE_TTL_SECONDS', '300'))
+
+# Máximo de entradas en el cache (se descartan las menos usadas)
+HISTORY_CACHE_MAX_ENTRIES = int(os.environ.get('HISTORY_CACHE_MAX_ENTRIES', '256'))
+
+# Columnas del historial para el contexto RAG (alias im = informes_medicos)
+HISTORY_COLUMNS = """
+            im.fecha_examen,
+            im.presion_arterial,
+            im.peso,
+            im.altura,
+            im.nivel_riesgo,
+            im.observaciones"""
+
+# Historial de varios informes en una query. Se numeran los informes de cada
+# trabajador y se toman limit + 1 por trabajador: al excluir el informe objetivo
+# quedan al menos limit. Las columnas objetivo_*/historial_* son internas.
+HISTORIES_SQL = """
+    WITH objetivo AS (
+        SELECT id AS objetivo_id, trabajador_id AS objetivo_trabajador_id
+        FROM informes_medicos
+        WHERE id = ANY(CAST(string_to_array(:informe_ids, ',') AS int[]))
+    ),
+    historial AS (
+        SELECT
+            im.id AS historial_id,
+            im.trabajador_id AS historial_trabajador_id,{columns},
+            ROW_NUMBER() OVER (
+                PARTITION BY im.trabajador_id
+                ORDER BY im.fecha_examen DESC, im.id DESC
+            ) AS historial_rn
+        FROM informes_medicos im{join}
+        WHERE im.trabajador_id IN (SELECT objetivo_trabajador_id FROM objetivo){condition}
+    )
+    SELECT o.objetivo_id, h.*
+    FROM objetivo o
+    JOIN historial h ON h.historial_trabajador_id = o.objetivo_trabajador_id
+    WHERE h.historial_rn <= :k
+      AND h.historial_id <> o.objetivo_id
+    ORDER BY o.objetivo_id, h.historial_rn
+"""
+
+_INTERNAL_COLUMNS = ('objetivo_id', 'historial_id', 'historial_trabajador_id', 'historial_rn')
+
+
+class TTLCache:
+    """Cache LRU con expiración por entrada y contadores de aciertos/fallos."""
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Retorna el valor cacheado para key, o None si no existe o expiró.
+        Cuenta el acierto o fallo.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Guarda value bajo key y descarta la entrada menos usada si se excede el máximo."""
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, predicate):
+        """
+        Elimina las entradas cuya clave cumple predicate.
+
+        Returns:
+            int: Cantidad de entradas eliminadas
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self):
+        """Vacía el cache y reinicia los contadores."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Contadores del cache para incluir en la respuesta de la Lambda."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entradas': len(self._entries)
+            }
+
+
+# Cache de historiales de la Lambda caliente
+_cache = TTLCache(HISTORY_CACHE_MAX_ENTRIES, HISTORY_CACHE_TTL_SECONDS)
+
+
+def get_worker_history(trabajador_id, current_informe_id, limit=3,
+                       db_secret_arn=None, db_cluster_arn=None, database_name=None):
+    """
+    Obtiene los últimos informes clasificados de un trabajador, excluyendo el actual.
+
+    Args:
+        trabajador_id: ID del trabajador
+        current_informe_id: ID del informe actual (excluido del historial)
+        limit: Número máximo de informes (default: 3)
+        db_secret_arn: ARN del secreto de Aurora (opcional, usa env var)
+        db_cluster_arn: ARN del cluster de Aurora (opcional, usa env var)
+        database_name: Nombre de la base de datos (opcional, usa env var)
+
+    Returns:
+        tuple: (lista de informes ordenados del más reciente al más antiguo,
+                True si vino del cache)
+    """
+    key = (int(trabajador_id), int(current_informe_id), int(limit))
+
+    history = _cache.get(key)
+    if history is not None:
+        return list(history), True
+
+    sql = f"""
+    SELECT{HISTORY_COLUMNS}
+    FROM informes_medicos im
+    WHERE im.trabajador_id = :trabajador_id
+    AND im.id != :current_informe_id
+    AND im.nivel_riesgo IS NOT NULL
+    ORDER BY im.fecha_examen DESC, im.id DESC
+    LIMIT :limit;
+    """
+
+    parameters = [
+        {'name': 'trabajador_id', 'value': {'longValue': key[0]}},
+        {'name': 'current_informe_id', 'value': {'longValue': key[1]}},
+        {'name': 'limit', 'value': {'longValue': key[2]}}
+    ]
+
+    history = db.query(sql, parameters, db_secret_arn=db_secret_arn,
+                       db_cluster_arn=db_cluster_arn, database_name=database_name)
+
+    # Se guarda una tupla para que el llamador no pueda modificar la entrada
+    _cache.put(key, tuple(history))
+    return history, False
+
+
+def get_worker_histories(informe_ids, limit=3, columns=HISTORY_COLUMNS, only_classified=True,
+                         join_trabajadores=False, db_secret_arn=None, db_cluster_arn=None,
+                         database_name=None):
+    """
+    Obtiene el historial de varios informes en una sola query (procesos batch).
+
+    Para cada informe retorna los últimos `limit` informes de su trabajador,
+    excluyendo el propio informe, igual que get_worker_history() pero sin
+    una query por informe. No usa el cache.
+
+    Args:
+        informe_ids: IDs de los informes objetivo
+        limit: Informes de historial por informe objetivo (default: 3)
+        columns: Columnas a retornar con alias im (informes_medicos) y t (trabajadores)
+        only_classified: Solo informes con nivel_riesgo (default: True)
+        join_trabajadores: Hacer JOIN con trabajadores t (si columns usa t.*)
+        db_secret_arn: ARN del secreto de Aurora (opcional, usa env var)
+        db_cluster_arn: ARN del cluster de Aurora (opcional, usa env var)
+        database_name: Nombre de la base de datos (opcional, usa env var)
+
+    Returns:
+        dict: {informe_id: [historial del más reciente al más antiguo]} con
+              una entrada (posiblemente vacía) por cada ID pedido
+    """
+    ids = sorted({int(informe_id) for informe_id in informe_ids})
+    if not ids:
+        return {}
+
+    sql = HISTORIES_SQL.format(
+        columns=columns,
+        join="\n        JOIN trabajadores t ON im.trabajador_id = t.id" if join_trabajadores else "",
+        condition="\n          AND im.nivel_riesgo IS NOT NULL" if only_classified else ""
+    )
+
+    parameters = [
+        {'name': 'informe_ids', 'value': {'stringValue': ','.join(map(str, ids))}},
+        {'name': 'k', 'value': {'longValue': int(limit) + 1}}
+    ]
+
+    rows = db.query(sql, parameters, db_secret_arn=db_secret_arn,
+                    db_cluster_arn=db_cluster_arn, database_name=database_name)
+
+    histories = {informe_id: [] for informe_id in ids}
+    for row in rows:
+        history = histories[row['objetivo_id']]
+        if len(history) < limit:
+            for column in _INTERNAL_COLUMNS:
+                row.pop(column, None)
+            history.append(row)
+
+    return histories
+
+
+def invalidate_worker(trabajador_id):
+    """
+    Descarta los historiales cacheados de un trabajador. Llamar después de
+    escribir nivel_riesgo en cualquiera de sus informes.
+
+    Args:
+        trabajador_id: ID del trabajador
+
+    Returns:
+        int: Cantidad de entradas eliminadas
+    """
+    trabajador_id = int(trabajador_id)
+    return _cache.invalidate(lambda key: key[0] == trabajador_id)
+
+
+def cache_stats():
+    """
+    Contadores acumulados del cache en este entorno de ejecución.
+
+    Returns:
+        dict: {'hits': int, 'misses': int, 'entradas': int}
+    """
+    return _cache.stats()
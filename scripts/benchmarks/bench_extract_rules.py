@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la extracción por reglas de extract_pdf
+(lambda/ai/extract_pdf/field_rules.py) frente a Bedrock.
+
+Usa las respuestas de Textract de los PDFs de sample_data/
+(fixtures/textract_sample_reports.json) en varias variantes:
+
+- formulario:     los pares clave-valor de FORMS tal como vienen
+- tablas:         los mismos pares como filas de una tabla de dos columnas
+                  (formato de los PDFs de generate_pdf)
+- solo líneas:    sin bloques FORMS ("Etiqueta:" y el valor en líneas separadas)
+- confianza baja: el par de Peso con confianza 55 -> debe usar Bedrock
+- sin DNI:        sin la etiqueta ni el valor del DNI -> debe usar Bedrock
+
+Para cada informe y variante reporta el camino (reglas o Bedrock), los campos
+correctos contra sample_data/medical_data.py y la latencia de las reglas.
+
+Con --bedrock además invoca Nova Pro (requiere credenciales AWS) con el mismo
+prompt de extract_pdf para comparar latencia y exactitud:
+
+    python scripts/benchmarks/bench_extract_rules.py
+    python scripts/benchmarks/bench_extract_rules.py --bedrock
+"""
+
+import argparse
+import copy
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+sys.path.insert(0, os.path.join(ROOT, 'lambda', 'ai', 'extract_pdf'))
+sys.path.insert(0, os.path.join(ROOT, 'lambda', 'shared'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from build_textract_fixture import OUTPUT as FIXTURE, REPORTS  # noqa: E402
+from field_rules import extract_fields  # noqa: E402
+from textract_layout import LayoutBuilder, compact_text  # noqa: E402
+
+MIN_CONFIDENCE = float(os.environ.get('EXTRACTION_RULES_MIN_CONFIDENCE', '80'))
+TOKEN_BUDGET = int(os.environ.get('EXTRACTION_TOKEN_BUDGET', '750'))
+
+
+def _by_id(blocks):
+    return {block['Id']: block for block in blocks}
+
+
+def _children(block, relationship_type='CHILD'):
+    return [i for r in block.get('Relationships', []) if r['Type'] == relationship_type for i in r['Ids']]
+
+
+def _key_text(block, index):
+    return ' '.join(index[i]['Text'] for i in _children(block))
+
+
+def as_forms(blocks):
+    return blocks
+
+
+def as_table(blocks):
+    """Reemplaza los pares clave-valor por una tabla etiqueta | valor."""
+    index = _by_id(blocks)
+    result = [b for b in blocks if b['BlockType'] != 'KEY_VALUE_SET']
+    cells = []
+    for block in blocks:
+        if block['BlockType'] != 'KEY_VALUE_SET' or 'KEY' not in block['EntityTypes']:
+            continue
+        value = index[_children(block, 'VALUE')[0]]
+        label_ids = _children(block)
+        index[label_ids[-1]] = dict(index[label_ids[-1]], Text=index[label_ids[-1]]['Text'].rstrip(':'))
+        row = len(cells) // 2 + 1
+        for column, word_ids in ((1, label_ids), (2, _children(value))):
+            cells.append({'BlockType': 'CELL', 'Id': f"{block['Id']}-c{column}", 'Page': block['Page'],
+                          'RowIndex': row, 'ColumnIndex': column, 'Confidence': 92.0,
+                          'Relationships': [{'Type': 'CHILD', 'Ids': word_ids}]})
+    words = {i: index[i] for i in index if index[i]['BlockType'] == 'WORD'}
+    result = [words.get(b['Id'], b) for b in result]
+    table = {'BlockType': 'TABLE', 'Id': 'tabla-campos', 'Page': 1, 'Confidence': 92.0,
+             'Geometry': {'BoundingBox': {'Top': 0.0, 'Left': 0.1}},
+             'Relationships': [{'Type': 'CHILD', 'Ids': [c['Id'] for c in cells]}]}
+    return result + cells + [table]
+
+
+def lines_only(blocks):
+    return [b for b in blocks if b['BlockType'] != 'KEY_VALUE_SET']
+
+
+def low_confidence(blocks):
+    """El par de Peso con confianza 55."""
+    blocks = copy.deepcopy(blocks)
+    index = _by_id(blocks)
+    for block in blocks:
+        if block['BlockType'] == 'KEY_VALUE_SET' and 'KEY' in block['EntityTypes'] \
+                and _key_text(block, index) == 'Peso:':
+            block['Confidence'] = 55.0
+    return blocks
+
+
+def without_dni(blocks):
+    """Sin la etiqueta DNI ni su valor (ni como par ni como línea)."""
+    index = _by_id(blocks)
+    removed = set()
+    for block in blocks:
+        if block['BlockType'] == 'KEY_VALUE_SET' and 'KEY' in block['EntityTypes'] \
+                and _key_text(block, index) == 'DNI:':
+            value = index[_children(block, 'VALUE')[0]]
+            removed.update({block['Id'], value['Id'], *_children(block), *_children(value)})
+    return [b for b in blocks if b['Id'] not in removed and not set(_children(b)) & removed]
+
+
+VARIANTS = [
+    ('formulario', as_forms, 'reglas'),
+    ('tablas', as_table, 'reglas'),
+    ('solo líneas', lines_only, 'reglas'),
+    ('confianza baja', low_confidence, 'bedrock'),
+    ('sin DNI', without_dni, 'bedrock'),
+]
+
+
+def build_layout(blocks):
+    builder = LayoutBuilder()
+    builder.add(blocks)
+    return builder.build()
+
+
+def expected_fields(report):
+    examen = report['examen']
+    return {
+        ('trabajador', 'nombre'): report['trabajador']['nombre'],
+        ('trabajador', 'documento'): report['trabajador']['dni'],
+        ('contratista', 'nombre'): report['contratista']['nombre'],
+        # Las reglas y Bedrock guardan la presión sin unidad ("118/78")
+        ('examen', 'presion_arterial'): examen['presion_arterial'].split()[0],
+        ('examen', 'peso'): examen['peso'],
+        ('examen', 'altura'): examen['altura'],
+        ('examen', 'vision'): examen['vision'],
+        ('examen', 'audiometria'): examen['audiometria'],
+    }
+
+
+def correct_fields(data, expected):
+    """Campos iguales al valor esperado (números con tolerancia, texto sin distinguir mayúsculas)."""
+    correct = 0
+    for (section, field), value in expected.items():
+        actual = (data or {}).get(section, {}).get(field)
+        if isinstance(value, float):
+            try:
+                correct += abs(float(actual) - value) < 0.01
+            except (TypeError, ValueError):
+                pass
+        elif isinstance(actual, str) and ' '.join(actual.split()).lower() == value.lower():
+            correct += 1
+    return correct
+
+
+def load_bedrock():
+    """Importa la Lambda para usar structure_data_with_bedrock (sin tocar Aurora)."""
+    for name in ('DB_SECRET_ARN', 'DB_CLUSTER_ARN', 'DATABASE_NAME', 'BUCKET_NAME'):
+        os.environ.setdefault(name, '')
+    import index
+    return index.structure_data_with_bedrock
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixture', default=FIXTURE)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--bedrock', action='store_true', help='Invocar Nova Pro para comparar')
+    args = parser.parse_args()
+
+    with open(args.fixture, encoding='utf-8') as f:
+        documents = json.load(f)['documents']
+
+    structure_with_bedrock = load_bedrock() if args.bedrock else None
+
+    print(f"{'Informe':<26}{'Variante':<16}{'camino':<9}{'esperado':<10}{'campos':>8}{'reglas ms':>11}"
+          + (f"{'Bedrock ms':>12}{'campos':>8}" if args.bedrock else ''))
+
+    rules_ms = []
+    mismatches = 0
+    for name, document in documents.items():
+        expected = expected_fields(REPORTS[name])
+        for label, transform, expected_route in VARIANTS:
+            layout = build_layout(transform(document['Blocks']))
+
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                data, reasons = extract_fields(layout, MIN_CONFIDENCE)
+                samples.append((time.perf_counter() - start) * 1000)
+            ms = statistics.median(samples)
+            rules_ms.append(ms)
+
+            route = 'reglas' if data else 'bedrock'
+            mismatches += route != expected_route
+            line = (f"{name:<26}{label:<16}{route:<9}{expected_route:<10}"
+                    f"{correct_fields(data, expected) if data else '-':>6}/{len(expected)}{ms:>11.2f}")
+
+            if structure_with_bedrock:
+                start = time.perf_counter()
+                bedrock_data = structure_with_bedrock(compact_text(layout, TOKEN_BUDGET))
+                line += f"{(time.perf_counter() - start) * 1000:>12.0f}{correct_fields(bedrock_data, expected):>6}/{len(expected)}"
+            print(line)
+            if reasons:
+                print(f"{'':<26}motivos: {'; '.join(reasons)}")
+        print()
+
+    print(f"Reglas: p50 {statistics.median(rules_ms):.2f} ms por informe (máx {max(rules_ms):.2f} ms)")
+    print('OK' if mismatches == 0 else f"ERROR: {mismatches} variante(s) con camino inesperado")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
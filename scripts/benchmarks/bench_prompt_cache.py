@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Verificación y benchmark de lambda/shared/prompt_templates.py con un S3 local.
+
+Usa un stub en memoria de s3.get_object (con ETag e If-None-Match) cargado con
+prompts/classification.txt y simula requests de classify_risk:
+
+1. Request en frío: 1 GET a S3
+2. Requests calientes: 0 llamadas a S3
+3. Vence PROMPT_CACHE_REVALIDATE_SECONDS sin cambios: 1 GET condicional -> 304
+4. Se actualiza el template en S3: el siguiente GET condicional trae la versión nueva
+
+Además compara armar el prompt con str.replace (anterior) vs render() (join).
+No necesita AWS ni dependencias externas:
+
+    python scripts/benchmarks/bench_prompt_cache.py
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+sys.path.insert(0, os.path.join(ROOT, 'lambda', 'shared'))
+
+import prompt_templates  # noqa: E402
+
+BUCKET = 'prompts-bucket'
+KEY = 'prompts/classification.txt'
+PLACEHOLDERS = ('informes_anteriores', 'datos_informe')
+
+
+class NotModified(Exception):
+    """Error con la misma forma que botocore.exceptions.ClientError para un 304."""
+
+    def __init__(self):
+        super().__init__('Not Modified')
+        self.response = {'Error': {'Code': '304'}, 'ResponseMetadata': {'HTTPStatusCode': 304}}
+
+
+class StubS3:
+    """get_object en memoria con ETag e If-None-Match; cuenta las llamadas."""
+
+    def __init__(self):
+        self.objects = {}
+        self.calls = []
+
+    def put(self, bucket, key, body):
+        etag = '"' + hashlib.md5(body.encode('utf-8')).hexdigest() + '"'
+        self.objects[(bucket, key)] = (body.encode('utf-8'), etag)
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None):
+        body, etag = self.objects[(Bucket, Key)]
+        if IfNoneMatch == etag:
+            self.calls.append('304')
+            raise NotModified()
+        self.calls.append('GET')
+        return {'Body': io.BytesIO(body), 'ETag': etag}
+
+
+def request(stub):
+    """Lo que hace classify_risk por request: obtener template y armar el prompt."""
+    before = len(stub.calls)
+    template = prompt_templates.get_template(BUCKET, KEY, PLACEHOLDERS)
+    prompt = template.render(informes_anteriores='HISTORIAL', datos_informe='DATOS')
+    return prompt, stub.calls[before:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--warm', type=int, default=1000, help='Requests calientes a simular')
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, KEY), encoding='utf-8') as f:
+        text = f.read()
+
+    stub = StubS3()
+    stub.put(BUCKET, KEY, text)
+    prompt_templates._s3 = stub
+    prompt_templates.PROMPT_CACHE_REVALIDATE_SECONDS = 3600
+
+    prompt, calls = request(stub)
+    expected = text.replace('{informes_anteriores}', 'HISTORIAL').replace('{datos_informe}', 'DATOS')
+    print(f"1. Frío:                  llamadas S3 = {calls}  prompt igual a str.replace: "
+          f"{'sí' if prompt == expected else 'NO'}")
+
+    warm_calls = []
+    for _ in range(args.warm):
+        warm_calls += request(stub)[1]
+    print(f"2. {args.warm} requests calientes: llamadas S3 = {len(warm_calls)}")
+
+    prompt_templates.PROMPT_CACHE_REVALIDATE_SECONDS = 0
+    _, calls = request(stub)
+    print(f"3. Revalidación sin cambios: llamadas S3 = {calls}")
+
+    stub.put(BUCKET, KEY, text + '\nNUEVA INSTRUCCIÓN')
+    prompt, calls = request(stub)
+    print(f"4. Template actualizado:  llamadas S3 = {calls}  versión nueva: "
+          f"{'sí' if prompt.endswith('NUEVA INSTRUCCIÓN') else 'NO'}")
+    print(f"   cache_stats() = {prompt_templates.cache_stats()}")
+
+    # Armado del prompt: str.replace por placeholder vs join de segmentos
+    template = prompt_templates.PromptTemplate(text, PLACEHOLDERS)
+    historial = 'HISTORIAL DEL TRABAJADOR:\n' + '- Presión arterial: 120/80 mmHg\n' * 20
+    datos = 'Trabajador: Juan Pérez\n' * 15
+    iterations = 20000
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        text.replace('{informes_anteriores}', historial).replace('{datos_informe}', datos)
+    replace_us = (time.perf_counter() - start) / iterations * 1e6
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        template.render(informes_anteriores=historial, datos_informe=datos)
+    render_us = (time.perf_counter() - start) / iterations * 1e6
+
+    print(f"\nArmado del prompt ({len(text)} caracteres): str.replace {replace_us:.2f} µs, "
+          f"render {render_us:.2f} µs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark de lambda/shared/row_decoder.py.
+
+Sintetiza una respuesta de execute_statement (Data API, includeResultMetadata=True)
+con N filas y 16 columnas de tipos mixtos y compara:
+- parser posicional: record[i].get('stringValue', '') por columna (patrón anterior)
+- format_records:    probar 'stringValue', 'longValue', ... celda por celda
+- decode_rows:       plan compilado por firma de columnas (dict, tuple y object)
+
+No necesita base de datos ni dependencias externas:
+
+    python scripts/benchmarks/bench_row_decoder.py --rows 10000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'lambda', 'shared'))
+
+from row_decoder import decode_rows  # noqa: E402
+
+# (nombre, typeName, generador de celda)
+COLUMNS = [
+    ('informe_id', 'int4', lambda i: {'longValue': i}),
+    ('trabajador_id', 'int4', lambda i: {'longValue': i % 500}),
+    ('tipo_examen', 'varchar', lambda i: {'stringValue': 'Periódico'}),
+    ('fecha_examen', 'text', lambda i: {'stringValue': f'2024-01-{i % 28 + 1:02d} 08:30:00'}),
+    ('presion_arterial', 'varchar', lambda i: {'stringValue': '120/80'}),
+    ('peso', 'float8', lambda i: {'doubleValue': 60 + i % 40 + 0.5}),
+    ('altura', 'float8', lambda i: {'doubleValue': 1.70}),
+    ('vision', 'varchar', lambda i: {'stringValue': '20/20'}),
+    ('audiometria', 'varchar', lambda i: {'stringValue': 'Normal'}),
+    ('observaciones', 'text', lambda i: {'stringValue': 'Sin hallazgos relevantes'}),
+    ('nivel_riesgo', 'varchar', lambda i: {'isNull': True} if i % 3 else {'stringValue': 'BAJO'}),
+    ('justificacion_riesgo', 'text', lambda i: {'isNull': True} if i % 3 else {'stringValue': 'Parámetros normales'}),
+    ('resumen_ejecutivo', 'text', lambda i: {'isNull': True}),
+    ('trabajador_nombre', 'varchar', lambda i: {'stringValue': f'Trabajador {i % 500}'}),
+    ('trabajador_documento', 'varchar', lambda i: {'stringValue': f'{10000000 + i % 500}'}),
+    ('similarity', 'float8', lambda i: {'doubleValue': 1 - (i % 100) / 100}),
+]
+
+
+def build_response(rows):
+    return {
+        'columnMetadata': [{'name': name, 'typeName': type_name} for name, type_name, _ in COLUMNS],
+        'records': [[cell(i) for _, _, cell in COLUMNS] for i in range(rows)],
+    }
+
+
+def positional_parser(response):
+    """Parser a mano por posición, como los parse_* anteriores."""
+    informes = []
+    for record in response.get('records', []):
+        informes.append({
+            'informe_id': record[0].get('longValue'),
+            'trabajador_id': record[1].get('longValue'),
+            'tipo_examen': record[2].get('stringValue', ''),
+            'fecha_examen': record[3].get('stringValue', ''),
+            'presion_arterial': record[4].get('stringValue', ''),
+            'peso': record[5].get('doubleValue', 0),
+            'altura': record[6].get('doubleValue', 0),
+            'vision': record[7].get('stringValue', ''),
+            'audiometria': record[8].get('stringValue', ''),
+            'observaciones': record[9].get('stringValue', ''),
+            'nivel_riesgo': record[10].get('stringValue') if not record[10].get('isNull') else None,
+            'justificacion_riesgo': record[11].get('stringValue') if not record[11].get('isNull') else None,
+            'resumen_ejecutivo': record[12].get('stringValue') if not record[12].get('isNull') else None,
+            'trabajador_nombre': record[13].get('stringValue', ''),
+            'trabajador_documento': record[14].get('stringValue', ''),
+            'similarity': record[15].get('doubleValue', 0),
+        })
+    return informes
+
+
+def format_records(response):
+    """Decodificación genérica celda por celda, como el format_records anterior."""
+    if 'records' not in response or not response['records']:
+        return []
+    columns = [col['name'] for col in response['columnMetadata']]
+    formatted_records = []
+    for record in response['records']:
+        formatted_record = {}
+        for i, col_name in enumerate(columns):
+            value = record[i]
+            if 'stringValue' in value:
+                formatted_record[col_name] = value['stringValue']
+            elif 'longValue' in value:
+                formatted_record[col_name] = value['longValue']
+            elif 'doubleValue' in value:
+                formatted_record[col_name] = value['doubleValue']
+            elif 'booleanValue' in value:
+                formatted_record[col_name] = value['booleanValue']
+            else:
+                formatted_record[col_name] = None
+        formatted_records.append(formatted_record)
+    return formatted_records
+
+
+def measure(fn, response, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(response)
+        times.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    rows = fn(response)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak / 1024 / 1024, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=15)
+    args = parser.parse_args()
+
+    response = build_response(args.rows)
+
+    candidates = [
+        ('parser posicional', positional_parser),
+        ('format_records', format_records),
+        ('decode_rows dict', lambda r: decode_rows(r)),
+        ('decode_rows tuple', lambda r: decode_rows(r, 'tuple')),
+        ('decode_rows object', lambda r: decode_rows(r, 'object')),
+    ]
+
+    reference = positional_parser(response)
+    print(f"{args.rows} filas x {len(COLUMNS)} columnas (mediana de {args.repeat} corridas)")
+    print(f"{'Decoder':<22}{'ms':>9}{'µs/fila':>10}{'MB pico':>10}  igual al posicional")
+    for label, fn in candidates:
+        ms, peak_mb, rows = measure(fn, response, args.repeat)
+        if rows and not isinstance(rows[0], dict):
+            rows = [row._asdict() if hasattr(row, '_asdict') else dict(zip(reference[0], row)) for row in rows]
+        same = rows == reference
+        print(f"{label:<22}{ms:>9.2f}{ms * 1000 / args.rows:>10.2f}{peak_mb:>10.2f}  {'sí' if same else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Verificación del pipeline asíncrono de extract_pdf ante una ráfaga de PDFs.
+
+Simula la subida de N PDFs de varias páginas (default 50) con el stub local
+de Textract (textract_stub.py), Bedrock en memoria y Aurora en memoria:
+
+1. Ingesta: los eventos S3 pasan por una cola SQS simulada y handler los
+   recibe en lotes de hasta 10 (varios lotes en paralelo), con throttling de
+   start_document_analysis. Los mensajes reportados en batchItemFailures
+   vuelven a la cola (maxReceiveCount 3, luego DLQ). Además se re-entregan
+   algunos eventos S3 (entrega at-least-once) y se vuelven a subir algunos
+   PDFs con otro nombre para verificar que no se duplican jobs ni informes
+   (cache de extracciones por hash de contenido, en memoria).
+2. Finalización: las notificaciones de Textract pasan por otra cola SQS y
+   completion_handler las procesa en lotes, paginando get_document_analysis
+   con páginas chicas para forzar NextToken. Bedrock simula latencia
+   (--bedrock-ms) para ver el efecto de EXTRACT_MAX_CONCURRENCY.
+   Algunas notificaciones se entregan dos veces.
+3. Verifica un informe por PDF y que el texto de todas las páginas llegó a Bedrock.
+
+No necesita AWS (solo boto3 instalado para importar la Lambda):
+
+    python scripts/benchmarks/bench_textract_burst.py --pdfs 50 --tps 5
+    python scripts/benchmarks/bench_textract_burst.py --concurrency 1   # sin paralelismo por lote
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+sys.path.insert(0, os.path.join(ROOT, 'lambda', 'ai', 'extract_pdf'))
+sys.path.insert(0, os.path.join(ROOT, 'lambda', 'shared'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-2')
+os.environ.setdefault('DB_SECRET_ARN', 'arn:aws:secretsmanager:us-east-2:000000000000:secret:local')
+os.environ.setdefault('DB_CLUSTER_ARN', 'arn:aws:rds:us-east-2:000000000000:cluster:local')
+os.environ.setdefault('DATABASE_NAME', 'medical_reports')
+os.environ.setdefault('BUCKET_NAME', 'bench-bucket')
+os.environ.setdefault('TEXTRACT_SNS_TOPIC_ARN', 'arn:aws:sns:us-east-2:000000000000:textract-completion')
+os.environ.setdefault('TEXTRACT_ROLE_ARN', 'arn:aws:iam::000000000000:role/textract')
+
+import index  # noqa: E402
+from textract_stub import StubTextract  # noqa: E402
+
+BUCKET = os.environ['BUCKET_NAME']
+
+# Configuración de las colas y del event source mapping en CDK
+SQS_BATCH_SIZE = 10
+SQS_MAX_RECEIVE_COUNT = 3
+
+# Lotes procesados a la vez (pollers del event source mapping)
+SQS_POLLERS = 5
+
+
+def make_document(number, pages):
+    """Informe de `pages` páginas; la marca de cierre va en la última."""
+    document = [[
+        'INFORME MÉDICO OCUPACIONAL',
+        f'Nombre: Trabajador {number}',
+        f'Documento: {10000000 + number}',
+        'Empresa: Constructora ABC',
+    ]]
+    for page in range(2, pages + 1):
+        document.append([f'Página {page}', 'Presión arterial: 120/80', 'Peso: 75 kg', 'Altura: 1.75 m'])
+    document[-1].append(f'FIN DEL INFORME {number}')
+    return document
+
+
+class StubBedrock:
+    """invoke_model en memoria: arma el JSON a partir del texto del prompt."""
+
+    def __init__(self, latency_ms=0):
+        self.latency_ms = latency_ms
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def invoke_model(self, modelId, body):
+        time.sleep(self.latency_ms / 1000)
+        prompt = json.loads(body)['messages'][0]['content'][0]['text']
+        with self._lock:
+            self.prompts.append(prompt)
+        nombre = re.search(r'Nombre: (.+)', prompt).group(1)
+        documento = re.search(r'Documento: (\d+)', prompt).group(1)
+        data = {
+            'trabajador': {'nombre': nombre, 'documento': documento},
+            'contratista': {'nombre': 'Constructora ABC', 'email': ''},
+            'examen': {'tipo': 'Periódico', 'observaciones': 'completo' if 'FIN DEL INFORME' in prompt else ''}
+        }
+        payload = {'output': {'message': {'content': [{'text': json.dumps(data)}]}}}
+        return {'body': io.BytesIO(json.dumps(payload).encode('utf-8'))}
+
+
+class MemoryExtractionCache:
+    """Misma semántica que extracciones_pdf (claim/get/store/fail) en memoria; MemoryAurora completa."""
+
+    def __init__(self):
+        self.rows = {}
+        self._lock = threading.Lock()
+
+    def claim(self, content_hash, pdf_s3_path):
+        with self._lock:
+            row = self.rows.get(content_hash)
+            if row is None or row['estado'] == 'ERROR':
+                intento = (row or {}).get('intento', 0) + 1
+                self.rows[content_hash] = {'estado': 'PROCESANDO', 'informe_id': None,
+                                           'datos_estructurados': None, 'hits': 0, 'intento': intento}
+                return {'reclamado': True, 'reclamado_en': str(intento)}
+            row['hits'] += 1
+            return {'reclamado': False, 'informe_id': row['informe_id'], 'estado': row['estado']}
+
+    def get(self, content_hash):
+        with self._lock:
+            row = self.rows.get(content_hash)
+            return dict(row) if row else None
+
+    def store(self, content_hash, extracted_text, structured_data):
+        with self._lock:
+            self.rows[content_hash]['datos_estructurados'] = structured_data
+
+    def complete(self, content_hash, informe_id):
+        # Con el lock tomado por MemoryAurora.save (misma transacción que el informe)
+        self.rows[content_hash].update(informe_id=informe_id, estado='COMPLETADO')
+
+    def fail(self, content_hash):
+        with self._lock:
+            if self.rows.get(content_hash, {}).get('informe_id') is None:
+                self.rows[content_hash]['estado'] = 'ERROR'
+
+
+class MemoryAurora:
+    """Reemplazo de save_to_aurora que guarda en memoria (informe y extracción juntos)."""
+
+    def __init__(self, cache):
+        self.informes = {}
+        self.cache = cache
+
+    def save(self, data, pdf_s3_path, content_hash=None):
+        with self.cache._lock:
+            row = self.cache.rows.get(content_hash) if content_hash else None
+            if row and row['informe_id'] is not None:
+                return row['informe_id']
+            if content_hash and (not row or row['estado'] != 'PROCESANDO'):
+                return None
+            informe_id = len(self.informes) + 1
+            self.informes[informe_id] = (pdf_s3_path, data)
+            if row:
+                self.cache.complete(content_hash, informe_id)
+            return informe_id
+
+
+def s3_notification(key, etag):
+    """Cuerpo del mensaje SQS que S3 publica por cada objeto creado."""
+    return json.dumps({'Records': [{
+        'eventSource': 'aws:s3',
+        's3': {'bucket': {'name': BUCKET}, 'object': {'key': key, 'eTag': etag}}
+    }]})
+
+
+class StubQueue:
+    """Cola SQS + event source mapping con respuesta parcial de lote."""
+
+    def __init__(self, bodies):
+        self.pending = [{'messageId': uuid.uuid4().hex, 'body': body, 'receives': 0} for body in bodies]
+        self.dlq = []
+        self.invocations = 0
+        self.batch_failures = 0
+        self.durations = []
+        self._lock = threading.Lock()
+
+    def drain(self, lambda_handler):
+        """Entrega lotes a lambda_handler hasta vaciar la cola."""
+        while self.pending:
+            batches = []
+            while self.pending and len(batches) < SQS_POLLERS:
+                batches.append(self.pending[:SQS_BATCH_SIZE])
+                self.pending = self.pending[SQS_BATCH_SIZE:]
+            with ThreadPoolExecutor(max_workers=len(batches)) as pool:
+                list(pool.map(lambda batch: self._invoke(lambda_handler, batch), batches))
+
+    def _invoke(self, lambda_handler, batch):
+        for message in batch:
+            message['receives'] += 1
+        event = {'Records': [
+            {'eventSource': 'aws:sqs', 'messageId': m['messageId'], 'body': m['body']} for m in batch
+        ]}
+
+        start = time.perf_counter()
+        try:
+            response = lambda_handler(event, None)
+            failed = {f['itemIdentifier'] for f in response['batchItemFailures']}
+        except Exception:
+            # Falla de la invocación completa: todo el lote vuelve a la cola
+            failed = {m['messageId'] for m in batch}
+
+        with self._lock:
+            self.invocations += 1
+            self.durations.append((time.perf_counter() - start) * 1000)
+            self.batch_failures += len(failed)
+            for message in batch:
+                if message['messageId'] not in failed:
+                    continue
+                if message['receives'] >= SQS_MAX_RECEIVE_COUNT:
+                    self.dlq.append(message)
+                else:
+                    self.pending.append(message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pdfs', type=int, default=50)
+    parser.add_argument('--max-pages', type=int, default=4)
+    parser.add_argument('--tps', type=int, default=5, help='TPS de start_document_analysis en el stub')
+    parser.add_argument('--page-size', type=int, default=5, help='MaxResults de get_document_analysis')
+    parser.add_argument('--redeliver', type=int, default=5, help='Eventos S3 a re-entregar')
+    parser.add_argument('--reuploads', type=int, default=10, help='PDFs a volver a subir con otro nombre')
+    parser.add_argument('--bedrock-ms', type=int, default=200, help='Latencia simulada de Bedrock')
+    parser.add_argument('--concurrency', type=int, default=4, help='EXTRACT_MAX_CONCURRENCY')
+    args = parser.parse_args()
+
+    textract = StubTextract(start_tps=args.tps)
+    bedrock = StubBedrock(args.bedrock_ms)
+    cache = MemoryExtractionCache()
+    aurora = MemoryAurora(cache)
+
+    index.textract_client = textract
+    index.bedrock_runtime = bedrock
+    index.save_to_aurora = aurora.save
+    index.claim_extraction = cache.claim
+    index.get_extraction = cache.get
+    index.store_extraction = cache.store
+    index.fail_extraction = cache.fail
+    index.TEXTRACT_PAGE_SIZE = args.page_size
+    index.EXTRACT_MAX_CONCURRENCY = args.concurrency
+
+    keys = []
+    etags = {}
+    expected_pages = {}
+    for number in range(1, args.pdfs + 1):
+        key = f'external-reports/informe-{number:03d}.pdf'
+        pages = 1 + (number - 1) % args.max_pages
+        document = make_document(number, pages)
+        textract.add_document(BUCKET, key, document)
+        # ETag de un PUT simple = MD5 del contenido
+        etags[key] = hashlib.md5(json.dumps(document).encode('utf-8')).hexdigest()
+        keys.append(key)
+        expected_pages[key] = pages
+
+    reuploads = []
+    for key in keys[-args.reuploads:] if args.reuploads else []:
+        copy = key.replace('informe-', 'copia-informe-')
+        textract.add_document(BUCKET, copy, textract.documents[(BUCKET, key)])
+        reuploads.append(s3_notification(copy, etags[key]))
+
+    # 1. Ingesta en ráfaga
+    ingest = StubQueue([s3_notification(key, etags[key]) for key in keys]
+                       + [s3_notification(key, etags[key]) for key in keys[:args.redeliver]]
+                       + reuploads)
+    total_events = len(ingest.pending)
+    start = time.perf_counter()
+    # Los logs de la Lambda se descartan para dejar solo el resumen
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        ingest.drain(index.handler)
+    ingest_s = time.perf_counter() - start
+
+    print(f"Ingesta: {total_events} eventos S3 ({args.pdfs} PDFs + {args.redeliver} re-entregas + "
+          f"{len(reuploads)} re-subidas) en {ingest_s:.1f}s")
+    print(f"  invocaciones: {ingest.invocations}  mensajes reintentados (batchItemFailures): "
+          f"{ingest.batch_failures}  en DLQ: {len(ingest.dlq)}")
+    print(f"  duración por invocación: p50 {statistics.median(ingest.durations):.0f} ms, "
+          f"máx {max(ingest.durations):.0f} ms")
+    print(f"  start_document_analysis: {textract.calls['start']} llamadas, "
+          f"{textract.calls['start_throttled']} throttled, {textract.calls['start_deduplicated']} deduplicadas por token")
+    print(f"  jobs únicos: {len(textract.jobs)} / {args.pdfs}")
+    print(f"  cache de extracciones: {index.cache_stats['hits']} aciertos, {index.cache_stats['misses']} fallos")
+
+    # 2. Finalización
+    notifications = textract.pop_notifications()
+    completion = StubQueue(notifications)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        completion.drain(index.completion_handler)
+    complete_s = time.perf_counter() - start
+
+    # Notificaciones repetidas: se resuelven al informe ya guardado
+    redelivered = StubQueue(notifications[:args.redeliver])
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        redelivered.drain(index.completion_handler)
+
+    print(f"Finalización: {len(notifications)} notificaciones en {complete_s:.1f}s "
+          f"({completion.invocations} invocaciones, EXTRACT_MAX_CONCURRENCY={args.concurrency}, "
+          f"Bedrock {args.bedrock_ms} ms), {textract.calls['get']} páginas de get_document_analysis "
+          f"(MaxResults={args.page_size})")
+
+    # 3. Verificación
+    saved = {path: data for path, data in aurora.informes.values()}
+    # Una re-subida puede reclamar el contenido si el intento original falló: basta
+    # con que el informe exista bajo el nombre original o el de la copia
+    missing = [key for key in keys
+               if f"s3://{BUCKET}/{key}" not in saved
+               and f"s3://{BUCKET}/{key.replace('informe-', 'copia-informe-')}" not in saved]
+    incomplete = [path for path, data in saved.items() if data['examen']['observaciones'] != 'completo']
+    multi_page = sum(1 for pages in expected_pages.values() if pages > 1)
+
+    print(f"Informes guardados: {len(aurora.informes)} (esperados {args.pdfs}), duplicados: "
+          f"{len(aurora.informes) - len(saved)}")
+    print(f"PDFs de varias páginas: {multi_page}, con texto incompleto: {len(incomplete)}")
+
+    ok = (not missing and not incomplete and not ingest.dlq and not completion.dlq
+          and len(aurora.informes) == args.pdfs and len(textract.jobs) == args.pdfs)
+    print('OK' if ok else f"ERROR: faltan {missing[:5]} incompletos {incomplete[:5]}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
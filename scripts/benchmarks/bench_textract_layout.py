@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark del armado del texto de extract_pdf a partir de los bloques de
+Textract (lambda/ai/extract_pdf/textract_layout.py).
+
+Sobre las respuestas AnalyzeDocument de los PDFs de sample_data/
+(fixtures/textract_sample_reports.json) compara el contenido que recibe el
+prompt de Bedrock:
+
+- líneas:   solo bloques LINE cortados en text[:4000] (comportamiento anterior)
+- compacto: campos FORMS + texto libre + filas TABLES con compact_text()
+            y el presupuesto por defecto
+- el mismo corte de líneas y compact_text() con un presupuesto ajustado
+
+Reporta caracteres, tokens estimados, cobertura de los valores que se
+extraen (trabajador, contratista, signos vitales, visión, audiometría), si
+llega la conclusión del informe, cobertura de los resultados de laboratorio
+y el tiempo de procesamiento de los bloques (entregados en páginas de
+resultados de 1000 bloques, como get_document_analysis).
+
+No necesita AWS:
+
+    python scripts/benchmarks/bench_textract_layout.py
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+sys.path.insert(0, os.path.join(ROOT, 'lambda', 'ai', 'extract_pdf'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from build_textract_fixture import OUTPUT as FIXTURE, REPORTS  # noqa: E402
+from textract_layout import CHARS_PER_TOKEN, LayoutBuilder, compact_text, estimate_tokens  # noqa: E402
+
+LEGACY_LIMIT = 4000
+RESULT_PAGE_SIZE = 1000
+
+
+def legacy_text(blocks, limit):
+    """Texto como lo armaba extract_pdf antes: LINE en orden de página, cortado en `limit` caracteres."""
+    lines = [block for block in blocks if block['BlockType'] == 'LINE']
+    lines.sort(key=lambda block: block.get('Page', 1))
+    return '\n'.join(block['Text'] for block in lines)[:limit]
+
+
+def layout_text(blocks, budget):
+    builder = LayoutBuilder()
+    for offset in range(0, len(blocks), RESULT_PAGE_SIZE):
+        builder.add(blocks[offset:offset + RESULT_PAGE_SIZE])
+    return compact_text(builder.build(), budget)
+
+
+def expected_values(report):
+    examen = report['examen']
+    fields = [
+        report['contratista']['nombre'],
+        report['trabajador']['nombre'],
+        report['trabajador']['dni'],
+        examen['presion_arterial'],
+        f"{examen['peso']:.1f} kg",
+        examen['vision'],
+        examen['audiometria'],
+    ]
+    conclusion = next(line for line in report['observaciones'].splitlines() if line.startswith('CONCLUSIÓN'))
+    laboratorio = [(item['nombre'], item['resultado']) for item in examen['laboratorio']]
+    return fields, conclusion, laboratorio
+
+
+def coverage(text, values):
+    """Cuántos valores aparecen en el texto (una tupla cuenta si aparecen todas sus partes)."""
+    flat = ' '.join(text.split())
+    return sum(1 for value in values if all(part in flat for part in (value if isinstance(value, tuple) else (value,))))
+
+
+def timed(fn, *args, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(*args)
+    return (time.perf_counter() - start) * 1000 / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixture', default=FIXTURE)
+    parser.add_argument('--budget', type=int, default=int(os.environ.get('EXTRACTION_TOKEN_BUDGET', '750')))
+    parser.add_argument('--tight-budget', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--show', action='store_true', help='Imprimir el texto compacto de cada informe')
+    args = parser.parse_args()
+
+    with open(args.fixture, encoding='utf-8') as f:
+        fixture = json.load(f)
+    print(f"Fixture: {os.path.relpath(args.fixture, ROOT)} ({fixture['source']})\n")
+
+    tight_limit = args.tight_budget * CHARS_PER_TOKEN
+    variants = [
+        (f'líneas[:{LEGACY_LIMIT}]', legacy_text, (LEGACY_LIMIT,)),
+        (f'compacto {args.budget} tok', layout_text, (args.budget,)),
+        (f'líneas[:{tight_limit}]', legacy_text, (tight_limit,)),
+        (f'compacto {args.tight_budget} tok', layout_text, (args.tight_budget,)),
+    ]
+
+    print(f"{'Informe':<26}{'Variante':<20}{'chars':>7}{'~tokens':>9}{'campos':>8}"
+          f"{'conclusión':>12}{'laboratorio':>13}{'ms':>8}")
+    for name, document in fixture['documents'].items():
+        blocks = document['Blocks']
+        fields, conclusion, laboratorio = expected_values(REPORTS[name])
+        for label, build, extra in variants:
+            ms, text = timed(build, blocks, *extra, repeat=args.repeat)
+            print(f"{name:<26}{label:<20}{len(text):>7}{estimate_tokens(text):>9}"
+                  f"{coverage(text, fields):>5}/{len(fields):<2}"
+                  f"{'sí' if coverage(text, [conclusion]) else 'NO':>12}"
+                  f"{coverage(text, laboratorio):>10}/{len(laboratorio):<2}{ms:>8.2f}")
+        print()
+
+    if args.show:
+        for name, document in fixture['documents'].items():
+            print(f"===== {name} ({args.budget} tokens) =====")
+            print(layout_text(document['Blocks'], args.budget))
+            print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Genera fixtures/textract_sample_reports.json: respuestas de Textract
+AnalyzeDocument (FORMS + TABLES) de los PDFs de sample_data/, usadas por
+bench_textract_layout.py.
+
+Modo por defecto (sin AWS): arma los bloques a partir del contenido de los
+PDFs con la misma estructura que entrega Textract:
+
+- LINE y WORD por cada texto dibujado, con BoundingBox y Page
+- KEY_VALUE_SET para cada etiqueta en negrita terminada en ':' con su valor
+  en la misma línea base (EMPRESA CONTRATISTA:, Nombre:, Presión Arterial:, ...)
+- el texto que los PDFs dibujan fuera de la hoja (y < 0) pasa a la página 2,
+  que repite el título del informe
+- una página de anexo con las tablas de laboratorio, examen físico y exámenes
+  complementarios de sample_data/medical_data.py (TABLE / CELL), como en los
+  informes completos de generate_sample_pdfs.py
+- un pie de página igual en todas las páginas
+
+Modo --record: llama a analyze_document real con cada PDF (requiere
+credenciales AWS) y guarda los bloques tal como los retorna Textract:
+
+    python scripts/benchmarks/build_textract_fixture.py --record
+"""
+
+import argparse
+import base64
+import json
+import os
+import re
+import sys
+import zlib
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..')
+SAMPLE_DATA = os.path.join(ROOT, 'sample_data')
+OUTPUT = os.path.join(os.path.dirname(__file__), 'fixtures', 'textract_sample_reports.json')
+
+sys.path.insert(0, SAMPLE_DATA)
+
+from medical_data import ALTO_RIESGO, BAJO_RIESGO, MEDIO_RIESGO  # noqa: E402
+
+REPORTS = {
+    'informe_bajo_riesgo.pdf': BAJO_RIESGO,
+    'informe_medio_riesgo.pdf': MEDIO_RIESGO,
+    'informe_alto_riesgo.pdf': ALTO_RIESGO,
+}
+
+PAGE_WIDTH = 612.0
+PAGE_HEIGHT = 792.0
+TITLE = 'INFORME MÉDICO OCUPACIONAL'
+FOOTER = 'Documento confidencial - Salud Ocupacional'
+
+_FONT = re.compile(r'/(F\d+) ([\d.]+) Tf')
+_TEXT = re.compile(r'1 0 0 1 ([\d.-]+) ([\d.-]+) Tm \(((?:\\.|[^\\)])*)\) Tj')
+
+
+def pdf_text_runs(path):
+    """
+    Lee los textos dibujados en un PDF de ReportLab (streams ASCII85 + Flate).
+
+    Returns:
+        list: [(x, y, fuente, tamaño, texto)]
+    """
+    raw = open(path, 'rb').read()
+    runs = []
+    for match in re.finditer(rb'stream\r?\n(.*?)endstream', raw, re.S):
+        data = match.group(1).strip()
+        if data.endswith(b'~>'):
+            data = data[:-2]
+        try:
+            content = zlib.decompress(base64.a85decode(data)).decode('latin-1')
+        except (ValueError, zlib.error):
+            continue
+
+        font, size = 'F1', 10.0
+        for op in re.finditer(f"{_FONT.pattern}|{_TEXT.pattern}", content):
+            if op.group(1):
+                font, size = op.group(1), float(op.group(2))
+            else:
+                runs.append((float(op.group(3)), float(op.group(4)), font, size, _pdf_string(op.group(5))))
+    return runs
+
+
+def _pdf_string(value):
+    value = re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), value)
+    return re.sub(r'\\(.)', r'\1', value)
+
+
+class BlockWriter:
+    """Emite bloques con ids secuenciales y geometría normalizada como Textract."""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.blocks = []
+        self.pages = {}
+
+    def _id(self):
+        return f"{self.prefix}-{len(self.blocks) + 1:04d}"
+
+    def _box(self, x, y, width, size):
+        return {'BoundingBox': {
+            'Width': round(width / PAGE_WIDTH, 4),
+            'Height': round(size / PAGE_HEIGHT, 4),
+            'Left': round(x / PAGE_WIDTH, 4),
+            'Top': round((PAGE_HEIGHT - y - size) / PAGE_HEIGHT, 4),
+        }}
+
+    def page(self, number):
+        block = {'BlockType': 'PAGE', 'Id': self._id(), 'Page': number,
+                 'Geometry': self._box(0, 0, PAGE_WIDTH, PAGE_HEIGHT), 'Relationships': [{'Type': 'CHILD', 'Ids': []}]}
+        self.blocks.append(block)
+        self.pages[number] = block
+
+    def line(self, page, x, y, size, text):
+        """Agrega un LINE con sus WORD; retorna los ids de las palabras."""
+        word_ids = []
+        offset = x
+        for word in text.split():
+            width = len(word) * size * 0.5
+            block = {'BlockType': 'WORD', 'Id': self._id(), 'Page': page, 'Text': word,
+                     'TextType': 'PRINTED', 'Confidence': 99.5, 'Geometry': self._box(offset, y, width, size)}
+            self.blocks.append(block)
+            word_ids.append(block['Id'])
+            offset += width + size * 0.25
+        line = {'BlockType': 'LINE', 'Id': self._id(), 'Page': page, 'Text': ' '.join(text.split()),
+                'Confidence': 99.5, 'Geometry': self._box(x, y, offset - x, size),
+                'Relationships': [{'Type': 'CHILD', 'Ids': word_ids}]}
+        self.blocks.append(line)
+        self.pages[page]['Relationships'][0]['Ids'].append(line['Id'])
+        return word_ids
+
+    def key_value(self, page, x, y, size, key_ids, value_ids):
+        value = {'BlockType': 'KEY_VALUE_SET', 'Id': self._id(), 'Page': page, 'EntityTypes': ['VALUE'],
+                 'Confidence': 95.0, 'Geometry': self._box(x, y, 0, size),
+                 'Relationships': [{'Type': 'CHILD', 'Ids': value_ids}]}
+        self.blocks.append(value)
+        key = {'BlockType': 'KEY_VALUE_SET', 'Id': self._id(), 'Page': page, 'EntityTypes': ['KEY'],
+               'Confidence': 95.0, 'Geometry': self._box(x, y, 0, size),
+               'Relationships': [{'Type': 'VALUE', 'Ids': [value['Id']]}, {'Type': 'CHILD', 'Ids': key_ids}]}
+        self.blocks.append(key)
+
+    def table(self, page, x, y, rows, widths, size=9.0, row_height=14.0):
+        """Agrega un TABLE con sus CELL (y los LINE/WORD de cada celda); retorna la y final."""
+        cell_ids = []
+        for row_index, row in enumerate(rows, start=1):
+            cell_x = x
+            for column_index, (text, width) in enumerate(zip(row, widths), start=1):
+                word_ids = self.line(page, cell_x + 4, y, size, text)
+                cell = {'BlockType': 'CELL', 'Id': self._id(), 'Page': page, 'RowIndex': row_index,
+                        'ColumnIndex': column_index, 'RowSpan': 1, 'ColumnSpan': 1, 'Confidence': 90.0,
+                        'Geometry': self._box(cell_x, y, width, row_height),
+                        'Relationships': [{'Type': 'CHILD', 'Ids': word_ids}]}
+                if row_index == 1:
+                    cell['EntityTypes'] = ['COLUMN_HEADER']
+                self.blocks.append(cell)
+                cell_ids.append(cell['Id'])
+                cell_x += width
+            y -= row_height
+        self.blocks.append({'BlockType': 'TABLE', 'Id': self._id(), 'Page': page, 'Confidence': 90.0,
+                            'Geometry': self._box(x, y, sum(widths), row_height * len(rows)),
+                            'Relationships': [{'Type': 'CHILD', 'Ids': cell_ids}]})
+        return y
+
+
+def derive_document(name, report):
+    """Arma la respuesta de AnalyzeDocument de un PDF de ejemplo."""
+    runs = pdf_text_runs(os.path.join(SAMPLE_DATA, name))
+    writer = BlockWriter(name.split('.')[0].replace('informe_', ''))
+
+    # Texto del PDF; lo dibujado bajo el borde de la hoja continúa en la página 2
+    last_page = 1
+    writer.page(1)
+    pending_key = None
+    for x, y, font, size, text in runs:
+        page = 1 if y >= 0 else 2
+        if page == 2:
+            y += 720
+            if last_page == 1:
+                writer.page(2)
+                writer.line(2, 173.112, 750, 16, TITLE)
+                last_page = 2
+
+        word_ids = writer.line(page, x, y, size, text)
+
+        # Etiqueta en negrita + valor en la misma línea base -> par clave-valor
+        if font == 'F2' and text.endswith(':'):
+            pending_key = (page, x, y, size, word_ids)
+        elif pending_key and pending_key[0] == page and pending_key[2] == y:
+            writer.key_value(page, pending_key[1], y, size, pending_key[4], word_ids)
+            pending_key = None
+        else:
+            pending_key = None
+
+    # Página de anexo con las tablas del informe completo
+    annex = last_page + 1
+    writer.page(annex)
+    writer.line(annex, 173.112, 750, 16, TITLE)
+    writer.line(annex, 72, 715, 12, 'ANEXO: RESULTADOS COMPLEMENTARIOS')
+    examen = report['examen']
+    y = writer.table(annex, 72, 690, [['EXAMEN DE LABORATORIO', 'RESULTADO', 'RANGO NORMAL']] + [
+        [item['nombre'], item['resultado'], item['rango']] for item in examen['laboratorio']
+    ], [160, 150, 158])
+    y = writer.table(annex, 72, y - 20, [['SISTEMA', 'HALLAZGO']] + [
+        [item['sistema'], item['hallazgo']] for item in report['examen_fisico']
+    ], [130, 338])
+    writer.table(annex, 72, y - 20, [['EXAMEN COMPLEMENTARIO', 'RESULTADO']] + [
+        [item['nombre'], item['resultado']] for item in report['examenes_adicionales']
+    ], [150, 318])
+
+    for page in range(1, annex + 1):
+        writer.line(page, 220, 0, 8, FOOTER)
+
+    return {'DocumentMetadata': {'Pages': annex}, 'Blocks': writer.blocks}
+
+
+def record_document(name):
+    """Llama a Textract AnalyzeDocument con el PDF de ejemplo."""
+    import boto3
+
+    textract = boto3.client('textract')
+    with open(os.path.join(SAMPLE_DATA, name), 'rb') as f:
+        response = textract.analyze_document(Document={'Bytes': f.read()}, FeatureTypes=['TABLES', 'FORMS'])
+    return {'DocumentMetadata': response['DocumentMetadata'], 'Blocks': response['Blocks']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--record', action='store_true', help='Usar Textract real en lugar de derivar los bloques')
+    parser.add_argument('--output', default=OUTPUT)
+    args = parser.parse_args()
+
+    documents = {}
+    for name, report in REPORTS.items():
+        documents[name] = record_document(name) if args.record else derive_document(name, report)
+        print(f"{name}: {documents[name]['DocumentMetadata']['Pages']} página(s), "
+              f"{len(documents[name]['Blocks'])} bloques")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'source': 'textract' if args.record else 'derived', 'documents': documents},
+                  f, ensure_ascii=False, separators=(',', ':'))
+        f.write('\n')
+    print(f"Fixture: {os.path.relpath(args.output, ROOT)}")
+
+
+if __name__ == '__main__':
+    main()
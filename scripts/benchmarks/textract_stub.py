@@ -0,0 +1,108 @@
+"""
+Stub local de Amazon Textract asíncrono para los benchmarks de extract_pdf.
+
+Implementa start_document_analysis / get_document_analysis con el mismo
+contrato que boto3:
+
+- ClientRequestToken idempotente (mismo token -> mismo JobId, sin notificar de nuevo)
+- Límite de TPS en start_document_analysis (ProvisionedThroughputExceededException)
+- Resultados paginados con MaxResults / NextToken, bloques PAGE y LINE con Page
+- Notificaciones de finalización con el formato del mensaje SNS de Textract
+
+Los documentos se registran con add_document() como lista de páginas, cada
+página una lista de líneas de texto.
+"""
+
+import json
+import threading
+import time
+import uuid
+
+
+class StubClientError(Exception):
+    """Error con la misma forma que botocore.exceptions.ClientError."""
+
+    def __init__(self, code, message=''):
+        super().__init__(f"{code}: {message}")
+        self.response = {'Error': {'Code': code, 'Message': message}}
+
+
+class StubTextract:
+
+    def __init__(self, start_tps=5):
+        self.start_tps = start_tps
+        self.documents = {}
+        self.jobs = {}
+        self.tokens = {}
+        self.notifications = []
+        self.calls = {'start': 0, 'start_throttled': 0, 'start_deduplicated': 0, 'get': 0}
+        self._starts = []
+        self._lock = threading.Lock()
+
+    def add_document(self, bucket, key, pages):
+        self.documents[(bucket, key)] = pages
+
+    def start_document_analysis(self, DocumentLocation, FeatureTypes, ClientRequestToken=None,
+                                JobTag=None, NotificationChannel=None):
+        bucket = DocumentLocation['S3Object']['Bucket']
+        key = DocumentLocation['S3Object']['Name']
+
+        with self._lock:
+            self.calls['start'] += 1
+
+            if ClientRequestToken in self.tokens:
+                self.calls['start_deduplicated'] += 1
+                return {'JobId': self.tokens[ClientRequestToken]}
+
+            now = time.monotonic()
+            self._starts = [t for t in self._starts if now - t < 1.0]
+            if len(self._starts) >= self.start_tps:
+                self.calls['start_throttled'] += 1
+                raise StubClientError('ProvisionedThroughputExceededException', 'Rate exceeded')
+            self._starts.append(now)
+
+            if (bucket, key) not in self.documents:
+                raise StubClientError('InvalidS3ObjectException', f"s3://{bucket}/{key}")
+
+            job_id = uuid.uuid4().hex
+            self.jobs[job_id] = (bucket, key)
+            if ClientRequestToken:
+                self.tokens[ClientRequestToken] = job_id
+
+            # El job termina de inmediato: queda una notificación SNS pendiente
+            self.notifications.append({
+                'JobId': job_id,
+                'Status': 'SUCCEEDED',
+                'API': 'StartDocumentAnalysis',
+                'JobTag': JobTag,
+                'Timestamp': int(time.time() * 1000),
+                'DocumentLocation': {'S3ObjectName': key, 'S3Bucket': bucket}
+            })
+            return {'JobId': job_id}
+
+    def get_document_analysis(self, JobId, MaxResults=1000, NextToken=None):
+        with self._lock:
+            self.calls['get'] += 1
+
+        pages = self.documents[self.jobs[JobId]]
+        blocks = []
+        for number, lines in enumerate(pages, start=1):
+            blocks.append({'BlockType': 'PAGE', 'Id': f"p{number}", 'Page': number})
+            for index, line in enumerate(lines):
+                blocks.append({'BlockType': 'LINE', 'Id': f"p{number}-l{index}", 'Page': number, 'Text': line})
+
+        offset = int(NextToken or 0)
+        response = {
+            'JobStatus': 'SUCCEEDED',
+            'DocumentMetadata': {'Pages': len(pages)},
+            'Blocks': blocks[offset:offset + MaxResults]
+        }
+        if offset + MaxResults < len(blocks):
+            response['NextToken'] = str(offset + MaxResults)
+        return response
+
+    def pop_notifications(self):
+        """Retorna y vacía las notificaciones pendientes (cuerpo JSON del mensaje SNS)."""
+        with self._lock:
+            messages, self.notifications = self.notifications, []
+        return [json.dumps(m) for m in messages]